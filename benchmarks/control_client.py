@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+控制接口压力测试客户端
+连接到以 PLAYER_CONTROL_ADDRESS 启动的播放器，在一个连接上连续发送大量命令（不等回复），
+同时用另一个连接每隔一段时间发送一次 status，测量界面线程在压力下的响应时间。
+
+用法:
+    PLAYER_CONTROL_ADDRESS=127.0.0.1:47621 python english_listening_player.py
+    python benchmarks/control_client.py --address 127.0.0.1:47621 --count 20000 --command next
+    python benchmarks/control_client.py --events        # 只打印 sentence/repeat 事件
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from control_server import parse_address  # noqa: E402
+
+
+async def connect(address):
+    kind = parse_address(address)
+    if kind[0] == 'unix':
+        return await asyncio.open_unix_connection(kind[1])
+    return await asyncio.open_connection(kind[1], kind[2])
+
+
+async def send(writer, request_id, command, args=None):
+    writer.write(json.dumps({'id': request_id, 'cmd': command, 'args': args or {}}).encode('utf-8') + b'\n')
+
+
+async def flood(address, count, command):
+    """连续发送 count 条命令，返回 (耗时秒, 失败数)"""
+    reader, writer = await connect(address)
+    started = time.perf_counter()
+
+    async def produce():
+        for i in range(count):
+            await send(writer, i, command)
+            if i % 256 == 0:
+                await writer.drain()
+        await writer.drain()
+
+    producer = asyncio.ensure_future(produce())
+    failed = 0
+    for _ in range(count):
+        reply = json.loads(await reader.readline())
+        if not reply.get('ok'):
+            failed += 1
+    await producer
+    elapsed = time.perf_counter() - started
+    writer.close()
+    return elapsed, failed
+
+
+async def probe(address, interval, stop_event, samples):
+    """另开一个连接定期发送 status，记录往返时间（毫秒）"""
+    reader, writer = await connect(address)
+    request_id = 0
+    while not stop_event.is_set():
+        request_id += 1
+        started = time.perf_counter()
+        await send(writer, request_id, 'status')
+        await writer.drain()
+        await reader.readline()
+        samples.append((time.perf_counter() - started) * 1000.0)
+        await asyncio.sleep(interval)
+    writer.close()
+
+
+async def run_load(args):
+    samples = []
+    stop_event = asyncio.Event()
+    prober = asyncio.ensure_future(probe(args.address, 0.05, stop_event, samples))
+    elapsed, failed = await flood(args.address, args.count, args.command)
+    stop_event.set()
+    await prober
+    print(f"{args.count} 条 {args.command} 命令: {elapsed:.2f}s, {args.count / elapsed:.0f} 条/秒, 失败 {failed}")
+    if samples:
+        samples.sort()
+        print(f"压力下 status 往返: 中位数 {statistics.median(samples):.1f}ms, "
+              f"P95 {samples[min(len(samples) - 1, int(len(samples) * 0.95))]:.1f}ms, 最大 {samples[-1]:.1f}ms（{len(samples)} 次）")
+
+
+async def watch_events(args):
+    reader, writer = await connect(args.address)
+    await send(writer, 0, 'subscribe')
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        print(line.decode('utf-8').rstrip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="控制接口压力测试客户端")
+    parser.add_argument('--address', default=os.environ.get('PLAYER_CONTROL_ADDRESS', '127.0.0.1:47621'))
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--command', default='status')
+    parser.add_argument('--events', action='store_true', help="订阅并打印事件")
+    args = parser.parse_args()
+    asyncio.run(watch_events(args) if args.events else run_load(args))
+
+
+if __name__ == '__main__':
+    main()
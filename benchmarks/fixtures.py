@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试数据生成
+生成不同规模的SRT/LRC字幕、WAV音频和播放列表目录
+"""
+
+import math
+import os
+import struct
+import wave
+
+
+SAMPLE_TEXTS = [
+    "Excuse me!",
+    "Yes?",
+    "Is this your handbag?",
+    "Pardon?",
+    "Is this your handbag?",
+    "Yes, it is. Thank you very much.",
+    "My coat and my umbrella please.",
+    "Here is my ticket.",
+]
+
+
+def _srt_time(ms):
+    """毫秒转换为SRT时间格式"""
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def _lrc_time(ms):
+    """毫秒转换为LRC时间格式"""
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"[{minutes:02d}:{seconds:02d}.{ms // 10:02d}]"
+
+
+def write_srt(path, cue_count, cue_ms=2500, gap_ms=500):
+    """生成包含指定句数的SRT文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        start = 0
+        for i in range(cue_count):
+            end = start + cue_ms
+            f.write(f"{i + 1}\n{_srt_time(start)} --> {_srt_time(end)}\n")
+            f.write(f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}\n\n")
+            start = end + gap_ms
+    return path
+
+
+def write_vtt(path, cue_count, cue_ms=2500, gap_ms=500):
+    """生成包含指定句数的WebVTT文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        start = 0
+        for i in range(cue_count):
+            end = start + cue_ms
+            f.write(f"{_srt_time(start).replace(',', '.')} --> {_srt_time(end).replace(',', '.')} line:90%\n")
+            f.write(f"<v Speaker>{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}\n\n")
+            start = end + gap_ms
+    return path
+
+
+def write_ass(path, cue_count, cue_ms=2500, gap_ms=500):
+    """生成包含指定句数的ASS文件"""
+    def ass_time(ms):
+        return _srt_time(ms)[1:].replace(',', '.')[:-1]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[Script Info]\nScriptType: v4.00+\n\n[Events]\n")
+        f.write("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+        start = 0
+        for i in range(cue_count):
+            end = start + cue_ms
+            f.write(f"Dialogue: 0,{ass_time(start)},{ass_time(end)},Default,,0,0,0,,"
+                    f"{{\\i1}}{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}\n")
+            start = end + gap_ms
+    return path
+
+
+def write_lrc(path, cue_count, cue_ms=3000, duplicate_every=5):
+    """生成包含指定句数的LRC文件，每隔几句插入一句同时间点的重复行"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[ti:Benchmark]\n[ar:Generated]\n")
+        start = 0
+        for i in range(cue_count):
+            f.write(f"{_lrc_time(start)}{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}\n")
+            if duplicate_every and i % duplicate_every == 0:
+                f.write(f"{_lrc_time(start + 20)}(translation {i})\n")
+            start += cue_ms
+    return path
+
+
+def make_duplicate_subtitles(cue_count, duplicate_every=3):
+    """生成带重复时间点的字幕列表，用于测试 _merge_duplicate_subtitles"""
+    subtitles = []
+    start = 0
+    for i in range(cue_count):
+        subtitles.append({'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)],
+                          'start': start, 'end': start + 3000, 'duration': 3000})
+        if duplicate_every and i % duplicate_every == 0:
+            subtitles.append({'text': "(dup)", 'start': start + 50,
+                              'end': start + 3050, 'duration': 3000})
+        start += 3000
+    return subtitles
+
+
+def make_subtitles(cue_count, cue_ms=2500, gap_ms=500):
+    """生成与 write_srt 时间轴相同的字幕列表"""
+    subtitles = []
+    start = 0
+    for i in range(cue_count):
+        subtitles.append({'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)],
+                          'start': start, 'end': start + cue_ms, 'duration': cue_ms})
+        start += cue_ms + gap_ms
+    return subtitles
+
+
+def write_wav(path, duration_ms, sample_rate=16000, tone_hz=440, beep_every_ms=1000):
+    """生成单声道16位WAV文件，每隔一段时间有一个短促的提示音"""
+    frame_count = sample_rate * duration_ms // 1000
+    beep_frames = sample_rate // 20
+    period_frames = sample_rate * beep_every_ms // 1000
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        chunk = bytearray()
+        for n in range(frame_count):
+            value = 0
+            if n % period_frames < beep_frames:
+                value = int(12000 * math.sin(2 * math.pi * tone_hz * n / sample_rate))
+            chunk += struct.pack('<h', value)
+            if len(chunk) >= 65536:
+                wav.writeframes(bytes(chunk))
+                chunk = bytearray()
+        wav.writeframes(bytes(chunk))
+    return path
+
+
+def make_course_dir(root, lesson_count, media_ext='.mp3'):
+    """生成课程目录：每课一个（空的）媒体文件和同名SRT字幕，返回媒体文件路径列表"""
+    os.makedirs(root, exist_ok=True)
+    media_paths = []
+    for i in range(lesson_count):
+        name = f"{i + 1:04d}-Lesson {i + 1}"
+        media_path = os.path.join(root, name + media_ext)
+        if not os.path.exists(media_path):
+            with open(media_path, 'wb'):
+                pass
+            write_srt(os.path.join(root, name + '.srt'), 4)
+        media_paths.append(media_path)
+    return media_paths
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面基准测试
+在 QT_QPA_PLATFORM=offscreen 和 VLC 的 dummy 音视频输出下运行，
+对字幕解析、播放列表、配置读写和循环边界精度进行计时，
+结果写入JSON文件并与保存的基线比较，超过阈值视为性能回退。
+
+用法:
+    python benchmarks/run_benchmarks.py                 # 运行并与基线比较
+    python benchmarks/run_benchmarks.py --quick         # 只运行小规模数据
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_THRESHOLD = 0.30
+
+# VLC 无界面参数
+VLC_HEADLESS_ARGS = ('--aout=dummy', '--vout=dummy', '--no-video-title-show', '--quiet')
+
+SUBTITLE_SIZES = (100, 1000, 10000)
+PLAYLIST_SIZES = (500, 2000, 5000)
+QUICK_SUBTITLE_SIZES = (100, 1000)
+QUICK_PLAYLIST_SIZES = (500,)
+REVIEW_SIZES = (10000, 300000)
+QUICK_REVIEW_SIZES = (10000,)
+BATCH_FILES = 1000
+QUICK_BATCH_FILES = 200
+COURSE_LESSONS = 500
+LOUDNESS_MINUTES = 60
+QUICK_LOUDNESS_MINUTES = 10
+WAVEFORM_WIDTH = 800
+QUICK_COURSE_LESSONS = 100
+
+
+def time_case(func, repeat, setup=None):
+    """多次执行并返回每次的耗时（秒）"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples, unit='s'):
+    """汇总多次计时结果，以最快一次作为比较值以减少机器抖动的影响"""
+    return {
+        'value': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'samples': len(samples),
+        'unit': unit,
+    }
+
+
+class BenchmarkRunner:
+    """基准测试运行器"""
+
+    def __init__(self, work_dir, quick=False, repeat=5):
+        self.work_dir = work_dir
+        self.quick = quick
+        self.repeat = repeat
+        self.results = {}
+        self.skipped = {}
+        self.app = None
+        self.player_module = None
+
+    def ensure_qt(self):
+        """创建无界面的QApplication并导入播放器模块"""
+        if self.app is None:
+            from PyQt5.QtWidgets import QApplication
+            self.app = QApplication.instance() or QApplication([sys.argv[0]])
+            import english_listening_player
+            self.player_module = english_listening_player
+        return self.player_module
+
+    def add(self, name, result):
+        self.results[name] = result
+        print(f"  {name:<40} {result['value']:.6f}{result['unit']}")
+
+    def skip(self, name, reason):
+        self.skipped[name] = reason
+        print(f"  {name:<40} 跳过: {reason}")
+
+    def subtitle_sizes(self):
+        return QUICK_SUBTITLE_SIZES if self.quick else SUBTITLE_SIZES
+
+    def playlist_sizes(self):
+        return QUICK_PLAYLIST_SIZES if self.quick else PLAYLIST_SIZES
+
+    def bench_srt(self):
+        from subtitle_formats import SubtitleParser
+        for size in self.subtitle_sizes():
+            path = fixtures.write_srt(os.path.join(self.work_dir, f'bench_{size}.srt'), size)
+            parser = SubtitleParser()
+            self.add(f'load_srt[{size}]', summarize(time_case(lambda: parser.load(path), self.repeat)))
+
+    def bench_lrc(self):
+        from subtitle_formats import SubtitleParser
+        for size in self.subtitle_sizes():
+            path = fixtures.write_lrc(os.path.join(self.work_dir, f'bench_{size}.lrc'), size)
+            parser = SubtitleParser()
+            self.add(f'load_lrc[{size}]', summarize(time_case(lambda: parser.load(path), self.repeat)))
+
+    def bench_formats(self):
+        """WebVTT 和 ASS 与 SRT 共用同一条加载路径"""
+        from subtitle_formats import SubtitleParser
+        for size in self.subtitle_sizes():
+            for name, write in (('vtt', fixtures.write_vtt), ('ass', fixtures.write_ass)):
+                path = write(os.path.join(self.work_dir, f'bench_{size}.{name}'), size)
+                parser = SubtitleParser()
+                self.add(f'load_{name}[{size}]', summarize(time_case(lambda: parser.load(path), self.repeat)))
+
+    def bench_merge(self):
+        import subtitle_lrc
+        from subtitle_formats import CueTable
+        for size in self.subtitle_sizes():
+            template = fixtures.make_duplicate_subtitles(size)
+            state = {}
+
+            def setup():
+                cues = CueTable()
+                for sub in template:
+                    cues.append(sub['start'], sub['end'], sub['text'])
+                state['cues'] = cues
+
+            self.add(f'merge_duplicate_subtitles[{size}]',
+                     summarize(time_case(lambda: subtitle_lrc.finish(state['cues']), self.repeat, setup)))
+
+    def bench_bilingual(self):
+        """双语字幕：第二字幕与主字幕逐句对照"""
+        from subtitle_tracks import align_tracks
+        for size in self.subtitle_sizes():
+            primary = fixtures.make_subtitles(size)
+            # 第二字幕的时间轴略有偏移，每隔几句拆成两句
+            secondary = []
+            for i, sub in enumerate(fixtures.make_subtitles(size, cue_ms=2300, gap_ms=700)):
+                if i % 5 == 0:
+                    middle = (sub['start'] + sub['end']) // 2
+                    secondary.append(dict(sub, end=middle))
+                    secondary.append(dict(sub, start=middle))
+                else:
+                    secondary.append(sub)
+            self.add(f'align_tracks[{size}]',
+                     summarize(time_case(lambda: align_tracks(primary, secondary), self.repeat)))
+
+    def make_window(self):
+        """创建不执行延迟初始化的主窗口，只构建播放列表界面"""
+        module = self.ensure_qt()
+        window = module.MainWindow()
+        window.config_file = os.path.join(self.work_dir, 'bench_config.json')
+        window.setup_file_playlist_interface()
+        return window
+
+    def bench_playlist(self):
+        for size in self.playlist_sizes():
+            media_paths = fixtures.make_course_dir(os.path.join(self.work_dir, f'course_{size}'), size)
+            window = self.make_window()
+
+            def setup():
+                window.playlist_items = []
+                window.file_playlist_widget.clear()
+
+            self.add(f'add_to_playlist[{size}]',
+                     summarize(time_case(lambda: window.add_files_to_playlist(media_paths),
+                                         self.repeat, setup)))
+
+            # 配置读写使用同一个大播放列表
+            window.playlist_items = []
+            window.file_playlist_widget.clear()
+            window.add_files_to_playlist(media_paths)
+            self.add(f'save_config[{size}]', summarize(time_case(window.save_config, self.repeat)))
+            self.add(f'load_config[{size}]', summarize(time_case(window.load_config, self.repeat)))
+            window.deleteLater()
+
+    def bench_search(self):
+        """句子索引：整个播放列表的首次索引和查询"""
+        module = self.ensure_qt()
+        from sentence_search import SentenceIndex
+        for size in self.playlist_sizes():
+            media_paths = fixtures.make_course_dir(os.path.join(self.work_dir, f'course_{size}'), size)
+            subtitle_paths = [os.path.splitext(path)[0] + '.srt' for path in media_paths]
+            db_path = os.path.join(self.work_dir, f'search_{size}.db')
+
+            def setup():
+                if os.path.exists(db_path):
+                    os.remove(db_path)
+
+            def build():
+                SentenceIndex(db_path, module.load_subtitle_cues).sync(subtitle_paths)
+
+            self.add(f'sentence_index_build[{size}]', summarize(time_case(build, self.repeat, setup)))
+            index = SentenceIndex(db_path, module.load_subtitle_cues)
+            index.sync(subtitle_paths)
+            self.add(f'sentence_search[{size}]',
+                     summarize(time_case(lambda: index.search('your handbag'), self.repeat)))
+
+    def bench_review(self):
+        """句子复习：大量已评分句子时建立到期堆、评分并取下一句"""
+        import random
+        from sentence_review import ReviewScheduler, CUE_BITS, GOOD
+        for size in (QUICK_REVIEW_SIZES if self.quick else REVIEW_SIZES):
+            db_path = os.path.join(self.work_dir, f'review_{size}.db')
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            scheduler = ReviewScheduler(db_path)
+            files_count = max(1, size // 300)
+            now = int(time.time())
+            rng = random.Random(size)
+            conn = scheduler._conn
+            conn.executemany("INSERT INTO files (id, subtitle_path) VALUES (?, ?)",
+                             ((i + 1, f'/course/lesson{i}.srt') for i in range(files_count)))
+            conn.executemany("INSERT INTO reviews VALUES (?, 2.5, 86400, ?, 1, 0, ?)",
+                             ((((i % files_count + 1) << CUE_BITS) | (i // files_count),
+                               now + rng.randint(-86400, 86400 * 30), now) for i in range(size)))
+            conn.commit()
+            scheduler.close()
+
+            state = {}
+
+            def setup():
+                if state:
+                    state['scheduler'].close()
+                state['scheduler'] = ReviewScheduler(db_path)
+
+            self.add(f'review_first_due[{size}]',
+                     summarize(time_case(lambda: state['scheduler'].next_due(), self.repeat, setup)))
+            state['scheduler'].close()
+
+            playlist = [f'/course/lesson{i}.srt' for i in range(0, files_count, 2)]
+            session_path = os.path.join(self.work_dir, f'review_session_{size}.db')
+
+            def session_setup():
+                # 每次都从同一份数据开始，否则前一次的评分会改变堆的状态，各次的工作量不同
+                state['scheduler'].close()
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(session_path + suffix):
+                        os.remove(session_path + suffix)
+                shutil.copyfile(db_path, session_path)
+                state['scheduler'] = ReviewScheduler(session_path)
+                state['scheduler'].next_due(playlist)
+
+            def review_session():
+                # 复习200句：评分后取播放列表中下一句到期的句子
+                scheduler = state['scheduler']
+                for _ in range(200):
+                    due = scheduler.next_due(playlist)
+                    scheduler.grade(due.subtitle_path, due.cue_index, GOOD, now=due.due)
+
+            self.add(f'review_session_200[{size}]', summarize(time_case(review_session, self.repeat, session_setup)))
+            state['scheduler'].close()
+
+    def bench_batch(self):
+        """批量检查字幕库：单进程和进程池，两者之比反映随核数的扩展"""
+        from subtitle_batch import find_subtitle_files, run_batch
+        file_count = QUICK_BATCH_FILES if self.quick else BATCH_FILES
+        library = os.path.join(self.work_dir, 'batch_library')
+        os.makedirs(library)
+        for i in range(file_count):
+            if i % 4:
+                fixtures.write_srt(os.path.join(library, f'lesson{i}.srt'), 200)
+            else:
+                fixtures.write_lrc(os.path.join(library, f'lesson{i}.lrc'), 200)
+        files = find_subtitle_files([library])
+        workers = max(2, os.cpu_count() or 1)
+        self.add(f'batch_check_serial[{file_count}]',
+                 summarize(time_case(lambda: run_batch(files, workers=1), self.repeat)))
+        self.add(f'batch_check_pool[{file_count}]',
+                 summarize(time_case(lambda: run_batch(files, workers=workers), self.repeat)))
+
+    def bench_course_manifest(self):
+        """课程清单：生成（扫描目录、计算哈希、解析字幕）和加载（列目录比较签名、读清单）"""
+        import course_manifest
+        lesson_count = QUICK_COURSE_LESSONS if self.quick else COURSE_LESSONS
+        course = os.path.join(self.work_dir, 'course')
+        os.makedirs(course)
+        for i in range(lesson_count):
+            fixtures.write_wav(os.path.join(course, f'lesson{i + 1}.wav'), 1000)
+            fixtures.write_srt(os.path.join(course, f'lesson{i + 1}.srt'), 200)
+        media_extensions = ('.mp3', '.wav')
+        with contextlib.redirect_stdout(io.StringIO()):
+            manifest = course_manifest.build_manifest(course, media_extensions)
+        course_manifest.write_manifest(course, manifest)
+        self.add(f'course_manifest_build[{lesson_count}]',
+                 summarize(time_case(lambda: course_manifest.build_manifest(course, media_extensions), self.repeat)))
+
+        def load():
+            manifest = course_manifest.load_manifest(course, media_extensions)
+            assert manifest is not None
+            return course_manifest.playlist_items(course, manifest)
+
+        self.add(f'course_manifest_load[{lesson_count}]', summarize(time_case(load, self.repeat)))
+
+    def bench_loudness(self):
+        """响度分析：16kHz单声道PCM的计算部分（不含VLC解码），记录为实时的多少倍"""
+        import wave
+        import loudness
+        minutes = QUICK_LOUDNESS_MINUTES if self.quick else LOUDNESS_MINUTES
+        name = f'loudness_analysis[{minutes}min]'
+        if not loudness.is_available():
+            self.skip(name, "没有安装numpy")
+            return
+        # 生成一分钟的音频后重复拼接，避免逐个采样生成长文件
+        minute = fixtures.write_wav(os.path.join(self.work_dir, 'loudness_minute.wav'), 60000)
+        with wave.open(minute, 'rb') as wav:
+            pcm = wav.readframes(wav.getnframes())
+        media_path = os.path.join(self.work_dir, 'loudness_lesson.wav')
+        with wave.open(media_path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            for _ in range(minutes):
+                wav.writeframes(pcm)
+        result = summarize(time_case(lambda: loudness.analyze_wav(media_path), self.repeat))
+        result['speedup'] = minutes * 60 / result['value']
+        self.add(name, result)
+        print(f"    约为实时的 {result['speedup']:.0f} 倍")
+
+    def bench_waveform(self):
+        """波形金字塔：生成（不含VLC解码），以及一句和整课两种范围取一行像素的最小/最大值"""
+        import wave
+        import waveform_cache
+        minutes = QUICK_LOUDNESS_MINUTES if self.quick else LOUDNESS_MINUTES
+        build_name = f'waveform_pyramid_build[{minutes}min]'
+        if not waveform_cache.is_available():
+            for name in (build_name, 'waveform_columns[sentence]', 'waveform_columns[lesson]'):
+                self.skip(name, "没有安装numpy")
+            return
+        minute = fixtures.write_wav(os.path.join(self.work_dir, 'waveform_minute.wav'), 60000,
+                                    sample_rate=waveform_cache.ANALYSIS_SAMPLE_RATE)
+        with wave.open(minute, 'rb') as wav:
+            pcm = wav.readframes(wav.getnframes())
+        wav_path = os.path.join(self.work_dir, 'waveform_lesson.wav')
+        with wave.open(wav_path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(waveform_cache.ANALYSIS_SAMPLE_RATE)
+            for _ in range(minutes):
+                wav.writeframes(pcm)
+        pyramid_path = os.path.join(self.work_dir, 'waveform_lesson.wave')
+
+        def build():
+            sample_rate, base_bin, base = waveform_cache.base_level_from_wav(wav_path)
+            waveform_cache.write_pyramid(pyramid_path, (0, 0), sample_rate, base_bin, waveform_cache.build_levels(base))
+
+        self.add(build_name, summarize(time_case(build, self.repeat)))
+
+        # 一句（3秒）和整课的计算量都只与像素数有关
+        pyramid = waveform_cache.WaveformPyramid.open(pyramid_path)
+        try:
+            duration = pyramid.duration_ms
+            middle = duration // 2
+            for label, start, end in (('sentence', middle, middle + 3000), ('lesson', 0, duration)):
+                result = summarize(time_case(lambda: pyramid.columns(start, end, WAVEFORM_WIDTH), self.repeat * 20))
+                self.add(f'waveform_columns[{label}]', result)
+        finally:
+            pyramid.close()
+
+    def bench_loop_accuracy(self):
+        """循环边界精度：统计越过循环结束点的毫秒数"""
+        name = 'loop_overshoot_p90'
+        module = self.ensure_qt()
+        try:
+            player = module.VLCPlayer(instance_args=VLC_HEADLESS_ARGS)
+        except Exception as e:
+            self.skip(name, f"无法创建VLC实例 ({e})")
+            return
+
+        from PyQt5.QtCore import QEventLoop, QTimer
+        from player_metrics import metrics, METRIC_LOOP_OVERSHOOT
+
+        media_path = fixtures.write_wav(os.path.join(self.work_dir, 'bench_tone.wav'), 30000)
+        metrics.reset()
+        player.set_repeat_settings(0, 0, False)
+        player.load_media(media_path)
+        player.play()
+        wait = QEventLoop()
+        QTimer.singleShot(500, wait.quit)
+        wait.exec_()
+        player.set_loop(5000, 7000)
+        QTimer.singleShot(3000 if self.quick else 10000, wait.quit)
+        with contextlib.redirect_stdout(io.StringIO()):
+            wait.exec_()
+        player.stop()
+
+        histogram = metrics.snapshot()['histograms'].get(METRIC_LOOP_OVERSHOOT)
+        if not histogram or not histogram['count']:
+            self.skip(name, "没有采集到循环数据")
+            return
+        self.add(name, {'value': histogram['p90_ms'], 'median': histogram['p50_ms'],
+                        'mean': histogram['mean_ms'], 'samples': histogram['count'], 'unit': 'ms'})
+
+    def bench_repeat_simulation(self):
+        """用模拟时钟后端重放整套课程的复读过程"""
+        from repeat_engine import RepeatStateMachine, SimulatedBackend
+
+        lesson_count = 50 if self.quick else 500
+        sentences_per_lesson = 30
+        cue_ms, gap_ms = 2500, 500
+        duration_ms = sentences_per_lesson * (cue_ms + gap_ms)
+
+        def replay():
+            for _ in range(lesson_count):
+                backend = SimulatedBackend(duration_ms, seek_latency_ms=30)
+                state = {'index': 0}
+
+                def start_sentence():
+                    start = state['index'] * (cue_ms + gap_ms)
+                    engine.reset_repeat_count()
+                    engine.set_loop(start, start + cue_ms)
+                    engine.play()
+
+                def on_completed():
+                    state['index'] += 1
+                    if state['index'] < sentences_per_lesson:
+                        start_sentence()
+
+                engine = RepeatStateMachine(backend, on_repeat_completed=on_completed, verbose=False)
+                engine.set_repeat_settings(3, 1, True)
+                start_sentence()
+                backend.run_while(lambda: state['index'] < sentences_per_lesson, 10 ** 9)
+                replay.simulated_ms += backend.now_ms
+
+        replay.simulated_ms = 0
+        samples = time_case(replay, 1)
+        result = summarize(samples)
+        result['speedup'] = replay.simulated_ms / (samples[0] * 1000.0)
+        self.add(f'repeat_simulation[{lesson_count}x{sentences_per_lesson}]', result)
+        print(f"    模拟时长 {replay.simulated_ms / 3600000:.1f} 小时，约为实时的 {result['speedup']:.0f} 倍")
+
+    def run(self):
+        # 循环精度需要运行事件循环，放在创建主窗口之前，避免触发主窗口的延迟初始化
+        print("循环精度")
+        self.bench_loop_accuracy()
+        print("复读状态机")
+        self.bench_repeat_simulation()
+        print("字幕解析")
+        self.bench_srt()
+        self.bench_lrc()
+        self.bench_formats()
+        self.bench_merge()
+        self.bench_bilingual()
+        print("播放列表与配置")
+        self.bench_playlist()
+        print("句子搜索")
+        self.bench_search()
+        print("句子复习")
+        self.bench_review()
+        print("批量检查字幕")
+        self.bench_batch()
+        print("课程清单")
+        self.bench_course_manifest()
+        print("响度分析")
+        self.bench_loudness()
+        print("句子波形")
+        self.bench_waveform()
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """与基线比较，返回回退的用例列表"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base['value']:
+            continue
+        ratio = result['value'] / base['value']
+        if ratio > 1 + threshold:
+            regressions.append((name, base['value'], result['value'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="英语精听复读播放器基准测试")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="结果JSON文件路径")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线JSON文件路径")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="允许的相对回退比例，默认0.30表示慢30%%以内不报错")
+    parser.add_argument('--update-baseline', action='store_true', help="用本次结果覆盖基线")
+    parser.add_argument('--quick', action='store_true', help="只运行小规模数据")
+    parser.add_argument('--repeat', type=int, default=5, help="每个用例的重复次数")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='elp_bench_') as work_dir:
+        # 主窗口会读取当前目录下的配置文件，切换到临时目录避免影响真实配置
+        old_cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            runner = BenchmarkRunner(work_dir, quick=args.quick, repeat=args.repeat)
+            runner.run()
+        finally:
+            os.chdir(old_cwd)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'results': runner.results,
+        'skipped': runner.skipped,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("没有找到基线文件，跳过回退检查")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(runner.results, baseline, args.threshold)
+    if regressions:
+        print(f"发现性能回退（阈值 {args.threshold:.0%}）:")
+        for name, base, value, ratio in regressions:
+            print(f"  {name}: 基线={base:.6f} 本次={value:.6f} ({ratio:.2f}x)")
+        return 1
+    print(f"没有超过阈值 {args.threshold:.0%} 的性能回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VLC资源泄漏测试
+无界面创建播放器，在几个音频文件之间反复切换（加载、播放、停止），模拟长时间自动连播，
+定期记录进程的常驻内存（RSS）。预热之后内存增长超过上限、播放器持有的媒体数超过保留数，
+或者关闭后还有没释放的媒体时返回非零。
+
+用法:
+    python benchmarks/soak_media_switch.py                       # 切换10000次
+    python benchmarks/soak_media_switch.py --switches 2000 --max-growth-mb 16
+    python benchmarks/soak_media_switch.py --memory-repeat       # 同时加载内存复读的句子片段
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures  # noqa: E402
+from run_benchmarks import VLC_HEADLESS_ARGS  # noqa: E402
+
+
+def current_rss_bytes():
+    """当前进程的常驻内存（字节），无法读取时返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def make_clip(media_path, index):
+    """内存复读用的一秒静音片段"""
+    from sentence_buffer import PcmClip
+    start_ms = index * 1000
+    return PcmClip(media_path, start_ms, start_ms + 1000, 16000, 1, bytes(32000))
+
+
+def run(args, work_dir):
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    import english_listening_player
+
+    media_paths = [fixtures.write_wav(os.path.join(work_dir, f'soak_{i}.wav'), 5000 + i * 1000)
+                   for i in range(args.files)]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            player = english_listening_player.VLCPlayer(instance_args=VLC_HEADLESS_ARGS)
+    except Exception as e:
+        print(f"跳过: 无法创建VLC实例 ({e})")
+        return 0
+    if args.memory_repeat:
+        with contextlib.redirect_stdout(io.StringIO()):
+            player.set_sentence_buffer_enabled(True)
+    resources = player.resources
+
+    samples = []
+    started = time.perf_counter()
+    for i in range(args.switches):
+        media_path = media_paths[i % len(media_paths)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            player.load_media(media_path)
+            player.play()
+            if args.memory_repeat:
+                player.clip_backend.load(make_clip(media_path, i))
+                player.clip_backend.play()
+                player.clip_backend.stop()
+            player.stop()
+        app.processEvents()
+        if (i + 1) % args.sample_every == 0 or i + 1 == args.warmup:
+            rss = current_rss_bytes()
+            samples.append((i + 1, rss))
+            rss_text = f"{rss / 1048576:.1f}MB" if rss is not None else "未知"
+            print(f"  切换 {i + 1:>6} 次  RSS={rss_text}  持有媒体={resources.live_media_count()}  "
+                  f"已创建={resources.created_media}  已释放={resources.released_media}")
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    # 持有的媒体：最近使用的文件媒体，加上内存复读播放器当前的片段
+    allowed = resources.media_keep + (1 if args.memory_repeat else 0)
+    if resources.live_media_count() > allowed:
+        failures.append(f"持有 {resources.live_media_count()} 个媒体，超过 {allowed}")
+
+    warm = [rss for count, rss in samples if count >= args.warmup and rss is not None]
+    if len(warm) >= 2:
+        growth_mb = (max(warm[1:]) - warm[0]) / 1048576
+        print(f"预热后内存增长: {growth_mb:.1f}MB（上限 {args.max_growth_mb}MB）")
+        if growth_mb > args.max_growth_mb:
+            failures.append(f"预热后内存增长 {growth_mb:.1f}MB，超过 {args.max_growth_mb}MB")
+    elif current_rss_bytes() is None:
+        print("无法读取进程内存（Windows上需要安装psutil），只检查媒体数")
+    else:
+        print("切换次数太少，没有检查内存增长")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        player.shutdown()
+    if not resources.closed or player.resources is not None:
+        failures.append("关闭后VLC实例没有释放")
+    if resources.released_media != resources.created_media:
+        failures.append(f"关闭后还有 {resources.created_media - resources.released_media} 个媒体没有释放")
+
+    print(f"切换 {args.switches} 次，耗时 {elapsed:.1f}s，平均 {elapsed / args.switches * 1000:.2f}ms/次")
+    if failures:
+        print("发现资源泄漏:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("没有发现资源泄漏")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VLC资源泄漏测试")
+    parser.add_argument('--switches', type=int, default=10000, help="切换文件的次数")
+    parser.add_argument('--files', type=int, default=5, help="轮流切换的文件数")
+    parser.add_argument('--warmup', type=int, default=500, help="预热的切换次数，之后的内存增长计入检查")
+    parser.add_argument('--sample-every', type=int, default=1000, help="每切换多少次记录一次内存")
+    parser.add_argument('--max-growth-mb', type=float, default=20.0, help="预热后允许的内存增长（MB）")
+    parser.add_argument('--memory-repeat', action='store_true', help="每次切换同时加载一个内存复读片段")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='elp_soak_') as work_dir:
+        return run(args, work_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
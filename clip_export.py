@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导出句子音频
+把播放列表中每个文件的每一句字幕导出为单独的音频文件，用于制作卡片和手机跟读。
+每句是一个独立任务，由进程池并行转码（每个进程一个VLC实例），
+已完成的句子记录在导出目录的状态文件中，中断后再次导出会跳过这些句子。
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from media_decode import create_decode_instance, transcode_file
+
+
+STATE_FILE_NAME = "export_state.json"
+
+# 导出格式：扩展名 -> sout编码参数
+EXPORT_FORMATS = {
+    'mp3': {'acodec': 'mp3', 'mux': 'dummy', 'bitrate': 128},
+    'wav': {'acodec': 's16l', 'mux': 'wav'},
+}
+DEFAULT_FORMAT = 'mp3'
+
+# 状态文件最多每隔多久写一次（秒）
+STATE_SAVE_INTERVAL = 1.0
+
+# 文件名中保留的字幕文字长度
+NAME_TEXT_LENGTH = 40
+
+
+def safe_file_name(text):
+    """把字幕文字转换为可用的文件名片段"""
+    text = re.sub(r'[\\/:*?"<>|\r\n\t]+', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip(' .')
+    return text[:NAME_TEXT_LENGTH].rstrip(' .')
+
+
+class ClipTask:
+    """一句字幕的导出任务"""
+
+    __slots__ = ('media_path', 'start_ms', 'end_ms', 'out_path', 'key')
+
+    def __init__(self, media_path, start_ms, end_ms, out_path, key):
+        self.media_path = media_path
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.out_path = out_path
+        self.key = key
+
+
+def build_tasks(items, out_dir, fmt=DEFAULT_FORMAT):
+    """根据播放列表生成导出任务
+
+    Args:
+        items: [(媒体路径, 字幕列表)]，字幕列表为解析器的 subtitles
+        out_dir: 导出目录，每个媒体文件一个子目录
+    """
+    tasks = []
+    for media_path, subtitles in items:
+        stem = os.path.splitext(os.path.basename(media_path))[0]
+        for index, sub in enumerate(subtitles):
+            if sub['end'] <= sub['start']:
+                continue
+            name = f"{index + 1:04d}"
+            text = safe_file_name(sub.get('text', ''))
+            if text:
+                name += f" - {text}"
+            relative_path = os.path.join(stem, f"{name}.{fmt}")
+            # 状态键包含时间区间和格式，字幕修改后会重新导出
+            key = f"{relative_path}|{sub['start']}|{sub['end']}"
+            tasks.append(ClipTask(media_path, sub['start'], sub['end'],
+                                  os.path.join(out_dir, relative_path), key))
+    return tasks
+
+
+# ---- 进程池工作进程 ----
+
+_worker_instance = None
+
+
+def _init_worker():
+    """工作进程初始化：每个进程创建一个VLC实例，所有任务共用"""
+    global _worker_instance
+    _worker_instance = create_decode_instance()
+
+
+def _export_clip(media_path, start_ms, end_ms, out_path, fmt):
+    """在工作进程中导出一句，成功返回True"""
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = out_path + ".part"
+    ok = transcode_file(_worker_instance, media_path, temp_path, start_ms, end_ms, **EXPORT_FORMATS[fmt])
+    if ok:
+        os.replace(temp_path, out_path)
+    return ok
+
+
+class ClipExporter:
+    """批量导出协调器
+
+    在后台线程中把任务提交到进程池，界面通过 progress() 查询进度，cancel() 取消。
+    """
+
+    def __init__(self, tasks, out_dir, fmt=DEFAULT_FORMAT, workers=None):
+        self.tasks = tasks
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.workers = workers or os.cpu_count() or 1
+        self.total = len(tasks)
+        self.done = 0
+        self.skipped = 0
+        self.failed = []
+        self.finished = False
+        self.cancelled = False
+        self._cancel_event = threading.Event()
+        self._state = {'format': fmt, 'done': {}}
+        self._state_saved_at = 0.0
+        self._thread = None
+
+    @property
+    def state_path(self):
+        return os.path.join(self.out_dir, STATE_FILE_NAME)
+
+    def _load_state(self):
+        """加载上次导出的状态，格式不同时重新开始"""
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('format') == self.fmt:
+                    self._state = state
+        except Exception as e:
+            print(f"加载导出状态失败: {e}")
+
+    def _save_state(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._state_saved_at < STATE_SAVE_INTERVAL:
+            return
+        self._state_saved_at = now
+        try:
+            temp_path = self.state_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False)
+            os.replace(temp_path, self.state_path)
+        except Exception as e:
+            print(f"保存导出状态失败: {e}")
+
+    def start(self):
+        """在后台线程中开始导出"""
+        self._thread = threading.Thread(target=self.run, name="ClipExporter", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """取消导出，正在转码的句子完成后停止，已完成的句子保留在状态文件中"""
+        self._cancel_event.set()
+
+    def progress(self):
+        """返回 (已完成数, 总数, 失败数)，已完成数包含跳过的句子"""
+        return self.done, self.total, len(self.failed)
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def run(self):
+        """执行导出（阻塞）"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._load_state()
+        done_keys = self._state['done']
+
+        pending = []
+        for task in self.tasks:
+            if task.key in done_keys and os.path.exists(task.out_path):
+                self.skipped += 1
+                self.done += 1
+            else:
+                pending.append(task)
+
+        if pending:
+            print(f"开始导出句子音频: {len(pending)} 句（跳过已完成 {self.skipped} 句），{self.workers} 个进程")
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            try:
+                futures = {executor.submit(_export_clip, task.media_path, task.start_ms, task.end_ms,
+                                           task.out_path, self.fmt): task
+                           for task in pending}
+                for future in as_completed(futures):
+                    task = futures[future]
+                    if future.cancelled():
+                        continue
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        print(f"导出句子失败: {task.out_path}, 错误: {e}")
+                        ok = False
+                    if ok:
+                        done_keys[task.key] = True
+                        self.done += 1
+                        self._save_state()
+                    else:
+                        self.failed.append(task)
+
+                    if self._cancel_event.is_set() and not self.cancelled:
+                        self.cancelled = True
+                        for other in futures:
+                            other.cancel()
+            finally:
+                executor.shutdown(wait=True)
+                self._save_state(force=True)
+
+        self.finished = True
+        print(f"句子音频导出{'已取消' if self.cancelled else '完成'}: "
+              f"{self.done}/{self.total}，失败 {len(self.failed)}")
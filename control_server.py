@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地控制接口
+供脚本驱动播放器：无人值守地播放整门课程、收集耗时统计、复现问题。
+asyncio服务器运行在自己的线程中，只监听本机地址或Unix套接字；
+收到的命令放入队列，由界面线程分批执行，每批有时间上限，大量命令也不会让界面卡住。
+
+协议为每行一个JSON：
+    请求  {"id": 1, "cmd": "next", "args": {...}}
+    回复  {"id": 1, "ok": true, "result": ...} 或 {"id": 1, "ok": false, "error": "..."}
+    事件  {"event": "sentence", ...}  发送 {"cmd": "subscribe", "args": {"events": [...]}} 后推送
+同一连接上的请求可以连续发送不等回复，回复按请求顺序返回。
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+
+from player_metrics import metrics
+
+
+DEFAULT_PORT = 47621
+
+# 界面线程每批执行命令的时间上限（毫秒），超过后让出事件循环
+BATCH_BUDGET_MS = 8
+
+# 每个连接最多同时等待执行的命令数，超过后暂停读取该连接
+MAX_IN_FLIGHT = 1000
+
+# 连接的发送缓冲超过该大小时丢弃推送给它的事件
+EVENT_BUFFER_LIMIT = 1024 * 1024
+
+# 可以订阅的事件
+EVENTS = ('file', 'sentence', 'repeat', 'repeat_completed')
+
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+class ControlError(Exception):
+    """命令参数错误或无法执行，错误信息会返回给客户端"""
+
+
+def parse_address(address):
+    """解析监听地址："unix:/path"、"host:port" 或 "port"，返回 ('unix', path) 或 ('tcp', host, port)"""
+    if address.startswith('unix:'):
+        return ('unix', address[5:])
+    host, _, port = address.rpartition(':')
+    host = host.strip('[]') or '127.0.0.1'
+    if host not in LOOPBACK_HOSTS:
+        print(f"控制接口只允许监听本机地址，忽略 {host}")
+        host = '127.0.0.1'
+    return ('tcp', host, int(port) if port else DEFAULT_PORT)
+
+
+class _Client:
+    """一个客户端连接"""
+
+    __slots__ = ('writer', 'events', 'dropped')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.events = set()
+        self.dropped = 0
+
+
+class ControlServer:
+    """本地控制服务器
+
+    Args:
+        address: 监听地址，见 parse_address
+        wakeup_fn: 有新命令时调用（在服务器线程中），界面收到后调用 run_pending()
+    """
+
+    def __init__(self, address, wakeup_fn):
+        self.address = parse_address(address)
+        self.wakeup_fn = wakeup_fn
+        self._commands = queue.SimpleQueue()
+        self._wakeup_sent = False
+        self._clients = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+
+    def start(self):
+        """在后台线程中启动服务器，启动失败时抛出异常"""
+        self._thread = threading.Thread(target=self._run, name="ControlServer", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error:
+            raise self._error
+        print(f"控制接口已启动: {self.describe_address()}")
+
+    def describe_address(self):
+        if self.address[0] == 'unix':
+            return f"unix:{self.address[1]}"
+        return f"{self.address[1]}:{self.address[2]}"
+
+    def close(self):
+        """停止服务器"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+        if self._thread:
+            self._thread.join(2)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            if self.address[0] == 'unix':
+                start = asyncio.start_unix_server(self._handle_client, path=self.address[1])
+            else:
+                start = asyncio.start_server(self._handle_client, host=self.address[1], port=self.address[2])
+            self._server = loop.run_until_complete(start)
+        except Exception as e:
+            self._error = e
+            self._started.set()
+            loop.close()
+            return
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            # 取消所有连接的任务后再关闭事件循环
+            self._server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    # ---- 服务器线程 ----
+
+    async def _handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        client = _Client(writer)
+        replies = asyncio.Queue()
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        writer_task = loop.create_task(self._write_replies(replies, writer, in_flight))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await in_flight.acquire()
+                future = loop.create_future()
+                request_id = None
+                try:
+                    message = json.loads(line)
+                    request_id = message.get('id')
+                    command = message['cmd']
+                    args = message.get('args') or {}
+                except (ValueError, KeyError, AttributeError, TypeError):
+                    future.set_exception(ControlError("无法解析的请求"))
+                else:
+                    if command == 'subscribe':
+                        events = args.get('events') or EVENTS
+                        client.events = set(event for event in events if event in EVENTS)
+                        self._clients.add(client)
+                        future.set_result(sorted(client.events))
+                    elif command == 'unsubscribe':
+                        client.events = set()
+                        self._clients.discard(client)
+                        future.set_result(True)
+                    else:
+                        self._submit(command, args, future)
+                replies.put_nowait((request_id, future))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # 服务器关闭
+            writer_task.cancel()
+        finally:
+            self._clients.discard(client)
+            replies.put_nowait(None)
+            try:
+                await writer_task
+            except asyncio.CancelledError:
+                pass
+            writer.close()
+
+    def _submit(self, command, args, future):
+        self._commands.put((command, args, future))
+        if not self._wakeup_sent:
+            self._wakeup_sent = True
+            self.wakeup_fn()
+
+    async def _write_replies(self, replies, writer, in_flight):
+        """按请求顺序写回复"""
+        while True:
+            item = await replies.get()
+            if item is None:
+                break
+            request_id, future = item
+            try:
+                payload = {'id': request_id, 'ok': True, 'result': await future}
+            except Exception as e:
+                payload = {'id': request_id, 'ok': False, 'error': str(e)}
+            in_flight.release()
+            try:
+                writer.write(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+                if replies.empty():
+                    await writer.drain()
+            except ConnectionError:
+                pass
+
+    def _deliver(self, results):
+        for future, ok, value in results:
+            if future.cancelled():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _broadcast(self, event, line):
+        for client in list(self._clients):
+            if event not in client.events:
+                continue
+            transport = client.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > EVENT_BUFFER_LIMIT:
+                # 客户端读得太慢，丢弃事件而不是占用越来越多的内存
+                client.dropped += 1
+                metrics.increment('control_events_dropped')
+                continue
+            client.writer.write(line)
+
+    # ---- 界面线程 ----
+
+    def run_pending(self, handler, budget_ms=BATCH_BUDGET_MS):
+        """执行队列中的命令，超过时间上限时停止，还有命令未执行时返回True
+
+        handler(command, args) 返回命令结果，参数错误时抛出 ControlError。
+        """
+        self._wakeup_sent = False
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        results = []
+        more = False
+        while True:
+            try:
+                command, args, future = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                results.append((future, True, handler(command, args)))
+            except ControlError as e:
+                results.append((future, False, e))
+            except Exception as e:
+                print(f"执行控制命令出错: {command}, 错误: {e}")
+                results.append((future, False, ControlError(f"{command}: {e}")))
+            metrics.increment('control_commands')
+            if time.perf_counter() >= deadline:
+                more = True
+                break
+        if results:
+            self._loop.call_soon_threadsafe(self._deliver, results)
+        return more
+
+    def publish(self, event, **data):
+        """向订阅了该事件的客户端推送事件"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._clients:
+            return
+        data['event'] = event
+        line = json.dumps(data, ensure_ascii=False).encode('utf-8') + b'\n'
+        try:
+            loop.call_soon_threadsafe(self._broadcast, event, line)
+        except RuntimeError:
+            pass
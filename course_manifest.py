@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程清单
+在课程目录中保存一个 course_manifest.json，按自然顺序（第2课在第10课之前）记录每一课的媒体文件、
+字幕文件、第二字幕、时长、句子数和内容哈希。整个课程加入播放列表时只需要读这一个小文件，
+不再逐个文件查找字幕、扫描第二字幕。
+
+清单同时记录目录中媒体和字幕文件的列表签名（文件名、大小、修改时间）：加载时列一次目录
+（不打开任何文件）与签名比较，增删、替换或修改了文件后清单自动失效，重新扫描并在后台生成。
+路径以相对于课程目录的形式保存，整个目录复制到别的电脑或U盘后清单仍然有效。
+
+用法:
+    python english_listening_player.py manifest 课程目录 --recursive
+    python english_listening_player.py manifest 课程目录 --force --no-duration
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import wave
+
+import vlc
+
+from folder_watch import scan_directory
+from subtitle_formats import subtitle_extensions, load_subtitle_cues
+from subtitle_tracks import secondary_subtitle_index, find_secondary_subtitle
+
+
+MANIFEST_FILE_NAME = "course_manifest.json"
+MANIFEST_VERSION = 1
+
+# 媒体文件只对开头和结尾各取一段计算哈希：足以识别同一个文件，读几个GB的视频也只需要几毫秒
+HASH_SAMPLE_BYTES = 64 * 1024
+
+# VLC解析一个文件时长的最长等待时间（毫秒）
+DURATION_PROBE_TIMEOUT_MS = 5000
+
+
+def natural_sort_key(name):
+    """自然排序的键：文件名中的数字按数值比较，lesson2 排在 lesson10 之前"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name.lower())]
+
+
+def _scan_course(directory, media_extensions):
+    return scan_directory(directory, tuple(media_extensions) + subtitle_extensions())
+
+
+def listing_signature(entries):
+    """目录快照（scan_directory 的结果）的签名，任何文件增删、改名、大小或修改时间变化都会改变签名"""
+    digest = hashlib.sha1()
+    for name in sorted(entries):
+        entry = entries[name]
+        digest.update(f"{name}\0{entry.size}\0{entry.mtime_ns}\n".encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def media_hash(path, size=None):
+    """媒体文件的内容哈希：文件大小加上开头和结尾各 HASH_SAMPLE_BYTES 字节"""
+    if size is None:
+        size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(HASH_SAMPLE_BYTES))
+        if size > HASH_SAMPLE_BYTES * 2:
+            f.seek(size - HASH_SAMPLE_BYTES)
+            digest.update(f.read(HASH_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    """整个文件的内容哈希（用于字幕文件）"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def match_subtitle(video_name, subtitle_names):
+    """按与播放器 find_subtitle_for_video 相同的规则为视频选择字幕文件名：
+    先找同名字幕（按扩展名的优先顺序），没有时用目录中第一个字幕文件"""
+    names = set(subtitle_names)
+    extensions = subtitle_extensions()
+    for ext in extensions:
+        if video_name + ext in names:
+            return video_name + ext
+    for ext in extensions:
+        for name in subtitle_names:
+            if name.lower().endswith(ext):
+                return name
+    return None
+
+
+def media_files(directory, media_extensions):
+    """目录中的媒体文件路径，按自然顺序"""
+    entries = _scan_course(directory, media_extensions) or {}
+    names = [name for name in entries if name.lower().endswith(tuple(media_extensions))]
+    return [os.path.join(directory, name) for name in sorted(names, key=natural_sort_key)]
+
+
+class DurationProbe:
+    """读取媒体时长：WAV直接读文件头，其他格式用VLC解析（不播放）；没有VLC时只能得到WAV的时长"""
+
+    def __init__(self):
+        self.instance = None
+        try:
+            self.instance = vlc.Instance('--quiet', '--no-video-title-show')
+        except Exception as e:
+            print(f"无法创建VLC实例，只记录WAV文件的时长: {e}")
+
+    def duration_ms(self, path):
+        """媒体时长（毫秒），无法得到时返回None"""
+        if path.lower().endswith('.wav'):
+            try:
+                with wave.open(path, 'rb') as f:
+                    return int(f.getnframes() * 1000 / f.getframerate())
+            except (OSError, EOFError, wave.Error):
+                pass
+        if self.instance is None:
+            return None
+        media = self.instance.media_new(path)
+        try:
+            media.parse_with_options(vlc.MediaParseFlag.local, DURATION_PROBE_TIMEOUT_MS)
+            deadline = time.monotonic() + DURATION_PROBE_TIMEOUT_MS / 1000 + 1
+            while media.get_parsed_status() == 0 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            duration = media.get_duration()
+            return duration if duration > 0 else None
+        finally:
+            media.release()
+
+    def close(self):
+        if self.instance is not None:
+            self.instance.release()
+            self.instance = None
+
+
+def build_manifest(directory, media_extensions, probe=None):
+    """扫描课程目录生成清单字典，目录中没有媒体文件时返回None
+
+    Args:
+        probe: DurationProbe，为None时不记录时长
+    """
+    entries = _scan_course(directory, media_extensions)
+    if not entries:
+        return None
+    media_names = sorted((name for name in entries if name.lower().endswith(tuple(media_extensions))),
+                         key=natural_sort_key)
+    if not media_names:
+        return None
+    subtitle_names = sorted(name for name in entries if name.lower().endswith(subtitle_extensions()))
+    secondary_index = secondary_subtitle_index(directory)
+
+    lessons = []
+    for name in media_names:
+        media_path = os.path.join(directory, name)
+        video_name = os.path.splitext(name)[0]
+        subtitle_name = match_subtitle(video_name, subtitle_names)
+        subtitle_path = os.path.join(directory, subtitle_name) if subtitle_name else None
+        secondary_path = find_secondary_subtitle(media_path, subtitle_path, secondary_index)
+        lesson = {
+            'media': name,
+            'subtitle': subtitle_name,
+            'secondary': os.path.basename(secondary_path) if secondary_path else None,
+            'duration_ms': None,
+            'cues': 0,
+            'media_hash': None,
+            'subtitle_hash': None,
+        }
+        try:
+            lesson['media_hash'] = media_hash(media_path, entries[name].size)
+        except OSError as e:
+            print(f"读取媒体文件失败: {media_path}, 错误: {e}")
+        if probe is not None:
+            try:
+                lesson['duration_ms'] = probe.duration_ms(media_path)
+            except Exception as e:
+                print(f"读取媒体时长失败: {media_path}, 错误: {e}")
+        if subtitle_path:
+            try:
+                lesson['subtitle_hash'] = file_hash(subtitle_path)
+                cues = load_subtitle_cues(subtitle_path)
+                lesson['cues'] = len(cues) if cues is not None else 0
+            except Exception as e:
+                print(f"读取字幕文件失败: {subtitle_path}, 错误: {e}")
+        lessons.append(lesson)
+
+    return {
+        'version': MANIFEST_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'listing': listing_signature(entries),
+        'lessons': lessons,
+    }
+
+
+def write_manifest(directory, manifest):
+    """把清单写入课程目录（先写临时文件再替换）"""
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+
+def read_manifest(directory):
+    """读取课程目录中的清单，不检查是否过期；没有或格式不对时返回None"""
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"读取课程清单失败: {manifest_path}, 错误: {e}")
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def load_manifest(directory, media_extensions):
+    """读取课程清单并检查是否过期，清单不存在或目录中的文件已经变化时返回None"""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    entries = _scan_course(directory, media_extensions)
+    if entries is None or listing_signature(entries) != manifest.get('listing'):
+        return None
+    return manifest
+
+
+def playlist_items(directory, manifest):
+    """把清单转换为播放列表项（与播放器 playlist_items 的字典格式相同），按清单的顺序"""
+    items = []
+    for lesson in manifest['lessons']:
+        subtitle = lesson.get('subtitle')
+        secondary = lesson.get('secondary')
+        items.append({
+            'video_path': os.path.join(directory, lesson['media']),
+            'subtitle_path': os.path.join(directory, subtitle) if subtitle else None,
+            'secondary_subtitle_path': os.path.join(directory, secondary) if secondary else None,
+            'video_name': os.path.splitext(lesson['media'])[0],
+        })
+    return items
+
+
+def update_manifest(directory, media_extensions, probe=None, force=False):
+    """清单过期或不存在时重新生成，返回 'fresh'（已是最新）、'written'、'empty'（没有媒体文件）"""
+    if not force and load_manifest(directory, media_extensions) is not None:
+        return 'fresh'
+    manifest = build_manifest(directory, media_extensions, probe)
+    if manifest is None:
+        return 'empty'
+    write_manifest(directory, manifest)
+    return 'written'
+
+
+class ManifestBuilder:
+    """在后台线程中为课程目录生成清单，已在队列中的目录不重复排队"""
+
+    def __init__(self, media_extensions, probe_durations=True):
+        self.media_extensions = tuple(media_extensions)
+        self.probe_durations = probe_durations
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._worker = None
+        self._stopped = False
+
+    def request(self, directory):
+        """在后台生成（或更新）一个目录的清单"""
+        with self._lock:
+            if self._stopped or directory in self._queued:
+                return
+            self._queued.add(directory)
+            self._queue.put(directory)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_worker, name="CourseManifestWorker",
+                                                daemon=True)
+                self._worker.start()
+
+    def shutdown(self):
+        """停止后台线程"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def _run_worker(self):
+        probe = None
+        try:
+            while not self._stopped:
+                try:
+                    directory = self._queue.get(timeout=1)
+                except queue.Empty:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._worker = None
+                            break
+                    continue
+                if directory is None:
+                    break
+                try:
+                    if probe is None and self.probe_durations:
+                        probe = DurationProbe()
+                    if update_manifest(directory, self.media_extensions, probe) == 'written':
+                        print(f"已生成课程清单: {directory}")
+                except Exception as e:
+                    print(f"生成课程清单失败: {directory}, 错误: {e}")
+                finally:
+                    with self._lock:
+                        self._queued.discard(directory)
+        finally:
+            # 队列空闲时退出线程并释放VLC实例，下次请求时重新创建
+            if probe is not None:
+                probe.close()
+
+
+def find_course_directories(paths, media_extensions, recursive=False):
+    """展开命令行给出的目录，recursive 时包括所有含媒体文件的子目录"""
+    directories = []
+    for path in paths:
+        if not os.path.isdir(path):
+            print(f"找不到目录: {path}", file=sys.stderr)
+            continue
+        if not recursive:
+            directories.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            if any(name.lower().endswith(media_extensions) for name in names):
+                directories.append(root)
+    return directories
+
+
+def main(argv, media_extensions):
+    parser = argparse.ArgumentParser(prog="english_listening_player.py manifest",
+                                     description="为课程目录生成课程清单，整个课程加入播放列表时只需读一个文件")
+    parser.add_argument('paths', nargs='+', help="课程目录")
+    parser.add_argument('--recursive', action='store_true', help="同时处理所有含媒体文件的子目录")
+    parser.add_argument('--force', action='store_true', help="清单没有过期也重新生成")
+    parser.add_argument('--no-duration', action='store_true', help="不读取媒体时长（不需要VLC，速度更快）")
+    args = parser.parse_args(argv)
+
+    media_extensions = tuple(media_extensions)
+    directories = find_course_directories(args.paths, media_extensions, args.recursive)
+    if not directories:
+        print("没有找到课程目录")
+        return 1
+
+    probe = None if args.no_duration else DurationProbe()
+    counts = {'fresh': 0, 'written': 0, 'empty': 0}
+    failed = 0
+    started = time.perf_counter()
+    try:
+        for directory in directories:
+            try:
+                status = update_manifest(directory, media_extensions, probe, args.force)
+            except Exception as e:
+                print(f"错误 {directory}: {e}")
+                failed += 1
+                continue
+            counts[status] += 1
+            if status == 'written':
+                print(f"已生成: {os.path.join(directory, MANIFEST_FILE_NAME)}")
+    finally:
+        if probe is not None:
+            probe.close()
+    elapsed = time.perf_counter() - started
+    print(f"处理了 {len(directories)} 个目录，耗时 {elapsed:.2f}s：生成 {counts['written']} 个，"
+          f"已是最新 {counts['fresh']} 个，没有媒体文件 {counts['empty']} 个，失败 {failed} 个")
+    return 1 if failed else 0
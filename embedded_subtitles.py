@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内嵌字幕提取
+MKV/WebM 和 MP4/MOV 文件中内嵌的文字字幕（SRT、ASS/SSA、WebVTT、tx3g）在后台提取一次，
+保存为SRT文件放在缓存目录中，以后按普通字幕文件加载，搜索索引、课程统计和自动对齐都可以直接使用。
+缓存按视频文件的大小和修改时间判断是否有效，没有文字字幕的文件也会记录下来，不会重复扫描。
+
+容器直接用Python读取，不依赖ffmpeg：只读取字幕轨道的数据，视频和音频数据按大小跳过。
+图形字幕（VobSub、PGS）无法转换为文字，会被忽略。
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import struct
+import threading
+import zlib
+
+import subtitle_srt
+from file_signature import file_signature
+from subtitle_formats import CueTable
+
+
+EMBEDDED_DIR_NAME = "embedded_subtitles"
+INDEX_FILE_NAME = "index.json"
+
+# 可能含有内嵌文字字幕的视频文件
+MATROSKA_EXTENSIONS = ('.mkv', '.mka', '.webm')
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+CONTAINER_EXTENSIONS = MATROSKA_EXTENSIONS + MP4_EXTENSIONS
+
+# 有多条字幕轨道时优先使用的语言
+PREFERRED_LANGUAGES = ('eng', 'en')
+
+# 数据块没有记录时长时使用的时长（毫秒），会截短到下一句开始
+DEFAULT_DURATION_MS = 3000
+
+TAG = re.compile(r'<[^>]*>')
+ASS_OVERRIDE = re.compile(r'\{[^}]*\}')
+ASS_DRAWING = re.compile(r'\{[^}]*\\p[1-9][^}]*\}')
+
+
+def _decode_text(data):
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return data.decode('utf-16', errors='replace')
+    return data.decode('utf-8', errors='replace')
+
+
+def _clean_text(codec, data):
+    """把一个字幕数据块转换为纯文字，去掉空行（空行在SRT中表示一句结束）"""
+    text = _decode_text(data)
+    if codec in ('S_TEXT/ASS', 'S_TEXT/SSA'):
+        # ReadOrder, Layer, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+        text = text.split(',', 8)[-1]
+        if '\\p' in text:
+            text = ASS_DRAWING.split(text)[0]
+        text = ASS_OVERRIDE.sub('', text)
+        text = text.replace('\\N', '\n').replace('\\n', '\n').replace('\\h', ' ')
+    else:
+        text = TAG.sub('', text)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _finish_cues(cues):
+    """排序，与下一句重叠的句子截短到下一句开始，去掉空句"""
+    cues.sort()
+    starts, ends = cues.starts, cues.ends
+    for i in range(len(starts) - 1):
+        if ends[i] > starts[i + 1]:
+            ends[i] = starts[i + 1]
+    keep = [bool(text) for text in cues.texts]
+    if not all(keep):
+        cues.compact(keep, [text for text in cues.texts if text])
+    return cues
+
+
+class _TextTrack:
+    """容器中的一条文字字幕轨道"""
+
+    __slots__ = ('number', 'codec', 'language', 'default', 'compression', 'strip_header', 'samples')
+
+    def __init__(self):
+        self.number = 0
+        self.codec = ''
+        self.language = 'und'
+        self.default = True
+        self.compression = None
+        self.strip_header = b''
+        self.samples = []   # (开始毫秒, 结束毫秒或None, 数据)
+
+    def decode(self, data):
+        if self.compression == 0:
+            return zlib.decompress(data)
+        if self.compression == 3:
+            return self.strip_header + data
+        return data
+
+
+def _pick_track(tracks):
+    """有多条字幕轨道时优先选择英文轨道，其次是默认轨道"""
+    if not tracks:
+        return None
+    for track in tracks:
+        if track.language.lower() in PREFERRED_LANGUAGES:
+            return track
+    return next((track for track in tracks if track.default), tracks[0])
+
+
+def _track_cues(track):
+    cues = CueTable()
+    for start_ms, end_ms, data in track.samples:
+        if end_ms is None:
+            end_ms = start_ms + DEFAULT_DURATION_MS
+        cues.append(start_ms, end_ms, _clean_text(track.codec, data))
+    return _finish_cues(cues)
+
+
+# ---- Matroska / WebM ----
+
+MKV_EBML = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_NUMBER = 0xD7
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_LANGUAGE = 0x22B59C
+MKV_FLAG_DEFAULT = 0x88
+MKV_CONTENT_ENCODINGS = 0x6D80
+MKV_CONTENT_ENCODING = 0x6240
+MKV_CONTENT_COMPRESSION = 0x5034
+MKV_COMP_ALGO = 0x4254
+MKV_COMP_SETTINGS = 0x4255
+MKV_CLUSTER = 0x1F43B675
+MKV_CLUSTER_TIMECODE = 0xE7
+MKV_SIMPLE_BLOCK = 0xA3
+MKV_BLOCK_GROUP = 0xA0
+MKV_BLOCK = 0xA1
+MKV_BLOCK_DURATION = 0x9B
+
+# Segment 下的一级元素：未知大小的 Cluster 在遇到它们时结束
+MKV_TOP_LEVEL = (MKV_CLUSTER, MKV_INFO, MKV_TRACKS, 0x114D9B74, 0x1C53BB6B, 0x1941A469, 0x1043A770, 0x1254C367)
+
+MKV_TRACK_TYPE_SUBTITLE = 0x11
+MKV_TEXT_CODECS = ('S_TEXT/UTF8', 'S_TEXT/ASCII', 'S_TEXT/ASS', 'S_TEXT/SSA', 'S_TEXT/WEBVTT',
+                   'D_WEBVTT/SUBTITLES', 'D_WEBVTT/CAPTIONS')
+
+UNKNOWN_SIZE = -1
+
+
+def _read_vint(f, keep_marker):
+    """读取EBML变长整数，返回 (值, 字节数)，文件结束时返回 (None, 0)"""
+    first = f.read(1)
+    if not first:
+        return None, 0
+    value = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not value & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("无效的EBML数据")
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        return None, 0
+    if keep_marker:
+        return int.from_bytes(first + rest, 'big'), length
+    value &= mask - 1
+    all_ones = value == mask - 1
+    for byte in rest:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    return (UNKNOWN_SIZE if all_ones else value), length
+
+
+def _iter_elements(f, end, stop_ids=()):
+    """遍历到 end（None表示文件结尾）为止的元素，产生 (元素ID, 数据大小, 数据开始位置)
+
+    调用方处理完一个元素后自动跳到下一个元素；未知大小的元素由调用方读到它的结尾。
+    遇到 stop_ids 中的元素时回到它的开头并停止。
+    """
+    while end is None or f.tell() < end:
+        header_start = f.tell()
+        element_id, _ = _read_vint(f, keep_marker=True)
+        if element_id is None:
+            return
+        size, _ = _read_vint(f, keep_marker=False)
+        if size is None:
+            return
+        if element_id in stop_ids:
+            f.seek(header_start)
+            return
+        start = f.tell()
+        yield element_id, size, start
+        if size != UNKNOWN_SIZE:
+            f.seek(start + size)
+
+
+def _read_uint(f, size):
+    return int.from_bytes(f.read(size), 'big')
+
+
+def _read_mkv_track(f, end):
+    """读取 TrackEntry，不是文字字幕轨道时返回None"""
+    track = _TextTrack()
+    track.language = 'eng'   # Matroska 的默认语言
+    track_type = 0
+    for element_id, size, start in _iter_elements(f, end):
+        if element_id == MKV_TRACK_NUMBER:
+            track.number = _read_uint(f, size)
+        elif element_id == MKV_TRACK_TYPE:
+            track_type = _read_uint(f, size)
+        elif element_id == MKV_CODEC_ID:
+            track.codec = f.read(size).rstrip(b'\0').decode('ascii', errors='replace')
+        elif element_id == MKV_LANGUAGE:
+            track.language = f.read(size).rstrip(b'\0').decode('ascii', errors='replace')
+        elif element_id == MKV_FLAG_DEFAULT:
+            track.default = bool(_read_uint(f, size))
+        elif element_id == MKV_CONTENT_ENCODINGS:
+            # 字幕轨道只会用到 zlib 压缩和头部剥离
+            for _, encoding_size, encoding_start in _iter_elements(f, start + size):
+                for child_id, child_size, child_start in _iter_elements(f, encoding_start + encoding_size):
+                    if child_id != MKV_CONTENT_COMPRESSION:
+                        continue
+                    track.compression = 0
+                    for comp_id, comp_size, _ in _iter_elements(f, child_start + child_size):
+                        if comp_id == MKV_COMP_ALGO:
+                            track.compression = _read_uint(f, comp_size)
+                        elif comp_id == MKV_COMP_SETTINGS:
+                            track.strip_header = f.read(comp_size)
+    if track_type == MKV_TRACK_TYPE_SUBTITLE and track.codec in MKV_TEXT_CODECS:
+        return track
+    return None
+
+
+def _read_mkv_block(f, size, tracks, cluster_time, scale_ms, duration):
+    """读取 Block/SimpleBlock 的轨道号，字幕轨道的数据保存到轨道中，其余数据不读取"""
+    number, length = _read_vint(f, keep_marker=False)
+    track = tracks.get(number)
+    if track is None:
+        return
+    header = f.read(3)
+    if len(header) < 3 or header[2] & 0x06:
+        # 字幕数据块不使用 lacing
+        return
+    relative_time = struct.unpack('>h', header[:2])[0]
+    data = track.decode(f.read(size - length - 3))
+    start_ms = int((cluster_time + relative_time) * scale_ms)
+    end_ms = start_ms + int(duration * scale_ms) if duration else None
+    track.samples.append((start_ms, end_ms, data))
+
+
+def _read_mkv_cluster(f, end, tracks, scale_ms):
+    cluster_time = 0
+    stop_ids = MKV_TOP_LEVEL if end is None else ()
+    for element_id, size, start in _iter_elements(f, end, stop_ids):
+        if size == UNKNOWN_SIZE:
+            raise ValueError("无法跳过未知大小的元素")
+        if element_id == MKV_CLUSTER_TIMECODE:
+            cluster_time = _read_uint(f, size)
+        elif element_id == MKV_SIMPLE_BLOCK:
+            _read_mkv_block(f, size, tracks, cluster_time, scale_ms, None)
+        elif element_id == MKV_BLOCK_GROUP:
+            block = None
+            duration = None
+            for child_id, child_size, child_start in _iter_elements(f, start + size):
+                if child_id == MKV_BLOCK:
+                    block = (child_start, child_size)
+                elif child_id == MKV_BLOCK_DURATION:
+                    duration = _read_uint(f, child_size)
+            if block:
+                f.seek(block[0])
+                _read_mkv_block(f, block[1], tracks, cluster_time, scale_ms, duration)
+
+
+def read_matroska_tracks(f):
+    """读取MKV/WebM中所有文字字幕轨道（包括数据），返回 _TextTrack 列表"""
+    elements = _iter_elements(f, None)
+    header = next(elements, None)
+    if not header or header[0] != MKV_EBML:
+        return []
+    segment = next(elements, None)
+    if not segment or segment[0] != MKV_SEGMENT:
+        return []
+    segment_end = None if segment[1] == UNKNOWN_SIZE else segment[2] + segment[1]
+
+    scale_ms = 1.0   # TimecodeScale 默认为1毫秒
+    tracks = {}
+    for element_id, size, start in _iter_elements(f, segment_end):
+        end = None if size == UNKNOWN_SIZE else start + size
+        if element_id == MKV_INFO:
+            for child_id, child_size, _ in _iter_elements(f, end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    scale_ms = (_read_uint(f, child_size) or 1000000) / 1000000.0
+        elif element_id == MKV_TRACKS:
+            for child_id, child_size, child_start in _iter_elements(f, end):
+                if child_id == MKV_TRACK_ENTRY:
+                    track = _read_mkv_track(f, child_start + child_size)
+                    if track:
+                        tracks[track.number] = track
+            if not tracks:
+                # 没有文字字幕，不需要读取数据块
+                return []
+        elif element_id == MKV_CLUSTER:
+            if not tracks:
+                # Tracks 必须在第一个 Cluster 之前
+                return []
+            _read_mkv_cluster(f, end, tracks, scale_ms)
+        elif size == UNKNOWN_SIZE:
+            break
+    return list(tracks.values())
+
+
+# ---- MP4 / MOV ----
+
+MP4_TEXT_HANDLERS = (b'sbtl', b'text', b'subt')
+MP4_TEXT_SAMPLE_ENTRIES = (b'tx3g',)
+
+
+def _iter_boxes(f, end):
+    """遍历到 end 为止的box，产生 (类型, 数据开始位置, box结束位置)；调用方处理完后自动跳到下一个box"""
+    while f.tell() + 8 <= end:
+        box_start = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = end - box_start
+        if size < 8:
+            return
+        box_end = min(box_start + size, end)
+        yield box_type, f.tell(), box_end
+        f.seek(box_end)
+
+
+def _find_box(f, end, path):
+    """按路径查找子box，如 (b'mdia', b'minf')，返回 (数据开始位置, box结束位置)，找不到时返回None"""
+    start = f.tell()
+    for box_type in path:
+        for child_type, child_start, child_end in _iter_boxes(f, end):
+            if child_type == box_type:
+                start, end = child_start, child_end
+                f.seek(start)
+                break
+        else:
+            return None
+    return start, end
+
+
+def _read_full_box(f, start, end):
+    """读取 full box（版本和标志之后）的数据"""
+    f.seek(start)
+    data = f.read(end - start)
+    return data[0], data[4:]
+
+
+def _read_mp4_track(f, trak_end):
+    """读取一个trak，不是tx3g字幕轨道时返回None"""
+    trak_start = f.tell()
+    mdia = _find_box(f, trak_end, (b'mdia',))
+    if not mdia:
+        return None
+    boxes = {box_type: (start, end) for box_type, start, end in _iter_boxes(f, mdia[1])}
+    if b'hdlr' not in boxes or b'mdhd' not in boxes or b'minf' not in boxes:
+        return None
+    _, hdlr = _read_full_box(f, *boxes[b'hdlr'])
+    if hdlr[4:8] not in MP4_TEXT_HANDLERS:
+        return None
+
+    version, mdhd = _read_full_box(f, *boxes[b'mdhd'])
+    if version == 1:
+        timescale = struct.unpack('>I', mdhd[16:20])[0]
+        packed_language = struct.unpack('>H', mdhd[28:30])[0]
+    else:
+        timescale = struct.unpack('>I', mdhd[8:12])[0]
+        packed_language = struct.unpack('>H', mdhd[16:18])[0]
+    if not timescale:
+        return None
+
+    f.seek(boxes[b'minf'][0])
+    stbl = _find_box(f, boxes[b'minf'][1], (b'stbl',))
+    if not stbl:
+        return None
+    tables = {box_type: _read_full_box(f, start, end)[1] for box_type, start, end in _iter_boxes(f, stbl[1])
+              if box_type in (b'stsd', b'stts', b'stsz', b'stsc', b'stco', b'co64')}
+    stsd = tables.get(b'stsd')
+    if not stsd or stsd[8:12] not in MP4_TEXT_SAMPLE_ENTRIES:
+        return None
+
+    track = _TextTrack()
+    track.number = trak_start
+    track.codec = stsd[8:12].decode('ascii')
+    track.language = ''.join(chr(((packed_language >> shift) & 0x1F) + 0x60) for shift in (10, 5, 0))
+    track.samples = _read_mp4_samples(f, tables, timescale)
+    return track
+
+
+def _read_mp4_samples(f, tables, timescale):
+    """由样本表得到每个样本的时间和文件位置，读取文字"""
+    # 每个样本的时长
+    stts = tables.get(b'stts', b'')
+    durations = []
+    for i in range(struct.unpack('>I', stts[:4])[0] if stts else 0):
+        count, delta = struct.unpack('>II', stts[4 + i * 8:12 + i * 8])
+        durations.extend([delta] * count)
+
+    # 每个样本的大小
+    stsz = tables.get(b'stsz', b'')
+    sample_size, sample_count = struct.unpack('>II', stsz[:8]) if stsz else (0, 0)
+    if sample_size:
+        sizes = [sample_size] * sample_count
+    else:
+        sizes = list(struct.unpack(f'>{sample_count}I', stsz[8:8 + sample_count * 4]))
+
+    # 每个块的位置和样本数
+    if b'co64' in tables:
+        count = struct.unpack('>I', tables[b'co64'][:4])[0]
+        chunk_offsets = struct.unpack(f'>{count}Q', tables[b'co64'][4:4 + count * 8])
+    else:
+        stco = tables.get(b'stco', b'\0\0\0\0')
+        count = struct.unpack('>I', stco[:4])[0]
+        chunk_offsets = struct.unpack(f'>{count}I', stco[4:4 + count * 4])
+    stsc = tables.get(b'stsc', b'')
+    runs = [struct.unpack('>III', stsc[4 + i * 12:16 + i * 12])
+            for i in range(struct.unpack('>I', stsc[:4])[0] if stsc else 0)]
+
+    offsets = []
+    for run_index, (first_chunk, samples_per_chunk, _) in enumerate(runs):
+        last_chunk = runs[run_index + 1][0] - 1 if run_index + 1 < len(runs) else len(chunk_offsets)
+        for chunk in range(first_chunk, last_chunk + 1):
+            offset = chunk_offsets[chunk - 1]
+            for _ in range(samples_per_chunk):
+                if len(offsets) >= len(sizes):
+                    break
+                offsets.append(offset)
+                offset += sizes[len(offsets) - 1]
+
+    samples = []
+    time = 0
+    for offset, size, duration in zip(offsets, sizes, durations):
+        start_ms = time * 1000 // timescale
+        time += duration
+        if size <= 2:
+            # 空样本表示两句之间没有字幕
+            continue
+        f.seek(offset)
+        data = f.read(size)
+        text_length = struct.unpack('>H', data[:2])[0]
+        if text_length:
+            samples.append((start_ms, time * 1000 // timescale, data[2:2 + text_length]))
+    return samples
+
+
+def read_mp4_tracks(f):
+    """读取MP4/MOV中所有tx3g文字字幕轨道（包括数据），返回 _TextTrack 列表"""
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+    f.seek(0)
+    moov = _find_box(f, file_end, (b'moov',))
+    if not moov:
+        return []
+    tracks = []
+    for box_type, start, end in _iter_boxes(f, moov[1]):
+        if box_type == b'trak':
+            track = _read_mp4_track(f, end)
+            if track:
+                tracks.append(track)
+    return tracks
+
+
+# ---- 提取 ----
+
+def extract_cues(media_path):
+    """提取视频文件中的文字字幕，返回 (语言, CueTable)，没有文字字幕时返回None
+
+    容器格式按文件开头识别，扩展名不对时也能读取。
+    """
+    with open(media_path, 'rb') as f:
+        head = f.read(12)
+        f.seek(0)
+        if head.startswith(MKV_EBML.to_bytes(4, 'big')):
+            tracks = read_matroska_tracks(f)
+        elif head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide'):
+            tracks = read_mp4_tracks(f)
+        else:
+            tracks = []
+    track = _pick_track([track for track in tracks if track.samples])
+    if track is None:
+        return None
+    cues = _track_cues(track)
+    if not len(cues):
+        return None
+    return track.language, cues
+
+
+class EmbeddedSubtitleCache:
+    """内嵌字幕缓存
+
+    提取结果保存为缓存目录中的SRT文件，索引保存在 index.json 中，键为视频文件路径，
+    值记录视频大小/修改时间、字幕文件名（没有文字字幕时为null）和语言。
+    提取在后台线程中逐个进行；完成后 version 加一，界面定期检查并调用 take_results() 取出结果。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.entries = {}
+        self.version = 0
+        self._results = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._worker = None
+        self._stopped = False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE_NAME)
+
+    def _load_index(self):
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('entries', {})
+        except Exception as e:
+            print(f"加载内嵌字幕索引失败: {e}")
+            self.entries = {}
+
+    def _save_index(self):
+        """保存索引（调用方持有锁）"""
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
+
+    def lookup(self, media_path):
+        """查询缓存，返回 (是否已提取, 字幕路径)；视频没有文字字幕时为 (True, None)"""
+        with self._lock:
+            entry = self.entries.get(media_path)
+            if entry is None:
+                return False, None
+            try:
+                if file_signature(media_path) != (entry['size'], entry['mtime']):
+                    return False, None
+            except OSError:
+                return False, None
+            if entry['file'] is None:
+                return True, None
+            subtitle_path = os.path.join(self.cache_dir, entry['file'])
+            if not os.path.exists(subtitle_path):
+                return False, None
+            return True, subtitle_path
+
+    def extract_in_background(self, media_paths):
+        """在后台提取指定视频的内嵌字幕，不是MKV/MP4、已经提取过或已在队列中的文件会被跳过"""
+        pending = [path for path in media_paths
+                   if path and path.lower().endswith(CONTAINER_EXTENSIONS) and not self.lookup(path)[0]]
+        with self._lock:
+            for media_path in pending:
+                if media_path in self._queued:
+                    continue
+                self._queued.add(media_path)
+                self._queue.put(media_path)
+            if self._queued and (self._worker is None or not self._worker.is_alive()):
+                self._worker = threading.Thread(target=self._run_worker, name="EmbeddedSubtitleWorker",
+                                                daemon=True)
+                self._worker.start()
+
+    def take_results(self):
+        """取出上次调用以来完成的提取，返回 {视频路径: 字幕路径或None}"""
+        with self._lock:
+            results, self._results = self._results, {}
+            return results
+
+    def shutdown(self):
+        """停止后台线程"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def _run_worker(self):
+        while not self._stopped:
+            media_path = self._queue.get()
+            if media_path is None:
+                break
+            subtitle_path = None
+            try:
+                subtitle_path = self._extract(media_path)
+            except Exception as e:
+                print(f"提取内嵌字幕失败: {media_path}, 错误: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(media_path)
+                    self._results[media_path] = subtitle_path
+                    self.version += 1
+
+    def _extract(self, media_path):
+        """提取一个视频的字幕并写入缓存，返回字幕路径，没有文字字幕时返回None"""
+        if not os.path.exists(media_path):
+            return None
+        size, mtime = file_signature(media_path)
+        result = extract_cues(media_path)
+
+        file_name = None
+        language = None
+        if result:
+            language, cues = result
+            # 每个视频一个子目录，字幕文件与视频同名，界面上显示的名字与外挂字幕一致
+            digest = hashlib.sha1(media_path.encode('utf-8')).hexdigest()[:16]
+            video_name = os.path.splitext(os.path.basename(media_path))[0]
+            file_name = os.path.join(digest, video_name + ".srt")
+            subtitle_path = os.path.join(self.cache_dir, file_name)
+            os.makedirs(os.path.dirname(subtitle_path), exist_ok=True)
+            temp_path = subtitle_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                subtitle_srt.write(cues, f)
+            os.replace(temp_path, subtitle_path)
+            print(f"已提取内嵌字幕（{language}，{len(cues)} 句）: {media_path}")
+        else:
+            print(f"没有内嵌文字字幕: {media_path}")
+
+        with self._lock:
+            self.entries[media_path] = {'size': size, 'mtime': mtime, 'file': file_name, 'language': language}
+            self._save_index()
+        return os.path.join(self.cache_dir, file_name) if file_name else None
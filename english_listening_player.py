@@ -10,17 +10,132 @@
 
 import sys
 import os
+import multiprocessing
+import runpy
+
+
+# 播放列表中的媒体文件
+MEDIA_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm', '.mp3', '.wav', '.flac', '.m4a', '.aac')
+
+
+def batch_main(argv):
+    """命令行批量检查和转换字幕库，不创建QApplication。
+    以 subtitle_batch 作为主模块运行（由它的 __main__ 入口处理参数并退出）：进程池以spawn方式启动工作进程时
+    重新导入的是主模块，这样工作进程只导入字幕解析，不会导入PyQt5、VLC和播放器的其他模块"""
+    sys.argv[1:] = argv
+    runpy.run_module('subtitle_batch', run_name='__main__', alter_sys=True)
+
+
+def manifest_main(argv):
+    """命令行为课程目录生成课程清单，不创建QApplication"""
+    import course_manifest
+    return course_manifest.main(argv, MEDIA_EXTENSIONS)
+
+
+if __name__ == "__main__":
+    # 打包后导出句子音频和批量检查字幕的进程池需要，在导入界面之前处理工作进程
+    multiprocessing.freeze_support()
+    # 命令行子命令不需要界面，在导入PyQt5和VLC之前处理
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        sys.exit(batch_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'manifest':
+        sys.exit(manifest_main(sys.argv[2:]))
+
+import ctypes
 import json
+import math
+import threading
+import time
 import vlc
-import pysrt
 import re
+from array import array
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QLabel, QFileDialog, 
                             QListWidget, QStackedWidget, QFrame, QMessageBox,
                             QSpinBox, QDialog, QDialogButtonBox, QFormLayout,
-                            QFontComboBox, QCheckBox, QListWidgetItem)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QFont, QPalette, QColor, QIcon
+                            QFontComboBox, QCheckBox, QListWidgetItem,
+                            QPlainTextEdit, QShortcut, QProgressBar, QInputDialog,
+                            QLineEdit, QComboBox, QDoubleSpinBox)
+from PyQt5.QtCore import (Qt, QTimer, pyqtSignal, QFileSystemWatcher, QSize, QPoint,
+                          QByteArray, QBuffer, QIODevice, QRect, QLine)
+from PyQt5.QtGui import QFont, QPalette, QColor, QIcon, QKeySequence, QImage, QPixmap, QPainter
+
+from player_metrics import metrics, METRIC_PLAY_TO_AUDIO, METRIC_SEEK_SETTLE, METRIC_FILE_SWITCH
+from player_scheduler import Scheduler, Debouncer, SCOPE_FILE, SCOPE_SENTENCE
+from repeat_engine import PlaybackBackend, RepeatStateMachine
+from media_cache import MediaCache
+from media_resources import MediaResources
+from media_decode import create_decode_instance, decode_to_wav, wav_bytes
+from sentence_buffer import SentenceBuffer
+from clip_export import ClipExporter, build_tasks, EXPORT_FORMATS, DEFAULT_FORMAT
+from sentence_search import SentenceIndex, INDEX_FILE_NAME as SENTENCE_INDEX_FILE_NAME
+from lesson_stats import LessonStatsIndex, STATS_FILE_NAME as LESSON_STATS_FILE_NAME
+from sentence_review import ReviewScheduler, REVIEW_FILE_NAME, GRADE_NAMES, AGAIN, GOOD
+from playback_engine import PlaybackEngineClient, EngineBackend
+from control_server import ControlServer, ControlError
+from embedded_subtitles import EmbeddedSubtitleCache, EMBEDDED_DIR_NAME
+import loudness
+from loudness import LoudnessCache, LOUDNESS_DIR_NAME
+from folder_watch import FolderIndex
+import course_manifest
+from thumbnail_cache import ThumbnailCache, THUMBNAIL_DIR_NAME, THUMBNAIL_WIDTH, DEFAULT_ASPECT, is_video_file
+import waveform_cache
+from waveform_cache import WaveformCache, WAVEFORM_DIR_NAME
+import subtitle_align
+from subtitle_align import AlignmentStore, ALIGNMENT_FILE_NAME
+from subtitle_formats import SubtitleParser, load_subtitle_cues, subtitle_extensions, subtitle_file_filter
+from subtitle_tracks import SecondaryTrackCache, find_secondary_subtitle, secondary_subtitle_index
+import theme
+from theme import ThemeEngine
+
+
+# 上一句/下一句的第一次点击立即跳转；此后在这个时间内（毫秒）的连续点击合并，最后一次点击后再跳转一次
+NAVIGATION_COALESCE_MS = 150
+
+# 自动对齐字幕时解码整段音频的超时时间（秒）
+ALIGN_DECODE_TIMEOUT = 1800
+
+# 关闭时等待句子解码线程结束的时间（秒），超时则不释放解码用的VLC实例，避免线程还在使用时被释放
+DECODE_SHUTDOWN_TIMEOUT = 2.0
+
+# 可以使用内存复读的音频文件；视频文件仍由主播放器播放，以保留画面
+MEMORY_REPEAT_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a', '.aac')
+
+# 当前句还没解码到内存时，每隔多久检查一次是否已经解码完成（毫秒）
+CLIP_READY_POLL_MS = 50
+
+# 播放列表目录最后一次变化后等待多久再重新扫描（毫秒），复制或下载文件时会连续产生很多变化
+FOLDER_RESCAN_DELAY_MS = 500
+
+# 句子清单缩略图：JPEG质量、可见行上下额外加载的行数、滚动停止多久后加载（毫秒）
+THUMBNAIL_JPEG_QUALITY = 80
+THUMBNAIL_PRELOAD_ROWS = 10
+THUMBNAIL_SCROLL_DELAY_MS = 100
+
+# 句子波形：控件高度、句子前后多显示的时长（毫秒）、播放位置的刷新间隔（毫秒）
+WAVEFORM_HEIGHT = 80
+WAVEFORM_PADDING_MS = 400
+WAVEFORM_PLAYHEAD_MS = 40
+
+# 句子波形的颜色：背景、波形、循环区间、循环标记、播放位置
+WAVEFORM_COLORS = {
+    'background': QColor("#111"),
+    'wave': QColor("#4a9eda"),
+    'loop': QColor(255, 255, 255, 28),
+    'marker': QColor("#f0a030"),
+    'playhead': QColor("#ffffff"),
+}
+
+# 搜索框停止输入多久后开始搜索（毫秒）
+SEARCH_DELAY_MS = 200
+
+# 播放列表排序方式：(显示名称, 排序键)，排序键为None表示不排序
+PLAYLIST_SORT_OPTIONS = [
+    ("排序...", None),
+    ("语速从慢到快", lambda stats: stats.words_per_second),
+    ("词汇量从少到多", lambda stats: stats.unique_words),
+    ("词数从少到多", lambda stats: stats.word_count),
+]
 
 
 class SoftwareSettingsDialog(QDialog):
@@ -133,346 +248,843 @@ class SoftwareSettingsDialog(QDialog):
         return self.auto_next_checkbox.isChecked()
 
 
-class SubtitleParser:
-    """SRT字幕解析器"""
-    
-    def __init__(self):
-        self.subtitles = []
-        self.current_index = 0
+class MetricsDialog(QDialog):
+    """性能统计对话框（按F12打开）"""
     
-    def load_srt(self, srt_path):
-        """加载并解析SRT字幕文件"""
-        try:
-            subs = pysrt.open(srt_path)
-            self.subtitles = []
-            
-            for sub in subs:
-                # 将时间转换为毫秒
-                start_ms = (sub.start.hours * 3600 + sub.start.minutes * 60 + 
-                           sub.start.seconds) * 1000 + sub.start.milliseconds
-                end_ms = (sub.end.hours * 3600 + sub.end.minutes * 60 + 
-                         sub.end.seconds) * 1000 + sub.end.milliseconds
-                
-                self.subtitles.append({
-                    'text': sub.text,
-                    'start': start_ms,
-                    'end': end_ms,
-                    'duration': end_ms - start_ms
-                })
-            
-            self.current_index = 0
-            return True
-            
-        except Exception as e:
-            print(f"解析SRT文件失败: {e}")
-            return False
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setup_ui()
+        
+        # 定时刷新统计数据
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(1000)
+        self.refresh()
     
-    def get_current_subtitle(self):
-        """获取当前字幕"""
-        if 0 <= self.current_index < len(self.subtitles):
-            return self.subtitles[self.current_index]
-        return None
+    def setup_ui(self):
+        """设置对话框UI"""
+        self.setWindowTitle("性能统计")
+        self.setGeometry(200, 200, 640, 560)
+        
+        layout = QVBoxLayout()
+        
+        # 统计报告
+        self.report_edit = QPlainTextEdit()
+        self.report_edit.setReadOnly(True)
+        self.report_edit.setFont(QFont("Consolas", 10))
+        layout.addWidget(self.report_edit)
+        
+        # 按钮
+        button_layout = QHBoxLayout()
+        export_button = QPushButton("导出JSON")
+        export_button.clicked.connect(self.export_json)
+        button_layout.addWidget(export_button)
+        
+        reset_button = QPushButton("重置")
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(reset_button)
+        
+        button_layout.addStretch()
+        
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
     
-    def next_subtitle(self):
-        """跳转到下一句字幕"""
-        if self.current_index < len(self.subtitles) - 1:
-            self.current_index += 1
-            return self.get_current_subtitle()
-        return None
+    def refresh(self):
+        """刷新统计报告"""
+        self.report_edit.setPlainText(metrics.format_report())
     
-    def previous_subtitle(self):
-        """跳转到上一句字幕"""
-        if self.current_index > 0:
-            self.current_index -= 1
-            return self.get_current_subtitle()
-        return None
+    def reset(self):
+        """清空统计数据"""
+        metrics.reset()
+        self.refresh()
     
-    def get_total_count(self):
-        """获取总字幕数量"""
-        return len(self.subtitles)
+    def export_json(self):
+        """导出统计数据"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出性能统计", "player_metrics.json", "JSON文件 (*.json)"
+        )
+        if file_path:
+            try:
+                metrics.export_json(file_path)
+                QMessageBox.information(self, "导出成功", f"性能统计已导出到:\n{file_path}")
+            except Exception as e:
+                QMessageBox.warning(self, "导出失败", f"导出性能统计失败: {e}")
 
 
-class LRCSubtitleParser:
-    """LRC字幕解析器"""
+class SubtitleAlignDialog(QDialog):
+    """字幕自动对齐进度对话框，解码和计算在后台线程进行"""
     
-    def __init__(self):
-        self.subtitles = []
-        self.current_index = 0
+    def __init__(self, media_path, subtitles, parent=None):
+        super().__init__(parent)
+        self.media_path = media_path
+        self.subtitles = subtitles
+        self.alignment_result = None
+        self.cancelled = False
+        self.cancel_event = threading.Event()
+        self.finished_event = threading.Event()
+        self.setup_ui()
+        
+        self.worker = threading.Thread(target=self._run, name="SubtitleAlign", daemon=True)
+        self.worker.start()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(200)
+    
+    def setup_ui(self):
+        """设置对话框UI"""
+        self.setWindowTitle("自动对齐字幕")
+        self.setGeometry(300, 300, 480, 140)
+        
+        layout = QVBoxLayout()
+        self.status_label = QLabel(f"正在分析 {os.path.basename(self.media_path)} 的语音...")
+        layout.addWidget(self.status_label)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        layout.addWidget(self.progress_bar)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
     
-    def load_lrc(self, lrc_path):
-        """加载并解析LRC字幕文件"""
+    def _run(self):
+        instance = None
         try:
-            with open(lrc_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            self.subtitles = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # 解析LRC格式的时间标签 [mm:ss.xx] 或 [mm:ss:xx]
-                matches = re.findall(r'\[(\d+):(\d+)\.(\d+)\]', line)
-                if not matches:
-                    matches = re.findall(r'\[(\d+):(\d+):(\d+)\]', line)
-                
-                if matches:
-                    # 获取时间标签后的文本内容
-                    text = re.sub(r'\[\d+:\d+\.\d+\]', '', line).strip()
-                    text = re.sub(r'\[\d+:\d+:\d+\]', '', text).strip()
-                    
-                    if text:
-                        # 处理每个时间标签
-                        for match in matches:
-                            minutes = int(match[0])
-                            seconds = int(match[1])
-                            hundredths = int(match[2])
-                            
-                            # 转换为毫秒
-                            start_ms = (minutes * 60 + seconds) * 1000 + hundredths * 10
-                            
-                            # 对于LRC文件，我们假设每句持续3秒
-                            end_ms = start_ms + 3000
-                            
-                            self.subtitles.append({
-                                'text': text,
-                                'start': start_ms,
-                                'end': end_ms,
-                                'duration': 3000
-                            })
-            
-            # 按时间排序
-            self.subtitles.sort(key=lambda x: x['start'])
+            instance = create_decode_instance()
             
-            # 合并相同时间点的重复字幕
-            self._merge_duplicate_subtitles()
-            
-            self.current_index = 0
-            print(f"成功解析LRC文件，共 {len(self.subtitles)} 句字幕")
-            return True
+            def decode(media_path, out_path, sample_rate, channels, cancel_event):
+                return decode_to_wav(instance, media_path, out_path, sample_rate=sample_rate,
+                                     channels=channels, timeout=ALIGN_DECODE_TIMEOUT, cancel_event=cancel_event)
             
+            self.alignment_result = subtitle_align.align_media(self.media_path, self.subtitles, decode,
+                                                               self.cancel_event)
         except Exception as e:
-            print(f"解析LRC文件失败: {e}")
-            return False
+            print(f"自动对齐字幕失败: {e}")
+            self.alignment_result = None
+        finally:
+            if instance is not None:
+                instance.release()
+            self.finished_event.set()
     
-    def _merge_duplicate_subtitles(self):
-        """合并相同时间点的重复字幕"""
-        if not self.subtitles:
-            return
+    def refresh(self):
+        """后台计算完成后关闭对话框"""
+        if self.finished_event.is_set():
+            self.refresh_timer.stop()
+            self.accept()
+    
+    def reject(self):
+        """取消对齐"""
+        self.cancelled = True
+        self.cancel_event.set()
+        self.refresh_timer.stop()
+        super().reject()
+
+
+class ClipExportDialog(QDialog):
+    """句子音频导出进度对话框"""
+    
+    def __init__(self, exporter, parent=None):
+        super().__init__(parent)
+        self.exporter = exporter
+        self.setup_ui()
+        
+        # 导出在后台进行，定时刷新进度
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(200)
+        self.exporter.start()
+        self.refresh()
+    
+    def setup_ui(self):
+        """设置对话框UI"""
+        self.setWindowTitle("导出句子音频")
+        self.setGeometry(300, 300, 480, 160)
         
-        merged = []
-        current_sub = self.subtitles[0]
+        layout = QVBoxLayout()
         
-        for i in range(1, len(self.subtitles)):
-            next_sub = self.subtitles[i]
-            
-            # 如果时间相同或非常接近（100ms内），合并文本
-            if abs(next_sub['start'] - current_sub['start']) < 100:
-                current_sub['text'] += " " + next_sub['text']
+        self.status_label = QLabel("准备导出...")
+        layout.addWidget(self.status_label)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, max(1, self.exporter.total))
+        layout.addWidget(self.progress_bar)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.cancel_export)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
+    
+    def refresh(self):
+        """刷新导出进度"""
+        done, total, failed = self.exporter.progress()
+        self.progress_bar.setValue(done)
+        text = f"已导出 {done}/{total} 句"
+        if failed:
+            text += f"，失败 {failed} 句"
+        
+        if self.exporter.finished:
+            self.refresh_timer.stop()
+            if self.exporter.cancelled:
+                text += "（已取消，再次导出到同一目录会继续）"
             else:
-                merged.append(current_sub)
-                current_sub = next_sub
+                text += "，导出完成"
+            self.cancel_button.setText("关闭")
+            self.cancel_button.setEnabled(True)
+        self.status_label.setText(text)
+    
+    def cancel_export(self):
+        """取消导出或关闭对话框"""
+        if self.exporter.finished:
+            self.accept()
+            return
+        self.exporter.cancel()
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("正在取消，等待正在导出的句子完成...")
+    
+    def reject(self):
+        """关闭窗口时取消导出"""
+        if not self.exporter.finished:
+            self.cancel_export()
+            return
+        super().reject()
+
+
+class SentenceSearchDialog(QDialog):
+    """全文句子搜索对话框（Ctrl+F打开）"""
+    
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.hits = []
+        self.setup_ui()
         
-        merged.append(current_sub)
-        self.subtitles = merged
+        # 输入停顿后再搜索，连续输入只搜索一次
+        self.search_debouncer = Debouncer(main_window.scheduler, SEARCH_DELAY_MS, self.run_search)
+        self.search_edit.textChanged.connect(self.search_debouncer.request)
+        self.search_edit.returnPressed.connect(self.jump_to_selected)
+        self.result_list.itemActivated.connect(self.jump_to_selected)
     
-    def get_current_subtitle(self):
-        """获取当前字幕"""
-        if 0 <= self.current_index < len(self.subtitles):
-            return self.subtitles[self.current_index]
-        return None
+    def setup_ui(self):
+        """设置对话框UI"""
+        self.setWindowTitle("搜索句子")
+        self.setGeometry(250, 200, 720, 520)
+        
+        layout = QVBoxLayout()
+        
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("输入要查找的单词或句子")
+        layout.addWidget(self.search_edit)
+        
+        self.result_list = QListWidget()
+        layout.addWidget(self.result_list)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        self.setLayout(layout)
     
-    def next_subtitle(self):
-        """跳转到下一句字幕"""
-        if self.current_index < len(self.subtitles) - 1:
-            self.current_index += 1
-            return self.get_current_subtitle()
-        return None
+    def run_search(self):
+        """执行搜索并显示结果"""
+        query = self.search_edit.text().strip()
+        self.result_list.clear()
+        self.hits = self.main_window.sentence_index.search(query) if query else []
+        
+        for hit in self.hits:
+            minutes, seconds = divmod(hit.start_ms // 1000, 60)
+            name = os.path.splitext(os.path.basename(hit.subtitle_path))[0]
+            text = hit.text.replace('\n', ' ')
+            self.result_list.addItem(f"{name}  #{hit.cue_index + 1}  [{minutes:02d}:{seconds:02d}]  {text}")
+        
+        if self.hits:
+            self.result_list.setCurrentRow(0)
+        if query:
+            self.status_label.setText(f"找到 {len(self.hits)} 句")
+        else:
+            self.status_label.setText("")
     
-    def previous_subtitle(self):
-        """跳转到上一句字幕"""
-        if self.current_index > 0:
-            self.current_index -= 1
-            return self.get_current_subtitle()
-        return None
+    def jump_to_selected(self):
+        """跳转到选中的句子"""
+        if self.search_debouncer.pending:
+            self.search_debouncer.flush()
+        row = self.result_list.currentRow()
+        if 0 <= row < len(self.hits):
+            hit = self.hits[row]
+            self.main_window.jump_to_sentence(hit.subtitle_path, hit.cue_index)
+            self.accept()
+    
+    def done(self, result):
+        self.search_debouncer.cancel()
+        super().done(result)
+
+
+class QtSchedulerDriver:
+    """用一个QTimer驱动调度器：只在最早到期的任务时刻唤醒一次"""
+    
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._on_timeout)
+        self.armed_due = None
+        scheduler.on_reschedule = self._arm
+    
+    def _arm(self, due_ms):
+        """按最早到期时间重新设置定时器"""
+        if due_ms is None:
+            self.timer.stop()
+            self.armed_due = None
+            return
+        if self.timer.isActive() and self.armed_due is not None and self.armed_due <= due_ms:
+            return
+        self.armed_due = due_ms
+        # 向上取整，避免提前唤醒后发现任务未到期而空转
+        self.timer.start(max(0, math.ceil(due_ms - monotonic_ms())))
+    
+    def _on_timeout(self):
+        self.armed_due = None
+        self.scheduler.run_due()
+
+
+def monotonic_ms():
+    """单调时钟（毫秒）"""
+    return time.monotonic() * 1000.0
+
+
+def encode_thumbnail_jpeg(width, height, pixels):
+    """把截图的RV32像素数据压缩为JPEG，在缩略图后台线程中调用（QImage可以在非界面线程中使用）"""
+    image = QImage(pixels, width, height, width * 4, QImage.Format_RGB32)
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPG", THUMBNAIL_JPEG_QUALITY)
+    buffer.close()
+    return bytes(data)
+
+
+def create_qt_scheduler():
+    """创建由Qt事件循环驱动的调度器"""
+    scheduler = Scheduler(monotonic_ms)
+    scheduler.driver = QtSchedulerDriver(scheduler)
+    return scheduler
+
+
+class VLCBackend(PlaybackBackend):
+    """VLC播放后端，延迟调用由Qt驱动的调度器完成"""
+    
+    def __init__(self, media_player, scheduler):
+        self.media_player = media_player
+        self.scheduler = scheduler
+        
+        # 性能统计：收到Playing事件后的第一次时间变化视为开始出声
+        self._playing_event_seen = False
+        event_manager = self.media_player.event_manager()
+        event_manager.event_attach(vlc.EventType.MediaPlayerPlaying, self._on_vlc_playing)
+        event_manager.event_attach(vlc.EventType.MediaPlayerTimeChanged, self._on_vlc_time_changed)
+    
+    def close(self):
+        """释放播放器前解除VLC事件回调"""
+        event_manager = self.media_player.event_manager()
+        event_manager.event_detach(vlc.EventType.MediaPlayerPlaying)
+        event_manager.event_detach(vlc.EventType.MediaPlayerTimeChanged)
+    
+    def _on_vlc_playing(self, event):
+        """VLC开始播放事件（在VLC线程中调用）"""
+        self._playing_event_seen = True
+    
+    def _on_vlc_time_changed(self, event):
+        """VLC播放时间变化事件（在VLC线程中调用）"""
+        if self._playing_event_seen:
+            metrics.end(METRIC_PLAY_TO_AUDIO)
+    
+    def play(self):
+        return self.media_player.play() == 0
+    
+    def pause(self):
+        self.media_player.pause()
+        self._playing_event_seen = False
+    
+    def stop(self):
+        self.media_player.stop()
+        self._playing_event_seen = False
+    
+    def seek(self, position_ms):
+        # VLC使用0-1的浮点数表示播放位置
+        if self.media_player.get_media():
+            length = self.media_player.get_media().get_duration()
+            if length > 0:
+                position = position_ms / length
+                self.media_player.set_position(position)
+                metrics.increment('seek_count')
+    
+    def get_position(self):
+        if self.media_player.get_media():
+            position = self.media_player.get_position()
+            length = self.media_player.get_media().get_duration()
+            return int(position * length)
+        return 0
+
+
+class MemoryStream:
+    """把内存中的数据作为VLC的输入流（libvlc_media_new_callbacks）"""
+    
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        # ctypes回调对象必须一直被引用，否则会被回收导致VLC崩溃
+        self._open_cb = vlc.CallbackDecorators.MediaOpenCb(self._open)
+        self._read_cb = vlc.CallbackDecorators.MediaReadCb(self._read)
+        self._seek_cb = vlc.CallbackDecorators.MediaSeekCb(self._seek)
+        self._close_cb = vlc.CallbackDecorators.MediaCloseCb(self._close)
+    
+    def create_media(self, instance):
+        """创建读取这段数据的VLC媒体"""
+        return instance.media_new_callbacks(self._open_cb, self._read_cb, self._seek_cb, self._close_cb, None)
+    
+    def _open(self, opaque, datap, sizep):
+        self.offset = 0
+        sizep.contents.value = len(self.data)
+        return 0
+    
+    def _read(self, opaque, buf, length):
+        chunk = self.data[self.offset:self.offset + length]
+        ctypes.memmove(buf, chunk, len(chunk))
+        self.offset += len(chunk)
+        return len(chunk)
+    
+    def _seek(self, opaque, offset):
+        self.offset = min(offset, len(self.data))
+        return 0
+    
+    def _close(self, opaque):
+        pass
+
+
+class MemoryClipBackend(PlaybackBackend):
+    """从内存中的PCM片段播放当前句子的后端
+    
+    片段只包含这一句，句子边界精确到采样点；复读时只是把内存读取位置移回开头，
+    不需要在压缩音频中跳转和重新解码。对外的位置仍使用原媒体文件的时间。
+    """
+    
+    def __init__(self, resources, scheduler):
+        self.resources = resources
+        self.scheduler = scheduler
+        self.media_player = resources.new_player()
+        self.clip = None
+        self.stream = None
+    
+    def load(self, clip):
+        """加载一个句子片段，上一个片段的媒体随之释放"""
+        if self.clip is clip:
+            return
+        self.media_player.stop()
+        self.clip = clip
+        self.stream = MemoryStream(wav_bytes(clip.sample_rate, clip.channels, clip.pcm))
+        self.resources.load_stream(self.media_player, self.stream)
     
-    def get_total_count(self):
-        """获取总字幕数量"""
-        return len(self.subtitles)
+    def close(self):
+        """停止并释放片段播放器"""
+        self.resources.release_player(self.media_player)
+        self.clip = None
+        self.stream = None
+    
+    def play(self):
+        if self.media_player.get_state() == vlc.State.Ended:
+            self.media_player.stop()
+        return self.media_player.play() == 0
+    
+    def pause(self):
+        self.media_player.set_pause(1)
+    
+    def stop(self):
+        self.media_player.stop()
+    
+    def seek(self, position_ms):
+        if not self.clip:
+            return
+        offset = max(0, min(position_ms - self.clip.start_ms, self.clip.duration_ms))
+        if self.media_player.get_state() == vlc.State.Ended:
+            # 片段播放到结尾后VLC不再接受跳转，从内存重新打开即可
+            self.media_player.stop()
+            self.media_player.play()
+        # 跳回开头（offset为0）也要设置，否则正在播放或暂停的片段停在原处
+        self.media_player.set_time(int(offset))
+        metrics.increment('memory_seek_count')
+    
+    def get_position(self):
+        if not self.clip:
+            return 0
+        if self.media_player.get_state() == vlc.State.Ended:
+            return self.clip.end_ms
+        return self.clip.start_ms + max(0, self.media_player.get_time())
 
 
 class VLCPlayer(QWidget):
-    """VLC播放器封装类"""
+    """VLC播放器封装类
+    
+    复读逻辑由 RepeatStateMachine 实现，这里负责创建VLC实例并对外提供原有接口。
+    """
     
     # 定义信号
     repeat_completed = pyqtSignal()
+    repeat_progress = pyqtSignal(int, int)
     
-    def __init__(self):
+    def __init__(self, instance_args=(), scheduler=None, engine_process=False):
+        """
+        Args:
+            instance_args: 传给vlc.Instance的命令行参数，例如无界面测试时的 --aout=dummy
+            scheduler: 共用的调度器，不传时自动创建
+            engine_process: 为True时在独立进程中运行libvlc，界面进程只收发消息
+        """
         super().__init__()
-        # 创建VLC实例和媒体播放器
-        self.instance = vlc.Instance()
-        self.media_player = self.instance.media_player_new()
-        
-        # 循环播放相关变量
-        self.is_looping = False
-        self.loop_start = 0
-        self.loop_end = 0
-        self.loop_timer = QTimer()
-        self.loop_timer.timeout.connect(self._check_loop_position)
-        
-        # 播放状态
-        self.is_playing = False
-        
-        # 复读设置
-        self.repeat_count = 0
-        self.current_repeat = 0
-        self.repeat_interval = 0
-        self.auto_next = False
-        self.repeat_timer = QTimer()
-        self.repeat_timer.timeout.connect(self._handle_repeat_complete)
+        self.instance_args = tuple(instance_args)
+        
+        # 所有延迟操作都通过同一个调度器
+        self.scheduler = scheduler or create_qt_scheduler()
+        
+        # 创建VLC实例和媒体播放器，独立进程模式下界面进程中不创建
+        # 实例、播放器和媒体都由 MediaResources 持有，shutdown() 时统一释放
+        self.engine_client = None
+        if engine_process:
+            self.resources = None
+            self.media_player = None
+            self.engine_client = PlaybackEngineClient(self.instance_args)
+            self.engine_client.start()
+            self.backend = EngineBackend(self.engine_client, self.scheduler)
+            print("播放引擎运行在独立进程中")
+        else:
+            self.resources = MediaResources(self.instance_args)
+            self.media_player = self.resources.new_player()
+            self.backend = VLCBackend(self.media_player, self.scheduler)
+        
+        # 复读状态机
+        self.engine = RepeatStateMachine(self.backend, on_repeat_completed=self.repeat_completed.emit,
+                                         on_repeat=self.repeat_progress.emit)
         
         # 位置设置相关
         self.target_position = 0
-        self.position_set_timer = QTimer()
-        self.position_set_timer.timeout.connect(self._try_set_position)
+        self.position_set_task = None
         self.position_set_attempts = 0
+        
+        # 本地媒体缓存，存在本地副本时从本地播放
+        self.media_cache = None
+        
+        # 内存复读：当前句和下一句解码到内存，复读时从内存播放
+        self.media_source = None
+        self.sentence_buffer = None
+        self.clip_backend = None
+        self.decode_instance = None
+        self.clip_wait_task = None
+        self.clip_wait_version = 0
+        
+        # 响度均衡：按课程和句子的响度调整增益，分析结果由主窗口设置的 LoudnessCache 提供
+        self.loudness_cache = None
+        self.loudness_profile = None
+        self.loudness_media_path = ""
+        self.gain_db = 0.0
+    
+    @property
+    def is_playing(self):
+        return self.engine.is_playing
+    
+    @property
+    def is_looping(self):
+        return self.engine.is_looping
+    
+    @property
+    def loop_start(self):
+        return self.engine.loop_start
+    
+    @property
+    def loop_end(self):
+        return self.engine.loop_end
+    
+    @property
+    def repeat_count(self):
+        return self.engine.repeat_count
+    
+    @property
+    def current_repeat(self):
+        return self.engine.current_repeat
+    
+    @property
+    def repeat_interval(self):
+        return self.engine.repeat_interval
+    
+    @property
+    def auto_next(self):
+        return self.engine.auto_next
     
     def load_media(self, media_path):
         """加载媒体文件"""
-        media = self.instance.media_new(media_path)
-        self.media_player.set_media(media)
+        self._load_loudness(media_path)
+        if self.media_cache:
+            cached_path = self.media_cache.lookup(media_path)
+            if cached_path:
+                print(f"使用本地缓存: {cached_path}")
+                media_path = cached_path
+        self._switch_backend(self.backend)
+        if self.sentence_buffer:
+            self.sentence_buffer.clear()
+        self.media_source = media_path
+        if self.engine_client:
+            self.engine_client.load(media_path)
+        else:
+            self.resources.load(self.media_player, media_path)
         return True
     
+    def set_video_window(self, window_id):
+        """设置视频输出窗口"""
+        if self.engine_client:
+            self.engine_client.set_window(window_id)
+        elif sys.platform == "win32":
+            # Windows平台
+            self.media_player.set_hwnd(window_id)
+        else:
+            # Linux/Mac平台
+            self.media_player.set_xwindow(window_id)
+    
+    def shutdown(self):
+        """停止播放并释放所有VLC资源，关闭独立进程播放引擎；之后不能再使用"""
+        # 尚未执行的跳转、复读等延迟操作不能再访问已释放的播放器
+        self.scheduler.new_generation(SCOPE_FILE)
+        self._stop_position_retry()
+        self._cancel_clip_wait()
+        self.engine.stop()
+        sentence_buffer = self.sentence_buffer
+        self.set_sentence_buffer_enabled(False)
+        if self.engine_client:
+            self.engine_client.close()
+        if isinstance(self.backend, VLCBackend):
+            self.backend.close()
+        if self.resources:
+            self.resources.close()
+            self.resources = None
+            self.media_player = None
+        if self.decode_instance is not None:
+            if sentence_buffer is None or sentence_buffer.join(DECODE_SHUTDOWN_TIMEOUT):
+                self.decode_instance.release()
+            else:
+                print("句子解码线程没有及时结束，不释放解码用的VLC实例")
+            self.decode_instance = None
+    
     def set_media_position(self, position_ms):
         """设置播放位置（毫秒）"""
-        # VLC使用0-1的浮点数表示播放位置
-        if self.media_player.get_media():
-            length = self.media_player.get_media().get_duration()
-            if length > 0:
-                position = position_ms / length
-                self.media_player.set_position(position)
+        self.engine.backend.seek(position_ms)
     
     def get_current_position(self):
         """获取当前播放位置（毫秒）"""
-        if self.media_player.get_media():
-            position = self.media_player.get_position()
-            length = self.media_player.get_media().get_duration()
-            return int(position * length)
-        return 0
+        return self.engine.backend.get_position()
     
     def play(self):
         """开始播放"""
-        if self.media_player.play() == 0:
-            self.is_playing = True
-            return True
-        return False
+        return self.engine.play()
     
     def pause(self):
         """暂停播放"""
-        self.media_player.pause()
-        self.is_playing = False
+        self.engine.pause()
     
     def stop(self):
         """停止播放"""
-        self.media_player.stop()
-        self.is_playing = False
-        self.is_looping = False
-        self.loop_timer.stop()
+        self.engine.stop()
     
-    def set_loop(self, start_ms, end_ms):
-        """设置循环播放区间"""
-        self.loop_start = start_ms
-        self.loop_end = end_ms
-        self.is_looping = True
-        
-        # 设置初始位置
-        self.set_media_position(start_ms)
-        
-        # 启动循环检查定时器
-        self.loop_timer.start(100)  # 每100ms检查一次
+    def set_loop(self, start_ms, end_ms, seek=True):
+        """设置循环播放区间，这一句已经解码到内存时改为从内存播放，
+        还在解码时先由主播放器播放，解码完成后再切换到内存"""
+        self._cancel_clip_wait()
+        backend = self.backend
+        if self.can_buffer_sentences():
+            clip = self.sentence_buffer.get(self.media_source, start_ms, end_ms)
+            if clip:
+                self.clip_backend.load(clip)
+                backend = self.clip_backend
+            else:
+                self.clip_wait_version = self.sentence_buffer.version
+                self.clip_wait_task = self.scheduler.call_every(CLIP_READY_POLL_MS, self._check_clip_ready,
+                                                                scope=SCOPE_SENTENCE)
+        if backend is not self.engine.backend:
+            self._switch_backend(backend)
+            seek = True
+        if self.loudness_profile:
+            self._set_gain(self.loudness_profile.cue_gain_db(start_ms, end_ms))
+        self.engine.set_loop(start_ms, end_ms, seek=seek)
+    
+    def _check_clip_ready(self):
+        """当前循环的句子解码完成后，从主播放器的当前位置切换到内存播放"""
+        sentence_buffer = self.sentence_buffer
+        if sentence_buffer is None or not self.engine.is_looping or self.engine.backend is not self.backend:
+            self._cancel_clip_wait()
+            return
+        if sentence_buffer.version == self.clip_wait_version:
+            return
+        self.clip_wait_version = sentence_buffer.version
+        clip = sentence_buffer.get(self.media_source, self.engine.loop_start, self.engine.loop_end)
+        if clip is None:
+            return
+        self._cancel_clip_wait()
+        position = self.backend.get_position()
+        self.clip_backend.load(clip)
+        self._switch_backend(self.clip_backend)
+        if self.engine.loop_start <= position < self.engine.loop_end:
+            # 接着主播放器的位置播放，不从句子开头重来
+            self.clip_backend.seek(position)
+        else:
+            self.engine.set_loop(self.engine.loop_start, self.engine.loop_end)
+        print("当前句已解码到内存，改为从内存复读")
+    
+    def _cancel_clip_wait(self):
+        if self.clip_wait_task is not None:
+            self.clip_wait_task.cancel()
+            self.clip_wait_task = None
     
     def stop_loop(self):
         """停止循环播放"""
-        self.is_looping = False
-        self.loop_timer.stop()
-    
-    def _check_loop_position(self):
-        """检查循环位置，实现自动循环"""
-        if self.is_looping and self.is_playing:
-            current_pos = self.get_current_position()
-            
-            # 如果播放位置超过循环结束点，跳回循环开始点
-            if current_pos >= self.loop_end:
-                # 更新复读计数
-                self.current_repeat += 1
-                print(f"复读计数: {self.current_repeat}/{self.repeat_count}")
-                
-                # 检查是否达到设定的复读次数
-                if self.repeat_count > 0 and self.current_repeat >= self.repeat_count:
-                    # 达到复读次数，停止循环
-                    print(f"达到复读次数 {self.repeat_count}，停止循环")
-                    self.stop_loop()
-                    # 如果有复读间隔，先暂停播放，等待间隔时间
-                    if self.repeat_interval > 0:
-                        print(f"复读间隔 {self.repeat_interval} 秒")
-                        self.pause()  # 暂停播放
-                        self.repeat_timer.start(self.repeat_interval * 1000)
-                    else:
-                        self._handle_repeat_complete()
-                else:
-                    # 如果还有复读次数，检查是否需要间隔
-                    if self.repeat_interval > 0 and self.current_repeat > 0:
-                        # 暂停播放，等待间隔时间后再继续
-                        print(f"复读间隔 {self.repeat_interval} 秒")
-                        self.pause()
-                        self.repeat_timer.start(self.repeat_interval * 1000)
-                    else:
-                        # 继续循环播放
-                        print("继续循环播放")
-                        self.set_media_position(self.loop_start)
-    
-    def _handle_repeat_complete(self):
-        """处理复读完成后的逻辑"""
-        self.repeat_timer.stop()
-        
-        # 检查是复读间隔还是复读完成
-        if self.current_repeat < self.repeat_count:
-            # 这是复读间隔，继续播放
-            self.set_media_position(self.loop_start)
-            self.play()
-        else:
-            # 这是复读完成，如果设置了自动跳到下一句，触发下一句
-            if self.auto_next:
-                # 发射信号通知主窗口
-                self.repeat_completed.emit()
+        self._cancel_clip_wait()
+        self.engine.stop_loop()
+        if self.loudness_profile:
+            self._set_gain(self.loudness_profile.lesson_gain_db())
     
     def set_repeat_settings(self, repeat_count, repeat_interval, auto_next):
         """设置复读参数"""
-        self.repeat_count = repeat_count
-        self.repeat_interval = repeat_interval
-        self.auto_next = auto_next
-        self.current_repeat = 0
+        self.engine.set_repeat_settings(repeat_count, repeat_interval, auto_next)
     
     def reset_repeat_count(self):
         """重置复读计数"""
-        self.current_repeat = 0
+        self.engine.reset_repeat_count()
     
-    def set_position_with_retry(self, position_ms, max_attempts=10):
-        """设置播放位置并重试，直到位置设置成功"""
-        self.target_position = position_ms
-        self.position_set_attempts = 0
-        
-        print(f"开始设置位置: {position_ms}ms")
-        
-        # 直接设置位置，不进行任何播放操作
-        self.set_media_position(position_ms)
-        
-        # 确保处于暂停状态
-        self.pause()
-        
-        # 启动重试定时器
-        self.position_set_timer.start(100)  # 每100ms检查一次
+    def set_sentence_buffer_enabled(self, enabled):
+        """开启或关闭内存复读"""
+        if enabled and not self.sentence_buffer:
+            if self.resources is None:
+                # 独立进程模式下，内存片段仍由界面进程中的VLC实例播放
+                self.resources = MediaResources(self.instance_args)
+            self.clip_backend = MemoryClipBackend(self.resources, self.scheduler)
+            if self.gain_db:
+                self.resources.set_gain(self.clip_backend.media_player, self.gain_db)
+            self.sentence_buffer = SentenceBuffer(self._decode_sentence)
+            print("内存复读已开启")
+        elif not enabled and self.sentence_buffer:
+            self._switch_backend(self.backend)
+            self.sentence_buffer.shutdown()
+            self.sentence_buffer = None
+            self.clip_backend.close()
+            self.clip_backend = None
+            print("内存复读已关闭")
+    
+    def set_loudness_cache(self, loudness_cache):
+        """开启（传入 LoudnessCache）或关闭（传入None）响度均衡，立即应用到当前文件"""
+        self.loudness_cache = loudness_cache
+        self.loudness_profile = None
+        if loudness_cache and self.loudness_media_path:
+            self._load_loudness(self.loudness_media_path)
+        else:
+            self._set_gain(0.0)
+    
+    def refresh_loudness(self):
+        """后台分析完成后调用：当前文件刚分析完时应用增益"""
+        if self.loudness_cache is None or self.loudness_profile is not None or not self.loudness_media_path:
+            return
+        self.loudness_profile = self.loudness_cache.lookup(self.loudness_media_path)
+        self._apply_loudness()
+    
+    def _load_loudness(self, media_path):
+        """查询文件的响度分析结果，没有时在后台分析（分析完成前不调整增益）"""
+        self.loudness_media_path = media_path
+        self.loudness_profile = None
+        if self.loudness_cache is None:
+            return
+        self.loudness_profile = self.loudness_cache.lookup(media_path)
+        if self.loudness_profile is None:
+            self.loudness_cache.analyze_in_background([media_path])
+        self._apply_loudness()
+    
+    def _apply_loudness(self):
+        """按当前文件（正在循环时按当前句）应用增益"""
+        profile = self.loudness_profile
+        if profile is None:
+            self._set_gain(0.0)
+        elif self.is_looping:
+            self._set_gain(profile.cue_gain_db(self.loop_start, self.loop_end))
+        else:
+            self._set_gain(profile.lesson_gain_db())
+    
+    def _set_gain(self, gain_db):
+        """把增益应用到主播放器和内存复读播放器"""
+        gain_db = round(gain_db, 1)
+        if gain_db == self.gain_db:
+            return
+        self.gain_db = gain_db
+        if self.engine_client:
+            self.engine_client.set_gain(gain_db)
+        elif self.media_player is not None:
+            self.resources.set_gain(self.media_player, gain_db)
+        if self.clip_backend:
+            self.resources.set_gain(self.clip_backend.media_player, gain_db)
+    
+    def can_buffer_sentences(self):
+        """当前媒体是否可以使用内存复读"""
+        return (self.sentence_buffer is not None and bool(self.media_source) and
+                os.path.splitext(self.media_source)[1].lower() in MEMORY_REPEAT_EXTENSIONS)
+    
+    def prefetch_sentences(self, sentences):
+        """在后台把这些句子解码到内存，sentences 为 (开始ms, 结束ms) 列表，当前句在前"""
+        if self.can_buffer_sentences():
+            self.sentence_buffer.request([(self.media_source, start, end) for start, end in sentences])
+    
+    def _decode_sentence(self, media_path, start_ms, end_ms, out_path):
+        """解码一句到WAV文件（在句子缓冲的后台线程中调用）"""
+        if self.decode_instance is None:
+            self.decode_instance = create_decode_instance()
+        return decode_to_wav(self.decode_instance, media_path, out_path, start_ms, end_ms)
+    
+    def _switch_backend(self, backend):
+        """切换复读状态机使用的播放后端，正在播放时由新后端继续播放"""
+        current = self.engine.backend
+        if backend is current:
+            return
+        if current is self.backend:
+            # 主播放器保持在原位置暂停，画面不受影响
+            if self.engine_client:
+                self.engine_client.pause()
+            else:
+                self.media_player.set_pause(1)
+        else:
+            current.stop()
+        self.engine.backend = backend
+        if self.engine.is_playing:
+            backend.play()
+    
+    def set_position_with_retry(self, position_ms, max_attempts=10):
+        """设置播放位置并重试，直到位置设置成功"""
+        self.target_position = position_ms
+        self.position_set_attempts = 0
+        
+        print(f"开始设置位置: {position_ms}ms")
+        metrics.begin(METRIC_SEEK_SETTLE)
+        
+        # 直接设置位置，不进行任何播放操作
+        self.set_media_position(position_ms)
+        
+        # 确保处于暂停状态
+        self.pause()
+        
+        # 启动重试检查，每100ms检查一次
+        self._stop_position_retry()
+        self.position_set_task = self.scheduler.call_every(100, self._try_set_position, scope=SCOPE_SENTENCE)
         
         # 设置最大重试次数
         self.max_position_attempts = max_attempts
@@ -481,7 +1093,9 @@ class VLCPlayer(QWidget):
         """尝试设置位置的重试逻辑"""
         if self.position_set_attempts >= self.max_position_attempts:
             print(f"位置设置失败，已达到最大重试次数: {self.max_position_attempts}")
-            self.position_set_timer.stop()
+            metrics.cancel(METRIC_SEEK_SETTLE)
+            metrics.increment('seek_settle_failed')
+            self._stop_position_retry()
             return
         
         current_pos = self.get_current_position()
@@ -493,7 +1107,125 @@ class VLCPlayer(QWidget):
             self.position_set_attempts += 1
         else:
             print(f"位置设置成功: 当前={current_pos}ms, 目标={self.target_position}ms")
-            self.position_set_timer.stop()
+            metrics.end(METRIC_SEEK_SETTLE)
+            self._stop_position_retry()
+    
+    def _stop_position_retry(self):
+        """停止位置重试检查"""
+        if self.position_set_task is not None:
+            self.position_set_task.cancel()
+            self.position_set_task = None
+
+
+class WaveformView(QWidget):
+    """当前句的波形，带循环标记和播放位置
+    
+    每一列的最小/最大值只在显示范围、波形数据或控件宽度变化时从金字塔取一次（与像素数成正比）；
+    绘制时只画需要重绘的区域，播放位置移动时只重绘旧位置和新位置两条窄区域。
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(WAVEFORM_HEIGHT)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.pyramid = None
+        self.view_start = 0
+        self.view_end = 0
+        self.loop_start = None
+        self.loop_end = None
+        self.playhead_ms = None
+        self._columns = None        # 每一列的 (上端y, 下端y)，没有数据的列为None
+    
+    def set_pyramid(self, pyramid):
+        """设置波形数据（WaveformPyramid 或 None），返回原来的数据，由调用方关闭"""
+        previous, self.pyramid = self.pyramid, pyramid
+        self._columns = None
+        self.update()
+        return previous
+    
+    def set_view(self, start_ms, end_ms, loop_start=None, loop_end=None):
+        """设置显示的时间范围和循环区间"""
+        if (start_ms, end_ms, loop_start, loop_end) == (self.view_start, self.view_end, self.loop_start, self.loop_end):
+            return
+        self.view_start = start_ms
+        self.view_end = end_ms
+        self.loop_start = loop_start
+        self.loop_end = loop_end
+        self._columns = None
+        self.update()
+    
+    def set_playhead(self, position_ms):
+        """移动播放位置，只重绘旧位置和新位置"""
+        old_x = self._x(self.playhead_ms)
+        self.playhead_ms = position_ms
+        new_x = self._x(position_ms)
+        if old_x == new_x:
+            return
+        for x in (old_x, new_x):
+            if x is not None:
+                self.update(QRect(x - 1, 0, 3, self.height()))
+    
+    def _x(self, time_ms):
+        """时间对应的列，不在显示范围内时返回None"""
+        if time_ms is None or self.view_end <= self.view_start:
+            return None
+        x = int((time_ms - self.view_start) * self.width() / (self.view_end - self.view_start))
+        return x if 0 <= x < self.width() else None
+    
+    def _ensure_columns(self):
+        if self._columns is not None or self.pyramid is None:
+            return
+        width = self.width()
+        mins, maxs = self.pyramid.columns(self.view_start, self.view_end, width)
+        middle = self.height() / 2.0
+        scale = middle - 2
+        columns = [None] * width
+        for x in range(width):
+            if mins[x] == mins[x]:      # 不是NaN
+                columns[x] = (int(middle - maxs[x] * scale), int(middle - mins[x] * scale))
+        self._columns = columns
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._columns = None
+    
+    def paintEvent(self, event):
+        rect = event.rect()
+        painter = QPainter(self)
+        painter.fillRect(rect, WAVEFORM_COLORS['background'])
+        
+        # 循环区间
+        loop_left = self._x(self.loop_start) if self.loop_start is not None else None
+        loop_right = self._x(self.loop_end) if self.loop_end is not None else None
+        if self.loop_start is not None and self.loop_end is not None:
+            left = 0 if loop_left is None and self.loop_start < self.view_start else loop_left
+            right = self.width() - 1 if loop_right is None and self.loop_end >= self.view_end else loop_right
+            if left is not None and right is not None:
+                painter.fillRect(QRect(left, 0, right - left + 1, self.height()).intersected(rect),
+                                 WAVEFORM_COLORS['loop'])
+        
+        # 波形：只画重绘区域内的列
+        self._ensure_columns()
+        if self._columns:
+            painter.setPen(WAVEFORM_COLORS['wave'])
+            lines = []
+            for x in range(max(0, rect.left()), min(len(self._columns), rect.right() + 1)):
+                column = self._columns[x]
+                if column is not None:
+                    lines.append(QLine(x, column[0], x, column[1]))
+            if lines:
+                painter.drawLines(lines)
+        
+        # 循环标记和播放位置
+        painter.setPen(WAVEFORM_COLORS['marker'])
+        for x in (loop_left, loop_right):
+            if x is not None and rect.left() <= x <= rect.right():
+                painter.drawLine(x, 0, x, self.height())
+        playhead_x = self._x(self.playhead_ms)
+        if playhead_x is not None and rect.left() - 1 <= playhead_x <= rect.right() + 1:
+            painter.setPen(WAVEFORM_COLORS['playhead'])
+            painter.drawLine(playhead_x, 0, playhead_x, self.height())
+        painter.end()
 
 
 class PlayerWidget(QWidget):
@@ -511,7 +1243,7 @@ class PlayerWidget(QWidget):
         
         # 视频显示区域 - 支持自适应缩放
         self.video_frame = QFrame()
-        self.video_frame.setStyleSheet("background-color: black;")
+        self.video_frame.setObjectName(theme.VIDEO_FRAME)
         self.video_frame.setMinimumSize(960, 540)  # 设置1080P比例的最小尺寸(16:9)
         
         # 使用弹性布局使视频窗口可以自适应
@@ -525,27 +1257,26 @@ class PlayerWidget(QWidget):
     
     def attach_vlc(self):
         """将VLC播放器附加到窗口"""
-        if sys.platform == "win32":
-            # Windows平台
-            self.vlc_player.media_player.set_hwnd(int(self.video_frame.winId()))
-        else:
-            # Linux/Mac平台
-            self.vlc_player.media_player.set_xwindow(int(self.video_frame.winId()))
+        self.vlc_player.set_video_window(int(self.video_frame.winId()))
 
 
 class MainWindow(QMainWindow):
     """主窗口"""
     
+    # 控制接口收到新命令（从服务器线程发出，在界面线程中处理）
+    control_commands_ready = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         # 延迟初始化非关键组件
         self.vlc_player = None
+        self.status_task = None
         self.subtitle_parser = None
-        self.lrc_subtitle_parser = None
         
         self.current_media_path = ""
         self.current_subtitle_path = ""
-        self.current_subtitle_type = None  # 'srt' or 'lrc'
+        self.current_subtitle_type = None  # 字幕格式名，如 'srt'、'lrc'、'vtt'、'ass'，没有加载字幕时为None
+        self.secondary_texts = None  # 当前文件每句的第二字幕（中文对照），没有第二字幕时为None
 
         # 播放列表相关变量
         self.playlist_items = []  # 存储播放列表项
@@ -579,6 +1310,54 @@ class MainWindow(QMainWindow):
         self.playlist_items = []
         self.current_playlist_index = -1
         
+        # 本地媒体缓存设置，延迟初始化时从配置加载
+        self.media_cache = None
+        self.media_cache_enabled = False
+        self.media_cache_size_mb = 2048
+        self.memory_repeat_enabled = False
+        self.engine_process_enabled = False
+        self.loudness_enabled = False
+        self.loudness_cache = None
+        self.loudness_version = 0
+        
+        # 全文句子搜索索引和课程统计
+        self.sentence_index = None
+        self.lesson_stats = None
+        self.lesson_stats_version = -1
+        self.embedded_subtitles = None
+        self.embedded_subtitles_version = 0
+        
+        # 句子清单缩略图，只为可见行加载图片
+        self.thumbnail_cache = None
+        self.thumbnail_version = 0
+        self.thumbnail_media_path = ""
+        self.thumbnail_starts = None
+        self.thumbnail_pack = None
+        self.thumbnail_rows = set()
+        self.thumbnail_request_row = 0
+        self.thumbnail_placeholder = None
+        
+        # 当前句的波形，数据来自后台生成的最小值/最大值金字塔
+        self.waveform_cache = None
+        self.waveform_version = None
+        self.waveform_media_path = ""
+        self.waveform_task = None
+        
+        # 句子间隔复习，复习模式下评分后自动跳到下一句到期的句子
+        self.review_scheduler = None
+        self.review_mode = False
+        
+        # 监视播放列表涉及的目录，文件变化时增量更新播放列表
+        self.folder_watcher = None
+        self.folder_index = None
+        self.changed_folders = set()
+        
+        # 在后台为加入播放列表的课程目录生成课程清单，下次加载时只读清单
+        self.manifest_builder = course_manifest.ManifestBuilder(MEDIA_EXTENSIONS)
+        
+        # 本地控制接口，设置了环境变量 PLAYER_CONTROL_ADDRESS 时启动
+        self.control_server = None
+        
         # 快速设置UI
         self.setup_ui_fast()
         
@@ -659,8 +1438,9 @@ class MainWindow(QMainWindow):
         # 设置深色主题
         self.set_dark_theme()
         
-        # 设置全局字体
+        # 设置全局字体和样式表
         self.set_global_font()
+        self.apply_theme()
         
         # 创建中央部件
         central_widget = QWidget()
@@ -673,8 +1453,7 @@ class MainWindow(QMainWindow):
         # 标题栏
         self.title_label = QLabel("冰狐精听复读播放器")
         self.title_label.setAlignment(Qt.AlignCenter)
-        self.title_label.setFont(QFont(self.font_family, max(14, self.font_size), QFont.Bold))
-        self.title_label.setStyleSheet("color: white; padding: 10px;")
+        self.title_label.setObjectName(theme.TITLE_LABEL)
         main_layout.addWidget(self.title_label)
         
         # 内容区域堆叠窗口
@@ -694,10 +1473,20 @@ class MainWindow(QMainWindow):
         """延迟初始化非关键组件"""
         print("开始延迟初始化...")
         
-        # 初始化VLC播放器
-        self.vlc_player = VLCPlayer()
+        # 加载完整的配置数据
+        full_config = self.load_config()
+        self.engine_process_enabled = full_config.get('engine_process_enabled', False)
+        
+        # 初始化VLC播放器，播放器的调度器同时负责主窗口的所有延迟操作
+        self.vlc_player = VLCPlayer(engine_process=self.engine_process_enabled)
+        self.scheduler = self.vlc_player.scheduler
+        
+        # 合并连续的上一句/下一句请求，切换文件时作废
+        self.navigation_debouncer = Debouncer(self.scheduler, NAVIGATION_COALESCE_MS,
+                                              self._commit_sentence_navigation, scope=SCOPE_FILE, leading=True)
+        
         self.subtitle_parser = SubtitleParser()
-        self.lrc_subtitle_parser = LRCSubtitleParser()
+        self.secondary_tracks = SecondaryTrackCache(self.load_secondary_cues)
         
         # 创建播放器控件
         self.player_widget = PlayerWidget(self.vlc_player)
@@ -712,13 +1501,45 @@ class MainWindow(QMainWindow):
                 self.player_widget_placeholder.deleteLater()
                 break
         
-        # 加载完整的配置数据
-        full_config = self.load_config()
         self.last_video_path = full_config.get('last_video_path', "")
         self.last_srt_path = full_config.get('last_srt_path', "")
         self.last_subtitle_index = full_config.get('last_subtitle_index', 0)
         self.playlist_items = full_config.get('playlist_items', [])
         self.current_playlist_index = full_config.get('current_playlist_index', -1)
+        self.media_cache_enabled = full_config.get('media_cache_enabled', False)
+        self.media_cache_size_mb = full_config.get('media_cache_size_mb', 2048)
+        self.memory_repeat_enabled = full_config.get('memory_repeat_enabled', False)
+        self.loudness_enabled = full_config.get('loudness_enabled', False)
+        
+        # 本地媒体缓存
+        self.setup_media_cache()
+        
+        # 内存复读
+        self.vlc_player.set_sentence_buffer_enabled(self.memory_repeat_enabled)
+        
+        # 响度均衡
+        self.setup_loudness()
+        
+        # 字幕时间校正
+        self.setup_subtitle_alignment()
+        
+        # 内嵌字幕提取
+        self.setup_embedded_subtitles()
+        
+        # 句子搜索索引和课程统计
+        self.setup_library_index()
+        
+        # 句子复习
+        self.setup_review_scheduler()
+        
+        # 监视播放列表目录
+        self.setup_folder_watcher()
+        
+        # 句子缩略图
+        self.setup_thumbnail_cache()
+        
+        # 句子波形
+        self.setup_waveform_cache()
         
         # 应用复读设置到播放器
         self.vlc_player.set_repeat_settings(self.repeat_count, self.repeat_interval, self.auto_next)
@@ -737,10 +1558,14 @@ class MainWindow(QMainWindow):
         # 尝试恢复上次的播放进度
         self.restore_last_session()
         
-        # 状态更新定时器
-        self.status_timer = QTimer()
-        self.status_timer.timeout.connect(self.update_status)
-        self.status_timer.start(500)  # 每500ms更新一次状态
+        # 状态更新任务，每500ms更新一次状态
+        self.status_task = self.scheduler.call_every(500, self.update_status)
+        
+        # 波形上的播放位置刷新得更频繁，每次只重绘播放位置附近
+        self.waveform_task = self.scheduler.call_every(WAVEFORM_PLAYHEAD_MS, self.update_waveform_playhead)
+        
+        # 本地控制接口
+        self.setup_control_server()
         
         print("延迟初始化完成")
     
@@ -755,8 +1580,9 @@ class MainWindow(QMainWindow):
         # 设置深色主题
         self.set_dark_theme()
         
-        # 设置全局字体
+        # 设置全局字体和样式表
         self.set_global_font()
+        self.apply_theme()
         
         # 创建中央部件
         central_widget = QWidget()
@@ -769,8 +1595,7 @@ class MainWindow(QMainWindow):
         # 标题栏
         self.title_label = QLabel("冰狐精听复读播放器")
         self.title_label.setAlignment(Qt.AlignCenter)
-        self.title_label.setFont(QFont(self.font_family, max(14, self.font_size), QFont.Bold))
-        self.title_label.setStyleSheet("color: white; padding: 10px;")
+        self.title_label.setObjectName(theme.TITLE_LABEL)
         main_layout.addWidget(self.title_label)
         
         # 内容区域堆叠窗口
@@ -888,6 +1713,12 @@ class MainWindow(QMainWindow):
         font = QFont(self.font_family, self.font_size)  # 使用配置的字体家族和大小
         self.setFont(font)
     
+    def apply_theme(self):
+        """按当前字体设置应用主窗口样式表，字体没有变化时不会重新计算样式"""
+        if not hasattr(self, 'theme_engine'):
+            self.theme_engine = ThemeEngine()
+        self.theme_engine.apply(self, self.font_family, self.font_size)
+    
     def set_dark_theme(self):
         """设置深色主题"""
         palette = QPalette()
@@ -916,34 +1747,65 @@ class MainWindow(QMainWindow):
         file_layout = QHBoxLayout()
         
         self.file_playlist_btn = QPushButton("播放列表")
-        self.file_playlist_btn.setStyleSheet(self.get_button_style())
+        self.file_playlist_btn.setObjectName(theme.BUTTON)
         self.file_playlist_btn.setFixedWidth(200)  # 改为两倍宽度
         file_layout.addWidget(self.file_playlist_btn)
         
+        # 复习到期的句子
+        self.review_btn = QPushButton("复习")
+        self.review_btn.setObjectName(theme.BUTTON)
+        self.review_btn.setEnabled(False)
+        file_layout.addWidget(self.review_btn)
+        file_layout.addStretch()
+        
         play_layout.addLayout(file_layout)
         
         # 播放器控件 - 延迟初始化
         self.player_widget = None
         self.player_widget_placeholder = QFrame()
-        self.player_widget_placeholder.setStyleSheet("background-color: black;")
+        self.player_widget_placeholder.setObjectName(theme.VIDEO_FRAME)
         self.player_widget_placeholder.setMinimumSize(960, 540)
         play_layout.addWidget(self.player_widget_placeholder)
         
+        # 双语字幕：当前句的原文和第二字幕，只在有第二字幕时显示
+        self.bilingual_label = QLabel("")
+        self.bilingual_label.setObjectName(theme.SUBTITLE_LABEL)
+        self.bilingual_label.setAlignment(Qt.AlignCenter)
+        self.bilingual_label.setWordWrap(True)
+        self.bilingual_label.setVisible(False)
+        play_layout.addWidget(self.bilingual_label)
+        
+        # 当前句的波形（没有波形数据时隐藏）
+        self.waveform_view = WaveformView()
+        self.waveform_view.setVisible(False)
+        play_layout.addWidget(self.waveform_view)
+        
         # 进度信息区域 - 包含文件信息和进度
         progress_layout = QHBoxLayout()
         
         # 当前播放文件信息 - 左对齐
         self.file_info_label = QLabel("")
-        self.file_info_label.setStyleSheet(f"color: #ccc; font-family: {self.font_family}; font-size: {max(10, self.font_size - 4)}px;")
+        self.file_info_label.setObjectName(theme.INFO_LABEL)
         progress_layout.addWidget(self.file_info_label)
         
         progress_layout.addStretch()  # 添加弹性空间
         
+        # 给当前句评分，安排下次复习
+        self.grade_again_btn = QPushButton("没听懂")
+        self.grade_again_btn.setObjectName(theme.BUTTON)
+        self.grade_again_btn.setEnabled(False)
+        progress_layout.addWidget(self.grade_again_btn)
+        
+        self.grade_good_btn = QPushButton("听懂了")
+        self.grade_good_btn.setObjectName(theme.BUTTON)
+        self.grade_good_btn.setEnabled(False)
+        progress_layout.addWidget(self.grade_good_btn)
+        
         # 进度信息 - 右对齐
         self.progress_label = QLabel("进度: 0/0")
         self.progress_label.setAlignment(Qt.AlignRight)
         self.progress_label.setFixedHeight(30)  # 固定高度
-        self.progress_label.setStyleSheet(f"color: #ccc; font-family: {self.font_family}; font-size: {max(10, self.font_size - 4)}px;")
+        self.progress_label.setObjectName(theme.INFO_LABEL)
         progress_layout.addWidget(self.progress_label)
         
         play_layout.addLayout(progress_layout)
@@ -959,26 +1821,12 @@ class MainWindow(QMainWindow):
         # 句子清单标题
         playlist_title = QLabel("句子清单")
         playlist_title.setAlignment(Qt.AlignCenter)
-        playlist_title.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(14, self.font_size)}px; padding: 10px;")
+        playlist_title.setObjectName(theme.PAGE_TITLE)
         playlist_layout.addWidget(playlist_title)
         
         # 句子清单
         self.playlist_widget = QListWidget()
-        self.playlist_widget.setStyleSheet("""
-            QListWidget {
-                background-color: #2a2a2a;
-                color: white;
-                border: 1px solid #555;
-                border-radius: 5px;
-            }
-            QListWidget::item {
-                padding: 8px;
-                border-bottom: 1px solid #444;
-            }
-            QListWidget::item:selected {
-                background-color: #42a2da;
-            }
-        """)
+        self.playlist_widget.setObjectName(theme.SENTENCE_LIST)
         playlist_layout.addWidget(self.playlist_widget)
         
         self.stacked_widget.addWidget(playlist_widget)
@@ -992,62 +1840,95 @@ class MainWindow(QMainWindow):
         # 播放列表标题
         playlist_title = QLabel("播放列表")
         playlist_title.setAlignment(Qt.AlignCenter)
-        playlist_title.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(14, self.font_size)}px; padding: 10px;")
+        playlist_title.setObjectName(theme.PAGE_TITLE)
         playlist_layout.addWidget(playlist_title)
         
         # 播放列表控制按钮
         control_layout = QHBoxLayout()
         
         self.add_to_playlist_btn = QPushButton("添加文件到播放列表")
-        self.add_to_playlist_btn.setStyleSheet(self.get_button_style())
+        self.add_to_playlist_btn.setObjectName(theme.BUTTON)
         control_layout.addWidget(self.add_to_playlist_btn)
         
+        self.add_course_btn = QPushButton("添加课程目录")
+        self.add_course_btn.setObjectName(theme.BUTTON)
+        control_layout.addWidget(self.add_course_btn)
+        
         self.remove_from_playlist_btn = QPushButton("从播放列表移除")
-        self.remove_from_playlist_btn.setStyleSheet(self.get_button_style())
+        self.remove_from_playlist_btn.setObjectName(theme.BUTTON)
         self.remove_from_playlist_btn.setEnabled(False)
         control_layout.addWidget(self.remove_from_playlist_btn)
         
         self.clear_playlist_btn = QPushButton("清空播放列表")
-        self.clear_playlist_btn.setStyleSheet(self.get_button_style())
+        self.clear_playlist_btn.setObjectName(theme.BUTTON)
         self.clear_playlist_btn.setEnabled(False)
         control_layout.addWidget(self.clear_playlist_btn)
         
+        self.search_sentences_btn = QPushButton("搜索句子")
+        self.search_sentences_btn.setObjectName(theme.BUTTON)
+        control_layout.addWidget(self.search_sentences_btn)
+        
+        self.export_clips_btn = QPushButton("导出句子音频")
+        self.export_clips_btn.setObjectName(theme.BUTTON)
+        self.export_clips_btn.setEnabled(False)
+        control_layout.addWidget(self.export_clips_btn)
+        
+        self.align_subtitle_btn = QPushButton("自动对齐字幕")
+        self.align_subtitle_btn.setObjectName(theme.BUTTON)
+        self.align_subtitle_btn.setEnabled(False)
+        control_layout.addWidget(self.align_subtitle_btn)
+        
+        self.secondary_subtitle_btn = QPushButton("第二字幕")
+        self.secondary_subtitle_btn.setObjectName(theme.BUTTON)
+        self.secondary_subtitle_btn.setEnabled(False)
+        control_layout.addWidget(self.secondary_subtitle_btn)
+        
         playlist_layout.addLayout(control_layout)
         
+        # 按课程统计排序和筛选
+        stats_layout = QHBoxLayout()
+        
+        self.playlist_sort_combo = QComboBox()
+        for name, _ in PLAYLIST_SORT_OPTIONS:
+            self.playlist_sort_combo.addItem(name)
+        self.playlist_sort_combo.setObjectName(theme.INPUT_FIELD)
+        stats_layout.addWidget(self.playlist_sort_combo)
+        
+        max_rate_label = QLabel("最高语速:")
+        max_rate_label.setObjectName(theme.FIELD_LABEL)
+        stats_layout.addWidget(max_rate_label)
+        self.playlist_max_rate_spin = QDoubleSpinBox()
+        self.playlist_max_rate_spin.setRange(0, 10)
+        self.playlist_max_rate_spin.setSingleStep(0.1)
+        self.playlist_max_rate_spin.setDecimals(1)
+        self.playlist_max_rate_spin.setSpecialValueText("不限")
+        self.playlist_max_rate_spin.setSuffix(" 词/秒")
+        self.playlist_max_rate_spin.setObjectName(theme.INPUT_FIELD)
+        stats_layout.addWidget(self.playlist_max_rate_spin)
+        stats_layout.addStretch()
+        
+        playlist_layout.addLayout(stats_layout)
+        
         # 播放列表
         self.file_playlist_widget = QListWidget()
-        self.file_playlist_widget.setStyleSheet("""
-            QListWidget {
-                background-color: #2a2a2a;
-                color: white;
-                border: 1px solid #555;
-                border-radius: 5px;
-            }
-            QListWidget::item {
-                padding: 8px;
-                border-bottom: 1px solid #444;
-            }
-            QListWidget::item:selected {
-                background-color: #42a2da;
-            }
-        """)
+        self.file_playlist_widget.setObjectName(theme.FILE_LIST)
         playlist_layout.addWidget(self.file_playlist_widget)
         
         # 播放控制按钮
         play_control_layout = QHBoxLayout()
         
         self.play_prev_file_btn = QPushButton("上一个文件")
-        self.play_prev_file_btn.setStyleSheet(self.get_button_style())
+        self.play_prev_file_btn.setObjectName(theme.BUTTON)
         self.play_prev_file_btn.setEnabled(False)
         play_control_layout.addWidget(self.play_prev_file_btn)
         
         self.play_current_file_btn = QPushButton("播放当前文件")
-        self.play_current_file_btn.setStyleSheet(self.get_button_style(primary=True))
+        self.play_current_file_btn.setObjectName(theme.PRIMARY_BUTTON)
         self.play_current_file_btn.setEnabled(False)
         play_control_layout.addWidget(self.play_current_file_btn)
         
         self.play_next_file_btn = QPushButton("下一个文件")
-        self.play_next_file_btn.setStyleSheet(self.get_button_style())
+        self.play_next_file_btn.setObjectName(theme.BUTTON)
         self.play_next_file_btn.setEnabled(False)
         play_control_layout.addWidget(self.play_next_file_btn)
         
@@ -1064,88 +1945,132 @@ class MainWindow(QMainWindow):
         # 设置标题
         settings_title = QLabel("软件设置")
         settings_title.setAlignment(Qt.AlignCenter)
-        settings_title.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(14, self.font_size)}px; padding: 10px;")
+        settings_title.setObjectName(theme.PAGE_TITLE)
         settings_layout.addWidget(settings_title)
         
         # 设置内容区域
         settings_content = QFrame()
-        settings_content.setStyleSheet(f"QFrame {{ background-color: #2a2a2a; border: 1px solid #555; border-radius: 5px; padding: 20px; color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; }}")
+        settings_content.setObjectName(theme.SETTINGS_CONTENT)
         settings_content_layout = QVBoxLayout()
         settings_content.setLayout(settings_content_layout)
         
         # 字体设置区域
         font_group = QFrame()
-        font_group.setStyleSheet(f"QFrame {{ border: 1px solid #555; border-radius: 5px; padding: 10px; color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; }}")
+        font_group.setObjectName(theme.SETTINGS_GROUP)
         font_layout = QFormLayout(font_group)
         
         # 字体家族选择
         font_family_label = QLabel("字体家族:")
-        font_family_label.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
+        font_family_label.setObjectName(theme.FIELD_LABEL)
         font_layout.addRow(font_family_label)
         self.settings_font_family_combo = QFontComboBox()
         self.settings_font_family_combo.setCurrentFont(QFont(self.font_family))
-        self.settings_font_family_combo.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
+        self.settings_font_family_combo.setObjectName(theme.INPUT_FIELD)
         font_layout.addRow(self.settings_font_family_combo)
         
         # 字体大小选择
         font_size_label = QLabel("字体大小:")
-        font_size_label.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
+        font_size_label.setObjectName(theme.FIELD_LABEL)
         font_layout.addRow(font_size_label)
         self.settings_font_size_spin = QSpinBox()
         self.settings_font_size_spin.setRange(8, 48)
         self.settings_font_size_spin.setValue(self.font_size)
         self.settings_font_size_spin.setSuffix(" 点")
-        self.settings_font_size_spin.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
+        self.settings_font_size_spin.setObjectName(theme.INPUT_FIELD)
         font_layout.addRow(self.settings_font_size_spin)
         
         # 预览标签
         preview_label = QLabel("预览:")
-        preview_label.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
+        preview_label.setObjectName(theme.FIELD_LABEL)
         font_layout.addRow(preview_label)
         self.settings_preview_label = QLabel(f"预览文字 - {self.font_family} {self.font_size}点")
-        self.settings_preview_label.setStyleSheet(f"font-family: {self.font_family}; font-size: {self.font_size}px; padding: 10px; background-color: #333; border-radius: 5px; color: white;")
+        self.settings_preview_label.setObjectName(theme.PREVIEW_LABEL)
         font_layout.addRow(self.settings_preview_label)
         
         settings_content_layout.addWidget(font_group)
         
         # 复读设置区域
         repeat_group = QFrame()
-        repeat_group.setStyleSheet(f"QFrame {{ border: 1px solid #555; border-radius: 5px; padding: 10px; color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; }}")
+        repeat_group.setObjectName(theme.SETTINGS_GROUP)
         repeat_layout = QFormLayout(repeat_group)
         
         # 复读间隔秒数
         repeat_interval_label = QLabel("复读间隔:")
-        repeat_interval_label.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
+        repeat_interval_label.setObjectName(theme.FIELD_LABEL)
         repeat_layout.addRow(repeat_interval_label)
         self.settings_repeat_interval_spin = QSpinBox()
         self.settings_repeat_interval_spin.setRange(0, 60)
         self.settings_repeat_interval_spin.setValue(self.repeat_interval)
         self.settings_repeat_interval_spin.setSuffix(" 秒")
-        self.settings_repeat_interval_spin.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
+        self.settings_repeat_interval_spin.setObjectName(theme.INPUT_FIELD)
         repeat_layout.addRow(self.settings_repeat_interval_spin)
         
         # 复读次数
         repeat_count_label = QLabel("复读次数:")
-        repeat_count_label.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
+        repeat_count_label.setObjectName(theme.FIELD_LABEL)
         repeat_layout.addRow(repeat_count_label)
         self.settings_repeat_count_spin = QSpinBox()
         self.settings_repeat_count_spin.setRange(0, 999)
         self.settings_repeat_count_spin.setValue(self.repeat_count)
         self.settings_repeat_count_spin.setSuffix(" 次")
-        self.settings_repeat_count_spin.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
+        self.settings_repeat_count_spin.setObjectName(theme.INPUT_FIELD)
         repeat_layout.addRow(self.settings_repeat_count_spin)
         
         # 自动跳到下一句
         self.settings_auto_next_checkbox = QCheckBox("复读完自动跳到下一句")
         self.settings_auto_next_checkbox.setChecked(self.auto_next)
-        self.settings_auto_next_checkbox.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
+        self.settings_auto_next_checkbox.setObjectName(theme.FIELD_LABEL)
         repeat_layout.addRow(self.settings_auto_next_checkbox)
         
+        # 内存复读
+        self.settings_memory_repeat_checkbox = QCheckBox("内存复读（音频文件，复读时不再跳转解码）")
+        self.settings_memory_repeat_checkbox.setChecked(self.memory_repeat_enabled)
+        self.settings_memory_repeat_checkbox.setObjectName(theme.FIELD_LABEL)
+        repeat_layout.addRow(self.settings_memory_repeat_checkbox)
+        
+        # 独立进程播放
+        self.settings_engine_process_checkbox = QCheckBox("在独立进程中播放（文件损坏或设备卡顿时界面不卡，重启软件后生效）")
+        self.settings_engine_process_checkbox.setChecked(self.engine_process_enabled)
+        self.settings_engine_process_checkbox.setObjectName(theme.FIELD_LABEL)
+        repeat_layout.addRow(self.settings_engine_process_checkbox)
+        
+        # 响度均衡
+        self.settings_loudness_checkbox = QCheckBox("音量均衡（在后台解码分析每个文件的响度，按课程和句子自动调整音量，需要numpy）")
+        self.settings_loudness_checkbox.setChecked(self.loudness_enabled)
+        self.settings_loudness_checkbox.setEnabled(loudness.is_available())
+        self.settings_loudness_checkbox.setObjectName(theme.FIELD_LABEL)
+        repeat_layout.addRow(self.settings_loudness_checkbox)
+        
         settings_content_layout.addWidget(repeat_group)
         
+        # 媒体缓存设置区域
+        cache_group = QFrame()
+        cache_group.setObjectName(theme.SETTINGS_GROUP)
+        cache_layout = QFormLayout(cache_group)
+        
+        # 是否启用本地缓存
+        self.settings_media_cache_checkbox = QCheckBox("缓存媒体文件到本地（适合U盘和网络盘）")
+        self.settings_media_cache_checkbox.setChecked(self.media_cache_enabled)
+        self.settings_media_cache_checkbox.setObjectName(theme.FIELD_LABEL)
+        cache_layout.addRow(self.settings_media_cache_checkbox)
+        
+        # 缓存大小上限
+        media_cache_size_label = QLabel("缓存上限:")
+        media_cache_size_label.setObjectName(theme.FIELD_LABEL)
+        cache_layout.addRow(media_cache_size_label)
+        self.settings_media_cache_size_spin = QSpinBox()
+        self.settings_media_cache_size_spin.setRange(100, 100000)
+        self.settings_media_cache_size_spin.setSingleStep(100)
+        self.settings_media_cache_size_spin.setValue(self.media_cache_size_mb)
+        self.settings_media_cache_size_spin.setSuffix(" MB")
+        self.settings_media_cache_size_spin.setObjectName(theme.INPUT_FIELD)
+        cache_layout.addRow(self.settings_media_cache_size_spin)
+        
+        settings_content_layout.addWidget(cache_group)
+        
         # 应用设置按钮
         apply_button = QPushButton("应用设置")
-        apply_button.setStyleSheet(self.get_button_style(primary=True))
+        apply_button.setObjectName(theme.PRIMARY_BUTTON)
         apply_button.clicked.connect(self.apply_settings)
         settings_content_layout.addWidget(apply_button)
         
@@ -1157,18 +2082,18 @@ class MainWindow(QMainWindow):
     def setup_control_bar(self, main_layout):
         """设置底部控制栏"""
         control_frame = QFrame()
-        control_frame.setStyleSheet("background-color: #2a2a2a; padding: 10px;")
+        control_frame.setObjectName(theme.CONTROL_BAR)
         control_layout = QHBoxLayout()
         control_frame.setLayout(control_layout)
         
         # 左侧：软件设置按钮和播放列表界面的返回播放按钮
         self.software_settings_btn = QPushButton("软件设置")
-        self.software_settings_btn.setStyleSheet(self.get_button_style())
+        self.software_settings_btn.setObjectName(theme.BUTTON)
         control_layout.addWidget(self.software_settings_btn)
         
         # 播放列表界面的返回播放按钮（在左侧）
         self.settings_back_btn = QPushButton("返回播放")
-        self.settings_back_btn.setStyleSheet(self.get_button_style())
+        self.settings_back_btn.setObjectName(theme.BUTTON)
         self.settings_back_btn.setVisible(False)
         control_layout.addWidget(self.settings_back_btn)
         
@@ -1176,17 +2101,17 @@ class MainWindow(QMainWindow):
         
         # 中间：播放控制按钮
         self.prev_btn = QPushButton("上一句")
-        self.prev_btn.setStyleSheet(self.get_button_style())
+        self.prev_btn.setObjectName(theme.BUTTON)
         self.prev_btn.setEnabled(False)
         control_layout.addWidget(self.prev_btn)
         
         self.play_pause_btn = QPushButton("播放")
-        self.play_pause_btn.setStyleSheet(self.get_button_style(primary=True))
+        self.play_pause_btn.setObjectName(theme.PRIMARY_BUTTON)
         self.play_pause_btn.setEnabled(False)
         control_layout.addWidget(self.play_pause_btn)
         
         self.next_btn = QPushButton("下一句")
-        self.next_btn.setStyleSheet(self.get_button_style())
+        self.next_btn.setObjectName(theme.BUTTON)
         self.next_btn.setEnabled(False)
         control_layout.addWidget(self.next_btn)
         
@@ -1194,68 +2119,17 @@ class MainWindow(QMainWindow):
         
         # 右侧：句子清单按钮和句子清单界面的返回播放按钮
         self.playlist_btn = QPushButton("句子清单")
-        self.playlist_btn.setStyleSheet(self.get_button_style())
+        self.playlist_btn.setObjectName(theme.BUTTON)
         control_layout.addWidget(self.playlist_btn)
         
         # 句子清单界面的返回播放按钮（在右侧）
         self.playlist_back_btn = QPushButton("返回播放")
-        self.playlist_back_btn.setStyleSheet(self.get_button_style())
+        self.playlist_back_btn.setObjectName(theme.BUTTON)
         self.playlist_back_btn.setVisible(False)
         control_layout.addWidget(self.playlist_back_btn)
         
         main_layout.addWidget(control_frame)
     
-    def get_button_style(self, primary=False):
-        """获取按钮样式"""
-        if primary:
-            return f"""
-                QPushButton {{
-                    background-color: #42a2da;
-                    color: white;
-                    border: none;
-                    padding: 15px 30px;
-                    border-radius: 25px;
-                    font-family: {self.font_family};
-                    font-size: {max(14, self.font_size + 2)}px;
-                    min-width: 120px;
-                    min-height: 50px;
-                }}
-                QPushButton:hover {{
-                    background-color: #3598c5;
-                }}
-                QPushButton:pressed {{
-                    background-color: #2a7ba2;
-                }}
-                QPushButton:disabled {{
-                    background-color: #666;
-                    color: #999;
-                }}
-            """
-        else:
-            return f"""
-                QPushButton {{
-                    background-color: #555;
-                    color: white;
-                    border: none;
-                    padding: 12px 24px;
-                    border-radius: 20px;
-                    font-family: {self.font_family};
-                    font-size: {max(12, self.font_size)}px;
-                    min-width: 100px;
-                    min-height: 45px;
-                }}
-                QPushButton:hover {{
-                    background-color: #666;
-                }}
-                QPushButton:pressed {{
-                    background-color: #444;
-                }}
-                QPushButton:disabled {{
-                    background-color: #333;
-                    color: #666;
-                }}
-            """
-    
     def setup_signals(self):
         """设置信号连接"""
         # 播放控制
@@ -1263,6 +2137,11 @@ class MainWindow(QMainWindow):
         self.next_btn.clicked.connect(self.next_sentence)
         self.prev_btn.clicked.connect(self.previous_sentence)
         
+        # 句子复习
+        self.review_btn.clicked.connect(self.toggle_review_mode)
+        self.grade_again_btn.clicked.connect(lambda: self.grade_current_sentence(AGAIN))
+        self.grade_good_btn.clicked.connect(lambda: self.grade_current_sentence(GOOD))
+        
         # 界面切换
         self.playlist_btn.clicked.connect(self.show_playlist)
         self.playlist_back_btn.clicked.connect(self.show_play_interface)
@@ -1276,6 +2155,7 @@ class MainWindow(QMainWindow):
         
         # 复读完成信号
         self.vlc_player.repeat_completed.connect(self.on_repeat_completed)
+        self.vlc_player.repeat_progress.connect(self.on_repeat_progress)
         
         # 设置界面信号连接
         self.settings_font_size_spin.valueChanged.connect(self.update_settings_preview)
@@ -1284,12 +2164,34 @@ class MainWindow(QMainWindow):
         # 播放列表信号连接
         self.file_playlist_btn.clicked.connect(self.show_settings_interface)
         self.add_to_playlist_btn.clicked.connect(self.add_to_playlist)
+        self.add_course_btn.clicked.connect(self.add_course_to_playlist)
         self.remove_from_playlist_btn.clicked.connect(self.remove_from_playlist)
         self.clear_playlist_btn.clicked.connect(self.clear_playlist)
+        self.export_clips_btn.clicked.connect(self.export_playlist_clips)
+        self.align_subtitle_btn.clicked.connect(self.align_selected_subtitle)
+        self.secondary_subtitle_btn.clicked.connect(self.choose_secondary_subtitle)
+        self.search_sentences_btn.clicked.connect(self.show_search_dialog)
+        self.playlist_sort_combo.activated.connect(self.sort_playlist_by_stats)
+        self.playlist_max_rate_spin.valueChanged.connect(self.apply_playlist_filter)
         self.play_prev_file_btn.clicked.connect(self.play_prev_file)
         self.play_current_file_btn.clicked.connect(self.play_current_file)
         self.play_next_file_btn.clicked.connect(self.play_next_file)
         self.file_playlist_widget.itemSelectionChanged.connect(self.on_playlist_selection_changed)
+        self.playlist_widget.verticalScrollBar().valueChanged.connect(
+            lambda value: self.thumbnail_debouncer.request())
+        
+        # 性能统计快捷键
+        self.metrics_shortcut = QShortcut(QKeySequence("F12"), self)
+        self.metrics_shortcut.activated.connect(self.show_metrics_dialog)
+        
+        # 句子搜索快捷键
+        self.search_shortcut = QShortcut(QKeySequence("Ctrl+F"), self)
+        self.search_shortcut.activated.connect(self.show_search_dialog)
+    
+    def show_metrics_dialog(self):
+        """显示性能统计对话框"""
+        dialog = MetricsDialog(self)
+        dialog.exec_()
     
     
     def update_file_status(self):
@@ -1301,6 +2203,8 @@ class MainWindow(QMainWindow):
         self.play_pause_btn.setEnabled(has_video and has_subtitle)
         self.next_btn.setEnabled(has_video and has_subtitle)
         self.prev_btn.setEnabled(has_video and has_subtitle)
+        self.grade_again_btn.setEnabled(has_video and has_subtitle and self.review_scheduler is not None)
+        self.grade_good_btn.setEnabled(has_video and has_subtitle and self.review_scheduler is not None)
     
     def update_file_info_display(self):
         """更新文件信息显示"""
@@ -1313,6 +2217,9 @@ class MainWindow(QMainWindow):
             
             if has_subtitle:
                 subtitle_name = os.path.splitext(os.path.basename(self.current_subtitle_path))[0]
+                secondary_path = self.secondary_subtitle_path(self.current_subtitle_path)
+                if secondary_path:
+                    subtitle_name += " + " + os.path.splitext(os.path.basename(secondary_path))[0]
                 file_info = f"当前播放: {video_name} (字幕: {subtitle_name})"
             else:
                 file_info = f"当前播放: {video_name} (无字幕)"
@@ -1323,12 +2230,18 @@ class MainWindow(QMainWindow):
     
     def get_current_subtitle_parser(self):
         """获取当前字幕解析器"""
-        if self.current_subtitle_type == 'srt':
+        if self.current_subtitle_type:
             return self.subtitle_parser
-        elif self.current_subtitle_type == 'lrc':
-            return self.lrc_subtitle_parser
-        else:
-            return None
+        return None
+    
+    def load_subtitle_file(self, subtitle_path):
+        """按文件内容和扩展名识别格式并加载字幕，应用已保存的时间校正"""
+        if self.subtitle_parser.load(subtitle_path, self.subtitle_correction(subtitle_path)):
+            self.current_subtitle_type = self.subtitle_parser.format
+            print(f"字幕文件加载成功（{self.current_subtitle_type}），共 {self.subtitle_parser.get_total_count()} 句")
+            return True
+        self.current_subtitle_type = None
+        return False
     
     def start_playing_current_sentence(self, auto_play=True):
         """开始播放当前句子
@@ -1341,12 +2254,16 @@ class MainWindow(QMainWindow):
             
         current_sub = subtitle_parser.get_current_subtitle()
         if current_sub and self.current_media_path:
-            # 停止之前的循环
+            # 取消上一句尚未执行的延迟操作，并停止之前的循环
+            self.scheduler.new_generation(SCOPE_SENTENCE)
             self.vlc_player.stop_loop()
             
             # 重置复读计数
             self.vlc_player.reset_repeat_count()
             
+            # 当前句和下一句在后台解码到内存，供内存复读使用
+            self.prefetch_sentences()
+            
             # 根据参数决定是否设置循环播放
             if auto_play:
                 # 设置循环播放并开始播放
@@ -1368,13 +2285,28 @@ class MainWindow(QMainWindow):
                 self.vlc_player.pause()
                 self.play_pause_btn.setText("播放")
                 self.update_subtitle_display()
+            
+            self.publish_control_event('sentence', file_index=self.current_playlist_index,
+                                       sentence_index=subtitle_parser.current_index,
+                                       start_ms=current_sub['start'], end_ms=current_sub['end'],
+                                       text=current_sub['text'],
+                                       secondary_text=self.secondary_text(subtitle_parser.current_index),
+                                       playing=auto_play)
     
     def toggle_play_pause(self):
         """切换播放/暂停状态"""
+        # 连续切换句子后还没执行的跳转作废：暂停时不能再开始播放，开始播放时由下面直接播放当前句
+        self.navigation_debouncer.cancel()
         if self.vlc_player.is_playing:
+            metrics.cancel(METRIC_PLAY_TO_AUDIO)
+            # 暂停时放弃尚未执行的延迟播放操作
+            self.scheduler.new_generation(SCOPE_SENTENCE)
             self.vlc_player.pause()
             self.play_pause_btn.setText("播放")
         else:
+            # 记录从点击播放到出声的耗时
+            metrics.begin(METRIC_PLAY_TO_AUDIO)
+            
             # 在开始播放前，先设置循环播放区间
             subtitle_parser = self.get_current_subtitle_parser()
             if not subtitle_parser:
@@ -1385,20 +2317,26 @@ class MainWindow(QMainWindow):
                 # 强制从句子开始位置播放，因为我们知道已经定位到这里了
                 print(f"从定位位置 {current_sub['start']}ms 开始播放")
                 
-                # 先设置到句子开始位置
-                self.vlc_player.set_media_position(current_sub['start'])
+                # 以下延迟操作都属于当前句子，期间切换句子会使它们全部失效
+                self.scheduler.new_generation(SCOPE_SENTENCE)
+                start_ms, end_ms = current_sub['start'], current_sub['end']
                 
-                # 延迟一小段时间确保位置设置生效
-                QTimer.singleShot(100, lambda: self.vlc_player.set_media_position(current_sub['start']))
+                # 先设置到句子开始位置
+                self.vlc_player.set_media_position(start_ms)
                 
                 # 延迟后开始播放，但不设置循环播放
                 def start_playback():
                     if self.vlc_player.play():
                         self.play_pause_btn.setText("暂停")
-                        # 播放开始后设置循环播放，使用50毫秒延迟
-                        QTimer.singleShot(50, lambda: self.vlc_player.set_loop(current_sub['start'], current_sub['end']))
+                        # 播放开始后设置循环播放，使用50毫秒延迟；已经在句子内时不再重复跳转
+                        self.scheduler.call_later(50, set_loop, scope=SCOPE_SENTENCE)
+                
+                def set_loop():
+                    position = self.vlc_player.get_current_position()
+                    already_there = start_ms - 200 <= position < end_ms
+                    self.vlc_player.set_loop(start_ms, end_ms, seek=not already_there)
                 
-                QTimer.singleShot(150, start_playback)
+                self.scheduler.call_later(150, start_playback, scope=SCOPE_SENTENCE)
             else:
                 if self.vlc_player.play():
                     self.play_pause_btn.setText("暂停")
@@ -1411,7 +2349,7 @@ class MainWindow(QMainWindow):
             
         next_sub = subtitle_parser.next_subtitle()
         if next_sub:
-            self.start_playing_current_sentence()
+            self.request_sentence_playback()
         else:
             # 如果当前文件已经播放完所有句子，自动跳到播放列表的下一个文件
             if self.current_playlist_index >= 0 and self.current_playlist_index < len(self.playlist_items) - 1:
@@ -1426,7 +2364,39 @@ class MainWindow(QMainWindow):
             
         prev_sub = subtitle_parser.previous_subtitle()
         if prev_sub:
-            self.start_playing_current_sentence()
+            self.request_sentence_playback()
+    
+    def request_sentence_playback(self):
+        """请求播放当前句子
+        
+        进度显示立即更新。单独的一次点击立即跳转；紧接着的连续点击（间隔不超过 NAVIGATION_COALESCE_MS 毫秒）
+        合并，只在最后一次点击后对最后停留的句子跳转一次。因此一串连续点击共跳转两次（第一次点击和最后停留的句子），
+        而不是一次：换来单独一次点击不必等待。暂停或开始播放时放弃尚未执行的跳转。
+        """
+        metrics.increment('navigation_requests')
+        self.update_subtitle_display()
+        
+        # 旧句子的循环和复读间隔不再需要，避免等待期间再跳回旧句子
+        self.scheduler.new_generation(SCOPE_SENTENCE)
+        self.vlc_player.stop_loop()
+        
+        self.navigation_debouncer.request()
+    
+    def _commit_sentence_navigation(self):
+        """跳转到当前停留的句子（一轮连续导航的第一次点击，或连续点击结束后）"""
+        metrics.increment('navigation_seeks')
+        if self.navigation_debouncer.merged > 1:
+            print(f"合并了 {self.navigation_debouncer.merged} 次句子切换")
+        self.start_playing_current_sentence()
+    
+    def prefetch_sentences(self):
+        """请求把当前句和下一句解码到内存"""
+        subtitle_parser = self.get_current_subtitle_parser()
+        if not subtitle_parser:
+            return
+        index = subtitle_parser.current_index
+        self.vlc_player.prefetch_sentences([(sub['start'], sub['end'])
+                                            for sub in subtitle_parser.subtitles[index:index + 2]])
     
     def update_subtitle_display(self):
         """更新字幕显示"""
@@ -1440,9 +2410,26 @@ class MainWindow(QMainWindow):
             total = subtitle_parser.get_total_count()
             current = subtitle_parser.current_index + 1
             self.progress_label.setText(f"进度: {current}/{total}")
+        self.update_bilingual_display()
+        self.update_waveform_sentence()
     
     def update_status(self):
         """更新状态信息"""
+        # 后台统计完成后刷新播放列表
+        self.update_playlist_stats_display()
+        
+        # 后台提取的内嵌字幕
+        self.update_embedded_subtitles()
+        
+        # 后台生成的句子缩略图
+        self.update_sentence_thumbnails()
+        
+        # 后台分析的响度
+        self.update_loudness()
+        
+        # 后台生成的波形
+        self.update_waveform()
+        
         if self.vlc_player.is_playing:
             current_pos = self.vlc_player.get_current_position()
             subtitle_parser = self.get_current_subtitle_parser()
@@ -1464,8 +2451,12 @@ class MainWindow(QMainWindow):
         self.playlist_widget.clear()
         for i, sub in enumerate(subtitle_parser.subtitles):
             text = sub['text'][:50] + "..." if len(sub['text']) > 50 else sub['text']
+            secondary_text = self.secondary_text(i)
+            if secondary_text:
+                text += "\n" + (secondary_text[:50] + "..." if len(secondary_text) > 50 else secondary_text)
             item = QListWidgetItem(f"{i+1}. {text}")
             self.playlist_widget.addItem(item)
+        self.show_sentence_thumbnails(subtitle_parser)
         
         # 切换到播放列表界面
         self.stacked_widget.setCurrentIndex(1)
@@ -1501,164 +2492,76 @@ class MainWindow(QMainWindow):
     
     def on_repeat_completed(self):
         """处理复读完成信号"""
+        self.publish_control_event('repeat_completed', sentence_index=self.current_sentence_index())
+        # 复习模式下等待评分，评分后跳到下一句到期的句子
+        if self.review_mode:
+            return
         # 自动跳到下一句
         self.next_sentence()
     
+    def on_repeat_progress(self, current_repeat, repeat_count):
+        """每播完一遍当前句子"""
+        self.publish_control_event('repeat', sentence_index=self.current_sentence_index(),
+                                   repeat=current_repeat, repeat_count=repeat_count)
+    
     def update_font_settings(self):
         """更新所有UI元素的字体设置"""
         try:
             # 更新全局字体
-            font = QFont(self.font_family, self.font_size)
-            self.setFont(font)
-            
-            # 更新按钮样式
-            self.update_button_styles()
+            self.set_global_font()
             
-            # 更新进度信息字体
-            if hasattr(self, 'progress_label'):
-                self.progress_label.setStyleSheet(f"color: #ccc; font-family: {self.font_family}; font-size: {max(10, self.font_size - 4)}px;")
+            # 重新生成样式表，所有控件按objectName匹配，只触发一次样式计算
+            self.apply_theme()
             
-            # 更新标题字体
-            title_font = QFont(self.font_family, max(14, self.font_size), QFont.Bold)
-            # 遍历所有子控件找到标题标签
-            for child in self.findChildren(QLabel):
-                if child.text() == "冰狐精听复读播放器":
-                    child.setFont(title_font)
-                    break
-            
-            # 更新句子清单标题字体
-            for child in self.findChildren(QLabel):
-                if child.text() == "句子清单":
-                    child.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(14, self.font_size)}px; padding: 10px;")
-                    break
-            
-            # 更新设置界面的字体样式
-            self.update_settings_interface_fonts()
-            
-            # 更新播放列表项字体
-            if hasattr(self, 'playlist_widget'):
-                self.playlist_widget.setStyleSheet(f"""
-                    QListWidget {{
-                        background-color: #2a2a2a;
-                        color: white;
-                        border: 1px solid #555;
-                        border-radius: 5px;
-                        font-family: {self.font_family};
-                        font-size: {max(10, self.font_size - 4)}px;
-                    }}
-                    QListWidget::item {{
-                        padding: 8px;
-                        border-bottom: 1px solid #444;
-                    }}
-                    QListWidget::item:selected {{
-                        background-color: #42a2da;
-                    }}
-                """)
+            # 预览恢复为当前字体
+            if hasattr(self, 'settings_preview_label'):
+                self.settings_preview_label.setStyleSheet("")
+                self.settings_preview_label.setText(f"预览文字 - {self.font_family} {self.font_size}点")
                 
         except Exception as e:
             print(f"更新字体设置时出错: {e}")
     
-    def update_button_styles(self):
-        """更新所有按钮的字体大小"""
-        # 更新播放控制按钮
-        self.play_pause_btn.setStyleSheet(self.get_button_style(primary=True))
-        self.next_btn.setStyleSheet(self.get_button_style())
-        self.prev_btn.setStyleSheet(self.get_button_style())
-        
-        # 更新界面切换按钮
-        self.playlist_btn.setStyleSheet(self.get_button_style())
-        self.settings_back_btn.setStyleSheet(self.get_button_style())
-        self.playlist_back_btn.setStyleSheet(self.get_button_style())
-        self.software_settings_btn.setStyleSheet(self.get_button_style())
+    def get_default_config(self):
+        """获取默认配置"""
+        return {
+            'font_size': 16,
+            'font_family': "Arial",
+            'last_video_dir': "",
+            'last_srt_dir': "",
+            'repeat_interval': 0,
+            'repeat_count': 0,
+            'auto_next': False,
+            'last_video_path': "",
+            'last_srt_path': "",
+            'last_subtitle_index': 0,
+            'playlist_items': [],
+            'current_playlist_index': -1,
+            'media_cache_enabled': False,
+            'media_cache_size_mb': 2048,
+            'memory_repeat_enabled': False,
+            'engine_process_enabled': False,
+            'loudness_enabled': False
+        }
     
     def load_config(self):
         """加载配置文件"""
-        default_font_size = 16
-        default_font_family = "Arial"
-        default_repeat_interval = 0
-        default_repeat_count = 0
-        default_auto_next = False
+        default_config = self.get_default_config()
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
-                    font_size = config.get('font_size', default_font_size)
-                    font_family = config.get('font_family', default_font_family)
-                    last_video_dir = config.get('last_video_dir', "")
-                    last_srt_dir = config.get('last_srt_dir', "")
-                    repeat_interval = config.get('repeat_interval', default_repeat_interval)
-                    repeat_count = config.get('repeat_count', default_repeat_count)
-                    auto_next = config.get('auto_next', default_auto_next)
-                    last_video_path = config.get('last_video_path', "")
-                    last_srt_path = config.get('last_srt_path', "")
-                    last_subtitle_index = config.get('last_subtitle_index', 0)
-                    playlist_items = config.get('playlist_items', [])
-                    current_playlist_index = config.get('current_playlist_index', -1)
-                    
-                    print(f"从配置文件加载: video={last_video_path}, srt={last_srt_path}, index={last_subtitle_index}, playlist_items={len(playlist_items)}, current_playlist_index={current_playlist_index}")  # 调试信息
-                    
-                    # 确保字体大小在有效范围内
-                    if 8 <= font_size <= 48:
-                        return {
-                            'font_size': font_size,
-                            'font_family': font_family,
-                            'last_video_dir': last_video_dir,
-                            'last_srt_dir': last_srt_dir,
-                            'repeat_interval': repeat_interval,
-                            'repeat_count': repeat_count,
-                            'auto_next': auto_next,
-                            'last_video_path': last_video_path,
-                            'last_srt_path': last_srt_path,
-                            'last_subtitle_index': last_subtitle_index,
-                            'playlist_items': playlist_items,
-                            'current_playlist_index': current_playlist_index
-                        }
-                    else:
-                        return {
-                            'font_size': default_font_size,
-                            'font_family': default_font_family,
-                            'last_video_dir': "",
-                            'last_srt_dir': "",
-                            'repeat_interval': default_repeat_interval,
-                            'repeat_count': default_repeat_count,
-                            'auto_next': default_auto_next,
-                            'last_video_path': "",
-                            'last_srt_path': "",
-                            'last_subtitle_index': 0,
-                            'playlist_items': [],
-                            'current_playlist_index': -1
-                        }
-            else:
-                return {
-                    'font_size': default_font_size,
-                    'font_family': default_font_family,
-                    'last_video_dir': "",
-                    'last_srt_dir': "",
-                    'repeat_interval': default_repeat_interval,
-                    'repeat_count': default_repeat_count,
-                    'auto_next': default_auto_next,
-                    'last_video_path': "",
-                    'last_srt_path': "",
-                    'last_subtitle_index': 0,
-                    'playlist_items': [],
-                    'current_playlist_index': -1
-                }
+                
+                loaded_config = {key: config.get(key, default) for key, default in default_config.items()}
+                
+                print(f"从配置文件加载: video={loaded_config['last_video_path']}, srt={loaded_config['last_srt_path']}, index={loaded_config['last_subtitle_index']}, playlist_items={len(loaded_config['playlist_items'])}, current_playlist_index={loaded_config['current_playlist_index']}")  # 调试信息
+                
+                # 确保字体大小在有效范围内
+                if 8 <= loaded_config['font_size'] <= 48:
+                    return loaded_config
+            return default_config
         except Exception as e:
             print(f"加载配置文件失败: {e}")
-            return {
-                'font_size': default_font_size,
-                'font_family': default_font_family,
-                'last_video_dir': "",
-                'last_srt_dir': "",
-                'repeat_interval': default_repeat_interval,
-                'repeat_count': default_repeat_count,
-                'auto_next': default_auto_next,
-                'last_video_path': "",
-                'last_srt_path': "",
-                'last_subtitle_index': 0,
-                'playlist_items': [],
-                'current_playlist_index': -1
-            }
+            return default_config
     
     def save_config(self):
         """保存配置文件"""
@@ -1681,7 +2584,12 @@ class MainWindow(QMainWindow):
                 'last_srt_path': self.current_subtitle_path,
                 'last_subtitle_index': last_subtitle_index,
                 'playlist_items': self.playlist_items,
-                'current_playlist_index': self.current_playlist_index
+                'current_playlist_index': self.current_playlist_index,
+                'media_cache_enabled': self.media_cache_enabled,
+                'media_cache_size_mb': self.media_cache_size_mb,
+                'memory_repeat_enabled': self.memory_repeat_enabled,
+                'engine_process_enabled': self.engine_process_enabled,
+                'loudness_enabled': self.loudness_enabled
             }
             print(f"保存配置: {config}")  # 调试信息
             with open(self.config_file, 'w', encoding='utf-8') as f:
@@ -1693,6 +2601,54 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """窗口关闭事件 - 保存配置"""
         self.save_config()
+        
+        # 停止媒体缓存的后台线程
+        if self.media_cache:
+            self.media_cache.shutdown()
+        
+        # 停止内嵌字幕提取
+        if self.embedded_subtitles:
+            self.embedded_subtitles.shutdown()
+        
+        # 停止缩略图生成
+        if self.thumbnail_cache:
+            self.thumbnail_cache.shutdown()
+        
+        # 停止响度分析
+        if self.loudness_cache:
+            self.loudness_cache.shutdown()
+        
+        # 停止波形生成，关闭映射的波形文件
+        if self.waveform_cache:
+            self.waveform_cache.shutdown()
+        if self.waveform_task is not None:
+            self.waveform_task.cancel()
+        pyramid = self.waveform_view.set_pyramid(None)
+        if pyramid is not None:
+            pyramid.close()
+        
+        # 停止课程清单生成
+        self.manifest_builder.shutdown()
+        
+        # 停止控制接口
+        if self.control_server:
+            self.control_server.close()
+        
+        # 停止状态更新，释放VLC实例、播放器和媒体，停止句子解码线程和独立进程播放引擎
+        if self.vlc_player:
+            if self.status_task is not None:
+                self.status_task.cancel()
+            self.vlc_player.shutdown()
+        
+        # 设置了环境变量时自动导出性能统计
+        metrics_file = os.environ.get('PLAYER_METRICS_FILE')
+        if metrics_file:
+            try:
+                metrics.export_json(metrics_file)
+                print(f"性能统计已导出: {metrics_file}")
+            except Exception as e:
+                print(f"导出性能统计失败: {e}")
+        
         event.accept()
     
     def restore_last_session(self):
@@ -1720,28 +2676,14 @@ class MainWindow(QMainWindow):
                 if self.vlc_player.load_media(self.last_video_path):
                     print("媒体文件加载成功")
                     self.player_widget.attach_vlc()
+                    self.show_waveform(self.last_video_path)
                     
-                    # 根据文件扩展名确定字幕类型并加载
-                    file_ext = os.path.splitext(self.last_srt_path)[1].lower()
-                    subtitle_loaded = False
-                    
-                    if file_ext == '.srt':
-                        self.current_subtitle_type = 'srt'
-                        if self.subtitle_parser.load_srt(self.last_srt_path):
-                            print(f"SRT字幕文件加载成功，共 {len(self.subtitle_parser.subtitles)} 句")
-                            subtitle_loaded = True
-                        else:
-                            print("SRT字幕文件加载失败")
-                    
-                    elif file_ext == '.lrc':
-                        self.current_subtitle_type = 'lrc'
-                        if self.lrc_subtitle_parser.load_lrc(self.last_srt_path):
-                            print(f"LRC字幕文件加载成功，共 {len(self.lrc_subtitle_parser.subtitles)} 句")
-                            subtitle_loaded = True
-                        else:
-                            print("LRC字幕文件加载失败")
+                    # 后台缓存当前和下一个文件
+                    if 0 <= self.current_playlist_index < len(self.playlist_items):
+                        self.prefetch_playlist_media(self.current_playlist_index)
                     
-                    if subtitle_loaded:
+                    # 识别字幕格式并加载
+                    if self.load_subtitle_file(self.last_srt_path):
                         # 获取当前字幕解析器
                         subtitle_parser = self.get_current_subtitle_parser()
                         if subtitle_parser:
@@ -1750,6 +2692,9 @@ class MainWindow(QMainWindow):
                                 subtitle_parser.current_index = self.last_subtitle_index
                                 print(f"设置播放进度为第 {subtitle_parser.current_index + 1} 句")
                             
+                            # 第二字幕
+                            self.load_secondary_track()
+                            
                             # 更新文件状态
                             self.update_file_status()
                             
@@ -1788,38 +2733,13 @@ class MainWindow(QMainWindow):
         self.playlist_btn.setVisible(True)
         self.playlist_back_btn.setVisible(False)
     
-    def update_settings_interface_fonts(self):
-        """更新设置界面的字体样式"""
-        try:
-            # 更新设置界面的字体控件
-            if hasattr(self, 'settings_font_family_combo'):
-                self.settings_font_family_combo.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
-            
-            if hasattr(self, 'settings_font_size_spin'):
-                self.settings_font_size_spin.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
-            
-            if hasattr(self, 'settings_preview_label'):
-                self.settings_preview_label.setStyleSheet(f"font-family: {self.font_family}; font-size: {self.font_size}px; padding: 10px; background-color: #333; border-radius: 5px; color: white;")
-            
-            # 更新复读设置控件
-            if hasattr(self, 'settings_repeat_interval_spin'):
-                self.settings_repeat_interval_spin.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
-            
-            if hasattr(self, 'settings_repeat_count_spin'):
-                self.settings_repeat_count_spin.setStyleSheet(f"color: white; background-color: #333; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px; min-height: 30px;")
-            
-            if hasattr(self, 'settings_auto_next_checkbox'):
-                self.settings_auto_next_checkbox.setStyleSheet(f"color: white; font-family: {self.font_family}; font-size: {max(12, self.font_size)}px;")
-            
-        except Exception as e:
-            print(f"更新设置界面字体时出错: {e}")
-    
     def update_settings_preview(self):
         """更新设置界面的预览"""
         font_family = self.settings_font_family_combo.currentFont().family()
         font_size = self.settings_font_size_spin.value()
         self.settings_preview_label.setText(f"预览文字 - {font_family} {font_size}点")
-        self.settings_preview_label.setStyleSheet(f"font-family: {font_family}; font-size: {font_size}px; padding: 10px; background-color: #333; border-radius: 5px;")
+        # 只覆盖预览标签自己的字体，其余样式仍来自主题
+        self.settings_preview_label.setStyleSheet(f'font-family: "{font_family}"; font-size: {font_size}px;')
     
     def apply_settings(self):
         """应用设置"""
@@ -1829,6 +2749,11 @@ class MainWindow(QMainWindow):
         new_repeat_interval = self.settings_repeat_interval_spin.value()
         new_repeat_count = self.settings_repeat_count_spin.value()
         new_auto_next = self.settings_auto_next_checkbox.isChecked()
+        new_memory_repeat_enabled = self.settings_memory_repeat_checkbox.isChecked()
+        new_engine_process_enabled = self.settings_engine_process_checkbox.isChecked()
+        new_loudness_enabled = self.settings_loudness_checkbox.isChecked()
+        new_media_cache_enabled = self.settings_media_cache_checkbox.isChecked()
+        new_media_cache_size_mb = self.settings_media_cache_size_spin.value()
         
         # 更新设置
         self.font_size = new_font_size
@@ -1836,9 +2761,19 @@ class MainWindow(QMainWindow):
         self.repeat_interval = new_repeat_interval
         self.repeat_count = new_repeat_count
         self.auto_next = new_auto_next
+        self.memory_repeat_enabled = new_memory_repeat_enabled
+        self.engine_process_enabled = new_engine_process_enabled
+        self.loudness_enabled = new_loudness_enabled
+        self.media_cache_enabled = new_media_cache_enabled
+        self.media_cache_size_mb = new_media_cache_size_mb
         
         # 应用复读设置到播放器
         self.vlc_player.set_repeat_settings(self.repeat_count, self.repeat_interval, self.auto_next)
+        self.vlc_player.set_sentence_buffer_enabled(self.memory_repeat_enabled)
+        self.setup_loudness()
+        
+        # 应用媒体缓存设置
+        self.setup_media_cache()
         
         # 更新字体设置
         self.update_font_settings()
@@ -1855,10 +2790,9 @@ class MainWindow(QMainWindow):
         video_name = os.path.splitext(os.path.basename(video_path))[0]
         
         # 查找可能的字幕文件
-        subtitle_extensions = ['.srt', '.lrc']
         found_subtitle = None
         
-        for ext in subtitle_extensions:
+        for ext in subtitle_extensions():
             subtitle_path = os.path.join(video_dir, video_name + ext)
             if os.path.exists(subtitle_path):
                 found_subtitle = subtitle_path
@@ -1866,7 +2800,7 @@ class MainWindow(QMainWindow):
         
         # 如果没找到完全匹配的文件名，查找目录中所有字幕文件
         if not found_subtitle:
-            for ext in subtitle_extensions:
+            for ext in subtitle_extensions():
                 for file in os.listdir(video_dir):
                     if file.lower().endswith(ext):
                         found_subtitle = os.path.join(video_dir, file)
@@ -1879,29 +2813,14 @@ class MainWindow(QMainWindow):
             # 自动加载字幕文件
             self.current_subtitle_path = found_subtitle
             
-            # 根据文件扩展名确定字幕类型
-            file_ext = os.path.splitext(found_subtitle)[1].lower()
-            if file_ext == '.srt':
-                self.current_subtitle_type = 'srt'
-                # 保存上次选择的目录
-                self.last_srt_dir = os.path.dirname(found_subtitle)
-                
-                if self.subtitle_parser.load_srt(found_subtitle):
-                    self.update_file_status()
-                    print("自动加载SRT字幕文件成功")
-                else:
-                    print("自动加载SRT字幕文件失败")
+            # 保存上次选择的目录
+            self.last_srt_dir = os.path.dirname(found_subtitle)
             
-            elif file_ext == '.lrc':
-                self.current_subtitle_type = 'lrc'
-                # 保存上次选择的目录
-                self.last_srt_dir = os.path.dirname(found_subtitle)
-                
-                if self.lrc_subtitle_parser.load_lrc(found_subtitle):
-                    self.update_file_status()
-                    print("自动加载LRC字幕文件成功")
-                else:
-                    print("自动加载LRC字幕文件失败")
+            if self.load_subtitle_file(found_subtitle):
+                self.update_file_status()
+                print("自动加载字幕文件成功")
+            else:
+                print("自动加载字幕文件失败")
         else:
             print("未找到匹配的字幕文件")
 
@@ -1913,38 +2832,100 @@ class MainWindow(QMainWindow):
         )
         
         if file_paths:
-            for file_path in file_paths:
-                # 检查文件是否已经在播放列表中
-                if any(item['video_path'] == file_path for item in self.playlist_items):
-                    continue
-                
-                # 查找对应的字幕文件
-                subtitle_path = self.find_subtitle_for_video(file_path)
-                
-                # 添加到播放列表项
-                playlist_item = {
-                    'video_path': file_path,
-                    'subtitle_path': subtitle_path,
-                    'video_name': os.path.splitext(os.path.basename(file_path))[0]
-                }
-                self.playlist_items.append(playlist_item)
-                
-                # 添加到播放列表显示
-                display_text = playlist_item['video_name']
-                if subtitle_path:
-                    subtitle_name = os.path.splitext(os.path.basename(subtitle_path))[0]
-                    display_text += f" (字幕: {subtitle_name})"
-                else:
-                    display_text += " (无字幕)"
-                
-                self.file_playlist_widget.addItem(display_text)
+            self.add_files_to_playlist(file_paths)
+    
+    def add_course_to_playlist(self):
+        """把整个课程目录添加到播放列表"""
+        directory = QFileDialog.getExistingDirectory(self, "选择课程目录", self.last_video_dir)
+        if directory:
+            self.add_course_directory(directory)
+    
+    def add_course_directory(self, directory):
+        """按自然顺序把课程目录中的所有课加入播放列表
+
+        有最新的课程清单时只读清单文件，不再逐个查找字幕；没有清单或目录内容已经变化时
+        扫描目录加入，并在后台生成清单供下次使用。
+        """
+        directory = os.path.normpath(directory)
+        manifest = course_manifest.load_manifest(directory, MEDIA_EXTENSIONS)
+        if manifest is None:
+            file_paths = course_manifest.media_files(directory, MEDIA_EXTENSIONS)
+            if not file_paths:
+                QMessageBox.information(self, "提示", "该目录中没有视频或音频文件")
+                return
+            self.add_files_to_playlist(file_paths)
+            self.manifest_builder.request(directory)
+            return
+        
+        print(f"使用课程清单: {directory}（{len(manifest['lessons'])} 课）")
+        playlist_items = []
+        for playlist_item in course_manifest.playlist_items(directory, manifest):
+            if not playlist_item['subtitle_path']:
+                embedded_path = self.embedded_subtitle_path(playlist_item['video_path'])
+                if embedded_path:
+                    playlist_item['subtitle_path'] = embedded_path
+                    playlist_item['embedded_subtitle'] = True
+            playlist_items.append(playlist_item)
+        self.add_playlist_items(playlist_items)
+    
+    def add_files_to_playlist(self, file_paths):
+        """将指定的文件添加到播放列表"""
+        playlist_items = []
+        secondary_indexes = {}
+        # 已经在播放列表中（或本次重复给出）的文件不再查找字幕
+        seen = set(item['video_path'] for item in self.playlist_items)
+        for file_path in file_paths:
+            if file_path in seen:
+                continue
+            seen.add(file_path)
             
-            # 更新按钮状态
-            self.update_playlist_buttons()
+            # 查找对应的字幕文件，没有外挂字幕时使用已经提取过的内嵌字幕
+            subtitle_path = self.find_subtitle_for_video(file_path)
+            embedded_path = None if subtitle_path else self.embedded_subtitle_path(file_path)
             
-            # 保存上次选择的目录
-            if file_paths:
-                self.last_video_dir = os.path.dirname(file_paths[0])
+            # 查找同名的第二字幕（如 lesson1.zh.srt），每个目录只扫描一次
+            video_dir = os.path.dirname(file_path)
+            if video_dir not in secondary_indexes:
+                secondary_indexes[video_dir] = secondary_subtitle_index(video_dir)
+            secondary_path = find_secondary_subtitle(file_path, subtitle_path, secondary_indexes[video_dir])
+            
+            # 添加到播放列表项
+            playlist_item = {
+                'video_path': file_path,
+                'subtitle_path': subtitle_path or embedded_path,
+                'secondary_subtitle_path': secondary_path,
+                'video_name': os.path.splitext(os.path.basename(file_path))[0]
+            }
+            if embedded_path:
+                playlist_item['embedded_subtitle'] = True
+            playlist_items.append(playlist_item)
+        
+        self.add_playlist_items(playlist_items)
+    
+    def add_playlist_items(self, playlist_items):
+        """把已经找好字幕的播放列表项加入播放列表，跳过已经在播放列表中的文件"""
+        existing = set(item['video_path'] for item in self.playlist_items)
+        for playlist_item in playlist_items:
+            if playlist_item['video_path'] in existing:
+                continue
+            existing.add(playlist_item['video_path'])
+            self.playlist_items.append(playlist_item)
+            
+            # 添加到播放列表显示
+            self.file_playlist_widget.addItem(self.playlist_display_text(playlist_item))
+        
+        # 更新按钮状态
+        self.update_playlist_buttons()
+        
+        # 索引新加入文件的字幕
+        self.refresh_library_index()
+        
+        # 在后台提取没有字幕的视频中的内嵌字幕
+        self.extract_embedded_subtitles()
+        
+        # 保存上次选择的目录
+        if playlist_items:
+            self.last_video_dir = os.path.dirname(playlist_items[0]['video_path'])
 
     def find_subtitle_for_video(self, video_path):
         """为视频文件查找对应的字幕文件"""
@@ -1952,15 +2933,13 @@ class MainWindow(QMainWindow):
         video_name = os.path.splitext(os.path.basename(video_path))[0]
         
         # 查找可能的字幕文件
-        subtitle_extensions = ['.srt', '.lrc']
-        
-        for ext in subtitle_extensions:
+        for ext in subtitle_extensions():
             subtitle_path = os.path.join(video_dir, video_name + ext)
             if os.path.exists(subtitle_path):
                 return subtitle_path
         
         # 如果没找到完全匹配的文件名，查找目录中所有字幕文件
-        for ext in subtitle_extensions:
+        for ext in subtitle_extensions():
             for file in os.listdir(video_dir):
                 if file.lower().endswith(ext):
                     return os.path.join(video_dir, file)
@@ -1984,6 +2963,7 @@ class MainWindow(QMainWindow):
             
             # 更新按钮状态
             self.update_playlist_buttons()
+            self.refresh_library_index()
 
     def clear_playlist(self):
         """清空播放列表"""
@@ -2000,6 +2980,7 @@ class MainWindow(QMainWindow):
                 self.file_playlist_widget.clear()
                 self.current_playlist_index = -1
                 self.update_playlist_buttons()
+                self.refresh_library_index()
 
     def play_prev_file(self):
         """播放上一个文件"""
@@ -2021,59 +3002,1025 @@ class MainWindow(QMainWindow):
             # 自动播放下一个文件
             self.load_playlist_file(self.current_playlist_index, auto_play=True)
 
-    def load_playlist_file(self, index, auto_play=True):
+    def load_playlist_file(self, index, auto_play=True, start_index=None):
         """加载播放列表中的指定文件
         Args:
             index: 播放列表索引
             auto_play: 是否自动开始播放
+            start_index: 从第几句开始（从0开始），None表示从第一句开始
         """
         if 0 <= index < len(self.playlist_items):
-            playlist_item = self.playlist_items[index]
+            # 取消上一个文件尚未执行的延迟操作
+            self.scheduler.new_generation(SCOPE_FILE)
+            with metrics.span(METRIC_FILE_SWITCH):
+                self._load_playlist_item(index, auto_play, start_index)
+    
+    def _load_playlist_item(self, index, auto_play, start_index=None):
+        """加载播放列表项（由load_playlist_file调用并计时）"""
+        playlist_item = self.playlist_items[index]
+        
+        # 设置当前文件路径
+        self.current_media_path = playlist_item['video_path']
+        self.current_subtitle_path = playlist_item['subtitle_path']
+        
+        # 更新文件信息显示
+        self.update_file_info_display()
+        
+        # 更新按钮文字显示文件名（这些按钮已被移除，不再需要更新）
+        print(f"加载播放列表文件: 视频={playlist_item['video_name']}, 字幕={playlist_item['subtitle_path']}")
+        
+        # 加载媒体文件
+        if self.vlc_player.load_media(playlist_item['video_path']):
+            self.player_widget.attach_vlc()
+            self.show_waveform(playlist_item['video_path'])
             
-            # 设置当前文件路径
-            self.current_media_path = playlist_item['video_path']
-            self.current_subtitle_path = playlist_item['subtitle_path']
+            # 后台缓存当前和下一个文件
+            self.prefetch_playlist_media(index)
+            self.prefetch_loudness(index)
             
-            # 更新文件信息显示
-            self.update_file_info_display()
+            # 如果有字幕文件，加载字幕
+            if playlist_item['subtitle_path']:
+                if self.load_subtitle_file(playlist_item['subtitle_path']):
+                    self.set_start_sentence(self.subtitle_parser, start_index)
+                    self.load_secondary_track()
+                    self.update_file_status()
+                    # 根据参数决定是否自动播放
+                    self.start_playing_current_sentence(auto_play=auto_play)
+                else:
+                    self.load_secondary_track()
+                    self.update_file_status()
+                    QMessageBox.warning(self, "加载失败", "无法加载字幕文件")
+            else:
+                # 没有字幕文件，清空字幕解析器
+                self.current_subtitle_type = None
+                self.load_secondary_track()
+                self.update_file_status()
             
-            # 更新按钮文字显示文件名（这些按钮已被移除，不再需要更新）
-            print(f"加载播放列表文件: 视频={playlist_item['video_name']}, 字幕={playlist_item['subtitle_path']}")
+            # 切换到播放界面
+            self.show_play_interface()
             
-            # 加载媒体文件
-            if self.vlc_player.load_media(playlist_item['video_path']):
-                self.player_widget.attach_vlc()
-                
-                # 如果有字幕文件，加载字幕
-                if playlist_item['subtitle_path']:
-                    file_ext = os.path.splitext(playlist_item['subtitle_path'])[1].lower()
-                    if file_ext == '.srt':
-                        self.current_subtitle_type = 'srt'
-                        if self.subtitle_parser.load_srt(playlist_item['subtitle_path']):
-                            self.update_file_status()
-                            # 根据参数决定是否自动播放
-                            self.start_playing_current_sentence(auto_play=auto_play)
-                        else:
-                            QMessageBox.warning(self, "加载失败", "无法加载SRT字幕文件")
-                    elif file_ext == '.lrc':
-                        self.current_subtitle_type = 'lrc'
-                        if self.lrc_subtitle_parser.load_lrc(playlist_item['subtitle_path']):
-                            self.update_file_status()
-                            # 根据参数决定是否自动播放
-                            self.start_playing_current_sentence(auto_play=auto_play)
-                        else:
-                            QMessageBox.warning(self, "加载失败", "无法加载LRC字幕文件")
-                else:
-                    # 没有字幕文件，清空字幕解析器
-                    self.current_subtitle_type = None
+            # 更新播放列表选中项
+            self.file_playlist_widget.setCurrentRow(index)
+            
+            subtitle_parser = self.get_current_subtitle_parser()
+            self.publish_control_event('file', file_index=index, media_path=playlist_item['video_path'],
+                                       subtitle_path=playlist_item['subtitle_path'],
+                                       sentence_count=subtitle_parser.get_total_count() if subtitle_parser else 0)
+
+    def set_start_sentence(self, subtitle_parser, start_index):
+        """把刚加载的字幕定位到指定句子"""
+        if start_index is not None and 0 <= start_index < subtitle_parser.get_total_count():
+            subtitle_parser.current_index = start_index
+    
+    def jump_to_sentence(self, subtitle_path, cue_index):
+        """跳转到播放列表中某个字幕文件的指定句子并开始播放"""
+        index = next((i for i, item in enumerate(self.playlist_items)
+                      if item.get('subtitle_path') == subtitle_path), -1)
+        if index < 0:
+            QMessageBox.warning(self, "无法跳转", "该字幕文件已不在播放列表中")
+            return
+        
+        subtitle_parser = self.get_current_subtitle_parser()
+        if index == self.current_playlist_index and subtitle_path == self.current_subtitle_path and subtitle_parser:
+            # 当前文件内跳转，不需要重新加载
+            self.set_start_sentence(subtitle_parser, cue_index)
+            self.show_play_interface()
+            self.start_playing_current_sentence()
+        else:
+            self.current_playlist_index = index
+            self.load_playlist_file(index, auto_play=True, start_index=cue_index)
+            self.update_playlist_buttons()
+    
+    def setup_subtitle_alignment(self):
+        """加载自动对齐得到的字幕时间校正"""
+        config_dir = os.path.dirname(os.path.abspath(self.config_file))
+        try:
+            self.alignment_store = AlignmentStore(os.path.join(config_dir, ALIGNMENT_FILE_NAME))
+        except Exception as e:
+            print(f"加载字幕校正失败: {e}")
+            self.alignment_store = None
+    
+    def subtitle_correction(self, subtitle_path):
+        """获取字幕文件的时间校正，没有时返回None"""
+        alignment_store = getattr(self, 'alignment_store', None)
+        if not alignment_store or not subtitle_path:
+            return None
+        return alignment_store.get(subtitle_path)
+    
+    def align_selected_subtitle(self):
+        """自动对齐播放列表中选中文件的字幕"""
+        index = self.file_playlist_widget.currentRow()
+        if not (0 <= index < len(self.playlist_items)) or not self.alignment_store:
+            return
+        playlist_item = self.playlist_items[index]
+        subtitle_path = playlist_item.get('subtitle_path')
+        if not subtitle_path or not os.path.exists(subtitle_path):
+            QMessageBox.information(self, "自动对齐字幕", "该文件没有字幕")
+            return
+        if not subtitle_align.is_available():
+            QMessageBox.warning(self, "自动对齐字幕", "自动对齐需要安装numpy：pip install numpy")
+            return
+        
+        existing = self.alignment_store.get(subtitle_path)
+        if existing:
+            box = QMessageBox(QMessageBox.Question, "自动对齐字幕",
+                              f"该字幕已有校正（{existing.describe()}）", parent=self)
+            realign_button = box.addButton("重新对齐", QMessageBox.AcceptRole)
+            clear_button = box.addButton("清除校正", QMessageBox.DestructiveRole)
+            box.addButton("取消", QMessageBox.RejectRole)
+            box.exec_()
+            if box.clickedButton() == clear_button:
+                self.alignment_store.remove(subtitle_path)
+                self.reload_aligned_subtitle(index)
+                return
+            if box.clickedButton() != realign_button:
+                return
+        
+        # 总是对原始字幕时间做对齐
+        subtitles = load_subtitle_cues(subtitle_path)
+        if not subtitles:
+            QMessageBox.warning(self, "自动对齐字幕", "无法解析字幕文件")
+            return
+        
+        dialog = SubtitleAlignDialog(playlist_item['video_path'], subtitles, self)
+        dialog.exec_()
+        result = dialog.alignment_result
+        if dialog.cancelled:
+            return
+        if result is None:
+            QMessageBox.warning(self, "自动对齐字幕", "无法解码媒体文件的音频")
+            return
+        if not result.reliable:
+            QMessageBox.information(self, "自动对齐字幕",
+                                    f"没有找到可靠的对齐结果（相关系数 {result.score:.2f}），字幕保持不变")
+            return
+        if result.is_identity(subtitles[-1]['end']):
+            QMessageBox.information(self, "自动对齐字幕", "字幕与音频已经对齐，不需要校正")
+            if existing:
+                self.alignment_store.remove(subtitle_path)
+                self.reload_aligned_subtitle(index)
+            return
+        reply = QMessageBox.question(self, "自动对齐字幕",
+                                     f"检测到 {result.correction.describe()}（相关系数 {result.score:.2f}），"
+                                     f"是否应用校正？",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            self.alignment_store.set(subtitle_path, result.correction)
+            self.reload_aligned_subtitle(index)
+    
+    def reload_aligned_subtitle(self, index):
+        """字幕校正变化后，如果是正在播放的文件则按新的时间重新解析字幕，保持当前句子"""
+        self.reload_current_subtitle(self.playlist_items[index].get('subtitle_path'))
+    
+    def reload_current_subtitle(self, subtitle_path):
+        """如果是正在播放的字幕文件则重新解析，保持当前句子（句子数变少时回到第一句）"""
+        if not subtitle_path or subtitle_path != self.current_subtitle_path or not self.current_media_path:
+            return
+        subtitle_parser = self.get_current_subtitle_parser()
+        current_index = subtitle_parser.current_index if subtitle_parser else 0
+        if self.load_subtitle_file(subtitle_path):
+            self.set_start_sentence(self.subtitle_parser, current_index)
+        self.load_secondary_track()
+        self.update_file_status()
+    
+    def secondary_subtitle_path(self, subtitle_path):
+        """播放列表中该主字幕对应的第二字幕，没有时返回None"""
+        if not subtitle_path:
+            return None
+        for playlist_item in self.playlist_items:
+            if playlist_item.get('subtitle_path') == subtitle_path:
+                return playlist_item.get('secondary_subtitle_path')
+        return None
+    
+    def load_secondary_cues(self, subtitle_path):
+        """解析第二字幕；第二字幕自己没有校正时沿用主字幕的校正（两者通常来自同一时间轴）"""
+        correction = self.subtitle_correction(subtitle_path)
+        if correction is None:
+            correction = self.subtitle_correction(self.current_subtitle_path)
+        return load_subtitle_cues(subtitle_path, correction)
+    
+    def load_secondary_track(self):
+        """加载当前文件的第二字幕并与主字幕逐句对照，句子和循环边界仍由主字幕决定"""
+        self.secondary_texts = None
+        subtitle_parser = self.get_current_subtitle_parser()
+        secondary_path = self.secondary_subtitle_path(self.current_subtitle_path)
+        if subtitle_parser and secondary_path and os.path.exists(secondary_path):
+            corrections = tuple((c.offset_ms, c.scale) if c else None for c in
+                                (self.subtitle_correction(self.current_subtitle_path),
+                                 self.subtitle_correction(secondary_path)))
+            try:
+                self.secondary_texts = self.secondary_tracks.get(self.current_subtitle_path, subtitle_parser.subtitles,
+                                                                 secondary_path, corrections)
+            except Exception as e:
+                print(f"加载第二字幕失败: {e}")
+            if self.secondary_texts is None:
+                print(f"无法加载第二字幕: {secondary_path}")
+        self.update_bilingual_display()
+    
+    def secondary_text(self, index):
+        """当前文件第index句的第二字幕"""
+        if self.secondary_texts and 0 <= index < len(self.secondary_texts):
+            return self.secondary_texts[index]
+        return ""
+    
+    def update_bilingual_display(self):
+        """在视频下方显示当前句的原文和第二字幕"""
+        subtitle_parser = self.get_current_subtitle_parser()
+        current_sub = subtitle_parser.get_current_subtitle() if subtitle_parser else None
+        if not self.secondary_texts or not current_sub:
+            self.bilingual_label.setVisible(False)
+            return
+        secondary_text = self.secondary_text(subtitle_parser.current_index)
+        text = current_sub['text'].replace('\n', ' ')
+        if secondary_text:
+            text += "\n" + secondary_text
+        self.bilingual_label.setText(text)
+        self.bilingual_label.setVisible(True)
+    
+    def choose_secondary_subtitle(self):
+        """为播放列表中选中的文件选择或移除第二字幕"""
+        index = self.file_playlist_widget.currentRow()
+        if not (0 <= index < len(self.playlist_items)):
+            return
+        playlist_item = self.playlist_items[index]
+        if not playlist_item.get('subtitle_path'):
+            QMessageBox.information(self, "第二字幕", "请先为该文件添加主字幕")
+            return
+        
+        start_dir = os.path.dirname(playlist_item['subtitle_path'])
+        secondary_path, _ = QFileDialog.getOpenFileName(self, "选择第二字幕（如中文字幕）", start_dir,
+                                                        subtitle_file_filter())
+        if not secondary_path:
+            if not playlist_item.get('secondary_subtitle_path'):
+                return
+            reply = QMessageBox.question(self, "第二字幕", "是否移除该文件的第二字幕？",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+            secondary_path = None
+        
+        playlist_item['secondary_subtitle_path'] = secondary_path
+        self.file_playlist_widget.item(index).setText(self.playlist_display_text(playlist_item))
+        if playlist_item['subtitle_path'] == self.current_subtitle_path:
+            self.load_secondary_track()
+            self.update_file_info_display()
+    
+    def setup_embedded_subtitles(self):
+        """创建内嵌字幕缓存，并在后台提取播放列表中没有字幕的视频的内嵌字幕"""
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), EMBEDDED_DIR_NAME)
+        try:
+            self.embedded_subtitles = EmbeddedSubtitleCache(cache_dir)
+        except Exception as e:
+            print(f"创建内嵌字幕缓存失败: {e}")
+            self.embedded_subtitles = None
+        self.extract_embedded_subtitles()
+
+    def embedded_subtitle_path(self, video_path):
+        """已经提取过的内嵌字幕路径，没有提取或视频没有文字字幕时返回None"""
+        if not self.embedded_subtitles:
+            return None
+        return self.embedded_subtitles.lookup(video_path)[1]
+
+    def extract_embedded_subtitles(self):
+        """在后台提取没有字幕的视频的内嵌字幕，视频文件变化后重新提取"""
+        if not self.embedded_subtitles:
+            return
+        media_paths = []
+        for playlist_item in self.playlist_items:
+            if playlist_item.get('embedded_subtitle'):
+                if self.embedded_subtitle_path(playlist_item['video_path']) == playlist_item.get('subtitle_path'):
+                    continue
+            elif playlist_item.get('subtitle_path'):
+                continue
+            media_paths.append(playlist_item['video_path'])
+        self.embedded_subtitles.extract_in_background(media_paths)
+
+    def update_embedded_subtitles(self):
+        """后台提取完成后把内嵌字幕设置到播放列表，正在播放的视频没有字幕时直接加载"""
+        if not self.embedded_subtitles or self.embedded_subtitles.version == self.embedded_subtitles_version:
+            return
+        self.embedded_subtitles_version = self.embedded_subtitles.version
+        results = self.embedded_subtitles.take_results()
+        changed = False
+        for row, playlist_item in enumerate(self.playlist_items):
+            if playlist_item['video_path'] not in results:
+                continue
+            subtitle_path = results[playlist_item['video_path']]
+            if playlist_item.get('embedded_subtitle'):
+                if subtitle_path is None and not os.path.exists(playlist_item['video_path']):
+                    # 视频所在的设备没有连接，保留原来的字幕
+                    continue
+            elif playlist_item.get('subtitle_path') or subtitle_path is None:
+                continue
+            playlist_item['subtitle_path'] = subtitle_path
+            playlist_item['embedded_subtitle'] = subtitle_path is not None
+            if row < self.file_playlist_widget.count():
+                self.file_playlist_widget.item(row).setText(self.playlist_display_text(playlist_item))
+            changed = True
+
+            if (subtitle_path and playlist_item['video_path'] == self.current_media_path and
+                    not self.current_subtitle_type):
+                self.current_subtitle_path = subtitle_path
+                if self.load_subtitle_file(subtitle_path):
+                    self.load_secondary_track()
                     self.update_file_status()
-                
-                # 切换到播放界面
-                self.show_play_interface()
-                
-                # 更新播放列表选中项
-                self.file_playlist_widget.setCurrentRow(index)
+                    self.update_file_info_display()
+                    self.update_subtitle_display()
+        if changed:
+            self.refresh_library_index()
+
+    def setup_thumbnail_cache(self):
+        """创建句子缩略图缓存"""
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), THUMBNAIL_DIR_NAME)
+        try:
+            self.thumbnail_cache = ThumbnailCache(cache_dir, encode_thumbnail_jpeg)
+        except Exception as e:
+            print(f"创建缩略图缓存失败: {e}")
+            self.thumbnail_cache = None
+        self.thumbnail_debouncer = Debouncer(self.scheduler, THUMBNAIL_SCROLL_DELAY_MS, self.load_visible_thumbnails)
+        height = int(THUMBNAIL_WIDTH * DEFAULT_ASPECT)
+        placeholder = QPixmap(THUMBNAIL_WIDTH, height)
+        placeholder.fill(Qt.transparent)
+        self.thumbnail_placeholder = QIcon(placeholder)
+
+    def show_sentence_thumbnails(self, subtitle_parser):
+        """视频课程的句子清单每行显示句子开始位置的缩略图，缺少的在后台生成
+
+        所有行先使用同一个占位图（行高一致），只有可见行加载真正的图片。
+        """
+        self.thumbnail_rows = set()
+        self.thumbnail_pack = None
+        self.thumbnail_starts = None
+        self.thumbnail_media_path = self.current_media_path
+        if not self.thumbnail_cache or not is_video_file(self.current_media_path) or not len(subtitle_parser.subtitles):
+            self.playlist_widget.setIconSize(QSize())
+            return
+        self.thumbnail_starts = array('i', subtitle_parser.subtitles.starts)
+        self.thumbnail_pack = self.thumbnail_cache.lookup(self.current_media_path)
+        self.playlist_widget.setIconSize(QSize(THUMBNAIL_WIDTH, int(THUMBNAIL_WIDTH * DEFAULT_ASPECT)))
+        for row in range(self.playlist_widget.count()):
+            self.playlist_widget.item(row).setIcon(self.thumbnail_placeholder)
+        self.request_thumbnails(subtitle_parser.current_index)
+        # 切换到句子清单、布局完成后再计算可见行
+        self.thumbnail_debouncer.request()
+
+    def request_thumbnails(self, first_row):
+        """从 first_row 开始（之后回到开头）为缺少缩略图的句子截图"""
+        starts = self.thumbnail_starts
+        first_row = max(0, min(first_row, len(starts) - 1))
+        self.thumbnail_request_row = first_row
+        self.thumbnail_cache.generate_in_background(self.thumbnail_media_path,
+                                                    list(starts[first_row:]) + list(starts[:first_row]))
+
+    def load_visible_thumbnails(self, request_missing=True):
+        """为可见行和上下几行加载缩略图，滚出范围的行换回占位图，内存中的图片数量与句子数无关
+
+        Args:
+            request_missing: 可见行还没有生成、后台线程又不会很快生成到时，让后台线程从可见行开始
+        """
+        if self.thumbnail_starts is None or self.stacked_widget.currentIndex() != 1:
+            return
+        pack = self.thumbnail_pack
+        if pack is not None and not pack.has_video:
+            return
+        widget = self.playlist_widget
+        count = min(widget.count(), len(self.thumbnail_starts))
+        if not count:
+            return
+        first = widget.indexAt(QPoint(0, 0)).row()
+        last = widget.indexAt(QPoint(0, widget.viewport().height() - 1)).row()
+        first = max(0, first)
+        last = count - 1 if last < 0 else last
+        visible = last - first + 1
+        first = max(0, first - THUMBNAIL_PRELOAD_ROWS)
+        last = min(count - 1, last + THUMBNAIL_PRELOAD_ROWS)
+
+        for row in [row for row in self.thumbnail_rows if not first <= row <= last]:
+            widget.item(row).setIcon(self.thumbnail_placeholder)
+            self.thumbnail_rows.discard(row)
+
+        first_missing = None
+        for row in range(first, last + 1):
+            if row in self.thumbnail_rows:
+                continue
+            start_ms = self.thumbnail_starts[row]
+            if pack is None or start_ms not in pack:
+                if first_missing is None:
+                    first_missing = row
+                continue
+            data = pack.read(start_ms)
+            pixmap = QPixmap()
+            if data and pixmap.loadFromData(data):
+                widget.item(row).setIcon(QIcon(pixmap))
+                self.thumbnail_rows.add(row)
 
+        if request_missing and first_missing is not None:
+            # 后台线程按行号顺序生成，正在生成的位置是请求开始行之后第一个缺少的行
+            frontier = self.thumbnail_request_row
+            while (frontier < count and pack is not None and
+                   self.thumbnail_starts[frontier] in pack):
+                frontier += 1
+            if first_missing < self.thumbnail_request_row or first_missing - frontier > 2 * visible:
+                self.request_thumbnails(first_missing)
+
+    def update_sentence_thumbnails(self):
+        """后台生成了新的缩略图后刷新句子清单的可见行"""
+        if not self.thumbnail_cache or self.thumbnail_cache.version == self.thumbnail_version:
+            return
+        self.thumbnail_version = self.thumbnail_cache.version
+        if self.thumbnail_starts is None:
+            return
+        if self.thumbnail_pack is None:
+            self.thumbnail_pack = self.thumbnail_cache.lookup(self.thumbnail_media_path)
+        else:
+            self.thumbnail_pack.refresh()
+        self.load_visible_thumbnails(request_missing=False)
+
+    def setup_folder_watcher(self):
+        """监视播放列表涉及的目录，文件修改、新增或移动时增量更新播放列表，不需要轮询"""
+        self.folder_index = FolderIndex(MEDIA_EXTENSIONS + subtitle_extensions())
+        self.folder_watcher = QFileSystemWatcher(self)
+        self.folder_watcher.directoryChanged.connect(self.on_folder_changed)
+        self.folder_watcher.fileChanged.connect(lambda path: self.on_folder_changed(os.path.dirname(path)))
+        self.folder_rescan_debouncer = Debouncer(self.scheduler, FOLDER_RESCAN_DELAY_MS, self.rescan_changed_folders)
+        self.update_watched_folders()
+
+    def update_watched_folders(self):
+        """按播放列表更新被监视的目录和字幕文件（字幕文件原地修改时所在目录不会发出变化通知）"""
+        if not self.folder_watcher:
+            return
+        directories = set()
+        subtitle_files = set()
+        for playlist_item in self.playlist_items:
+            for key in ('video_path', 'subtitle_path', 'secondary_subtitle_path'):
+                path = playlist_item.get(key)
+                if not path or (key == 'subtitle_path' and playlist_item.get('embedded_subtitle')):
+                    continue
+                directories.add(os.path.dirname(path))
+                if key != 'video_path':
+                    subtitle_files.add(path)
+        self.folder_index.watch(directories)
+        
+        wanted = set(os.path.normpath(path) for path in self.folder_index.directories() | subtitle_files)
+        watched = dict((os.path.normpath(path), path)
+                       for path in self.folder_watcher.directories() + self.folder_watcher.files())
+        stale = [watched[path] for path in set(watched) - wanted]
+        if stale:
+            self.folder_watcher.removePaths(stale)
+        missing = [path for path in wanted - set(watched) if os.path.exists(path)]
+        if missing:
+            self.folder_watcher.addPaths(missing)
+
+    def on_folder_changed(self, directory):
+        """目录内容或被监视的字幕文件变化，合并连续的变化后再扫描"""
+        self.changed_folders.add(directory)
+        self.folder_rescan_debouncer.request()
+
+    def rescan_changed_folders(self):
+        """重新扫描变化的目录，把变化应用到播放列表"""
+        directories, self.changed_folders = self.changed_folders, set()
+        changes = self.folder_index.rescan(directories)
+        if changes:
+            print(f"播放列表目录有变化: {changes}")
+            try:
+                self.apply_folder_changes(changes)
+            except Exception as e:
+                print(f"更新播放列表失败: {e}")
+        # 先删除再写入的字幕文件会从监视中消失，重新添加
+        self.update_watched_folders()
+
+    def apply_folder_changes(self, changes):
+        """移动的文件改为新路径，修改的字幕重新解析，新的字幕配给同名文件，新的课程加入播放列表
+
+        删除的文件保留在播放列表中，重新下载（删除后再创建同名文件）时会被当作修改处理。
+        """
+        changed_rows = set()
+        
+        # 移动或重命名：只改路径，字幕校正和复习记录随文件移动
+        moved = dict(changes.moved)
+        if moved:
+            for row, playlist_item in enumerate(self.playlist_items):
+                for key in ('video_path', 'subtitle_path', 'secondary_subtitle_path'):
+                    new_path = moved.get(playlist_item.get(key))
+                    if new_path:
+                        playlist_item[key] = new_path
+                        changed_rows.add(row)
+                        if key == 'video_path':
+                            playlist_item['video_name'] = os.path.splitext(os.path.basename(new_path))[0]
+            for old_path, new_path in changes.moved:
+                print(f"文件已移动: {old_path} -> {new_path}")
+                if self.alignment_store:
+                    self.alignment_store.rename(old_path, new_path)
+                if self.review_scheduler:
+                    self.review_scheduler.rename_file(old_path, new_path)
+            self.current_media_path = moved.get(self.current_media_path, self.current_media_path)
+            self.current_subtitle_path = moved.get(self.current_subtitle_path, self.current_subtitle_path)
+            self.last_video_path = moved.get(self.last_video_path, self.last_video_path)
+            self.last_srt_path = moved.get(self.last_srt_path, self.last_srt_path)
+        
+        # 修改：正在播放的字幕重新解析；搜索索引、课程统计和第二字幕对照按文件签名自动失效
+        modified = set(changes.modified)
+        if self.current_subtitle_path in modified:
+            print(f"字幕文件已修改，重新加载: {self.current_subtitle_path}")
+            self.reload_current_subtitle(self.current_subtitle_path)
+        elif self.secondary_subtitle_path(self.current_subtitle_path) in modified:
+            self.load_secondary_track()
+        if self.current_media_path in modified and self.vlc_player.sentence_buffer:
+            self.vlc_player.sentence_buffer.clear()
+        
+        # 新的字幕文件：配给同目录下同名的文件（替换内嵌字幕或按目录猜测的字幕）；中文字幕配为第二字幕
+        added_subtitles = [path for path in changes.added if path.lower().endswith(subtitle_extensions())]
+        if added_subtitles:
+            by_name = dict(((os.path.dirname(path), os.path.splitext(os.path.basename(path))[0].lower()), path)
+                           for path in added_subtitles)
+            subtitle_dirs = set(os.path.dirname(path) for path in added_subtitles)
+            secondary_indexes = {}
+            for row, playlist_item in enumerate(self.playlist_items):
+                video_path = playlist_item['video_path']
+                video_dir = os.path.dirname(video_path)
+                if video_dir not in subtitle_dirs:
+                    continue
+                video_name = os.path.splitext(os.path.basename(video_path))[0].lower()
+                subtitle_path = by_name.get((video_dir, video_name))
+                old_path = playlist_item.get('subtitle_path')
+                if subtitle_path and (not old_path or playlist_item.get('embedded_subtitle') or
+                                      os.path.splitext(os.path.basename(old_path))[0].lower() != video_name):
+                    playlist_item['subtitle_path'] = subtitle_path
+                    playlist_item.pop('embedded_subtitle', None)
+                    changed_rows.add(row)
+                if not playlist_item.get('secondary_subtitle_path'):
+                    if video_dir not in secondary_indexes:
+                        secondary_indexes[video_dir] = secondary_subtitle_index(video_dir)
+                    secondary_path = find_secondary_subtitle(video_path, playlist_item.get('subtitle_path'),
+                                                             secondary_indexes[video_dir])
+                    if secondary_path:
+                        playlist_item['secondary_subtitle_path'] = secondary_path
+                        changed_rows.add(row)
+        
+        for row in changed_rows:
+            if row < self.file_playlist_widget.count():
+                self.file_playlist_widget.item(row).setText(self.playlist_display_text(self.playlist_items[row]))
+        
+        # 正在播放的文件：原来没有字幕时直接加载新配上的字幕，配上第二字幕时重新对照
+        current_row = next((row for row in changed_rows
+                            if self.playlist_items[row]['video_path'] == self.current_media_path), None)
+        if current_row is not None:
+            playlist_item = self.playlist_items[current_row]
+            if not self.current_subtitle_type and playlist_item.get('subtitle_path'):
+                self.current_subtitle_path = playlist_item['subtitle_path']
+                self.reload_current_subtitle(self.current_subtitle_path)
+            else:
+                self.load_secondary_track()
+        self.update_file_info_display()
+        
+        for path in changes.removed:
+            print(f"文件已删除或移出监视的目录: {path}")
+        
+        # 新的课程：出现在播放列表已有课程的目录中的媒体文件
+        video_dirs = set(os.path.dirname(item['video_path']) for item in self.playlist_items)
+        known = set(item['video_path'] for item in self.playlist_items)
+        new_media = sorted(path for path in changes.added
+                           if path.lower().endswith(MEDIA_EXTENSIONS) and os.path.dirname(path) in video_dirs
+                           and path not in known)
+        if new_media:
+            print(f"发现 {len(new_media)} 个新课程，加入播放列表")
+            self.add_files_to_playlist(new_media)
+        else:
+            self.refresh_library_index()
+            # 重新下载的视频需要重新提取内嵌字幕
+            self.extract_embedded_subtitles()
+
+    def setup_library_index(self):
+        """创建句子搜索索引和课程统计，并在后台同步播放列表"""
+        config_dir = os.path.dirname(os.path.abspath(self.config_file))
+        try:
+            self.sentence_index = SentenceIndex(os.path.join(config_dir, SENTENCE_INDEX_FILE_NAME),
+                                                load_subtitle_cues)
+        except Exception as e:
+            print(f"创建句子索引失败: {e}")
+            self.sentence_index = None
+        try:
+            self.lesson_stats = LessonStatsIndex(os.path.join(config_dir, LESSON_STATS_FILE_NAME),
+                                                 load_subtitle_cues)
+        except Exception as e:
+            print(f"创建课程统计失败: {e}")
+            self.lesson_stats = None
+        self.refresh_library_index()
+    
+    def refresh_library_index(self):
+        """播放列表或字幕文件变化后更新句子索引和课程统计（只处理变化的文件）"""
+        subtitle_paths = [item.get('subtitle_path') for item in self.playlist_items]
+        if self.sentence_index:
+            self.sentence_index.sync_in_background(subtitle_paths)
+        if self.lesson_stats:
+            self.lesson_stats.sync_in_background(subtitle_paths)
+        # 播放列表变化后被监视的目录也随之变化
+        self.update_watched_folders()
+    
+    def setup_review_scheduler(self):
+        """打开句子复习数据库"""
+        config_dir = os.path.dirname(os.path.abspath(self.config_file))
+        try:
+            self.review_scheduler = ReviewScheduler(os.path.join(config_dir, REVIEW_FILE_NAME))
+            print(f"句子复习: 已评分 {self.review_scheduler.tracked_count()} 句，"
+                  f"到期 {self.review_scheduler.due_count()} 句")
+        except Exception as e:
+            print(f"打开句子复习数据库失败: {e}")
+            self.review_scheduler = None
+        self.review_btn.setEnabled(self.review_scheduler is not None)
+
+    def grade_current_sentence(self, grade):
+        """给当前句评分并安排下次复习，复习模式下接着跳到下一句到期的句子；没有字幕时返回False"""
+        subtitle_parser = self.get_current_subtitle_parser()
+        if not self.review_scheduler or not subtitle_parser or not subtitle_parser.get_current_subtitle():
+            return False
+        try:
+            state = self.review_scheduler.grade(self.current_subtitle_path, subtitle_parser.current_index, grade)
+        except Exception as e:
+            print(f"保存复习状态失败: {e}")
+            return False
+        days = state.interval / 86400
+        print(f"第 {subtitle_parser.current_index + 1} 句下次复习: "
+              f"{f'{days:.1f} 天后' if days >= 1 else f'{state.interval // 60} 分钟后'}")
+        if self.review_mode:
+            self.review_next_sentence()
+        return True
+
+    def toggle_review_mode(self):
+        """开始或结束复习"""
+        if self.review_mode:
+            self.review_mode = False
+            self.review_btn.setText("复习")
+            return
+        self.review_mode = True
+        self.review_next_sentence()
+
+    def review_next_sentence(self, quiet=False):
+        """跳到播放列表中最早到期的句子，没有到期的句子时结束复习"""
+        subtitle_paths = [item.get('subtitle_path') for item in self.playlist_items if item.get('subtitle_path')]
+        due = self.review_scheduler.next_due(subtitle_paths) if self.review_scheduler else None
+        if due is None or due.due > time.time():
+            self.review_mode = False
+            self.review_btn.setText("复习")
+            if not quiet:
+                if due is None:
+                    message = "没有需要复习的句子。播放时点击“没听懂”或“听懂了”给句子评分后，句子会按时出现在复习中。"
+                else:
+                    message = f"没有到期的句子，下一句在 {time.strftime('%m-%d %H:%M', time.localtime(due.due))} 到期"
+                QMessageBox.information(self, "复习", message)
+            return
+        self.review_btn.setText("结束复习")
+        self.jump_to_sentence(due.subtitle_path, due.cue_index)
+
+    def get_lesson_stats(self, playlist_item):
+        """获取播放列表项的课程统计，还没统计时返回None"""
+        if not self.lesson_stats or not playlist_item.get('subtitle_path'):
+            return None
+        return self.lesson_stats.lessons.get(playlist_item['subtitle_path'])
+    
+    def playlist_display_text(self, playlist_item):
+        """播放列表中显示的文字"""
+        display_text = playlist_item['video_name']
+        if playlist_item['subtitle_path']:
+            if playlist_item.get('embedded_subtitle'):
+                subtitle_name = "内嵌字幕"
+            else:
+                subtitle_name = os.path.splitext(os.path.basename(playlist_item['subtitle_path']))[0]
+            secondary_path = playlist_item.get('secondary_subtitle_path')
+            if secondary_path:
+                subtitle_name += " + " + os.path.splitext(os.path.basename(secondary_path))[0]
+            display_text += f" (字幕: {subtitle_name})"
+        else:
+            display_text += " (无字幕)"
+        
+        stats = self.get_lesson_stats(playlist_item)
+        if stats:
+            display_text += (f"  [{stats.words_per_second:.1f} 词/秒, 词汇 {stats.unique_words}, "
+                             f"生词 {stats.new_words}]")
+        return display_text
+    
+    def update_playlist_stats_display(self):
+        """课程统计有更新时刷新播放列表文字"""
+        if not self.lesson_stats or self.lesson_stats.version == self.lesson_stats_version:
+            return
+        self.lesson_stats_version = self.lesson_stats.version
+        if self.file_playlist_widget.count() != len(self.playlist_items):
+            return
+        for row, playlist_item in enumerate(self.playlist_items):
+            self.file_playlist_widget.item(row).setText(self.playlist_display_text(playlist_item))
+        self.apply_playlist_filter()
+    
+    def apply_playlist_filter(self):
+        """隐藏语速超过上限的课程"""
+        max_rate = self.playlist_max_rate_spin.value()
+        for row, playlist_item in enumerate(self.playlist_items[:self.file_playlist_widget.count()]):
+            stats = self.get_lesson_stats(playlist_item)
+            hidden = bool(max_rate) and stats is not None and stats.words_per_second > max_rate
+            self.file_playlist_widget.setRowHidden(row, hidden)
+    
+    def sort_playlist_by_stats(self, option_index):
+        """按课程统计对播放列表排序，没有统计的文件排在最后"""
+        key = PLAYLIST_SORT_OPTIONS[option_index][1]
+        self.playlist_sort_combo.setCurrentIndex(0)
+        if key is None or not self.playlist_items:
+            return
+        
+        current_item = None
+        if 0 <= self.current_playlist_index < len(self.playlist_items):
+            current_item = self.playlist_items[self.current_playlist_index]
+        
+        def sort_key(playlist_item):
+            stats = self.get_lesson_stats(playlist_item)
+            return (0, key(stats)) if stats else (1, 0)
+        
+        self.playlist_items.sort(key=sort_key)
+        if current_item is not None:
+            self.current_playlist_index = self.playlist_items.index(current_item)
+        self.restore_playlist_display()
+        
+        # 生词数与顺序有关，按新顺序重新计算
+        self.refresh_library_index()
+    
+    def show_search_dialog(self):
+        """显示句子搜索对话框"""
+        if not self.sentence_index:
+            QMessageBox.warning(self, "搜索句子", "句子索引不可用")
+            return
+        # 打开前检查字幕文件是否有修改
+        self.refresh_library_index()
+        dialog = SentenceSearchDialog(self)
+        dialog.exec_()
+    
+    def setup_control_server(self):
+        """设置了环境变量 PLAYER_CONTROL_ADDRESS 时启动本地控制接口，例如 127.0.0.1:47621 或 unix:/tmp/player.sock"""
+        address = os.environ.get('PLAYER_CONTROL_ADDRESS')
+        if not address:
+            return
+        self.control_commands_ready.connect(self.process_control_commands)
+        try:
+            server = ControlServer(address, self.control_commands_ready.emit)
+            server.start()
+            self.control_server = server
+        except Exception as e:
+            print(f"启动控制接口失败: {e}")
+    
+    def process_control_commands(self):
+        """执行控制接口收到的命令，一批执行不完时先处理界面事件再继续"""
+        if self.control_server and self.control_server.run_pending(self.handle_control_command):
+            self.scheduler.call_later(0, self.process_control_commands)
+    
+    def publish_control_event(self, event, **data):
+        """向控制接口的订阅者推送事件"""
+        if self.control_server:
+            self.control_server.publish(event, **data)
+    
+    def current_sentence_index(self):
+        subtitle_parser = self.get_current_subtitle_parser()
+        return subtitle_parser.current_index if subtitle_parser else -1
+    
+    def control_status(self):
+        """控制接口返回的播放状态"""
+        subtitle_parser = self.get_current_subtitle_parser()
+        return {
+            'file_index': self.current_playlist_index,
+            'media_path': self.current_media_path,
+            'sentence_index': subtitle_parser.current_index if subtitle_parser else -1,
+            'sentence_count': subtitle_parser.get_total_count() if subtitle_parser else 0,
+            'playing': self.vlc_player.is_playing,
+            'position_ms': self.vlc_player.get_current_position(),
+            'repeat': self.vlc_player.current_repeat,
+            'repeat_count': self.repeat_count,
+            'repeat_interval': self.repeat_interval,
+            'auto_next': self.auto_next,
+        }
+    
+    def handle_control_command(self, command, args):
+        """执行一条控制命令，返回结果；参数错误时抛出 ControlError"""
+        def int_arg(name, low, high, default=None):
+            value = args.get(name, default)
+            # JSON的 true/false 解析为bool，而bool是int的子类，需要单独排除
+            if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+                raise ControlError(f"{name} 应为 {low} 到 {high} 之间的整数")
+            return value
+        
+        if command == 'status':
+            return self.control_status()
+        if command == 'playlist':
+            return [{'index': i, 'video_path': item['video_path'], 'subtitle_path': item.get('subtitle_path')}
+                    for i, item in enumerate(self.playlist_items)]
+        if command == 'metrics':
+            return metrics.snapshot()
+        
+        if command in ('grade', 'review'):
+            if not self.review_scheduler:
+                raise ControlError("句子复习不可用")
+            if command == 'grade':
+                grade = GRADE_NAMES.get(args.get('grade'))
+                if grade is None:
+                    raise ControlError(f"grade 应为 {', '.join(GRADE_NAMES)} 之一")
+                if not self.grade_current_sentence(grade):
+                    raise ControlError("没有加载字幕")
+            else:
+                self.review_mode = True
+                self.review_next_sentence(quiet=True)
+            status = self.control_status()
+            status['review_mode'] = self.review_mode
+            status['due_count'] = self.review_scheduler.due_count()
+            return status
+        
+        if command == 'load':
+            index = int_arg('index', 0, len(self.playlist_items) - 1)
+            start_index = args.get('sentence')
+            if start_index is not None:
+                start_index = int_arg('sentence', 0, 1 << 30)
+            self.current_playlist_index = index
+            self.load_playlist_file(index, auto_play=bool(args.get('play', True)), start_index=start_index)
+            self.update_playlist_buttons()
+        elif command == 'goto':
+            subtitle_parser = self.get_current_subtitle_parser()
+            if not subtitle_parser:
+                raise ControlError("没有加载字幕")
+            subtitle_parser.current_index = int_arg('sentence', 0, subtitle_parser.get_total_count() - 1)
+            self.request_sentence_playback()
+        elif command == 'next':
+            self.next_sentence()
+        elif command == 'prev':
+            self.previous_sentence()
+        elif command in ('play', 'pause', 'toggle'):
+            if command == 'toggle' or (command == 'play') != self.vlc_player.is_playing:
+                self.toggle_play_pause()
+        elif command == 'set_repeat':
+            self.repeat_count = int_arg('count', 0, 999, self.repeat_count)
+            self.repeat_interval = int_arg('interval', 0, 60, self.repeat_interval)
+            self.auto_next = bool(args.get('auto_next', self.auto_next))
+            self.vlc_player.set_repeat_settings(self.repeat_count, self.repeat_interval, self.auto_next)
+            # 保持设置界面一致，之后点击“应用设置”不会改回去
+            self.settings_repeat_count_spin.setValue(self.repeat_count)
+            self.settings_repeat_interval_spin.setValue(self.repeat_interval)
+            self.settings_auto_next_checkbox.setChecked(self.auto_next)
+        else:
+            raise ControlError(f"未知命令: {command}")
+        return self.control_status()
+    
+    def setup_media_cache(self):
+        """根据设置创建或关闭本地媒体缓存"""
+        if self.media_cache_enabled:
+            max_bytes = self.media_cache_size_mb * 1024 * 1024
+            if self.media_cache:
+                self.media_cache.max_bytes = max_bytes
+            else:
+                cache_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), "media_cache")
+                try:
+                    self.media_cache = MediaCache(cache_dir, max_bytes)
+                    print(f"媒体缓存已启用: {cache_dir}")
+                except Exception as e:
+                    print(f"创建媒体缓存失败: {e}")
+                    self.media_cache = None
+        elif self.media_cache:
+            self.media_cache.shutdown()
+            self.media_cache = None
+            print("媒体缓存已关闭")
+        
+        if self.vlc_player:
+            self.vlc_player.media_cache = self.media_cache
+    
+    def setup_loudness(self):
+        """根据设置创建或关闭响度分析缓存，并交给播放器"""
+        if self.loudness_enabled and loudness.is_available():
+            if not self.loudness_cache:
+                cache_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), LOUDNESS_DIR_NAME)
+                try:
+                    self.loudness_cache = LoudnessCache(cache_dir, on_decoded=self.build_waveform_from_decode)
+                    print(f"音量均衡已启用: {cache_dir}")
+                except Exception as e:
+                    print(f"创建响度分析缓存失败: {e}")
+                    self.loudness_cache = None
+        elif self.loudness_cache:
+            self.loudness_cache.shutdown()
+            self.loudness_cache = None
+            print("音量均衡已关闭")
+        
+        if self.vlc_player and self.vlc_player.loudness_cache is not self.loudness_cache:
+            self.vlc_player.set_loudness_cache(self.loudness_cache)
+    
+    def prefetch_loudness(self, index):
+        """在后台分析播放列表中下一个文件的响度，切换过去时直接使用"""
+        if self.loudness_cache:
+            self.loudness_cache.analyze_in_background(
+                [item['video_path'] for item in self.playlist_items[index + 1:index + 2]])
+    
+    def update_loudness(self):
+        """后台分析完成后让播放器应用增益"""
+        if not self.loudness_cache or self.loudness_cache.version == self.loudness_version:
+            return
+        self.loudness_version = self.loudness_cache.version
+        self.vlc_player.refresh_loudness()
+    
+    def setup_waveform_cache(self):
+        """创建句子波形缓存（需要numpy）"""
+        if not waveform_cache.is_available():
+            print("未安装numpy，不显示句子波形")
+            return
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), WAVEFORM_DIR_NAME)
+        try:
+            self.waveform_cache = WaveformCache(cache_dir)
+        except Exception as e:
+            print(f"创建波形缓存失败: {e}")
+            self.waveform_cache = None
+    
+    def build_waveform_from_decode(self, media_path, signature, wav_path):
+        """响度分析解码完一个文件后（在其后台线程中）用同一个WAV生成波形，不再解码第二遍"""
+        waveform = self.waveform_cache
+        if waveform:
+            waveform.build_from_wav(media_path, signature, wav_path)
+    
+    def show_waveform(self, media_path):
+        """切换到媒体文件的波形，还没有生成时在后台生成；media_path 为空时关闭当前波形
+        
+        文件正在等待响度分析时由那次解码一并生成，分析结束后仍然没有波形（如分析失败）时才单独解码。
+        """
+        self.waveform_media_path = media_path
+        pyramid = None
+        if media_path and self.waveform_cache:
+            pyramid = self.waveform_cache.lookup(media_path)
+            if pyramid is None and not (self.loudness_cache and self.loudness_cache.is_queued(media_path)):
+                self.waveform_cache.generate_in_background(media_path)
+        previous = self.waveform_view.set_pyramid(pyramid)
+        if previous is not None:
+            previous.close()
+        self.update_waveform_sentence()
+    
+    def update_waveform(self):
+        """后台生成（或响度分析）完成后打开当前文件的波形"""
+        if not self.waveform_cache:
+            return
+        version = (self.waveform_cache.version, self.loudness_cache.version if self.loudness_cache else None)
+        if version == self.waveform_version:
+            return
+        self.waveform_version = version
+        if self.waveform_media_path and self.waveform_view.pyramid is None:
+            self.show_waveform(self.waveform_media_path)
+    
+    def update_waveform_sentence(self):
+        """显示当前句（前后各留一点）的波形，循环区间为当前句"""
+        subtitle_parser = self.get_current_subtitle_parser()
+        current_sub = subtitle_parser.get_current_subtitle() if subtitle_parser else None
+        if self.waveform_view.pyramid is None or not current_sub:
+            self.waveform_view.setVisible(False)
+            return
+        if self.vlc_player.is_looping:
+            loop_start, loop_end = self.vlc_player.loop_start, self.vlc_player.loop_end
+        else:
+            loop_start, loop_end = current_sub['start'], current_sub['end']
+        self.waveform_view.set_view(max(0, current_sub['start'] - WAVEFORM_PADDING_MS),
+                                    current_sub['end'] + WAVEFORM_PADDING_MS, loop_start, loop_end)
+        self.waveform_view.setVisible(True)
+    
+    def update_waveform_playhead(self):
+        """移动波形上的播放位置（只在播放时查询位置）"""
+        if self.waveform_view.isVisible() and self.vlc_player.is_playing:
+            self.waveform_view.set_playhead(self.vlc_player.get_current_position())
+    
+    def prefetch_playlist_media(self, index):
+        """缓存播放列表中当前和下一个文件，并防止它们被淘汰"""
+        if not self.media_cache:
+            return
+        paths = [item['video_path'] for item in self.playlist_items[index:index + 2]]
+        self.media_cache.pin(paths)
+        self.media_cache.prefetch(paths)
+    
+    def export_playlist_clips(self):
+        """把播放列表中所有文件的每一句导出为单独的音频文件"""
+        out_dir = QFileDialog.getExistingDirectory(self, "选择导出目录", self.last_video_dir)
+        if not out_dir:
+            return
+        
+        # 选择导出格式；同一目录用相同格式再次导出时会跳过已完成的句子
+        formats = list(EXPORT_FORMATS)
+        fmt, ok = QInputDialog.getItem(self, "导出句子音频", "音频格式:", formats,
+                                       formats.index(DEFAULT_FORMAT), False)
+        if not ok:
+            return
+        
+        # 解析每个文件的字幕
+        items = []
+        for item in self.playlist_items:
+            subtitle_path = item.get('subtitle_path')
+            if not subtitle_path or not os.path.exists(subtitle_path):
+                continue
+            subtitles = load_subtitle_cues(subtitle_path, self.subtitle_correction(subtitle_path))
+            if subtitles:
+                items.append((item['video_path'], subtitles))
+        
+        tasks = build_tasks(items, out_dir, fmt)
+        if not tasks:
+            QMessageBox.information(self, "导出句子音频", "播放列表中没有带字幕的文件")
+            return
+        
+        exporter = ClipExporter(tasks, out_dir, fmt)
+        dialog = ClipExportDialog(exporter, self)
+        dialog.exec_()
+    
     def on_playlist_selection_changed(self):
         """播放列表选中项改变时的处理"""
         current_row = self.file_playlist_widget.currentRow()
@@ -2084,6 +4031,8 @@ class MainWindow(QMainWindow):
         
         # 更新播放当前文件按钮状态
         self.play_current_file_btn.setEnabled(has_selection)
+        self.align_subtitle_btn.setEnabled(has_selection)
+        self.secondary_subtitle_btn.setEnabled(has_selection)
 
     def update_playlist_buttons(self):
         """更新播放列表相关按钮的状态"""
@@ -2093,6 +4042,9 @@ class MainWindow(QMainWindow):
         # 更新按钮状态
         self.remove_from_playlist_btn.setEnabled(has_selection)
         self.clear_playlist_btn.setEnabled(has_items)
+        self.export_clips_btn.setEnabled(has_items)
+        self.align_subtitle_btn.setEnabled(has_selection)
+        self.secondary_subtitle_btn.setEnabled(has_selection)
         self.play_prev_file_btn.setEnabled(has_items and self.current_playlist_index > 0)
         self.play_current_file_btn.setEnabled(has_selection)
         self.play_next_file_btn.setEnabled(has_items and self.current_playlist_index < len(self.playlist_items) - 1)
@@ -2117,14 +4069,8 @@ class MainWindow(QMainWindow):
         
         # 重新添加所有播放列表项
         for playlist_item in self.playlist_items:
-            display_text = playlist_item['video_name']
-            if playlist_item['subtitle_path']:
-                subtitle_name = os.path.splitext(os.path.basename(playlist_item['subtitle_path']))[0]
-                display_text += f" (字幕: {subtitle_name})"
-            else:
-                display_text += " (无字幕)"
-            
-            self.file_playlist_widget.addItem(display_text)
+            self.file_playlist_widget.addItem(self.playlist_display_text(playlist_item))
+        self.apply_playlist_filter()
         
         # 更新按钮状态
         self.update_playlist_buttons()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件签名
+媒体缓存等各种缓存都用源文件的大小和修改时间判断缓存是否失效。修改时间使用纳秒精度（与 folder_watch 一致），
+同一秒内大小不变的改写也能发现。
+"""
+
+import os
+
+
+def file_signature(path):
+    """返回 (大小, 修改时间纳秒)，文件不存在时抛出 OSError"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
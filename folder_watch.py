@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播放列表目录监视
+记录播放列表涉及的每个目录中媒体和字幕文件的快照（大小、修改时间、文件编号），
+目录变化时只重新扫描变化的目录，与快照比较得到新增、删除、修改和移动的文件。
+
+移动和重命名按文件编号（st_dev, st_ino）和大小识别：同一批变化中一个文件从旧路径消失、
+在新路径出现，视为同一个文件，播放列表只需要改路径，不需要重新解析。
+界面部分（QFileSystemWatcher）在主程序中，本模块不依赖Qt。
+"""
+
+import os
+
+
+class FileEntry:
+    """目录快照中的一个文件"""
+
+    __slots__ = ('size', 'mtime_ns', 'identity')
+
+    def __init__(self, size, mtime_ns, identity):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.identity = identity
+
+    def same_content(self, other):
+        return self.size == other.size and self.mtime_ns == other.mtime_ns
+
+
+class FolderChanges:
+    """一批目录变化
+
+    added / removed / modified 为路径列表，moved 为 (旧路径, 新路径) 列表。
+    """
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.modified = []
+        self.moved = []
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified or self.moved)
+
+    def __repr__(self):
+        return (f"FolderChanges(added={len(self.added)}, removed={len(self.removed)}, "
+                f"modified={len(self.modified)}, moved={len(self.moved)})")
+
+
+def scan_directory(directory, extensions):
+    """扫描一个目录，返回 {文件名: FileEntry}，只包括指定扩展名的文件；目录不存在时返回None"""
+    entries = {}
+    try:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                if not entry.name.lower().endswith(extensions):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                # Windows 上 scandir 的 st_ino 为0，需要再 stat 一次才有文件编号
+                if not stat.st_ino:
+                    try:
+                        stat = os.stat(entry.path)
+                    except OSError:
+                        continue
+                identity = (stat.st_dev, stat.st_ino) if stat.st_ino else None
+                entries[entry.name] = FileEntry(stat.st_size, stat.st_mtime_ns, identity)
+    except OSError:
+        return None
+    return entries
+
+
+class FolderIndex:
+    """被监视目录的快照
+
+    Args:
+        extensions: 关心的文件扩展名（小写元组），其他文件的变化被忽略
+    """
+
+    def __init__(self, extensions):
+        self.extensions = extensions
+        self.snapshots = {}
+
+    def directories(self):
+        return set(self.snapshots)
+
+    def watch(self, directories):
+        """设置被监视的目录：新目录建立快照，不再需要的目录丢弃快照，返回新增的目录"""
+        directories = set(directories)
+        for directory in set(self.snapshots) - directories:
+            del self.snapshots[directory]
+        added = []
+        for directory in directories - set(self.snapshots):
+            snapshot = scan_directory(directory, self.extensions)
+            if snapshot is not None:
+                self.snapshots[directory] = snapshot
+                added.append(directory)
+        return added
+
+    def rescan(self, directories):
+        """重新扫描变化的目录，返回 FolderChanges
+
+        同一批中跨目录的移动也能识别，所以变化的目录应一起传入。
+        目录本身消失时（如U盘拔出）保留原来的快照，不报告删除，目录恢复后再比较。
+        """
+        changes = FolderChanges()
+        disappeared = {}
+        appeared = {}
+        for directory in directories:
+            old = self.snapshots.get(directory)
+            if old is None:
+                continue
+            new = scan_directory(directory, self.extensions)
+            if new is None:
+                continue
+            self.snapshots[directory] = new
+            for name, entry in new.items():
+                previous = old.get(name)
+                path = os.path.join(directory, name)
+                if previous is None:
+                    appeared[path] = entry
+                elif not previous.same_content(entry):
+                    changes.modified.append(path)
+            for name, entry in old.items():
+                if name not in new:
+                    disappeared[os.path.join(directory, name)] = entry
+
+        # 消失的文件和出现的文件是同一个文件时视为移动
+        by_identity = {}
+        for path, entry in appeared.items():
+            if entry.identity is not None:
+                by_identity[(entry.identity, entry.size)] = path
+        for path, entry in disappeared.items():
+            new_path = by_identity.pop((entry.identity, entry.size), None) if entry.identity else None
+            if new_path is not None:
+                changes.moved.append((path, new_path))
+                del appeared[new_path]
+            else:
+                changes.removed.append(path)
+        changes.added.extend(appeared)
+        return changes
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程词汇与语速统计
+为播放列表中每个字幕文件统计词数、词汇量、每句语速（词/秒），并维护全局词频表，
+用于按难度挑选课程。统计结果保存在SQLite中，每课的词表和每句语速以压缩的
+定长数组存储；同步时只重新统计大小或修改时间变化的文件。
+生词数（之前的课程中没出现过的词）依赖播放列表顺序，在同步后按当前顺序计算。
+"""
+
+import re
+import time
+import zlib
+from array import array
+
+from file_signature import file_signature
+from sqlite_index import SqliteIndex
+
+
+STATS_FILE_NAME = "lesson_stats.db"
+SCHEMA_VERSION = 1
+
+# 英文单词，允许 don't / o'clock 这样的撇号
+WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)*")
+
+# 每句语速以 1/100 词每秒为单位存储
+RATE_SCALE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS words (
+    id INTEGER PRIMARY KEY,
+    word TEXT UNIQUE NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    lessons INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS lessons (
+    subtitle_path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    cue_count INTEGER NOT NULL,
+    word_count INTEGER NOT NULL,
+    unique_words INTEGER NOT NULL,
+    speech_ms INTEGER NOT NULL,
+    words_per_second REAL NOT NULL,
+    vocab BLOB NOT NULL,
+    sentence_rates BLOB NOT NULL
+);
+"""
+
+
+def tokenize(text):
+    """把字幕文字切分为小写英文单词"""
+    return WORD_RE.findall(text.lower())
+
+
+def _pack(values, typecode):
+    return zlib.compress(array(typecode, values).tobytes())
+
+
+def _unpack(blob, typecode):
+    values = array(typecode)
+    values.frombytes(zlib.decompress(blob))
+    return values
+
+
+class LessonStats:
+    """一课的统计结果"""
+
+    __slots__ = ('subtitle_path', 'cue_count', 'word_count', 'unique_words', 'speech_ms',
+                 'words_per_second', 'new_words')
+
+    def __init__(self, subtitle_path, cue_count, word_count, unique_words, speech_ms, words_per_second):
+        self.subtitle_path = subtitle_path
+        self.cue_count = cue_count
+        self.word_count = word_count
+        self.unique_words = unique_words
+        self.speech_ms = speech_ms
+        self.words_per_second = words_per_second
+        self.new_words = 0
+
+
+class LessonStatsIndex(SqliteIndex):
+    """课程统计索引
+
+    sync() 在后台线程中执行，完成后替换内存中的 lessons 字典并增加 version，
+    界面线程比较 version 即可知道统计结果有更新，读取时不需要加锁。
+    """
+
+    sync_thread_name = "LessonStatsSync"
+    sync_error_message = "更新课程统计失败"
+
+    def __init__(self, db_path, parse_fn):
+        """
+        Args:
+            db_path: 统计数据库路径
+            parse_fn: parse_fn(subtitle_path) 返回字幕列表（解析器的 subtitles），失败返回None
+        """
+        super().__init__(db_path)
+        self.parse_fn = parse_fn
+        self.lessons = {}   # 字幕路径 -> LessonStats
+        self.version = 0
+        self._init_db()
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+        if row is None or int(row[0]) != SCHEMA_VERSION:
+            conn.execute("DELETE FROM lessons")
+            conn.execute("DELETE FROM words")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        conn.commit()
+
+    def _word_ids(self, conn, words):
+        """获取单词id，不存在的单词先插入"""
+        conn.executemany("INSERT OR IGNORE INTO words (word) VALUES (?)", ((word,) for word in words))
+        ids = {}
+        words = list(words)
+        for start in range(0, len(words), 500):
+            chunk = words[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            ids.update(conn.execute(f"SELECT word, id FROM words WHERE word IN ({placeholders})", chunk))
+        return ids
+
+    def _remove_lesson(self, conn, path):
+        """删除一课并从全局词频中减去它的词表"""
+        row = conn.execute("SELECT vocab FROM lessons WHERE subtitle_path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        vocab = _unpack(row[0], 'I')
+        conn.executemany("UPDATE words SET total = total - ?, lessons = lessons - 1 WHERE id = ?",
+                         ((vocab[i + 1], vocab[i]) for i in range(0, len(vocab), 2)))
+        conn.execute("DELETE FROM lessons WHERE subtitle_path = ?", (path,))
+
+    def _index_lesson(self, conn, path, signature, subtitles):
+        """统计一课并写入数据库"""
+        counts = {}
+        rates = []
+        word_count = 0
+        speech_ms = 0
+        for sub in subtitles:
+            words = tokenize(sub['text'])
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            word_count += len(words)
+            duration = sub['end'] - sub['start']
+            if duration > 0:
+                speech_ms += duration
+                rate = len(words) * 1000.0 / duration
+            else:
+                rate = 0.0
+            rates.append(min(65535, int(round(rate * RATE_SCALE))))
+
+        ids = self._word_ids(conn, counts)
+        vocab = []
+        for word, count in counts.items():
+            vocab.append(ids[word])
+            vocab.append(count)
+        conn.executemany("UPDATE words SET total = total + ?, lessons = lessons + 1 WHERE id = ?",
+                         ((count, ids[word]) for word, count in counts.items()))
+
+        words_per_second = word_count * 1000.0 / speech_ms if speech_ms else 0.0
+        conn.execute("INSERT INTO lessons VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (path, signature[0], signature[1], len(subtitles), word_count, len(counts),
+                      speech_ms, words_per_second, _pack(vocab, 'I'), _pack(rates, 'H')))
+
+    def sync(self, subtitle_paths):
+        """让统计与这些字幕文件一致（按播放列表顺序传入），返回重新统计的文件数"""
+        with self._sync_lock:
+            conn = self._connect()
+            ordered = list(dict.fromkeys(path for path in subtitle_paths if path))
+            wanted = set(ordered)
+            indexed = dict((row[0], (row[1], row[2]))
+                           for row in conn.execute("SELECT subtitle_path, size, mtime FROM lessons"))
+            updated = 0
+            started = time.perf_counter()
+
+            for path in set(indexed) - wanted:
+                self._remove_lesson(conn, path)
+                updated += 1
+
+            for path in ordered:
+                try:
+                    signature = file_signature(path)
+                except OSError:
+                    if path in indexed:
+                        self._remove_lesson(conn, path)
+                        updated += 1
+                    continue
+                if indexed.get(path) == signature:
+                    continue
+                subtitles = self.parse_fn(path)
+                if subtitles is None:
+                    continue
+                self._remove_lesson(conn, path)
+                self._index_lesson(conn, path, signature, subtitles)
+                updated += 1
+            conn.execute("DELETE FROM words WHERE lessons <= 0")
+            conn.commit()
+
+            self._load(conn, ordered)
+            if updated:
+                print(f"课程统计已更新: {updated} 个文件，耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+            return updated
+
+    def _load(self, conn, ordered):
+        """读取所有课程的统计，并按播放列表顺序计算生词数"""
+        lessons = {}
+        vocabs = {}
+        for row in conn.execute("SELECT subtitle_path, cue_count, word_count, unique_words, speech_ms, "
+                                "words_per_second, vocab FROM lessons"):
+            lessons[row[0]] = LessonStats(*row[:6])
+            vocabs[row[0]] = row[6]
+
+        seen = set()
+        for path in ordered:
+            if path not in lessons:
+                continue
+            word_ids = _unpack(vocabs[path], 'I')[::2]
+            new_words = set(word_ids) - seen
+            lessons[path].new_words = len(new_words)
+            seen.update(new_words)
+
+        self.lessons = lessons
+        self.version += 1
+
+    def sentence_rates(self, subtitle_path):
+        """返回一课每句的语速（词/秒）列表"""
+        row = self._connect().execute("SELECT sentence_rates FROM lessons WHERE subtitle_path = ?",
+                                      (subtitle_path,)).fetchone()
+        if row is None:
+            return []
+        return [rate / RATE_SCALE for rate in _unpack(row[0], 'H')]
+
+    def top_words(self, limit=100):
+        """全局词频最高的单词 [(单词, 出现次数, 出现的课数)]"""
+        return self._connect().execute("SELECT word, total, lessons FROM words ORDER BY total DESC LIMIT ?",
+                                       (limit,)).fetchall()
+
+    def lesson_words(self, subtitle_path):
+        """一课的词频表 {单词: 次数}"""
+        conn = self._connect()
+        row = conn.execute("SELECT vocab FROM lessons WHERE subtitle_path = ?", (subtitle_path,)).fetchone()
+        if row is None:
+            return {}
+        vocab = _unpack(row[0], 'I')
+        counts = dict((vocab[i], vocab[i + 1]) for i in range(0, len(vocab), 2))
+        words = {}
+        ids = list(counts)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for word_id, word in conn.execute(f"SELECT id, word FROM words WHERE id IN ({placeholders})", chunk):
+                words[word] = counts[word_id]
+        return words
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程响度均衡
+不同来源的课程音量相差很大，同一课里也有说得很轻的句子。这里在后台把每个媒体文件解码为低采样率单声道，
+按 ITU-R BS.1770 的方法（K加权、400ms块、绝对门限-70 LUFS和相对门限-10 LU）计算整体响度，
+同时保存每100ms的K加权均方功率和峰值，任意一句的响度（RMS）和峰值都可以直接从中求出。
+
+K加权不是逐个采样做IIR滤波，而是对每个100ms子块做FFT、按K加权滤波器的频率响应加权后求功率
+（帕塞瓦尔定理），整段音频一次向量化计算，一小时的课程只需要不到一秒。
+结果按媒体文件保存在缓存目录中，文件变化后重新分析，每个文件只分析一次。
+
+播放时按 目标响度 - 课程响度 调整增益，循环一句时再按这一句比整课轻或响的程度修正（有上限），
+并保证放大后不削波。增益通过VLC均衡器的前置放大实现，不改变用户的音量设置。
+
+需要numpy，没有安装时 is_available() 返回False。
+"""
+
+import hashlib
+import math
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from file_signature import file_signature
+from media_decode import create_decode_instance, decode_to_wav
+
+
+LOUDNESS_DIR_NAME = "loudness"
+
+# 分析用音频格式：16kHz单声道，K加权的高频提升（1.5kHz以上）仍在范围内
+ANALYSIS_SAMPLE_RATE = 16000
+
+# 子块长度（毫秒），BS.1770的400ms块由连续4个子块组成，块间隔100ms（重叠75%）
+BLOCK_MS = 100
+BLOCKS_PER_GATE = 4
+
+# 每次读入并计算的子块数（60秒），大文件不必整个读入内存
+CHUNK_BLOCKS = 600
+
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# 目标响度：适合耳机收听的语音节目
+TARGET_LOUDNESS = -18.0
+
+# 课程整体增益、单句相对整课的修正和总增益的上限（分贝），VLC前置放大的范围为 ±20dB
+MAX_LESSON_GAIN_DB = 15.0
+MAX_CUE_ADJUST_DB = 6.0
+MAX_GAIN_DB = 20.0
+
+# 内存中保留的最近查询过的分析结果数
+PROFILE_KEEP = 4
+
+# 后台线程的nice值（仅Linux上对单个线程有效）
+WORKER_NICENESS = 10
+
+# 解码整个文件的超时（秒）
+ANALYSIS_DECODE_TIMEOUT = 600
+
+# 缓存文件格式：文件头 + 每个子块的均方功率(float32) + 每个子块的峰值(float32)
+PROFILE_MAGIC = b'ELPLOUD1'
+HEADER = struct.Struct('<8sqqdI')       # 标记、媒体大小、修改时间、整体响度（没有声音时为NaN）、子块数
+PROFILE_EXTENSION = ".loud"
+
+# BS.1770 K加权滤波器在48kHz下的系数：高频搁架 + 高通
+K_SHELF = ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585))
+K_HIGHPASS = ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621))
+K_FILTER_RATE = 48000
+
+
+def is_available():
+    """是否可以进行响度分析（需要numpy）"""
+    return np is not None
+
+
+def _power_to_lufs(power):
+    return -0.691 + 10.0 * math.log10(power) if power > 0 else float('-inf')
+
+
+def k_weighting(frequencies):
+    """K加权滤波器在这些频率上的功率响应 |H(f)|²"""
+    z = np.exp(-2j * np.pi * np.asarray(frequencies, dtype=np.float64) / K_FILTER_RATE)
+    response = np.ones(len(z))
+    for b, a in (K_SHELF, K_HIGHPASS):
+        h = (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+        response = response * np.abs(h) ** 2
+    return response
+
+
+class BlockAnalyzer:
+    """把16位单声道PCM逐段转换为每个子块的K加权均方功率和峰值"""
+
+    def __init__(self, sample_rate=ANALYSIS_SAMPLE_RATE, block_ms=BLOCK_MS):
+        self.hop = sample_rate * block_ms // 1000
+        # 帕塞瓦尔定理：均方值 = (|X0|² + 2Σ|Xk|² + |X_N/2|²) / N²，与K加权一起并入一个权重向量
+        bins = self.hop // 2 + 1
+        weights = np.full(bins, 2.0)
+        weights[0] = 1.0
+        if self.hop % 2 == 0:
+            weights[-1] = 1.0
+        frequencies = np.arange(bins) * sample_rate / self.hop
+        self.weights = weights * k_weighting(frequencies) / (self.hop * self.hop)
+        self.powers = []
+        self.peaks = []
+        self._tail = b''
+
+    def feed(self, pcm):
+        """处理一段PCM，不满一个子块的部分留到下一次"""
+        data = self._tail + pcm
+        usable = len(data) // (self.hop * 2) * self.hop * 2
+        self._tail = data[usable:]
+        if usable:
+            self._process(np.frombuffer(data[:usable], dtype='<i2'))
+
+    def finish(self):
+        """处理剩余的不满一个子块的数据（补零），返回 (功率数组, 峰值数组)"""
+        if self._tail:
+            samples = np.zeros(self.hop, dtype='<i2')
+            tail = np.frombuffer(self._tail[:len(self._tail) // 2 * 2], dtype='<i2')
+            samples[:len(tail)] = tail
+            self._process(samples)
+            self._tail = b''
+        if not self.powers:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(self.powers), np.concatenate(self.peaks)
+
+    def _process(self, samples):
+        blocks = samples.reshape(-1, self.hop).astype(np.float32) / 32768.0
+        spectrum = np.fft.rfft(blocks, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) @ self.weights
+        self.powers.append(power.astype(np.float32))
+        self.peaks.append(np.abs(blocks).max(axis=1))
+
+
+def integrated_loudness(powers):
+    """BS.1770整体响度（LUFS），没有超过绝对门限的声音时返回None"""
+    if len(powers) == 0:
+        return None
+    cumulative = np.concatenate(([0.0], np.cumsum(powers, dtype=np.float64)))
+    if len(powers) >= BLOCKS_PER_GATE:
+        blocks = (cumulative[BLOCKS_PER_GATE:] - cumulative[:-BLOCKS_PER_GATE]) / BLOCKS_PER_GATE
+    else:
+        blocks = np.array([cumulative[-1] / len(powers)])
+    loudness = -0.691 + 10.0 * np.log10(blocks + 1e-20)
+    gated = blocks[loudness > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return None
+    relative_gate = _power_to_lufs(float(gated.mean())) + RELATIVE_GATE_LU
+    gated = blocks[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative_gate)]
+    return _power_to_lufs(float(gated.mean()))
+
+
+class LoudnessProfile:
+    """一个媒体文件的响度分析结果"""
+
+    def __init__(self, integrated, powers, peaks, signature=None):
+        self.integrated = integrated        # 整体响度（LUFS），没有声音时为None
+        self.powers = powers
+        self.peaks = peaks
+        self.signature = signature
+        self._cumulative = np.concatenate(([0.0], np.cumsum(powers, dtype=np.float64)))
+
+    @property
+    def duration_ms(self):
+        return len(self.powers) * BLOCK_MS
+
+    def _range(self, start_ms, end_ms):
+        first = max(0, min(int(start_ms) // BLOCK_MS, len(self.powers) - 1))
+        last = max(first + 1, min(-(-int(end_ms) // BLOCK_MS), len(self.powers)))
+        return first, last
+
+    def cue_loudness(self, start_ms, end_ms):
+        """一句的响度（K加权RMS，LUFS），太安静或超出范围时返回None"""
+        if not len(self.powers):
+            return None
+        first, last = self._range(start_ms, end_ms)
+        loudness = _power_to_lufs((self._cumulative[last] - self._cumulative[first]) / (last - first))
+        return loudness if loudness > ABSOLUTE_GATE_LUFS else None
+
+    def peak(self, start_ms=None, end_ms=None):
+        """一段（默认整个文件）的采样峰值（满刻度为1.0）"""
+        if not len(self.peaks):
+            return 0.0
+        if start_ms is None:
+            return float(self.peaks.max())
+        first, last = self._range(start_ms, end_ms)
+        return float(self.peaks[first:last].max())
+
+    def _base_gain(self, target):
+        return max(-MAX_LESSON_GAIN_DB, min(MAX_LESSON_GAIN_DB, target - self.integrated))
+
+    def lesson_gain_db(self, target=TARGET_LOUDNESS):
+        """整课的增益（分贝）"""
+        if self.integrated is None:
+            return 0.0
+        return self._limit_peak(self._base_gain(target), self.peak())
+
+    def cue_gain_db(self, start_ms, end_ms, target=TARGET_LOUDNESS):
+        """循环一句时的增益：整课的增益，加上这一句相对整课的修正，只受这一句峰值的限制"""
+        loudness = self.cue_loudness(start_ms, end_ms)
+        if loudness is None or self.integrated is None:
+            return self.lesson_gain_db(target)
+        adjust = max(-MAX_CUE_ADJUST_DB, min(MAX_CUE_ADJUST_DB, self.integrated - loudness))
+        return self._limit_peak(self._base_gain(target) + adjust, self.peak(start_ms, end_ms))
+
+    @staticmethod
+    def _limit_peak(gain, peak):
+        """放大后峰值不超过满刻度"""
+        if gain > 0 and peak > 0:
+            gain = min(gain, -20.0 * math.log10(peak))
+        return max(-MAX_GAIN_DB, min(MAX_GAIN_DB, gain))
+
+    # ---- 缓存文件 ----
+
+    def save(self, path):
+        integrated = self.integrated if self.integrated is not None else float('nan')
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(PROFILE_MAGIC, self.signature[0], self.signature[1], integrated, len(self.powers)))
+            f.write(self.powers.astype('<f4').tobytes())
+            f.write(self.peaks.astype('<f4').tobytes())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取缓存文件，不存在或格式不对时返回None"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+        magic, size, mtime, integrated, count = HEADER.unpack_from(data)
+        if magic != PROFILE_MAGIC or len(data) != HEADER.size + count * 8:
+            return None
+        powers = np.frombuffer(data, dtype='<f4', count=count, offset=HEADER.size)
+        peaks = np.frombuffer(data, dtype='<f4', count=count, offset=HEADER.size + count * 4)
+        return cls(None if math.isnan(integrated) else integrated, powers, peaks, (size, mtime))
+
+
+def analyze_wav(path):
+    """分析16位单声道WAV文件，按 CHUNK_BLOCKS 分段读入，返回 LoudnessProfile"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"解码格式不正确: {wav.getsampwidth() * 8}位 {wav.getnchannels()}声道")
+        analyzer = BlockAnalyzer(wav.getframerate())
+        while True:
+            pcm = wav.readframes(analyzer.hop * CHUNK_BLOCKS)
+            if not pcm:
+                break
+            analyzer.feed(pcm)
+    powers, peaks = analyzer.finish()
+    return LoudnessProfile(integrated_loudness(powers), powers, peaks)
+
+
+class LoudnessCache:
+    """响度分析缓存
+
+    每个媒体文件一个缓存文件，文件名为媒体路径的SHA1，文件头记录媒体的大小/修改时间，媒体变化后重新分析。
+    分析在后台线程中逐个进行（使用单独的VLC解码实例）；完成后 version 加一，界面定期检查并重新查询。
+    on_decoded(媒体路径, 签名, WAV路径) 在每次解码、分析之后（删除临时WAV之前）在后台线程中调用，
+    其他需要完整解码的分析（波形）可以复用这次解码。
+    """
+
+    def __init__(self, cache_dir, on_decoded=None):
+        self.cache_dir = cache_dir
+        self.on_decoded = on_decoded
+        self.version = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._failed = set()
+        self._profiles = OrderedDict()      # 媒体路径 -> 最近查询到的 LoudnessProfile，最后一项最近使用
+        self._worker = None
+        self._stopped = False
+        self._cancel = threading.Event()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def profile_path(self, media_path):
+        digest = hashlib.sha1(media_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, digest + PROFILE_EXTENSION)
+
+    def lookup(self, media_path):
+        """返回媒体文件的 LoudnessProfile，没有分析过或文件已经变化时返回None"""
+        try:
+            signature = file_signature(media_path)
+        except OSError:
+            return None
+        with self._lock:
+            profile = self._profiles.get(media_path)
+            if profile is not None:
+                self._profiles.move_to_end(media_path)
+        if profile is None or profile.signature != signature:
+            profile = LoudnessProfile.load(self.profile_path(media_path))
+            if profile is None or profile.signature != signature:
+                return None
+            self._remember(media_path, profile)
+        return profile
+
+    def _remember(self, media_path, profile):
+        with self._lock:
+            self._profiles[media_path] = profile
+            self._profiles.move_to_end(media_path)
+            while len(self._profiles) > PROFILE_KEEP:
+                self._profiles.popitem(last=False)
+
+    def analyze_in_background(self, media_paths):
+        """在后台分析这些文件，已经分析过、已在队列中或分析失败过的文件会被跳过"""
+        pending = [path for path in media_paths if path and os.path.exists(path) and self.lookup(path) is None]
+        with self._lock:
+            for media_path in pending:
+                if media_path in self._queued or media_path in self._failed:
+                    continue
+                self._queued.add(media_path)
+                self._queue.put(media_path)
+            if self._queued and (self._worker is None or not self._worker.is_alive()):
+                self._worker = threading.Thread(target=self._run_worker, name="LoudnessWorker", daemon=True)
+                self._worker.start()
+
+    def is_queued(self, media_path):
+        """文件是否在等待分析或正在分析"""
+        with self._lock:
+            return media_path in self._queued
+
+    def shutdown(self):
+        """停止后台线程，正在进行的解码随之中止"""
+        self._stopped = True
+        self._cancel.set()
+        self._queue.put(None)
+
+    def _run_worker(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        instance = None
+        try:
+            while not self._stopped:
+                media_path = self._queue.get()
+                if media_path is None:
+                    break
+                try:
+                    if instance is None:
+                        instance = create_decode_instance()
+                    self._analyze(instance, media_path)
+                except Exception as e:
+                    print(f"响度分析失败: {media_path}, 错误: {e}")
+                    with self._lock:
+                        self._failed.add(media_path)
+                finally:
+                    with self._lock:
+                        self._queued.discard(media_path)
+                        self.version += 1
+        finally:
+            if instance is not None:
+                instance.release()
+
+    def _analyze(self, instance, media_path):
+        signature = file_signature(media_path)
+        fd, temp_path = tempfile.mkstemp(prefix='elp_loudness_', suffix='.wav')
+        os.close(fd)
+        try:
+            started = time.perf_counter()
+            if not decode_to_wav(instance, media_path, temp_path, sample_rate=ANALYSIS_SAMPLE_RATE, channels=1,
+                                 timeout=ANALYSIS_DECODE_TIMEOUT, cancel_event=self._cancel):
+                if not self._stopped:
+                    raise RuntimeError("解码失败")
+                return
+            decoded = time.perf_counter()
+            profile = analyze_wav(temp_path)
+            elapsed = time.perf_counter() - decoded
+            if self.on_decoded is not None:
+                try:
+                    self.on_decoded(media_path, signature, temp_path)
+                except Exception as e:
+                    print(f"复用响度分析的解码失败: {media_path}, 错误: {e}")
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        profile.signature = signature
+        profile.save(self.profile_path(media_path))
+        self._remember(media_path, profile)
+        loudness = f"{profile.integrated:.1f} LUFS" if profile.integrated is not None else "没有声音"
+        print(f"响度分析完成: {os.path.basename(media_path)}，{loudness}，时长 {profile.duration_ms / 60000:.1f} 分钟，"
+              f"解码 {decoded - started:.1f}s，计算 {elapsed:.2f}s")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地媒体缓存
+把U盘、网络盘等慢速设备上的课程文件复制到本地缓存目录，循环跳转时只读本地文件。
+复制在后台线程中进行，缓存总大小有上限，超出时按最近最少使用淘汰。
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from file_signature import file_signature
+from player_metrics import metrics
+
+
+INDEX_FILE_NAME = "index.json"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _sha1_of_file(path):
+    """计算文件的SHA1"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """按最近最少使用淘汰的本地媒体缓存
+
+    索引保存在缓存目录的 index.json 中，键为源文件路径，值记录缓存文件名、
+    源文件大小/修改时间、内容SHA1和最近使用时间。
+    """
+
+    def __init__(self, cache_dir, max_bytes, on_ready=None):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            on_ready: 文件缓存完成时调用 on_ready(source_path, cached_path)，在后台线程中调用
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.on_ready = on_ready
+        self.entries = OrderedDict()   # 按最近使用排序，最后一项最新
+        self.pinned = set()            # 正在使用、不能淘汰的源文件
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._stopped = False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+        self._worker = threading.Thread(target=self._run_worker, name="MediaCacheWorker", daemon=True)
+        self._worker.start()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE_NAME)
+
+    def _load_index(self):
+        """加载缓存索引，丢弃缓存文件已经不存在的记录"""
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                entries = sorted(data.get('entries', {}).items(), key=lambda item: item[1].get('last_used', 0))
+                for source_path, entry in entries:
+                    if os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+                        self.entries[source_path] = entry
+        except Exception as e:
+            print(f"加载媒体缓存索引失败: {e}")
+            self.entries.clear()
+
+    def _save_index(self):
+        """保存缓存索引（调用方持有锁）"""
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
+
+    def total_bytes(self):
+        """缓存文件总大小"""
+        with self._lock:
+            return sum(entry['size'] for entry in self.entries.values())
+
+    def lookup(self, source_path):
+        """返回有效的本地缓存路径，没有缓存或缓存已失效时返回None"""
+        with self._lock:
+            entry = self.entries.get(source_path)
+            if entry is None:
+                metrics.increment('media_cache_misses')
+                return None
+            cached_path = os.path.join(self.cache_dir, entry['file'])
+
+            # 源文件还在时，大小或修改时间变化说明文件被重新下载过；
+            # 源设备已经拔出时仍然使用缓存
+            try:
+                signature_ok = file_signature(source_path) == (entry['size'], entry['mtime'])
+            except OSError:
+                signature_ok = True
+            try:
+                cached_ok = os.path.getsize(cached_path) == entry['size']
+            except OSError:
+                cached_ok = False
+
+            if not (signature_ok and cached_ok):
+                print(f"媒体缓存已失效: {source_path}")
+                self._remove_entry(source_path)
+                self._save_index()
+                metrics.increment('media_cache_misses')
+                return None
+
+            entry['last_used'] = time.time()
+            self.entries.move_to_end(source_path)
+            metrics.increment('media_cache_hits')
+            return cached_path
+
+    def prefetch(self, source_paths):
+        """在后台缓存指定的文件，已缓存或已在队列中的文件会被跳过"""
+        with self._lock:
+            for source_path in source_paths:
+                if not source_path or source_path in self.entries or source_path in self._queued:
+                    continue
+                self._queued.add(source_path)
+                self._queue.put(source_path)
+
+    def pin(self, source_paths):
+        """设置正在使用的文件，这些文件不会被淘汰"""
+        with self._lock:
+            self.pinned = set(path for path in source_paths if path)
+
+    def clear(self):
+        """删除所有缓存文件"""
+        with self._lock:
+            for source_path in list(self.entries):
+                self._remove_entry(source_path)
+            self._save_index()
+
+    def shutdown(self):
+        """停止后台线程"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def _remove_entry(self, source_path):
+        """删除一条缓存记录和对应的文件（调用方持有锁）"""
+        entry = self.entries.pop(source_path, None)
+        if entry:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+
+    def _evict_for(self, incoming_bytes):
+        """淘汰最久未使用的缓存，为新文件腾出空间（调用方持有锁），空间不够时返回False"""
+        total = sum(entry['size'] for entry in self.entries.values())
+        for source_path in list(self.entries):
+            if total + incoming_bytes <= self.max_bytes:
+                break
+            if source_path in self.pinned:
+                continue
+            total -= self.entries[source_path]['size']
+            print(f"淘汰媒体缓存: {source_path}")
+            self._remove_entry(source_path)
+            metrics.increment('media_cache_evictions')
+        return total + incoming_bytes <= self.max_bytes
+
+    def _run_worker(self):
+        while not self._stopped:
+            source_path = self._queue.get()
+            if source_path is None:
+                break
+            try:
+                self._cache_file(source_path)
+            except Exception as e:
+                print(f"缓存媒体文件失败: {source_path}, 错误: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(source_path)
+
+    def _cache_file(self, source_path):
+        """复制一个文件到缓存目录并校验"""
+        if not os.path.exists(source_path):
+            return
+        size, mtime = file_signature(source_path)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if source_path in self.entries:
+                return
+            if not self._evict_for(size):
+                print(f"媒体缓存空间不足，跳过: {source_path}")
+                return
+            self._save_index()
+
+        name_hash = hashlib.sha1(source_path.encode('utf-8')).hexdigest()
+        file_name = name_hash + os.path.splitext(source_path)[1].lower()
+        cached_path = os.path.join(self.cache_dir, file_name)
+        temp_path = cached_path + ".part"
+
+        started = time.perf_counter()
+        digest = hashlib.sha1()
+        with open(source_path, 'rb') as src, open(temp_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+                if self._stopped:
+                    break
+
+        # 完整性校验：复制过程中源文件没有变化，且本地文件内容与读取到的一致
+        if self._stopped or file_signature(source_path) != (size, mtime) or \
+                os.path.getsize(temp_path) != size or _sha1_of_file(temp_path) != digest.hexdigest():
+            print(f"媒体缓存校验失败: {source_path}")
+            os.remove(temp_path)
+            return
+        os.replace(temp_path, cached_path)
+
+        with self._lock:
+            self.entries[source_path] = {
+                'file': file_name,
+                'size': size,
+                'mtime': mtime,
+                'sha1': digest.hexdigest(),
+                'last_used': time.time(),
+            }
+            self._save_index()
+        metrics.record('media_cache_copy', (time.perf_counter() - started) * 1000.0)
+        print(f"媒体文件已缓存: {source_path}")
+
+        if self.on_ready:
+            self.on_ready(source_path, cached_path)
+
+    def verify(self, source_path):
+        """重新计算缓存文件的SHA1并与索引比较，不一致时删除缓存"""
+        with self._lock:
+            entry = self.entries.get(source_path)
+            if entry is None:
+                return False
+            cached_path = os.path.join(self.cache_dir, entry['file'])
+        ok = os.path.exists(cached_path) and _sha1_of_file(cached_path) == entry['sha1']
+        if not ok:
+            with self._lock:
+                self._remove_entry(source_path)
+                self._save_index()
+        return ok
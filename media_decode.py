@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体解码
+通过VLC的流输出（sout）把媒体文件的全部或一段转码为PCM WAV文件，
+以及WAV数据的读写辅助函数。解码使用独立的VLC实例，不影响正在播放的播放器。
+"""
+
+import io
+import os
+import threading
+import wave
+
+import vlc
+
+
+# 默认解码格式：16位PCM
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+SAMPLE_WIDTH = 2
+
+# 解码超时（秒），防止损坏的文件让解码线程一直等待
+DEFAULT_DECODE_TIMEOUT = 120
+
+# 解码用VLC实例参数：不输出画面和声音，只做转码
+DECODE_INSTANCE_ARGS = ('--no-video', '--no-sout-video', '--quiet', '--no-video-title-show')
+
+
+def create_decode_instance(extra_args=()):
+    """创建用于转码的VLC实例"""
+    return vlc.Instance(*(DECODE_INSTANCE_ARGS + tuple(extra_args)))
+
+
+def build_sout_chain(out_path, acodec='s16l', mux='wav', sample_rate=DEFAULT_SAMPLE_RATE,
+                     channels=DEFAULT_CHANNELS, bitrate=None):
+    """构造转码到文件的sout参数"""
+    transcode = f"acodec={acodec},channels={channels},samplerate={sample_rate}"
+    if bitrate:
+        transcode += f",ab={bitrate}"
+    dst = out_path.replace('\\', '/').replace('"', '\\"')
+    return f'#transcode{{vcodec=none,{transcode}}}:std{{access=file,mux={mux},dst="{dst}"}}'
+
+
+def transcode_file(instance, media_path, out_path, start_ms=None, end_ms=None,
+                   timeout=DEFAULT_DECODE_TIMEOUT, cancel_event=None, **sout_options):
+    """把媒体文件（或其中一段）转码到out_path，成功返回True
+
+    Args:
+        instance: create_decode_instance() 创建的VLC实例
+        start_ms, end_ms: 只转码这一段，None表示从头/到尾
+        cancel_event: threading.Event，被设置时中止转码
+        sout_options: 传给 build_sout_chain 的编码参数
+    """
+    media = instance.media_new(media_path)
+    media.add_option(f":sout={build_sout_chain(out_path, **sout_options)}")
+    media.add_option(":sout-keep")
+    media.add_option(":no-sout-all")
+    if start_ms is not None:
+        media.add_option(f":start-time={start_ms / 1000.0:.3f}")
+    if end_ms is not None:
+        media.add_option(f":stop-time={end_ms / 1000.0:.3f}")
+
+    player = instance.media_player_new()
+    player.set_media(media)
+    finished = threading.Event()
+    result = {'ok': False}
+
+    def on_end(event):
+        result['ok'] = True
+        finished.set()
+
+    def on_error(event):
+        finished.set()
+
+    event_manager = player.event_manager()
+    event_manager.event_attach(vlc.EventType.MediaPlayerEndReached, on_end)
+    event_manager.event_attach(vlc.EventType.MediaPlayerEncounteredError, on_error)
+
+    try:
+        if player.play() != 0:
+            return False
+        waited = 0.0
+        while not finished.wait(0.1):
+            waited += 0.1
+            if waited >= timeout or (cancel_event is not None and cancel_event.is_set()):
+                break
+    finally:
+        event_manager.event_detach(vlc.EventType.MediaPlayerEndReached)
+        event_manager.event_detach(vlc.EventType.MediaPlayerEncounteredError)
+        player.stop()
+        player.release()
+        media.release()
+
+    if not result['ok'] and os.path.exists(out_path):
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+    return result['ok'] and os.path.exists(out_path)
+
+
+def decode_to_wav(instance, media_path, out_path, start_ms=None, end_ms=None,
+                  sample_rate=DEFAULT_SAMPLE_RATE, channels=DEFAULT_CHANNELS, **kwargs):
+    """把媒体文件（或其中一段）解码为16位PCM WAV文件"""
+    return transcode_file(instance, media_path, out_path, start_ms, end_ms,
+                          acodec='s16l', mux='wav', sample_rate=sample_rate, channels=channels, **kwargs)
+
+
+def read_wav(path):
+    """读取WAV文件，返回 (采样率, 声道数, PCM数据)"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"不支持的采样位数: {wav.getsampwidth() * 8}")
+        return wav.getframerate(), wav.getnchannels(), wav.readframes(wav.getnframes())
+
+
+def wav_bytes(sample_rate, channels, pcm):
+    """把PCM数据封装为内存中的WAV文件"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
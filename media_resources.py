@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VLC资源管理
+libvlc的实例、播放器和媒体都是引用计数的C对象，python-vlc在Python对象被回收时不会释放它们：
+每次加载文件都新建一个 vlc.Media 而不释放，自动连播几个小时后内存会持续增长。
+
+MediaResources 拥有一个VLC实例以及由它创建的所有播放器和媒体：
+- 文件媒体按路径保留最近使用的几个，在上一个/下一个文件之间来回切换时直接复用，超出时释放最久未用的；
+- 内存数据的媒体（内存复读的句子片段）每个播放器只保留当前一个，换片段时释放上一个；
+- close() 按 停止并释放播放器 → 释放媒体 → 释放实例 的顺序拆除，之后不能再使用。
+"""
+
+from collections import OrderedDict
+
+import vlc
+
+
+# 按路径保留的文件媒体数：当前文件和上一个文件
+DEFAULT_MEDIA_KEEP = 2
+
+# libvlc均衡器前置放大的范围（分贝）
+MAX_PREAMP_DB = 20.0
+
+
+class MediaResources:
+    """一个VLC实例及其播放器和媒体的所有者
+
+    Raises:
+        RuntimeError: 无法创建VLC实例（如没有安装VLC）
+    """
+
+    def __init__(self, instance_args=(), media_keep=DEFAULT_MEDIA_KEEP):
+        self.instance = vlc.Instance(*instance_args)
+        if self.instance is None:
+            raise RuntimeError("无法创建VLC实例")
+        self.media_keep = media_keep
+        self.players = []
+        self._media = OrderedDict()     # 文件路径 -> vlc.Media，最后一项最近使用
+        self._stream_media = {}         # 播放器 -> 当前内存媒体
+        self.created_media = 0
+        self.released_media = 0
+
+    @property
+    def closed(self):
+        return self.instance is None
+
+    def live_media_count(self):
+        """当前持有的媒体数"""
+        return len(self._media) + len(self._stream_media)
+
+    def new_player(self):
+        """创建播放器，close() 时释放"""
+        player = self.instance.media_player_new()
+        self.players.append(player)
+        return player
+
+    def release_player(self, player):
+        """停止并释放一个播放器及其内存媒体"""
+        if player not in self.players:
+            return
+        self.players.remove(player)
+        player.stop()
+        player.release()
+        self._release(self._stream_media.pop(player, None))
+
+    def media(self, media_path):
+        """返回文件的媒体对象，最近用过的直接复用"""
+        media = self._media.get(media_path)
+        if media is not None:
+            self._media.move_to_end(media_path)
+            return media
+        media = self.instance.media_new(media_path)
+        self.created_media += 1
+        self._media[media_path] = media
+        while len(self._media) > self.media_keep:
+            # 播放器仍在使用的媒体由播放器自己的引用保留，这里只放掉本对象的引用
+            self._release(self._media.popitem(last=False)[1])
+        return media
+
+    def load(self, player, media_path):
+        """让播放器加载文件"""
+        player.set_media(self.media(media_path))
+
+    def load_stream(self, player, stream):
+        """让播放器加载内存数据（提供 create_media(instance) 的对象），释放该播放器上一个内存媒体"""
+        media = stream.create_media(self.instance)
+        self.created_media += 1
+        player.set_media(media)
+        self._release(self._stream_media.pop(player, None))
+        self._stream_media[player] = media
+
+    def set_gain(self, player, gain_db):
+        """用均衡器的前置放大调整播放器的音量（分贝，±20），为0时关闭均衡器；播放中也立即生效"""
+        if abs(gain_db) < 0.05:
+            player.set_equalizer(None)
+            return
+        equalizer = vlc.AudioEqualizer()
+        try:
+            equalizer.set_preamp(max(-MAX_PREAMP_DB, min(MAX_PREAMP_DB, gain_db)))
+            # 播放器保存的是均衡器的副本，这里的对象可以立即释放
+            player.set_equalizer(equalizer)
+        finally:
+            equalizer.release()
+
+    def _release(self, media):
+        if media is not None:
+            media.release()
+            self.released_media += 1
+
+    def close(self):
+        """停止并释放所有播放器、媒体和VLC实例，可以重复调用"""
+        if self.instance is None:
+            return
+        for player in list(self.players):
+            self.release_player(player)
+        while self._media:
+            self._release(self._media.popitem()[1])
+        self.instance.release()
+        self.instance = None
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+独立进程播放引擎
+libvlc 运行在单独的子进程中，界面进程只通过管道收发很小的消息，
+打开损坏的文件、设备响应慢导致 stop() 卡住，或者libvlc崩溃，都不会让界面卡死或退出。
+
+消息为 marshal 编码的元组：
+    请求  (请求id, 命令, 参数...)
+    回复  (MSG_REPLY, 请求id, 结果) 或 (MSG_ERROR, 请求id, 错误信息)
+    推送  (MSG_STATUS, 位置ms, 时长ms, 状态, 跳转序号)  状态变化时由引擎主动发送
+请求是异步的，发送后立即返回 Future；界面读取位置时直接使用最近一次推送的状态，不需要等待引擎。
+引擎进程退出或请求超时没有回复时自动重启，并恢复窗口、媒体、位置和播放状态。
+"""
+
+import marshal
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from player_metrics import metrics, METRIC_PLAY_TO_AUDIO, METRIC_ENGINE_REQUEST
+from repeat_engine import PlaybackBackend
+
+
+MSG_REPLY = 0
+MSG_ERROR = 1
+MSG_STATUS = 2
+
+# 与 vlc.State 的取值一致
+STATE_NOTHING = 0
+STATE_PLAYING = 3
+STATE_PAUSED = 4
+STATE_ENDED = 6
+STATE_ERROR = 7
+
+# 引擎检查请求和推送状态的间隔（秒）
+STATUS_INTERVAL = 0.05
+
+# 请求超过该时间没有回复时认为引擎卡住，重启引擎（秒）
+REQUEST_TIMEOUT = 5.0
+
+# 连续重启的等待时间上限（秒），引擎稳定运行这么久后重新计数
+MAX_RESTART_DELAY = 5.0
+STABLE_RUN_TIME = 10.0
+
+
+class EngineError(Exception):
+    """引擎重启或请求失败"""
+
+
+# ---- 引擎进程 ----
+
+def _engine_main(conn, instance_args, initial_seek_serial=0):
+    """引擎进程入口：执行请求并推送播放状态
+
+    Args:
+        initial_seek_serial: 客户端当前的跳转序号，重启后的状态推送不会被客户端当作过期状态丢弃
+    """
+    from media_resources import MediaResources
+
+    resources = MediaResources(instance_args)
+    player = resources.new_player()
+    seek_serial = [initial_seek_serial]
+
+    def load(media_path, serial):
+        seek_serial[0] = serial
+        resources.load(player, media_path)
+        return True
+
+    def seek(position_ms, serial):
+        seek_serial[0] = serial
+        media = player.get_media()
+        if media:
+            length = media.get_duration()
+            if length > 0:
+                player.set_position(position_ms / length)
+
+    def set_window(window_id):
+        if sys.platform == "win32":
+            player.set_hwnd(window_id)
+        else:
+            player.set_xwindow(window_id)
+
+    handlers = {
+        'load': load,
+        'play': lambda: player.play() == 0,
+        'pause': lambda: player.set_pause(1),
+        'stop': player.stop,
+        'seek': seek,
+        'set_window': set_window,
+        'set_gain': lambda gain_db: resources.set_gain(player, gain_db),
+        'ping': lambda: True,
+    }
+
+    last_status = None
+    while True:
+        if conn.poll(STATUS_INTERVAL):
+            try:
+                message = marshal.loads(conn.recv_bytes())
+            except (EOFError, OSError):
+                break
+            request_id, command, args = message[0], message[1], message[2:]
+            if command == 'quit':
+                break
+            try:
+                reply = (MSG_REPLY, request_id, handlers[command](*args))
+            except Exception as e:
+                reply = (MSG_ERROR, request_id, f"{command}: {e}")
+            conn.send_bytes(marshal.dumps(reply))
+
+        media = player.get_media()
+        length = media.get_duration() if media else 0
+        position = int(player.get_position() * length) if length > 0 else 0
+        status = (MSG_STATUS, position, length, player.get_state().value, seek_serial[0])
+        if status != last_status:
+            conn.send_bytes(marshal.dumps(status))
+            last_status = status
+
+    resources.close()
+
+
+# ---- 界面进程 ----
+
+class PlaybackEngineClient:
+    """播放引擎客户端
+
+    所有请求都是异步的；position_ms / length_ms / state 是引擎最近一次推送的状态。
+    回复和推送在读取线程中处理，on_status 回调也在读取线程中调用。
+    """
+
+    def __init__(self, instance_args=(), request_timeout=REQUEST_TIMEOUT, on_status=None):
+        self.instance_args = tuple(instance_args)
+        self.request_timeout = request_timeout
+        self.on_status = on_status
+        self.position_ms = 0
+        self.length_ms = 0
+        self.state = STATE_NOTHING
+        self.status_time = time.monotonic()
+        self.restarts = 0
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending = {}   # 请求id -> (Future, 发送时间)
+        self._next_id = 1
+        self._seek_serial = 0
+        self._process = None
+        self._conn = None
+        self._started_at = 0.0
+        self._failures = 0
+        self._closed = False
+        self._monitor = None
+
+        # 重启后需要恢复的状态
+        self._window_id = None
+        self._media_path = None
+        self._playing = False
+        self._gain_db = 0.0
+
+    def start(self):
+        """启动引擎进程和监视线程"""
+        self._spawn()
+        self._monitor = threading.Thread(target=self._run_monitor, name="PlaybackEngineMonitor", daemon=True)
+        self._monitor.start()
+
+    def close(self, timeout=1.0):
+        """关闭引擎进程"""
+        self._closed = True
+        self._send(0, 'quit')
+        process = self._process
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self._fail_pending("引擎已关闭")
+
+    def _spawn(self):
+        context = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_engine_main, args=(child_conn, self.instance_args, self._seek_serial),
+                                  name="PlaybackEngine", daemon=True)
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self._conn = parent_conn
+            self._process = process
+            self._started_at = time.monotonic()
+        reader = threading.Thread(target=self._run_reader, args=(parent_conn,), name="PlaybackEngineReader", daemon=True)
+        reader.start()
+
+    def _send(self, request_id, command, *args):
+        conn = self._conn
+        if conn is None:
+            return False
+        try:
+            with self._send_lock:
+                conn.send_bytes(marshal.dumps((request_id, command) + args))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def request(self, command, *args):
+        """发送请求，返回 Future；引擎重启时未完成的请求以 EngineError 结束"""
+        future = Future()
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = (future, time.monotonic())
+        if not self._send(request_id, command, *args):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            future.set_exception(EngineError(f"引擎不可用: {command}"))
+        return future
+
+    def _run_reader(self, conn):
+        """读取回复和状态推送，连接断开时退出，由监视线程重启引擎"""
+        while True:
+            try:
+                message = marshal.loads(conn.recv_bytes())
+            except (EOFError, OSError, ValueError):
+                break
+            kind = message[0]
+            if kind == MSG_STATUS:
+                self._on_status(*message[1:])
+                continue
+            with self._lock:
+                entry = self._pending.pop(message[1], None)
+            if entry is None:
+                continue
+            future, sent_at = entry
+            metrics.record(METRIC_ENGINE_REQUEST, (time.monotonic() - sent_at) * 1000.0)
+            if kind == MSG_REPLY:
+                future.set_result(message[2])
+            else:
+                print(f"播放引擎请求失败: {message[2]}")
+                future.set_exception(EngineError(message[2]))
+
+    def _on_status(self, position_ms, length_ms, state, seek_serial):
+        if seek_serial < self._seek_serial:
+            # 引擎还没处理最新的跳转，丢弃旧位置
+            return
+        if state == STATE_PLAYING and self.state == STATE_PLAYING and position_ms != self.position_ms:
+            metrics.end(METRIC_PLAY_TO_AUDIO)
+        self.position_ms = position_ms
+        self.length_ms = length_ms
+        self.state = state
+        self.status_time = time.monotonic()
+        if self.on_status:
+            self.on_status(position_ms, length_ms, state)
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            future.set_exception(EngineError(reason))
+
+    def _run_monitor(self):
+        """检查引擎进程是否退出或卡住，需要时重启"""
+        while not self._closed:
+            time.sleep(STATUS_INTERVAL * 4)
+            if self._closed:
+                break
+            now = time.monotonic()
+            with self._lock:
+                oldest = min((sent_at for _, sent_at in self._pending.values()), default=None)
+            process = self._process
+            if process is not None and process.is_alive():
+                if oldest is None or now - oldest < self.request_timeout:
+                    if now - self._started_at > STABLE_RUN_TIME:
+                        self._failures = 0
+                    continue
+                print(f"播放引擎超过 {self.request_timeout:.0f} 秒没有响应，正在重启")
+                process.kill()
+            else:
+                print(f"播放引擎已退出（退出码 {process.exitcode if process else None}），正在重启")
+            self._restart()
+
+    def _restart(self):
+        self._fail_pending("播放引擎已重启")
+        if self._process is not None:
+            self._process.join(1.0)
+        delay = min(MAX_RESTART_DELAY, 0.25 * (2 ** self._failures))
+        self._failures += 1
+        time.sleep(delay)
+        if self._closed:
+            return
+        self.restarts += 1
+        metrics.increment('engine_restarts')
+        position_ms = self.current_position()
+        self._spawn()
+        # 恢复重启前的窗口、媒体、位置和播放状态
+        if self._window_id is not None:
+            self.request('set_window', self._window_id)
+        if self._gain_db:
+            self.request('set_gain', self._gain_db)
+        if self._media_path:
+            self.request('load', self._media_path, self._seek_serial)
+            if position_ms > 0:
+                self.seek(position_ms)
+            if self._playing:
+                self.request('play')
+
+    # ---- 播放命令 ----
+
+    def set_window(self, window_id):
+        self._window_id = window_id
+        return self.request('set_window', window_id)
+
+    def set_gain(self, gain_db):
+        self._gain_db = gain_db
+        return self.request('set_gain', gain_db)
+
+    def load(self, media_path):
+        self._media_path = media_path
+        self._playing = False
+        self.position_ms = 0
+        self.length_ms = 0
+        self.status_time = time.monotonic()
+        return self.request('load', media_path, self._seek_serial)
+
+    def play(self):
+        self._playing = True
+        return self.request('play')
+
+    def pause(self):
+        self._playing = False
+        return self.request('pause')
+
+    def stop(self):
+        self._playing = False
+        return self.request('stop')
+
+    def seek(self, position_ms):
+        self._seek_serial += 1
+        # 在引擎回报新位置之前先按目标位置计算
+        self.position_ms = int(position_ms)
+        self.status_time = time.monotonic()
+        return self.request('seek', int(position_ms), self._seek_serial)
+
+    def current_position(self):
+        """当前播放位置（毫秒），播放中按最近一次推送的位置和经过的时间推算"""
+        position = self.position_ms
+        if self.state == STATE_PLAYING and self._playing:
+            position += int((time.monotonic() - self.status_time) * 1000.0)
+            if self.length_ms > 0:
+                position = min(position, self.length_ms)
+        return position
+
+
+class EngineBackend(PlaybackBackend):
+    """通过独立进程播放引擎播放的后端，所有调用都不会阻塞界面"""
+
+    def __init__(self, client, scheduler):
+        self.client = client
+        self.scheduler = scheduler
+
+    def play(self):
+        self.client.play()
+        return True
+
+    def pause(self):
+        self.client.pause()
+
+    def stop(self):
+        self.client.stop()
+
+    def seek(self, position_ms):
+        self.client.seek(position_ms)
+        metrics.increment('seek_count')
+
+    def get_position(self):
+        return self.client.current_position()
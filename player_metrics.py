@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播放性能指标
+使用单调时钟记录关键路径的耗时，按固定分桶统计直方图，并支持导出JSON
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+# 默认分桶上限（毫秒），最后一个桶之外的数据计入溢出桶
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# 播放器内置的指标名称
+METRIC_PLAY_TO_AUDIO = 'play_click_to_audio'    # 点击播放到听到声音
+METRIC_LOOP_OVERSHOOT = 'loop_overshoot'         # 循环结束点的越界量
+METRIC_SEEK_SETTLE = 'seek_settle'               # 跳转定位稳定耗时
+METRIC_FILE_SWITCH = 'file_switch'               # 切换播放列表文件耗时
+METRIC_SENTENCE_DECODE = 'sentence_decode'       # 内存复读解码一句耗时
+METRIC_SENTENCE_SEARCH = 'sentence_search'       # 全文搜索一次耗时
+METRIC_ENGINE_REQUEST = 'engine_request'         # 独立进程播放引擎请求往返耗时
+
+METRIC_TITLES = {
+    METRIC_PLAY_TO_AUDIO: "点击播放到出声",
+    METRIC_LOOP_OVERSHOOT: "循环结束越界",
+    METRIC_SEEK_SETTLE: "定位稳定时间",
+    METRIC_FILE_SWITCH: "文件切换时间",
+    METRIC_SENTENCE_DECODE: "句子解码时间",
+    METRIC_SENTENCE_SEARCH: "句子搜索时间",
+    METRIC_ENGINE_REQUEST: "播放引擎请求往返",
+}
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value_ms):
+        """记录一个数值（毫秒）"""
+        # bisect_left 使等于上限的数值落在该桶内
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if self.min is None or value_ms < self.min:
+            self.min = value_ms
+        if self.max is None or value_ms > self.max:
+            self.max = value_ms
+
+    def mean(self):
+        """平均值"""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """按分桶估算百分位数，返回所在桶的上限"""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                if i < len(self.buckets):
+                    return min(float(self.buckets[i]), self.max)
+                return self.max
+        return self.max
+
+    def to_dict(self):
+        """转换为可序列化的字典"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean(), 3),
+            'min_ms': round(self.min, 3) if self.min is not None else None,
+            'max_ms': round(self.max, 3) if self.max is not None else None,
+            'p50_ms': round(self.percentile(50), 3),
+            'p90_ms': round(self.percentile(90), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'buckets_ms': list(self.buckets),
+            'counts': list(self.counts),
+        }
+
+
+class PlayerMetrics:
+    """播放器性能指标收集器
+
+    span 使用 time.perf_counter() 单调时钟计时；同名 span 同时只保留一个，
+    重新 begin 会覆盖尚未结束的旧 span。VLC 事件回调在其它线程触发，所以所有操作都加锁。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.histograms = {}
+        self.counters = {}
+        self._open_spans = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = LatencyHistogram(self.buckets)
+            self.histograms[name] = histogram
+        return histogram
+
+    def begin(self, name):
+        """开始一个计时区间"""
+        with self._lock:
+            self._open_spans[name] = time.perf_counter()
+
+    def end(self, name):
+        """结束计时区间并记录耗时，返回耗时毫秒；区间不存在时返回None"""
+        now = time.perf_counter()
+        with self._lock:
+            started = self._open_spans.pop(name, None)
+            if started is None:
+                return None
+            elapsed_ms = (now - started) * 1000.0
+            self._histogram(name).record(elapsed_ms)
+            return elapsed_ms
+
+    def cancel(self, name):
+        """放弃计时区间，不记录"""
+        with self._lock:
+            self._open_spans.pop(name, None)
+
+    def is_open(self, name):
+        """计时区间是否正在进行"""
+        with self._lock:
+            return name in self._open_spans
+
+    @contextmanager
+    def span(self, name):
+        """以上下文管理器的方式计时"""
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def record(self, name, value_ms):
+        """直接记录一个数值（毫秒）"""
+        with self._lock:
+            self._histogram(name).record(value_ms)
+
+    def increment(self, name, amount=1):
+        """计数器加一"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        """清空所有统计数据"""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self._open_spans.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """获取当前统计数据的快照"""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'exported_at': time.time(),
+                'histograms': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def export_json(self, path):
+        """导出统计数据为JSON文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def format_report(self):
+        """生成文本报告，用于统计界面显示"""
+        data = self.snapshot()
+        lines = []
+        for name, h in data['histograms'].items():
+            title = METRIC_TITLES.get(name, name)
+            lines.append(f"{title} ({name})")
+            lines.append(f"  次数={h['count']}  平均={h['mean_ms']:.1f}ms  "
+                         f"最小={h['min_ms']:.1f}ms  最大={h['max_ms']:.1f}ms")
+            lines.append(f"  P50={h['p50_ms']:.1f}ms  P90={h['p90_ms']:.1f}ms  P99={h['p99_ms']:.1f}ms")
+            peak = max(h['counts']) or 1
+            lower = 0
+            for upper, count in zip(h['buckets_ms'] + [None], h['counts']):
+                label = f"{lower}-{upper}ms" if upper is not None else f">{lower}ms"
+                bar = '#' * int(round(count * 30 / peak))
+                lines.append(f"  {label:>12} | {bar} {count}")
+                if upper is not None:
+                    lower = upper
+            lines.append("")
+        if data['counters']:
+            lines.append("计数器")
+            for name, value in data['counters'].items():
+                lines.append(f"  {name}: {value}")
+        if not lines:
+            lines.append("暂无统计数据")
+        return "\n".join(lines)
+
+
+# 全局指标实例，播放器各处共用
+metrics = PlayerMetrics()
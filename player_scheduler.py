@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播放器统一调度器
+所有延迟调用和周期任务都由一个调度器管理。任务可以归属于一个作用域（当前句子、当前文件），
+切换句子或文件时调用 new_generation 使该作用域下尚未执行的任务全部失效，
+避免旧句子的回调在新句子上执行造成多余的跳转。
+
+调度器本身与Qt无关：由驱动层在 next_due() 时刻调用 run_due()。
+Qt驱动见 english_listening_player.QtSchedulerDriver，模拟时钟见 repeat_engine.SimulatedBackend。
+"""
+
+import heapq
+
+from player_metrics import metrics
+
+
+# 作用域：切换文件时同时使句子作用域失效
+SCOPE_FILE = 'file'
+SCOPE_SENTENCE = 'sentence'
+SCOPE_CHILDREN = {
+    SCOPE_FILE: (SCOPE_SENTENCE,),
+}
+
+# 堆中失效任务超过该比例时整理一次
+_COMPACT_RATIO = 0.5
+_COMPACT_MIN_SIZE = 64
+
+
+class ScheduledTask:
+    """调度任务句柄"""
+
+    __slots__ = ('due', 'seq', 'callback', 'scope', 'generation', 'interval', 'cancelled')
+
+    def __init__(self, due, seq, callback, scope, generation, interval):
+        self.due = due
+        self.seq = seq
+        self.callback = callback
+        self.scope = scope
+        self.generation = generation
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        """取消任务"""
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return (self.due, self.seq) < (other.due, other.seq)
+
+
+class Scheduler:
+    """基于最小堆的调度器
+
+    Args:
+        now_fn: 返回当前时间（毫秒，单调递增）的函数
+    """
+
+    def __init__(self, now_fn):
+        self.now_fn = now_fn
+        self.on_reschedule = None   # 最早到期时间变化时调用，参数为新的到期时间（没有任务时为None）
+        self._heap = []
+        self._seq = 0
+        self._generations = {}
+        self._running = False
+
+    def generation(self, scope):
+        """获取作用域的当前代数"""
+        return self._generations.get(scope, 0)
+
+    def new_generation(self, scope):
+        """开始作用域的新一代，使该作用域（及其子作用域）下所有未执行的任务失效"""
+        scopes = [scope]
+        while scopes:
+            current = scopes.pop()
+            self._generations[current] = self._generations.get(current, 0) + 1
+            scopes.extend(SCOPE_CHILDREN.get(current, ()))
+        self._maybe_compact()
+        if not self._running and self.on_reschedule:
+            self.on_reschedule(self.next_due())
+        return self._generations[scope]
+
+    def call_later(self, delay_ms, callback, scope=None):
+        """延迟delay_ms毫秒后执行一次callback"""
+        return self._push(delay_ms, callback, scope, None)
+
+    def call_every(self, interval_ms, callback, scope=None):
+        """每隔interval_ms毫秒执行一次callback，直到取消或作用域失效"""
+        return self._push(interval_ms, callback, scope, interval_ms)
+
+    def _push(self, delay_ms, callback, scope, interval):
+        self._seq += 1
+        task = ScheduledTask(self.now_fn() + max(0, delay_ms), self._seq, callback,
+                             scope, self.generation(scope), interval)
+        heapq.heappush(self._heap, task)
+        if not self._running and self._heap[0] is task and self.on_reschedule:
+            self.on_reschedule(task.due)
+        return task
+
+    def is_live(self, task):
+        """任务是否仍然有效（未取消且作用域未失效）"""
+        if task.cancelled:
+            return False
+        return task.scope is None or task.generation == self._generations.get(task.scope, 0)
+
+    def _maybe_compact(self):
+        """清理堆中已经失效的任务，避免频繁切换句子时堆无限增长"""
+        if len(self._heap) < _COMPACT_MIN_SIZE:
+            return
+        live = [task for task in self._heap if self.is_live(task)]
+        if len(live) < len(self._heap) * _COMPACT_RATIO:
+            metrics.increment('scheduler_discarded', len(self._heap) - len(live))
+            heapq.heapify(live)
+            self._heap = live
+
+    def next_due(self):
+        """最早一个有效任务的到期时间，没有任务时返回None"""
+        while self._heap and not self.is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+            metrics.increment('scheduler_discarded')
+        return self._heap[0].due if self._heap else None
+
+    def pending_count(self):
+        """有效任务数量"""
+        return sum(1 for task in self._heap if self.is_live(task))
+
+    def run_due(self, now=None):
+        """执行所有已到期的任务，返回执行的任务数"""
+        if now is None:
+            now = self.now_fn()
+        executed = 0
+        self._running = True
+        try:
+            while self._heap and self._heap[0].due <= now:
+                task = heapq.heappop(self._heap)
+                if not self.is_live(task):
+                    metrics.increment('scheduler_discarded')
+                    continue
+                if task.interval is not None:
+                    # 周期任务先重新入堆，回调中可以取消它；错过的周期直接跳过
+                    task.due += task.interval
+                    if task.due <= now:
+                        task.due = now + task.interval
+                    heapq.heappush(self._heap, task)
+                else:
+                    task.cancelled = True
+                executed += 1
+                try:
+                    task.callback()
+                except Exception as e:
+                    print(f"调度任务执行出错: {e}")
+        finally:
+            self._running = False
+        metrics.increment('scheduler_wakeups')
+        if self.on_reschedule:
+            self.on_reschedule(self.next_due())
+        return executed
+
+
+class Debouncer:
+    """合并短时间内的多次请求
+
+    每次 request() 都把执行时间推迟到 delay_ms 之后，连续请求结束后只执行一次回调。
+    leading=True 时一轮中的第一次请求立即执行，此后 delay_ms 内的请求合并，在最后一次请求 delay_ms 之后再执行一次；
+    单独的一次请求不必等待。
+    """
+
+    def __init__(self, scheduler, delay_ms, callback, scope=None, leading=False):
+        self.scheduler = scheduler
+        self.delay_ms = delay_ms
+        self.callback = callback
+        self.scope = scope
+        self.leading = leading
+        self._task = None
+        self._waiting = False   # 是否有尚未执行的请求
+        self.merged = 0         # 这一次执行合并的请求数
+
+    @property
+    def active(self):
+        """是否在一轮连续请求中（最后一次请求后还没过 delay_ms）"""
+        return self._task is not None and self.scheduler.is_live(self._task)
+
+    @property
+    def pending(self):
+        """是否有尚未执行的请求"""
+        return self._waiting and self.active
+
+    def request(self):
+        """请求执行一次，覆盖尚未执行的旧请求"""
+        active = self.active
+        if not self.pending:
+            self.merged = 0
+        if active:
+            self._task.cancel()
+        self.merged += 1
+        self._task = self.scheduler.call_later(self.delay_ms, self._fire, scope=self.scope)
+        if self.leading and not active:
+            self._waiting = False
+            self.callback()
+        else:
+            self._waiting = True
+
+    def flush(self):
+        """立即执行尚未执行的请求"""
+        if self.pending:
+            self._task.cancel()
+            self._fire()
+
+    def cancel(self):
+        """放弃尚未执行的请求"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._waiting = False
+
+    def _fire(self):
+        self._task = None
+        if self._waiting:
+            self._waiting = False
+            self.callback()
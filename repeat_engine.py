@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+复读状态机
+与Qt和VLC无关的句子循环/复读逻辑，通过播放后端接口驱动实际播放。
+VLC后端见 english_listening_player.VLCBackend，本模块提供模拟时钟后端用于测试和基准测试。
+"""
+
+from player_metrics import metrics, METRIC_LOOP_OVERSHOOT
+from player_scheduler import Scheduler, SCOPE_SENTENCE
+
+
+# 循环位置检查间隔（毫秒）
+LOOP_POLL_INTERVAL_MS = 100
+
+# 跳转后连续多少次检查位置仍未生效时重新跳转
+SEEK_RETRY_POLLS = 5
+
+# 判断跳转已生效时允许的提前量（毫秒）
+SEEK_LANDED_TOLERANCE_MS = 500
+
+
+class PlaybackBackend:
+    """播放后端接口
+
+    状态机只通过这些方法控制播放，延迟调用通过后端的 scheduler（player_scheduler.Scheduler）完成，
+    后端负责把它们映射到VLC和Qt定时器，或者模拟时钟。
+    """
+
+    scheduler = None
+
+    def play(self):
+        """开始播放，成功返回True"""
+        raise NotImplementedError
+
+    def pause(self):
+        """暂停播放"""
+        raise NotImplementedError
+
+    def stop(self):
+        """停止播放"""
+        raise NotImplementedError
+
+    def seek(self, position_ms):
+        """跳转到指定位置（毫秒）"""
+        raise NotImplementedError
+
+    def get_position(self):
+        """获取当前播放位置（毫秒）"""
+        raise NotImplementedError
+
+
+class RepeatStateMachine:
+    """句子循环与复读状态机
+
+    set_loop 设置当前句子的区间后，播放期间每隔 LOOP_POLL_INTERVAL_MS 检查一次播放位置：
+    越过结束点时累计复读次数，按设置跳回开头、暂停等待间隔，或在复读完成后通知自动下一句。
+    所有定时任务都属于句子作用域，调用方切换句子时使该作用域失效即可取消。
+
+    跳回开头后，播放器在跳转生效前可能仍报告旧位置，此时不会重复计数，
+    连续 SEEK_RETRY_POLLS 次未生效才重新跳转。
+    """
+
+    def __init__(self, backend, on_repeat_completed=None, verbose=True, on_repeat=None):
+        """
+        Args:
+            backend: PlaybackBackend 实例
+            on_repeat_completed: 复读完成且开启自动下一句时调用的函数
+            verbose: 是否打印复读过程信息
+            on_repeat: 每播完一遍时调用 on_repeat(已复读次数, 设定的复读次数)
+        """
+        self.backend = backend
+        self.scheduler = backend.scheduler
+        self.on_repeat_completed = on_repeat_completed
+        self.on_repeat = on_repeat
+        self.verbose = verbose
+
+        # 循环播放相关变量
+        self.is_looping = False
+        self.loop_start = 0
+        self.loop_end = 0
+        self._poll_handle = None
+        self._seek_pending = False
+        self._stale_polls = 0
+
+        # 播放状态
+        self.is_playing = False
+
+        # 复读设置
+        self.repeat_count = 0
+        self.current_repeat = 0
+        self.repeat_interval = 0
+        self.auto_next = False
+        self._repeat_handle = None
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def play(self):
+        """开始播放"""
+        if self.backend.play():
+            self.is_playing = True
+            if self.is_looping and self._poll_handle is None:
+                self._schedule_poll()
+            return True
+        return False
+
+    def pause(self):
+        """暂停播放，暂停期间不检查循环位置"""
+        self.backend.pause()
+        self.is_playing = False
+        self._cancel_poll()
+
+    def stop(self):
+        """停止播放"""
+        self.backend.stop()
+        self.is_playing = False
+        self.stop_loop()
+
+    def set_loop(self, start_ms, end_ms, seek=True):
+        """设置循环播放区间
+
+        Args:
+            seek: 是否跳转到区间开头；调用方已经定位到开头时传False，避免重复跳转
+        """
+        self.loop_start = start_ms
+        self.loop_end = end_ms
+        self.is_looping = True
+
+        # 设置初始位置
+        if seek:
+            self._seek_to_loop_start()
+
+        # 启动循环检查
+        self._cancel_poll()
+        if self.is_playing:
+            self._schedule_poll()
+
+    def _seek_to_loop_start(self):
+        self.backend.seek(self.loop_start)
+        self._seek_pending = True
+        self._stale_polls = 0
+
+    def stop_loop(self):
+        """停止循环播放"""
+        self.is_looping = False
+        self._cancel_poll()
+
+    def _schedule_poll(self):
+        self._poll_handle = self.scheduler.call_every(LOOP_POLL_INTERVAL_MS, self.check_loop_position,
+                                                      scope=SCOPE_SENTENCE)
+
+    def _cancel_poll(self):
+        if self._poll_handle is not None:
+            self._poll_handle.cancel()
+            self._poll_handle = None
+
+    def _start_repeat_timer(self):
+        if self._repeat_handle is not None:
+            self._repeat_handle.cancel()
+        self._repeat_handle = self.scheduler.call_later(self.repeat_interval * 1000,
+                                                        self.handle_repeat_complete,
+                                                        scope=SCOPE_SENTENCE)
+
+    def check_loop_position(self):
+        """检查循环位置，实现自动循环"""
+        if self.is_looping and self.is_playing:
+            current_pos = self.backend.get_position()
+
+            # 跳转尚未生效时播放器报告的还是旧位置，不能据此计数
+            if self._seek_pending:
+                if self.loop_start - SEEK_LANDED_TOLERANCE_MS <= current_pos < self.loop_end:
+                    self._seek_pending = False
+                else:
+                    metrics.increment('stale_position_skips')
+                    self._stale_polls += 1
+                    if self._stale_polls >= SEEK_RETRY_POLLS:
+                        self._seek_to_loop_start()
+                    return
+
+            # 如果播放位置超过循环结束点，跳回循环开始点
+            if current_pos >= self.loop_end:
+                # 记录越过循环结束点的距离
+                metrics.record(METRIC_LOOP_OVERSHOOT, current_pos - self.loop_end)
+
+                # 更新复读计数
+                self.current_repeat += 1
+                self._log(f"复读计数: {self.current_repeat}/{self.repeat_count}")
+                if self.on_repeat:
+                    self.on_repeat(self.current_repeat, self.repeat_count)
+
+                # 检查是否达到设定的复读次数
+                if self.repeat_count > 0 and self.current_repeat >= self.repeat_count:
+                    # 达到复读次数，停止循环
+                    self._log(f"达到复读次数 {self.repeat_count}，停止循环")
+                    self.stop_loop()
+                    # 如果有复读间隔，先暂停播放，等待间隔时间
+                    if self.repeat_interval > 0:
+                        self._log(f"复读间隔 {self.repeat_interval} 秒")
+                        self.pause()
+                        self._start_repeat_timer()
+                    else:
+                        self.handle_repeat_complete()
+                else:
+                    # 如果还有复读次数，检查是否需要间隔
+                    if self.repeat_interval > 0 and self.current_repeat > 0:
+                        # 暂停播放，等待间隔时间后再继续
+                        self._log(f"复读间隔 {self.repeat_interval} 秒")
+                        self.pause()
+                        self._start_repeat_timer()
+                    else:
+                        # 继续循环播放
+                        self._log("继续循环播放")
+                        self._seek_to_loop_start()
+
+    def handle_repeat_complete(self):
+        """处理复读间隔结束或复读完成后的逻辑"""
+        self._repeat_handle = None
+
+        # 检查是复读间隔还是复读完成
+        if self.current_repeat < self.repeat_count:
+            # 这是复读间隔，继续播放
+            self._seek_to_loop_start()
+            self.play()
+        else:
+            # 这是复读完成，如果设置了自动跳到下一句，通知调用方
+            if self.auto_next and self.on_repeat_completed:
+                self.on_repeat_completed()
+
+    def set_repeat_settings(self, repeat_count, repeat_interval, auto_next):
+        """设置复读参数"""
+        self.repeat_count = repeat_count
+        self.repeat_interval = repeat_interval
+        self.auto_next = auto_next
+        self.current_repeat = 0
+
+    def reset_repeat_count(self):
+        """重置复读计数"""
+        self.current_repeat = 0
+
+
+class SimulatedBackend(PlaybackBackend):
+    """模拟时钟播放后端
+
+    时间只在 advance/run_until 中推进，定时器按到期顺序同步触发，
+    所以可以远快于真实时间地重放大量复读过程，且结果完全确定。
+    """
+
+    def __init__(self, duration_ms, seek_latency_ms=0):
+        """
+        Args:
+            duration_ms: 模拟媒体的总时长
+            seek_latency_ms: 跳转后需要多久位置才生效，用于模拟慢速设备
+        """
+        self.duration_ms = duration_ms
+        self.seek_latency_ms = seek_latency_ms
+        self.now_ms = 0
+        self.playing = False
+        self._position_ms = 0       # 上次状态变化时的位置
+        self._position_at = 0       # 上次状态变化时的时钟
+        self._pending_seek = None   # (生效时间, 目标位置)
+        self.scheduler = Scheduler(lambda: self.now_ms)
+        self.seek_count = 0
+        self.play_count = 0
+
+    def _current_position(self):
+        if self._pending_seek and self._pending_seek[0] <= self.now_ms:
+            # 跳转已经生效，从生效时刻开始计算
+            due, target = self._pending_seek
+            position = target + (self.now_ms - due if self.playing else 0)
+        else:
+            position = self._position_ms
+            if self.playing:
+                position += self.now_ms - self._position_at
+        return min(position, self.duration_ms)
+
+    def _settle(self):
+        """把当前位置固定下来，在播放状态或位置变化前调用"""
+        self._position_ms = self._current_position()
+        self._position_at = self.now_ms
+        if self._pending_seek and self._pending_seek[0] <= self.now_ms:
+            self._pending_seek = None
+
+    def play(self):
+        self._settle()
+        self.playing = True
+        self.play_count += 1
+        return True
+
+    def pause(self):
+        self._settle()
+        self.playing = False
+
+    def stop(self):
+        self._settle()
+        self.playing = False
+        self._position_ms = 0
+        self._pending_seek = None
+
+    def seek(self, position_ms):
+        self._settle()
+        self.seek_count += 1
+        target = max(0, min(position_ms, self.duration_ms))
+        if self.seek_latency_ms > 0:
+            self._pending_seek = (self.now_ms + self.seek_latency_ms, target)
+        else:
+            self._position_ms = target
+
+    def get_position(self):
+        self._settle()
+        return self._current_position()
+
+    def _run_next(self, limit_ms):
+        """执行下一批到期任务，没有任务或超过limit_ms时返回False"""
+        due = self.scheduler.next_due()
+        if due is None or due > limit_ms:
+            return False
+        self._settle()
+        self.now_ms = max(self.now_ms, due)
+        self.scheduler.run_due(self.now_ms)
+        return True
+
+    def advance(self, delta_ms):
+        """推进模拟时钟，按顺序执行期间到期的任务"""
+        self.run_until(self.now_ms + delta_ms)
+
+    def run_until(self, target_ms):
+        """推进模拟时钟到 target_ms"""
+        while self._run_next(target_ms):
+            pass
+        self._settle()
+        self.now_ms = max(self.now_ms, target_ms)
+
+    def run_while(self, condition, limit_ms):
+        """在condition()为真且未超过limit_ms时持续执行任务，返回是否因条件不再满足而结束"""
+        while condition():
+            if not self._run_next(limit_ms):
+                return False
+        return True
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子PCM缓冲
+把当前句子和下一句解码为内存中的PCM片段，复读时直接从内存播放，
+不需要让播放器在压缩音频（VBR MP3等）中反复跳转和重新解码。
+缓冲区只有固定数量的槽位，占用的内存只与句子长度有关，与文件长度无关。
+"""
+
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+
+from player_metrics import metrics, METRIC_SENTENCE_DECODE
+
+
+# 槽位数：当前句 + 预取的下一句
+DEFAULT_SLOTS = 2
+
+# 超过该长度的句子不进内存，仍由播放器直接播放
+MAX_CLIP_MS = 60000
+
+
+class PcmClip:
+    """一句话的PCM数据"""
+
+    __slots__ = ('media_path', 'start_ms', 'end_ms', 'sample_rate', 'channels', 'pcm')
+
+    def __init__(self, media_path, start_ms, end_ms, sample_rate, channels, pcm):
+        self.media_path = media_path
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.pcm = pcm
+
+    @property
+    def key(self):
+        return (self.media_path, self.start_ms, self.end_ms)
+
+    @property
+    def frame_count(self):
+        return len(self.pcm) // (2 * self.channels)
+
+    @property
+    def duration_ms(self):
+        return self.frame_count * 1000.0 / self.sample_rate
+
+    def byte_offset(self, offset_ms):
+        """片段内时间对应的字节偏移，按采样帧对齐"""
+        frame = int(round(offset_ms * self.sample_rate / 1000.0))
+        frame = max(0, min(frame, self.frame_count))
+        return frame * 2 * self.channels
+
+
+class SentenceBuffer:
+    """固定槽位的句子PCM缓冲
+
+    解码在后台线程中进行，get() 只返回已经解码完成的片段，没有时调用方继续用普通方式播放。
+    """
+
+    def __init__(self, decode_fn, slots=DEFAULT_SLOTS, max_clip_ms=MAX_CLIP_MS):
+        """
+        Args:
+            decode_fn: decode_fn(media_path, start_ms, end_ms, out_path) 解码为WAV文件，成功返回True
+            slots: 最多保留的句子数
+            max_clip_ms: 允许缓冲的最长句子
+        """
+        self.decode_fn = decode_fn
+        self.slots = slots
+        self.max_clip_ms = max_clip_ms
+        self.clips = OrderedDict()   # 按使用顺序排列，最后一项最新
+        self.version = 0             # 每解码完成一句加一，调用方据此判断是否需要再次 get()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run_worker, name="SentenceBufferWorker", daemon=True)
+        self._worker.start()
+
+    def get(self, media_path, start_ms, end_ms):
+        """获取已解码的句子，没有时返回None"""
+        key = (media_path, start_ms, end_ms)
+        with self._lock:
+            clip = self.clips.get(key)
+            if clip is None:
+                metrics.increment('sentence_buffer_misses')
+                return None
+            self.clips.move_to_end(key)
+            metrics.increment('sentence_buffer_hits')
+            return clip
+
+    def request(self, sentences):
+        """请求解码这些句子，sentences 为 (media_path, start_ms, end_ms) 列表，按优先级排列
+
+        不在请求列表中的旧句子会被丢弃，缓冲区始终只保存最近请求的几句。
+        """
+        wanted = [tuple(sentence) for sentence in sentences[:self.slots]
+                  if sentence[0] and 0 < sentence[2] - sentence[1] <= self.max_clip_ms]
+        with self._lock:
+            for key in list(self.clips):
+                if key not in wanted:
+                    del self.clips[key]
+            # 丢弃还没开始解码的过期请求
+            self._queued.intersection_update(wanted)
+            for key in wanted:
+                if key not in self.clips and key not in self._queued:
+                    self._queued.add(key)
+                    self._queue.put(key)
+
+    def clear(self):
+        """清空缓冲区"""
+        with self._lock:
+            self.clips.clear()
+            self._queued.clear()
+
+    def memory_bytes(self):
+        """缓冲区占用的PCM字节数"""
+        with self._lock:
+            return sum(len(clip.pcm) for clip in self.clips.values())
+
+    def shutdown(self):
+        """停止后台线程"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def join(self, timeout=None):
+        """等待后台线程退出（先调用 shutdown），返回是否已经退出"""
+        self._worker.join(timeout)
+        return not self._worker.is_alive()
+
+    def _run_worker(self):
+        from media_decode import read_wav
+
+        while not self._stopped:
+            key = self._queue.get()
+            if key is None:
+                break
+            with self._lock:
+                if key not in self._queued:
+                    continue
+            media_path, start_ms, end_ms = key
+            fd, temp_path = tempfile.mkstemp(prefix='elp_clip_', suffix='.wav')
+            os.close(fd)
+            try:
+                with metrics.span(METRIC_SENTENCE_DECODE):
+                    ok = self.decode_fn(media_path, start_ms, end_ms, temp_path)
+                if ok:
+                    sample_rate, channels, pcm = read_wav(temp_path)
+                    clip = PcmClip(media_path, start_ms, end_ms, sample_rate, channels, pcm)
+                    with self._lock:
+                        if key in self._queued:
+                            self.clips[key] = clip
+                            while len(self.clips) > self.slots:
+                                self.clips.popitem(last=False)
+                            self.version += 1
+                else:
+                    print(f"句子解码失败: {media_path} {start_ms}-{end_ms}ms")
+            except Exception as e:
+                print(f"句子解码出错: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(key)
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
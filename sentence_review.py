@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子间隔复习
+为整个课程库中评过分的每一句保存复习状态（难度系数、间隔、到期时间、失败次数），保存在配置目录的SQLite数据库中。
+评分按SM-2算法计算下次复习时间：没听懂的句子十分钟后再练，听懂的句子间隔逐渐拉长。
+
+下一句到期的句子用内存中的最小堆取出，复杂度为 O(log n)：
+堆中每一项是一个整数 到期时间 << KEY_BITS | 句子编号，比元组省内存，几十万句也只占十几MB；
+句子重新评分时只把新的到期时间压入堆，旧的项在出堆时与数据库比较后丢弃，过期项太多时重建堆。
+"""
+
+import heapq
+import sqlite3
+import time
+
+
+REVIEW_FILE_NAME = "sentence_review.db"
+SCHEMA_VERSION = 1
+
+# 句子编号 = 文件id << CUE_BITS | 句子序号（与句子索引相同）
+CUE_BITS = 20
+KEY_BITS = 40
+KEY_MASK = (1 << KEY_BITS) - 1
+
+# 评分
+AGAIN = 0
+HARD = 1
+GOOD = 2
+EASY = 3
+GRADE_NAMES = {'again': AGAIN, 'hard': HARD, 'good': GOOD, 'easy': EASY}
+
+MINUTE = 60
+DAY = 24 * 60 * MINUTE
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+RELEARN_SECONDS = 10 * MINUTE
+
+# 第一次答对后的间隔
+FIRST_INTERVALS = {HARD: DAY // 2, GOOD: DAY, EASY: 4 * DAY}
+# 答对时难度系数的变化；之后的间隔：有点难乘以1.2，听懂了乘以难度系数，很简单再乘以 EASY_BONUS
+HARD_FACTOR = 1.2
+EASY_BONUS = 1.3
+EASE_CHANGES = {AGAIN: -0.2, HARD: -0.15, GOOD: 0.0, EASY: 0.15}
+# 最长间隔：一直答对时间隔按指数增长，不封顶会超出数据库的64位整数
+MAX_INTERVAL = 100 * 365 * DAY
+
+# 堆中过期的项超过有效项加上该值时重建堆
+REBUILD_SLACK = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    subtitle_path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    ease REAL NOT NULL,
+    interval INTEGER NOT NULL,
+    due INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    last_review INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_due ON reviews (due);
+"""
+
+
+class ReviewState:
+    """一句的复习状态，interval 和时间单位为秒"""
+
+    __slots__ = ('ease', 'interval', 'due', 'reps', 'failures', 'last_review')
+
+    def __init__(self, ease=INITIAL_EASE, interval=0, due=0, reps=0, failures=0, last_review=0):
+        self.ease = ease
+        self.interval = interval
+        self.due = due
+        self.reps = reps
+        self.failures = failures
+        self.last_review = last_review
+
+
+class DueSentence:
+    """到期（或最早到期）的句子"""
+
+    __slots__ = ('subtitle_path', 'cue_index', 'due')
+
+    def __init__(self, subtitle_path, cue_index, due):
+        self.subtitle_path = subtitle_path
+        self.cue_index = cue_index
+        self.due = due
+
+
+def schedule(state, grade, now):
+    """按评分计算新的复习状态（SM-2）"""
+    ease = max(MIN_EASE, state.ease + EASE_CHANGES[grade])
+    if grade == AGAIN:
+        return ReviewState(ease, RELEARN_SECONDS, now + RELEARN_SECONDS, 0, state.failures + 1, now)
+    if state.reps == 0:
+        interval = FIRST_INTERVALS[grade]
+    elif grade == HARD:
+        interval = state.interval * HARD_FACTOR
+    elif grade == GOOD:
+        interval = state.interval * ease
+    else:
+        interval = state.interval * ease * EASY_BONUS
+    interval = min(MAX_INTERVAL, max(DAY // 2, int(interval)))
+    return ReviewState(ease, interval, now + interval, state.reps + 1, state.failures, now)
+
+
+class ReviewScheduler:
+    """句子复习调度器，在界面线程中使用"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._file_ids = {}
+        self._file_paths = {}
+        self._heap = None        # 第一次取到期句子时才从数据库建立
+        self._tracked = 0
+        self._init_db()
+
+    def _init_db(self):
+        conn = self._conn
+        conn.executescript(SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+        if row is None or int(row[0]) != SCHEMA_VERSION:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM reviews")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        conn.commit()
+        for file_id, path in conn.execute("SELECT id, subtitle_path FROM files"):
+            self._file_ids[path] = file_id
+            self._file_paths[file_id] = path
+        self._tracked = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def _file_id(self, subtitle_path, create=False):
+        file_id = self._file_ids.get(subtitle_path)
+        if file_id is None and create:
+            file_id = self._conn.execute("INSERT INTO files (subtitle_path) VALUES (?)", (subtitle_path,)).lastrowid
+            self._file_ids[subtitle_path] = file_id
+            self._file_paths[file_id] = subtitle_path
+        return file_id
+
+    def _key(self, subtitle_path, cue_index, create=False):
+        if not 0 <= cue_index < (1 << CUE_BITS):
+            raise ValueError(f"句子序号超出范围: {cue_index}")
+        file_id = self._file_id(subtitle_path, create)
+        return None if file_id is None else (file_id << CUE_BITS) | cue_index
+
+    def rename_file(self, old_path, new_path):
+        """字幕文件移动或重命名后保留它的复习状态"""
+        file_id = self._file_ids.get(old_path)
+        if file_id is None or new_path in self._file_ids:
+            return
+        self._conn.execute("UPDATE files SET subtitle_path = ? WHERE id = ?", (new_path, file_id))
+        self._conn.commit()
+        del self._file_ids[old_path]
+        self._file_ids[new_path] = file_id
+        self._file_paths[file_id] = new_path
+
+    def tracked_count(self):
+        """已评分的句子数"""
+        return self._tracked
+
+    def state(self, subtitle_path, cue_index):
+        """返回句子的复习状态，没有评过分时返回None"""
+        key = self._key(subtitle_path, cue_index)
+        if key is None:
+            return None
+        row = self._conn.execute("SELECT ease, interval, due, reps, failures, last_review FROM reviews WHERE id = ?",
+                                 (key,)).fetchone()
+        return ReviewState(*row) if row else None
+
+    def grade(self, subtitle_path, cue_index, grade, now=None):
+        """给句子评分并安排下次复习，返回新的 ReviewState"""
+        now = int(time.time() if now is None else now)
+        key = self._key(subtitle_path, cue_index, create=True)
+        old = self.state(subtitle_path, cue_index)
+        if old is None:
+            self._tracked += 1
+        new = schedule(old or ReviewState(), grade, now)
+        self._conn.execute("INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (key, new.ease, new.interval, new.due, new.reps, new.failures, new.last_review))
+        self._conn.commit()
+        if self._heap is not None:
+            heapq.heappush(self._heap, (new.due << KEY_BITS) | key)
+            if len(self._heap) > 2 * self._tracked + REBUILD_SLACK:
+                self._build_heap()
+        return new
+
+    def _build_heap(self):
+        self._heap = [(due << KEY_BITS) | key for key, due in self._conn.execute("SELECT id, due FROM reviews")]
+        heapq.heapify(self._heap)
+
+    def next_due(self, subtitle_paths=None):
+        """返回最早到期的句子（可能还没到期，调用方比较 due），没有评过分的句子时返回None
+
+        Args:
+            subtitle_paths: 只在这些字幕文件中查找（如当前播放列表），None表示整个课程库
+        """
+        if self._heap is None:
+            self._build_heap()
+        allowed = None
+        if subtitle_paths is not None:
+            allowed = set(self._file_ids[path] for path in subtitle_paths if path in self._file_ids)
+            if not allowed:
+                return None
+        heap = self._heap
+        skipped = []
+        result = None
+        while heap:
+            entry = heap[0]
+            due, key = entry >> KEY_BITS, entry & KEY_MASK
+            row = self._conn.execute("SELECT due FROM reviews WHERE id = ?", (key,)).fetchone()
+            if row is None or row[0] != due:
+                # 句子已经重新评分，这是旧的到期时间
+                heapq.heappop(heap)
+                continue
+            file_id = key >> CUE_BITS
+            if allowed is not None and file_id not in allowed:
+                # 不在播放列表中的文件，找到结果后放回堆中
+                skipped.append(heapq.heappop(heap))
+                continue
+            result = DueSentence(self._file_paths[file_id], key & ((1 << CUE_BITS) - 1), due)
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return result
+
+    def due_count(self, now=None):
+        """已经到期的句子数"""
+        now = int(time.time() if now is None else now)
+        return self._conn.execute("SELECT COUNT(*) FROM reviews WHERE due <= ?", (now,)).fetchone()[0]
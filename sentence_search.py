@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文句子搜索
+用SQLite FTS5为播放列表中所有字幕文件的每一句建立倒排索引，保存在配置目录中。
+同步时只重新索引大小或修改时间变化的字幕文件，已删除的文件从索引中移除。
+"""
+
+import re
+import sqlite3
+import time
+
+from file_signature import file_signature
+from player_metrics import metrics, METRIC_SENTENCE_SEARCH
+from sqlite_index import SqliteIndex
+
+
+INDEX_FILE_NAME = "sentence_index.db"
+SCHEMA_VERSION = 1
+
+# 句子的rowid = 文件id << CUE_BITS | 句子序号，删除一个文件的句子只需按rowid范围删除
+CUE_BITS = 20
+
+DEFAULT_LIMIT = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    subtitle_path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    cue_count INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cues USING fts5(
+    text,
+    start_ms UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+
+class SearchHit:
+    """一条搜索结果"""
+
+    __slots__ = ('subtitle_path', 'cue_index', 'start_ms', 'text')
+
+    def __init__(self, subtitle_path, cue_index, start_ms, text):
+        self.subtitle_path = subtitle_path
+        self.cue_index = cue_index
+        self.start_ms = start_ms
+        self.text = text
+
+
+def build_match_query(query):
+    """把用户输入转换为FTS5查询：每个词都要出现，最后一个词按前缀匹配"""
+    words = re.findall(r"\w+", query, re.UNICODE)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SentenceIndex(SqliteIndex):
+    """句子全文索引
+
+    sync() 可以在后台线程中调用，search() 在界面线程中调用，两者使用各自的数据库连接。
+    """
+
+    sync_thread_name = "SentenceIndexSync"
+    sync_error_message = "更新句子索引失败"
+
+    def __init__(self, db_path, parse_fn):
+        """
+        Args:
+            db_path: 索引数据库路径
+            parse_fn: parse_fn(subtitle_path) 返回字幕列表（解析器的 subtitles），失败返回None
+        """
+        super().__init__(db_path)
+        self.parse_fn = parse_fn
+        self._init_db()
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+        if row is None or int(row[0]) != SCHEMA_VERSION:
+            # 索引格式变化时重建
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM cues")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        conn.commit()
+
+    def sync(self, subtitle_paths):
+        """让索引与这些字幕文件一致，返回重新索引的文件数"""
+        with self._sync_lock:
+            conn = self._connect()
+            wanted = set(path for path in subtitle_paths if path)
+            indexed = dict((row[0], (row[1], row[2]))
+                           for row in conn.execute("SELECT subtitle_path, size, mtime FROM files"))
+            updated = 0
+            started = time.perf_counter()
+
+            # 移除已不在播放列表中的文件
+            for path in set(indexed) - wanted:
+                self._remove_file(conn, path)
+
+            for path in wanted:
+                try:
+                    signature = file_signature(path)
+                except OSError:
+                    if path in indexed:
+                        self._remove_file(conn, path)
+                    continue
+                if indexed.get(path) == signature:
+                    continue
+                subtitles = self.parse_fn(path)
+                if subtitles is None:
+                    continue
+                self._remove_file(conn, path)
+                file_id = conn.execute("INSERT INTO files (subtitle_path, size, mtime, cue_count) VALUES (?, ?, ?, ?)",
+                                       (path, signature[0], signature[1], len(subtitles))).lastrowid
+                base = file_id << CUE_BITS
+                conn.executemany(
+                    "INSERT INTO cues (rowid, text, start_ms) VALUES (?, ?, ?)",
+                    ((base + index, sub['text'], sub['start'])
+                     for index, sub in enumerate(subtitles[:1 << CUE_BITS])))
+                updated += 1
+            conn.commit()
+
+            if updated:
+                print(f"句子索引已更新: {updated} 个文件，耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+            return updated
+
+    def _remove_file(self, conn, path):
+        row = conn.execute("SELECT id FROM files WHERE subtitle_path = ?", (path,)).fetchone()
+        if row:
+            base = row[0] << CUE_BITS
+            conn.execute("DELETE FROM cues WHERE rowid >= ? AND rowid < ?", (base, base + (1 << CUE_BITS)))
+            conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """搜索句子，按相关度返回 SearchHit 列表"""
+        match = build_match_query(query)
+        if not match:
+            return []
+        with metrics.span(METRIC_SENTENCE_SEARCH):
+            try:
+                conn = self._connect()
+                rows = conn.execute("SELECT rowid, start_ms, text FROM cues "
+                                    "WHERE cues MATCH ? ORDER BY rank LIMIT ?", (match, limit)).fetchall()
+                file_ids = set(rowid >> CUE_BITS for rowid, _, _ in rows)
+                paths = {}
+                if file_ids:
+                    placeholders = ','.join('?' * len(file_ids))
+                    paths = dict(conn.execute(f"SELECT id, subtitle_path FROM files WHERE id IN ({placeholders})",
+                                              tuple(file_ids)).fetchall())
+            except sqlite3.Error as e:
+                print(f"搜索句子失败: {e}")
+                return []
+        mask = (1 << CUE_BITS) - 1
+        return [SearchHit(paths[rowid >> CUE_BITS], rowid & mask, int(start_ms), text)
+                for rowid, start_ms, text in rows if (rowid >> CUE_BITS) in paths]
+
+    def stats(self):
+        """返回 (文件数, 句子数)"""
+        row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(cue_count), 0) FROM files").fetchone()
+        return row[0], row[1]
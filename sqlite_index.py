@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite索引的公共部分
+句子搜索索引（sentence_search）和课程统计（lesson_stats）都保存在SQLite中，
+在后台线程中与播放列表同步，在界面线程中查询；本模块提供两者共用的每线程连接和后台同步。
+"""
+
+import sqlite3
+import threading
+
+
+class SqliteIndex:
+    """保存在SQLite中、可以在后台同步的索引
+
+    每个线程使用自己的数据库连接。子类实现 sync(subtitle_paths)，
+    sync_in_background() 在后台线程中调用它，同步期间收到的请求只保留最新的一个，合并到下一次同步。
+    """
+
+    # 后台同步线程名和失败时的提示，由子类设置
+    sync_thread_name = "IndexSync"
+    sync_error_message = "更新索引失败"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()      # 子类的 sync() 持有，同一时间只有一个同步
+        self._sync_thread = None                # 正在运行的后台同步线程，由 _pending_lock 保护
+        self._sync_again = None                 # 同步期间收到的最新请求，由 _pending_lock 保护
+        self._pending_lock = threading.Lock()
+
+    def _connect(self):
+        """每个线程一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def sync(self, subtitle_paths):
+        """让索引与这些字幕文件一致，返回更新的文件数"""
+        raise NotImplementedError
+
+    def sync_in_background(self, subtitle_paths):
+        """在后台线程中同步，正在同步时合并到下一次"""
+        subtitle_paths = list(subtitle_paths)
+
+        def run():
+            paths = subtitle_paths
+            while True:
+                try:
+                    self.sync(paths)
+                except Exception as e:
+                    print(f"{self.sync_error_message}: {e}")
+                # 取下一次请求和线程退出在同一把锁内完成，退出后收到的请求会启动新线程
+                with self._pending_lock:
+                    paths, self._sync_again = self._sync_again, None
+                    if paths is None:
+                        self._sync_thread = None
+                        return
+
+        with self._pending_lock:
+            if self._sync_thread is not None:
+                self._sync_again = subtitle_paths
+                return
+            self._sync_thread = threading.Thread(target=run, name=self.sync_thread_name, daemon=True)
+            self._sync_thread.start()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕自动对齐
+很多字幕整体偏移了固定时间，或者随时间逐渐偏移（帧率不同），导致每句循环开头早了或晚了。
+这里把媒体音频解码为低采样率单声道，计算每10ms一帧的语音活动包络，
+用FFT互相关把它与字幕的“有句子/无句子”掩码对齐，得到整体偏移；
+再分段求局部偏移，拟合出线性漂移。校正结果按字幕文件保存，加载字幕时应用。
+
+需要numpy，没有安装时 is_available() 返回False。
+"""
+
+import json
+import os
+import tempfile
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from file_signature import file_signature
+
+
+ALIGNMENT_FILE_NAME = "subtitle_alignment.json"
+
+# 分析用音频格式：8kHz单声道足够判断有没有人声
+ANALYSIS_SAMPLE_RATE = 8000
+
+# 包络每帧长度（毫秒）
+FRAME_MS = 10
+
+# 搜索的最大偏移（毫秒）
+MAX_OFFSET_MS = 90000
+
+# 分段求漂移：每段至少多长（毫秒）、至少包含多少句，最多分多少段
+SEGMENT_MIN_MS = 120000
+SEGMENT_MIN_CUES = 8
+MAX_SEGMENTS = 16
+
+# 拟合漂移时，局部偏移与直线相差超过该值的分段视为误匹配
+OUTLIER_MS = 400
+
+# 常见的帧率换算比例：字幕按另一种帧率的版本制作时，时间会按比例整体拉伸
+CANDIDATE_SCALES = (1.0, 25 / 23.976, 23.976 / 25, 25 / 24, 24 / 25, 24 / 23.976, 23.976 / 24)
+
+# 低于该相关系数认为无法可靠对齐
+MIN_SCORE = 0.1
+
+# 偏移和漂移都小于该值时认为字幕已经对齐（毫秒）
+MIN_CORRECTION_MS = 40
+
+
+def is_available():
+    """是否可以进行自动对齐（需要numpy）"""
+    return np is not None
+
+
+class Correction:
+    """字幕时间校正：校正后时间 = 原时间 * scale + offset_ms"""
+
+    __slots__ = ('offset_ms', 'scale')
+
+    def __init__(self, offset_ms=0.0, scale=1.0):
+        self.offset_ms = offset_ms
+        self.scale = scale
+
+    def apply_ms(self, time_ms):
+        return max(0, int(round(time_ms * self.scale + self.offset_ms)))
+
+    def drift_ms(self, duration_ms):
+        """在这段时长内累计的漂移"""
+        return (self.scale - 1.0) * duration_ms
+
+    def describe(self):
+        text = f"偏移 {self.offset_ms / 1000.0:+.2f} 秒"
+        if self.scale != 1.0:
+            text += f"，漂移 {(self.scale - 1.0) * 3600:+.2f} 秒/小时"
+        return text
+
+
+def apply_correction(subtitles, correction):
+    """把校正应用到字幕字典列表（就地修改）"""
+    if correction is None:
+        return subtitles
+    for sub in subtitles:
+        sub['start'] = correction.apply_ms(sub['start'])
+        sub['end'] = max(sub['start'], correction.apply_ms(sub['end']))
+        sub['duration'] = sub['end'] - sub['start']
+    return subtitles
+
+
+class AlignmentResult:
+    """一次对齐的结果"""
+
+    def __init__(self, correction, score, segments, elapsed):
+        self.correction = correction
+        self.score = score          # 校正后字幕与语音的相关系数
+        self.segments = segments    # 参与漂移拟合的分段数
+        self.elapsed = elapsed      # 计算耗时（秒，不含解码）
+
+    @property
+    def reliable(self):
+        return self.score >= MIN_SCORE
+
+    def is_identity(self, duration_ms):
+        return (abs(self.correction.offset_ms) < MIN_CORRECTION_MS and
+                abs(self.correction.drift_ms(duration_ms)) < MIN_CORRECTION_MS)
+
+
+# ---- 信号 ----
+
+def speech_envelope(pcm, sample_rate=ANALYSIS_SAMPLE_RATE, frame_ms=FRAME_MS):
+    """16位单声道PCM -> 每帧是否有语音（float32 0/1数组）"""
+    samples = np.frombuffer(pcm, dtype='<i2')
+    hop = sample_rate * frame_ms // 1000
+    frames = len(samples) // hop
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    blocks = samples[:frames * hop].reshape(frames, hop).astype(np.float32)
+    energy_db = 10.0 * np.log10(np.mean(blocks * blocks, axis=1) + 1.0)
+    # 阈值取在底噪和响亮部分之间，对整体音量不敏感
+    noise, loud = np.percentile(energy_db, (10, 90))
+    active = energy_db > noise + 0.35 * (loud - noise)
+    # 去掉短于50ms的毛刺
+    kernel = np.ones(5, dtype=np.float32) / 5
+    return (np.convolve(active.astype(np.float32), kernel, mode='same') > 0.5).astype(np.float32)
+
+
+def cue_mask(subtitles, frames, frame_ms=FRAME_MS):
+    """字幕列表 -> 每帧是否在句子内（float32 0/1数组）"""
+    # 用差分数组一次标记所有区间
+    delta = np.zeros(frames + 1, dtype=np.float32)
+    starts = np.clip(np.array([sub['start'] for sub in subtitles], dtype=np.int64) // frame_ms, 0, frames)
+    ends = np.clip(np.array([sub['end'] for sub in subtitles], dtype=np.int64) // frame_ms, 0, frames)
+    np.add.at(delta, starts, 1)
+    np.add.at(delta, ends, -1)
+    return (np.cumsum(delta[:-1]) > 0).astype(np.float32)
+
+
+def _coefficient(envelope, mask):
+    """零偏移处的相关系数"""
+    a = envelope - envelope.mean()
+    b = mask - mask.mean()
+    norm = np.sqrt(np.dot(a, a) * np.dot(b, b))
+    return float(np.dot(a, b) / norm) if norm > 0 else 0.0
+
+
+def _correlate(envelope, mask, max_lag):
+    """FFT互相关，返回 (lags, 相关系数)；lag>0 表示语音比字幕晚"""
+    a = envelope - envelope.mean()
+    b = mask - mask.mean()
+    norm = np.sqrt(np.dot(a, a) * np.dot(b, b))
+    size = 1 << int(np.ceil(np.log2(len(a) + len(b))))
+    corr = np.fft.irfft(np.fft.rfft(a, size) * np.conj(np.fft.rfft(b, size)), size)
+    max_lag = min(max_lag, len(a) - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+    values = corr[lags % size]
+    if norm > 0:
+        values = values / norm
+    return lags, values
+
+
+def best_lag(envelope, mask, max_lag):
+    """相关性最高的偏移（帧）及其相关系数"""
+    lags, values = _correlate(envelope, mask, max_lag)
+    index = int(np.argmax(values))
+    return int(lags[index]), float(values[index])
+
+
+def estimate_correction(envelope, subtitles, frame_ms=FRAME_MS, max_offset_ms=MAX_OFFSET_MS):
+    """根据语音包络估计字幕的整体偏移和线性漂移，返回 AlignmentResult"""
+    started = time.perf_counter()
+    original = subtitles = [sub for sub in subtitles if sub['end'] > sub['start']]
+    frames = len(envelope)
+    if not subtitles or frames == 0:
+        return AlignmentResult(Correction(), 0.0, 0, time.perf_counter() - started)
+
+    max_lag = max_offset_ms // frame_ms
+
+    # 先按常见帧率比例拉伸字幕，取整体相关性最高的比例和偏移
+    best = None
+    for scale in CANDIDATE_SCALES:
+        scaled = apply_correction([dict(sub) for sub in subtitles], Correction(0.0, scale))
+        lag, value = best_lag(envelope, cue_mask(scaled, frames, frame_ms), max_lag)
+        if best is None or value > best[2]:
+            best = (scale, lag, value, scaled)
+    base_scale, global_lag, _, subtitles = best
+
+    # 分段求局部偏移：每段只保留这一段的字幕，与整段包络相关
+    span_start = subtitles[0]['start']
+    span_end = subtitles[-1]['end']
+    count = int(min(MAX_SEGMENTS, (span_end - span_start) // SEGMENT_MIN_MS, len(subtitles) // SEGMENT_MIN_CUES))
+    points = []
+    if count >= 3:
+        for chunk in np.array_split(np.arange(len(subtitles)), count):
+            segment = [subtitles[i] for i in chunk]
+            lag, value = best_lag(envelope, cue_mask(segment, frames, frame_ms), max_lag)
+            center = (segment[0]['start'] + segment[-1]['end']) / 2.0
+            points.append((center, lag * frame_ms, max(value, 1e-3)))
+
+    correction = Correction(global_lag * frame_ms, base_scale)
+    used = 0
+    if len(points) >= 3:
+        centers = np.array([p[0] for p in points])
+        offsets = np.array([p[1] for p in points], dtype=np.float64)
+        weights = np.array([p[2] for p in points])
+        keep = np.ones(len(points), dtype=bool)
+        for _ in range(3):
+            if keep.sum() < 3:
+                break
+            slope, intercept = np.polyfit(centers[keep], offsets[keep], 1, w=weights[keep])
+            residuals = np.abs(offsets - (slope * centers + intercept))
+            new_keep = residuals <= OUTLIER_MS
+            if (new_keep == keep).all():
+                break
+            keep = new_keep
+        if keep.sum() >= 3 and abs(slope * (span_end - span_start)) >= MIN_CORRECTION_MS:
+            # 局部偏移 d(t) = intercept + slope*t，校正后时间 = t*(1+slope) + intercept，t为按比例拉伸后的时间
+            correction = Correction(float(intercept), base_scale * (1.0 + float(slope)))
+            used = int(keep.sum())
+
+    # 用校正后的字幕与语音的吻合程度衡量结果是否可靠
+    corrected = apply_correction([dict(sub) for sub in original], correction)
+    score = _coefficient(envelope, cue_mask(corrected, frames, frame_ms))
+    return AlignmentResult(correction, score, used, time.perf_counter() - started)
+
+
+def align_media(media_path, subtitles, decode_fn, cancel_event=None):
+    """解码媒体并估计校正
+
+    Args:
+        decode_fn: decode_fn(media_path, out_path, sample_rate, channels, cancel_event) 解码为WAV，成功返回True
+    Returns:
+        AlignmentResult，解码失败返回None
+    """
+    from media_decode import read_wav
+
+    fd, temp_path = tempfile.mkstemp(prefix='elp_align_', suffix='.wav')
+    os.close(fd)
+    try:
+        decode_started = time.perf_counter()
+        if not decode_fn(media_path, temp_path, ANALYSIS_SAMPLE_RATE, 1, cancel_event):
+            return None
+        sample_rate, channels, pcm = read_wav(temp_path)
+        print(f"对齐用音频解码完成，耗时 {time.perf_counter() - decode_started:.1f}s")
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    if channels != 1 or sample_rate != ANALYSIS_SAMPLE_RATE:
+        raise ValueError(f"解码格式不正确: {sample_rate}Hz {channels}声道")
+    result = estimate_correction(speech_envelope(pcm), subtitles)
+    print(f"字幕对齐: {result.correction.describe()}，相关系数 {result.score:.2f}，耗时 {result.elapsed:.2f}s")
+    return result
+
+
+class AlignmentStore:
+    """按字幕文件保存的时间校正
+
+    记录字幕文件的大小和修改时间，字幕文件被修改后校正自动失效。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+        except Exception as e:
+            print(f"加载字幕校正失败: {e}")
+            self.entries = {}
+
+    def _save(self):
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"保存字幕校正失败: {e}")
+
+    def get(self, subtitle_path):
+        """返回字幕文件的 Correction，没有或已失效时返回None"""
+        entry = self.entries.get(subtitle_path)
+        if not entry:
+            return None
+        try:
+            size, mtime_ns = file_signature(subtitle_path)
+        except OSError:
+            return None
+        # 旧版本按整秒记录修改时间，这样的记录仍然有效，下次校正时改为纳秒
+        if tuple(entry['signature']) not in ((size, mtime_ns), (size, mtime_ns // 1000000000)):
+            return None
+        return Correction(entry['offset_ms'], entry['scale'])
+
+    def set(self, subtitle_path, correction):
+        self.entries[subtitle_path] = {
+            'signature': list(file_signature(subtitle_path)),
+            'offset_ms': correction.offset_ms,
+            'scale': correction.scale,
+        }
+        self._save()
+
+    def remove(self, subtitle_path):
+        if self.entries.pop(subtitle_path, None) is not None:
+            self._save()
+
+    def rename(self, old_path, new_path):
+        """字幕文件移动或重命名后保留它的校正"""
+        entry = self.entries.pop(old_path, None)
+        if entry is not None:
+            self.entries[new_path] = entry
+            self._save()
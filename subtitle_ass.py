@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASS/SSA字幕插件（由 subtitle_formats 在第一次遇到ASS/SSA文件时导入）
+只读取 [Events] 中的 Dialogue 行；样式、特效标签和绘图命令都会去掉。
+"""
+
+import re
+
+
+TIME = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})[.:](\d{1,3})')
+
+# 特效标签 {\pos(10,10)\b1}
+OVERRIDE = re.compile(r'\{[^}]*\}')
+
+# 没有 Format 行时使用的默认字段顺序
+DEFAULT_FIELDS = ('layer', 'start', 'end', 'style', 'name', 'marginl', 'marginr', 'marginv', 'effect', 'text')
+
+
+def _time_ms(value):
+    match = TIME.match(value.strip())
+    if not match:
+        raise ValueError(f"无法解析的时间: {value}")
+    hours, minutes, seconds, fraction = match.groups()
+    # ASS的小数部分是百分之一秒
+    fraction_ms = int(fraction) * 10 if len(fraction) <= 2 else int(fraction[:3])
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + fraction_ms
+
+
+def _clean_text(text):
+    if '\\p' in text:
+        # 绘图命令之后是矢量图形而不是文字
+        text = re.split(r'\{[^}]*\\p[1-9][^}]*\}', text)[0]
+    text = OVERRIDE.sub('', text)
+    text = text.replace('\\N', '\n').replace('\\n', '\n').replace('\\h', ' ')
+    return '\n'.join(part.strip() for part in text.split('\n') if part.strip())
+
+
+def parse(lines, cues):
+    in_events = False
+    fields = DEFAULT_FIELDS
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events:
+            continue
+        key, _, value = line.partition(':')
+        key = key.strip().lower()
+        if key == 'format':
+            fields = tuple(field.strip().lower() for field in value.split(','))
+        elif key == 'dialogue':
+            parts = value.split(',', len(fields) - 1)
+            if len(parts) < len(fields):
+                continue
+            event = dict(zip(fields, parts))
+            try:
+                start_ms, end_ms = _time_ms(event['start']), _time_ms(event['end'])
+            except (KeyError, ValueError):
+                continue
+            text = _clean_text(event.get('text', ''))
+            if text:
+                cues.append(start_ms, end_ms, text)
+
+
+def finish(cues):
+    """同一时间的多条事件（如中英文分两种样式显示）合并为一句"""
+    keep = []
+    texts = []
+    previous = None
+    for start, end, text in zip(cues.starts.tolist(), cues.ends.tolist(), cues.texts):
+        if (start, end) == previous:
+            texts[-1] += "\n" + text
+            keep.append(False)
+        else:
+            texts.append(text)
+            keep.append(True)
+            previous = (start, end)
+    if len(texts) != len(cues):
+        cues.compact(keep, texts)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕库批量检查和转换
+开学前用命令行检查整个课程库的字幕文件：文字编码、无法识别的格式、没有句子、时长为0的句子、相互重叠的句子，
+以及LRC没有结束时间、按3秒估计的句子；可以把所有文件转换为UTF-8的SRT（LRC以下一句的开始时间作为结束时间）。
+
+不创建QApplication，也不需要VLC。解析复用 subtitle_formats 的插件，每个文件是一个独立任务，
+由进程池并行处理（任务按块分发给工作进程，主进程只汇总结果），处理速度随CPU核数线性增长。
+
+用法:
+    python english_listening_player.py batch 课程目录 --report report.json
+    python english_listening_player.py batch 课程目录 --output 转换结果 --fix --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import subtitle_lrc
+import subtitle_srt
+from subtitle_formats import decode_text, parse_text, subtitle_extensions
+
+
+# 可以直接使用、不需要提示的编码
+UTF_ENCODINGS = ('utf-8-sig', 'utf-16')
+
+# 每个文件的报告中最多列出的问题句子序号
+MAX_EXAMPLES = 5
+
+# 每个工作进程平均分到的任务块数：块越大进程间通信越少，太大则最后几个进程空等
+CHUNKS_PER_WORKER = 8
+
+
+def find_subtitle_files(paths):
+    """展开命令行给出的文件和目录，返回 [(字幕路径, 输出用的相对路径)]，目录按名称顺序递归查找"""
+    extensions = subtitle_extensions()
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(extensions):
+                        full_path = os.path.join(root, name)
+                        files.append((full_path, os.path.relpath(full_path, path)))
+        elif os.path.isfile(path):
+            files.append((path, os.path.basename(path)))
+        else:
+            print(f"找不到文件或目录: {path}", file=sys.stderr)
+    return files
+
+
+def _examples(indexes):
+    return [index + 1 for index in indexes[:MAX_EXAMPLES]]
+
+
+def _trim_overlaps(cues):
+    """把每句的结束时间截到下一句开始，去掉时长为0的句子"""
+    starts = cues.starts
+    ends = cues.ends
+    for i in range(len(starts) - 1):
+        if ends[i] > starts[i + 1] > starts[i]:
+            ends[i] = starts[i + 1]
+    keep = [end > start for start, end in zip(starts, ends)]
+    if not all(keep):
+        cues.compact(keep, [text for text, kept in zip(cues.texts, keep) if kept])
+
+
+def check_file(path, out_path=None, fix=False):
+    """检查一个字幕文件，out_path 不为空时转换为UTF-8的SRT，返回报告字典（在工作进程中调用）
+
+    Args:
+        fix: 转换时把重叠句子的结束时间截到下一句开始，并去掉时长为0的句子
+    """
+    result = {'path': path, 'format': None, 'encoding': None, 'cues': 0, 'errors': [], 'warnings': [],
+              'overlaps': 0, 'zero_length': 0, 'lrc_guessed': 0, 'output': None}
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        result['errors'].append(f"无法读取: {e}")
+        return result
+
+    text, encoding = decode_text(data)
+    result['encoding'] = encoding
+    if encoding == 'latin-1':
+        result['errors'].append("无法识别的文字编码（不是UTF-8/UTF-16/GB18030）")
+    elif encoding not in UTF_ENCODINGS:
+        result['warnings'].append(f"文字编码为 {encoding}，不是UTF-8")
+
+    try:
+        fmt, cues = parse_text(path, text)
+    except Exception as e:
+        result['errors'].append(f"解析失败: {e}")
+        return result
+    result['format'] = fmt.name
+    result['cues'] = len(cues)
+    if not len(cues):
+        result['errors'].append("没有句子")
+        return result
+
+    if fmt.name == 'lrc':
+        # 先换成真实的结束时间，之后的重叠检查不再受3秒估计的影响
+        result['lrc_guessed'] = subtitle_lrc.fill_end_times(cues)
+        result['warnings'].append(f"{result['lrc_guessed']} 句没有结束时间，按3秒估计")
+
+    starts = cues.starts
+    ends = cues.ends
+    zero_length = [i for i in range(len(starts)) if ends[i] <= starts[i]]
+    overlaps = [i for i in range(len(starts) - 1) if ends[i] > starts[i + 1]]
+    result['zero_length'] = len(zero_length)
+    result['overlaps'] = len(overlaps)
+    if zero_length:
+        result['warnings'].append(f"{len(zero_length)} 句时长为0，如第 {_examples(zero_length)} 句")
+    if overlaps:
+        result['warnings'].append(f"{len(overlaps)} 句与下一句重叠，如第 {_examples(overlaps)} 句")
+
+    if out_path:
+        if os.path.abspath(out_path) == os.path.abspath(path):
+            result['errors'].append("输出文件与源文件相同，没有转换")
+            return result
+        if fix:
+            _trim_overlaps(cues)
+        try:
+            os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+            temp_path = out_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                subtitle_srt.write(cues, f)
+            os.replace(temp_path, out_path)
+            result['output'] = out_path
+        except OSError as e:
+            result['errors'].append(f"写入转换结果失败: {e}")
+    return result
+
+
+def _check_task(task):
+    return check_file(*task)
+
+
+def run_batch(files, output_dir=None, fix=False, workers=None, progress=None):
+    """检查（和转换）一批字幕文件，返回报告字典
+
+    Args:
+        files: find_subtitle_files() 的结果
+        output_dir: 转换结果目录，保持原来的相对路径，扩展名改为 .srt；None表示只检查
+        workers: 工作进程数，默认为CPU核数；为1时在当前进程中处理
+        progress: progress(已完成数, 总数)，每完成一个任务块调用一次，全部完成时一定会调用
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    for path, relative_path in files:
+        out_path = None
+        if output_dir:
+            out_path = os.path.join(output_dir, os.path.splitext(relative_path)[0] + ".srt")
+        tasks.append((path, out_path, fix))
+
+    started = time.perf_counter()
+    results = []
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            results.append(check_file(*task))
+            if progress:
+                progress(len(results), len(tasks))
+    else:
+        chunksize = max(1, len(tasks) // (workers * CHUNKS_PER_WORKER))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(_check_task, tasks, chunksize=chunksize):
+                results.append(result)
+                # 每个任务块完成时报告一次，最后不足一块的部分完成时也报告
+                if progress and (len(results) % chunksize == 0 or len(results) == len(tasks)):
+                    progress(len(results), len(tasks))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': len(results),
+        'files_with_errors': sum(1 for result in results if result['errors']),
+        'files_with_warnings': sum(1 for result in results if result['warnings']),
+        'cues': sum(result['cues'] for result in results),
+        'overlaps': sum(result['overlaps'] for result in results),
+        'zero_length': sum(result['zero_length'] for result in results),
+        'lrc_guessed': sum(result['lrc_guessed'] for result in results),
+        'converted': sum(1 for result in results if result['output']),
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 3),
+        'results': results,
+    }
+
+
+def print_summary(report, verbose=False):
+    """打印报告摘要：有错误的文件逐个列出，警告只列出数量（verbose 时逐个列出）"""
+    for result in report['results']:
+        for message in result['errors']:
+            print(f"错误 {result['path']}: {message}")
+        if verbose:
+            for message in result['warnings']:
+                print(f"警告 {result['path']}: {message}")
+    elapsed = report['elapsed_seconds']
+    rate = report['files'] / elapsed if elapsed > 0 else 0
+    print(f"检查了 {report['files']} 个文件（{report['cues']} 句），{report['workers']} 个进程，"
+          f"耗时 {elapsed:.2f}s（{rate:.0f} 个/秒）")
+    print(f"有错误的文件: {report['files_with_errors']}，有警告的文件: {report['files_with_warnings']}")
+    print(f"重叠句子: {report['overlaps']}，时长为0的句子: {report['zero_length']}，"
+          f"按3秒估计结束时间的LRC句子: {report['lrc_guessed']}")
+    if report['converted']:
+        print(f"已转换为SRT: {report['converted']} 个文件")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="english_listening_player.py batch",
+                                     description="批量检查字幕文件，并可转换为UTF-8的SRT")
+    parser.add_argument('paths', nargs='+', help="字幕文件或目录（递归查找）")
+    parser.add_argument('--output', help="转换结果目录，所有文件转换为SRT，保持原来的目录结构")
+    parser.add_argument('--fix', action='store_true', help="转换时截掉重叠部分并去掉时长为0的句子")
+    parser.add_argument('--report', help="把完整报告写入JSON文件")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数，默认为CPU核数")
+    parser.add_argument('--verbose', action='store_true', help="逐个列出有警告的文件")
+    args = parser.parse_args(argv)
+
+    files = find_subtitle_files(args.paths)
+    if not files:
+        print("没有找到字幕文件")
+        return 1
+
+    def progress(done, total):
+        print(f"\r已检查 {done}/{total}", end='', file=sys.stderr, flush=True)
+
+    report = run_batch(files, args.output, args.fix, args.workers, progress if sys.stderr.isatty() else None)
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    print_summary(report, args.verbose)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已写入: {args.report}")
+    return 1 if report['files_with_errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
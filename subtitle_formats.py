@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕格式注册表
+每种字幕格式（SRT、LRC、WebVTT、ASS/SSA）是一个单独的插件模块，第一次遇到该格式的文件时才导入，
+新增格式不会拖慢启动。格式先按文件内容识别，识别不出时再按扩展名。
+
+所有格式共用同一条加载路径：一次读入并解码文件，插件逐行解析并把句子追加到 CueTable，
+最后统一排序和应用时间校正。插件模块只需要提供：
+    parse(lines, cues)   逐行解析，调用 cues.append(start_ms, end_ms, text)
+    finish(cues)         可选，解析完成并排序后的格式专有处理（如合并重复行）
+插件是按名字动态导入的，用PyInstaller打包时需要把它们加入 hiddenimports（见 PLUGIN_MODULES）。
+"""
+
+import codecs
+import importlib
+import os
+import re
+from array import array
+from itertools import compress
+
+
+# 用于识别格式的文件开头长度（字符）
+SNIFF_CHARS = 4096
+
+# 解码失败时依次尝试的编码，中文字幕常见GBK编码
+FALLBACK_ENCODINGS = ('utf-8-sig', 'gb18030')
+
+
+class CueTable:
+    """紧凑的字幕存储
+
+    开始和结束时间（毫秒）存放在两个整数数组中，文字存放在一个列表中，不为每句创建字典。
+    按下标取出的是包含 text/start/end/duration 的新字典，修改它不会写回表中；修改时间使用 retime()。
+    """
+
+    __slots__ = ('starts', 'ends', 'texts')
+
+    def __init__(self):
+        self.starts = array('i')
+        self.ends = array('i')
+        self.texts = []
+
+    def append(self, start_ms, end_ms, text):
+        self.starts.append(start_ms)
+        self.ends.append(max(start_ms, end_ms))
+        self.texts.append(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _cue(self, index):
+        start = self.starts[index]
+        end = self.ends[index]
+        return {'text': self.texts[index], 'start': start, 'end': end, 'duration': end - start}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._cue(i) for i in range(*index.indices(len(self.texts)))]
+        return self._cue(index)
+
+    def __iter__(self):
+        for start, end, text in zip(self.starts, self.ends, self.texts):
+            yield {'text': text, 'start': start, 'end': end, 'duration': end - start}
+
+    def sort(self):
+        """按开始时间排序（稳定），已经有序时不做任何事"""
+        starts = self.starts
+        if all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1)):
+            return
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        self.starts = array('i', (starts[i] for i in order))
+        self.ends = array('i', (self.ends[i] for i in order))
+        self.texts = [self.texts[i] for i in order]
+
+    def retime(self, time_fn):
+        """用 time_fn(毫秒) 重新计算每句的开始和结束时间"""
+        for i in range(len(self.texts)):
+            start = time_fn(self.starts[i])
+            self.starts[i] = start
+            self.ends[i] = max(start, time_fn(self.ends[i]))
+
+    def compact(self, keep, texts):
+        """只保留 keep（与句子等长的布尔列表）为真的句子，文字替换为 texts，用于合并相邻句子"""
+        self.starts = array('i', compress(self.starts, keep))
+        self.ends = array('i', compress(self.ends, keep))
+        self.texts = texts
+
+
+# ---- 公共工具 ----
+
+def timestamp_ms(hours, minutes, seconds, fraction):
+    """时间字段转换为毫秒，fraction 为小数部分的数字串（"5" 表示500毫秒，"05" 表示50毫秒）"""
+    milliseconds = int((fraction or '0')[:3].ljust(3, '0'))
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + milliseconds
+
+
+def decode_text(data):
+    """解码字幕文件内容，返回 (文字, 使用的编码)；都解不开时按 latin-1 读取"""
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return data.decode('utf-16'), 'utf-16'
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            pass
+    return data.decode('latin-1'), 'latin-1'
+
+
+def read_text(path):
+    """读入并解码字幕文件"""
+    with open(path, 'rb') as f:
+        return decode_text(f.read())[0]
+
+
+# ---- 注册表 ----
+
+class SubtitleFormat:
+    """一种字幕格式：插件模块在第一次使用时导入"""
+
+    def __init__(self, name, label, module_name, extensions, sniff):
+        self.name = name
+        self.label = label
+        self.module_name = module_name
+        self.extensions = extensions
+        self.sniff = sniff
+        self._module = None
+
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.module_name)
+        return self._module
+
+
+_formats = []
+
+
+def register_format(name, label, module_name, extensions, sniff):
+    """注册字幕格式
+
+    Args:
+        module_name: 插件模块名，第一次解析该格式时才导入
+        extensions: 小写扩展名元组，如 ('.srt',)
+        sniff: sniff(文件开头文字) 返回该内容是否属于这种格式，不能依赖插件模块
+    """
+    _formats.append(SubtitleFormat(name, label, module_name, tuple(extensions), sniff))
+
+
+def subtitle_extensions():
+    """所有支持的字幕扩展名"""
+    return tuple(ext for fmt in _formats for ext in fmt.extensions)
+
+
+def subtitle_file_filter():
+    """文件对话框使用的过滤条件"""
+    return "字幕文件 (" + " ".join("*" + ext for ext in subtitle_extensions()) + ")"
+
+
+def detect_format(path, head):
+    """识别字幕格式：扩展名对应的格式确认内容相符时直接使用，否则按内容识别，最后按扩展名"""
+    ext = os.path.splitext(path)[1].lower()
+    by_extension = next((fmt for fmt in _formats if ext in fmt.extensions), None)
+    if by_extension and by_extension.sniff(head):
+        return by_extension
+    for fmt in _formats:
+        if fmt is not by_extension and fmt.sniff(head):
+            return fmt
+    return by_extension
+
+
+_SRT_TIMING = re.compile(r'^\s*\d+:\d{1,2}:\d{1,2},\d{1,3}\s*-->', re.MULTILINE)
+_LRC_TAG = re.compile(r'^\s*\[\d+:\d+[.:]\d+\]', re.MULTILINE)
+
+# 注册顺序也是按视频文件名查找字幕时尝试扩展名的顺序
+register_format('srt', 'SRT', 'subtitle_srt', ('.srt',),
+                lambda head: _SRT_TIMING.search(head) is not None)
+register_format('lrc', 'LRC', 'subtitle_lrc', ('.lrc',),
+                lambda head: _LRC_TAG.search(head) is not None)
+register_format('vtt', 'WebVTT', 'subtitle_vtt', ('.vtt',),
+                lambda head: head.lstrip().startswith('WEBVTT'))
+register_format('ass', 'ASS/SSA', 'subtitle_ass', ('.ass', '.ssa'),
+                lambda head: '[script info]' in head.lower() or '[events]' in head.lower())
+
+
+# 所有内置插件模块，供打包脚本使用
+PLUGIN_MODULES = tuple(fmt.module_name for fmt in _formats)
+
+
+def parse_file(path, correction=None):
+    """解析字幕文件，返回 (SubtitleFormat, CueTable)
+
+    Args:
+        correction: 自动对齐得到的时间校正（提供 apply_ms 方法），None表示不校正
+    Raises:
+        ValueError: 无法识别的格式
+    """
+    return parse_text(path, read_text(path), correction)
+
+
+def parse_text(path, text, correction=None):
+    """解析已经解码的字幕文字，path 用于按扩展名识别格式，返回 (SubtitleFormat, CueTable)"""
+    fmt = detect_format(path, text[:SNIFF_CHARS])
+    if fmt is None:
+        raise ValueError(f"无法识别的字幕格式: {os.path.basename(path)}")
+    module = fmt.module()
+    cues = CueTable()
+    module.parse(iter(text.splitlines()), cues)
+    cues.sort()
+    finish = getattr(module, 'finish', None)
+    if finish:
+        finish(cues)
+    if correction is not None:
+        cues.retime(correction.apply_ms)
+    return fmt, cues
+
+
+class SubtitleParser:
+    """字幕解析器：支持注册表中的所有格式，句子存放在 subtitles（CueTable）中"""
+
+    def __init__(self):
+        self.subtitles = CueTable()
+        self.current_index = 0
+        self.format = None
+
+    def load(self, subtitle_path, correction=None):
+        """加载并解析字幕文件，correction 为自动对齐得到的时间校正"""
+        try:
+            fmt, cues = parse_file(subtitle_path, correction)
+        except Exception as e:
+            print(f"解析字幕文件失败: {subtitle_path}, 错误: {e}")
+            return False
+        self.subtitles = cues
+        self.format = fmt.name
+        self.current_index = 0
+        return True
+
+    def get_current_subtitle(self):
+        """获取当前字幕"""
+        if 0 <= self.current_index < len(self.subtitles):
+            return self.subtitles[self.current_index]
+        return None
+
+    def next_subtitle(self):
+        """跳转到下一句字幕"""
+        if self.current_index < len(self.subtitles) - 1:
+            self.current_index += 1
+            return self.get_current_subtitle()
+        return None
+
+    def previous_subtitle(self):
+        """跳转到上一句字幕"""
+        if self.current_index > 0:
+            self.current_index -= 1
+            return self.get_current_subtitle()
+        return None
+
+    def get_total_count(self):
+        """获取总字幕数量"""
+        return len(self.subtitles)
+
+
+def load_subtitle_cues(subtitle_path, correction=None):
+    """解析字幕文件，返回 CueTable，失败时返回None"""
+    parser = SubtitleParser()
+    return parser.subtitles if parser.load(subtitle_path, correction) else None
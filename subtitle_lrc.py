@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LRC歌词字幕插件（由 subtitle_formats 在第一次遇到LRC文件时导入）
+LRC只有开始时间，每句按固定时长处理；同一时间点的多行（如中英对照）合并为一句。
+"""
+
+import re
+
+
+# 时间标签 [mm:ss.xx] 或 [mm:ss:xx]
+TIME_TAG = re.compile(r'\[(\d+):(\d+)[.:](\d+)\]')
+
+# LRC没有结束时间，假设每句持续3秒
+CUE_DURATION_MS = 3000
+
+# 开始时间相差不到该值的句子视为同一时间点（毫秒）
+MERGE_WINDOW_MS = 100
+
+
+def parse(lines, cues):
+    """一行可以有多个时间标签，每个标签生成一句；没有文字的行（如 [ti:...] 标签）忽略"""
+    for line in lines:
+        if '[' not in line:
+            continue
+        matches = TIME_TAG.findall(line)
+        if not matches:
+            continue
+        text = TIME_TAG.sub('', line).strip()
+        if not text:
+            continue
+        for minutes, seconds, fraction in matches:
+            # 两位小数为百分之一秒，三位为毫秒
+            fraction_ms = int(fraction) * 10 if len(fraction) <= 2 else int(fraction[:3])
+            start_ms = (int(minutes) * 60 + int(seconds)) * 1000 + fraction_ms
+            cues.append(start_ms, start_ms + CUE_DURATION_MS, text)
+
+
+def fill_end_times(cues, last_duration_ms=CUE_DURATION_MS):
+    """用下一句的开始时间代替按3秒估计的结束时间（句子已排序合并），最后一句仍按 last_duration_ms
+
+    返回估计值与下一句开始时间不一致（重叠或留空）的句子数，最后一句总是计入。
+    """
+    starts = cues.starts
+    ends = cues.ends
+    guessed = 0
+    for i in range(len(starts)):
+        if i + 1 < len(starts):
+            end = starts[i + 1]
+        else:
+            end = starts[i] + last_duration_ms
+        if ends[i] != end or i + 1 == len(starts):
+            guessed += 1
+        ends[i] = end
+    return guessed
+
+
+def finish(cues):
+    """合并相同时间点的重复字幕（句子已按开始时间排序）"""
+    keep = []
+    texts = []
+    run_start = None
+    for start, text in zip(cues.starts.tolist(), cues.texts):
+        if run_start is not None and start - run_start < MERGE_WINDOW_MS:
+            texts[-1] += " " + text
+            keep.append(False)
+        else:
+            texts.append(text)
+            keep.append(True)
+            run_start = start
+    if len(texts) != len(cues):
+        cues.compact(keep, texts)
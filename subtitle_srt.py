@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SRT字幕插件（由 subtitle_formats 在第一次遇到SRT文件时导入）
+"""
+
+import re
+
+from subtitle_formats import timestamp_ms
+
+
+TIMING = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})')
+
+
+def parse(lines, cues):
+    """逐行解析：时间行之后到空行之前的文字为一句；缺少空行分隔时遇到下一个时间行也会结束上一句"""
+    timing = None
+    text_lines = []
+    for line in lines:
+        line = line.strip()
+        match = TIMING.search(line) if '-->' in line else None
+        if match:
+            if timing:
+                # 上一句后面没有空行，去掉被当成文字的序号行
+                if text_lines and text_lines[-1].isdigit():
+                    text_lines.pop()
+                cues.append(timing[0], timing[1], '\n'.join(text_lines))
+            groups = match.groups()
+            timing = (timestamp_ms(*groups[:4]), timestamp_ms(*groups[4:]))
+            text_lines = []
+        elif timing is None:
+            continue
+        elif line:
+            text_lines.append(line)
+        else:
+            cues.append(timing[0], timing[1], '\n'.join(text_lines))
+            timing = None
+    if timing:
+        cues.append(timing[0], timing[1], '\n'.join(text_lines))
+
+
+def _format_time(ms):
+    seconds, ms = divmod(max(0, ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def write(cues, f):
+    """把 CueTable 写成SRT文本，f 为以文本方式打开的文件"""
+    for number, (start, end, text) in enumerate(zip(cues.starts, cues.ends, cues.texts), 1):
+        f.write(f"{number}\n{_format_time(start)} --> {_format_time(end)}\n{text}\n\n")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双语字幕
+主字幕（英文）决定句子和循环边界，第二字幕（中文）只提供每句的对照文字。
+两个字幕各自按开始时间排序后做一次线性扫描，把每句第二字幕分配给重叠最多的主字幕句子，
+复杂度为 O(n+m)；对照结果按两个文件的大小和修改时间缓存，来回切换文件时不需要重新计算。
+"""
+
+import os
+from collections import OrderedDict
+
+from file_signature import file_signature
+from subtitle_formats import subtitle_extensions
+
+
+# 第二字幕文件名中表示中文的标记，如 lesson1.zh.srt、lesson1_chs.srt
+SECONDARY_TAGS = ('zh', 'cn', 'chs', 'cht', 'chi', 'zho', 'sc', 'tc', 'zh-cn', 'zh-tw', 'zh_cn', 'zh_tw',
+                  'chinese', '中文', '中', '简体', '繁体', '双语')
+TAG_SEPARATORS = '._- '
+
+# 没有重叠的第二字幕句子，与主字幕句子的间隔不超过该值时仍然归到这一句（毫秒）
+NEAREST_TOLERANCE_MS = 500
+
+# 缓存的对照结果数
+CACHE_SIZE = 16
+
+
+def _split_tag(stem):
+    """"lesson1.zh-cn" 返回 "lesson1"，没有中文标记时返回None"""
+    for position in range(1, len(stem) - 1):
+        if stem[position] in TAG_SEPARATORS and stem[position + 1:] in SECONDARY_TAGS:
+            return stem[:position]
+    return None
+
+
+def secondary_subtitle_index(directory):
+    """扫描目录一次，返回 {视频文件名(小写，不含扩展名): 第二字幕路径}"""
+    index = {}
+    extensions = subtitle_extensions()
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return index
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in extensions:
+            continue
+        video_name = _split_tag(stem.lower())
+        if video_name:
+            index.setdefault(video_name, os.path.join(directory, name))
+    return index
+
+
+def find_secondary_subtitle(video_path, primary_path=None, index=None):
+    """查找与视频同名、带中文标记的字幕文件，如 lesson1.zh.srt，没有时返回None
+
+    Args:
+        index: secondary_subtitle_index() 的结果，批量添加同一目录的文件时复用
+    """
+    if index is None:
+        index = secondary_subtitle_index(os.path.dirname(video_path))
+    video_name = os.path.splitext(os.path.basename(video_path))[0].lower()
+    path = index.get(video_name)
+    if path and primary_path and os.path.abspath(path) == os.path.abspath(primary_path):
+        return None
+    return path
+
+
+def align_tracks(primary, secondary, tolerance_ms=NEAREST_TOLERANCE_MS):
+    """把第二字幕对应到主字幕，返回与主字幕等长的对照文字列表（没有对应时为空字符串）
+
+    每句第二字幕只分配给一句主字幕：与之重叠最多的那一句；完全不重叠时分配给间隔最小的一句。
+    """
+    texts = [[] for _ in primary]
+    if not primary or not secondary:
+        return [''] * len(primary)
+
+    primary_order = sorted(range(len(primary)), key=lambda i: primary[i]['start'])
+    secondary_sorted = sorted(secondary, key=lambda sub: sub['start'])
+    count = len(primary_order)
+    first = 0   # 第一句可能与当前第二字幕重叠的主字幕（按开始时间排序后的位置）
+
+    for sub in secondary_sorted:
+        start, end = sub['start'], sub['end']
+        # 结束时间早于当前句开始的主字幕不会再与后面的句子重叠
+        while first < count - 1 and primary[primary_order[first]]['end'] <= start:
+            first += 1
+
+        best, best_overlap = -1, 0
+        position = first
+        while position < count:
+            cue = primary[primary_order[position]]
+            if cue['start'] >= end:
+                break
+            overlap = min(end, cue['end']) - max(start, cue['start'])
+            if overlap > best_overlap:
+                best, best_overlap = primary_order[position], overlap
+            position += 1
+
+        if best < 0:
+            # 没有重叠，在前后两句中取间隔最小的一句
+            best_distance = tolerance_ms + 1
+            for position in (first - 1, first, first + 1):
+                if 0 <= position < count:
+                    index = primary_order[position]
+                    cue = primary[index]
+                    distance = max(cue['start'] - end, start - cue['end'], 0)
+                    if distance < best_distance:
+                        best, best_distance = index, distance
+        if best >= 0:
+            texts[best].append(sub['text'].replace('\n', ' ').strip())
+
+    return [' '.join(parts) for parts in texts]
+
+
+def _signature(path):
+    try:
+        return file_signature(path)
+    except OSError:
+        return None
+
+
+class SecondaryTrackCache:
+    """按 (主字幕, 第二字幕) 缓存对照结果
+
+    Args:
+        load_fn: load_fn(subtitle_path) 返回字幕列表，失败时返回None
+    """
+
+    def __init__(self, load_fn, size=CACHE_SIZE):
+        self.load_fn = load_fn
+        self.size = size
+        self._entries = OrderedDict()
+
+    def get(self, primary_path, primary, secondary_path, key=None):
+        """返回主字幕每句的对照文字，第二字幕无法加载时返回None
+
+        Args:
+            primary: 已加载的主字幕列表（决定句子和循环边界）
+            key: 影响结果的其他参数（如时间校正），变化时重新计算
+        """
+        if not secondary_path:
+            return None
+        cache_key = (primary_path, secondary_path)
+        signature = (_signature(primary_path), _signature(secondary_path), len(primary), key)
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry[0] == signature:
+            self._entries.move_to_end(cache_key)
+            return entry[1]
+
+        secondary = self.load_fn(secondary_path)
+        if secondary is None:
+            return None
+        texts = align_tracks(primary, secondary)
+        self._entries[cache_key] = (signature, texts)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return texts
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebVTT字幕插件（由 subtitle_formats 在第一次遇到WebVTT文件时导入）
+"""
+
+import html
+import re
+
+from subtitle_formats import timestamp_ms
+
+
+# 小时部分可以省略：00:01.000 --> 00:04.000 line:90%
+TIMING = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{1,2})\.(\d{1,3})\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{1,2})\.(\d{1,3})')
+
+# 文字中的标签：<c.yellow>、<v Speaker>、<00:00:01.000>、</i> 等
+TAG = re.compile(r'<[^>]*>')
+
+# 不包含字幕的块
+SKIPPED_BLOCKS = ('NOTE', 'STYLE', 'REGION')
+
+
+def parse(lines, cues):
+    """按空行分块，含时间行的块为一句，时间行之前的一行是可选的标识"""
+    timing = None
+    text_lines = []
+    skipping = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if timing:
+                cues.append(timing[0], timing[1], '\n'.join(text_lines))
+            timing = None
+            text_lines = []
+            skipping = False
+            continue
+        if skipping:
+            continue
+        if timing is None:
+            if '-->' in line:
+                match = TIMING.search(line)
+                if match:
+                    groups = match.groups()
+                    timing = (timestamp_ms(*groups[:4]), timestamp_ms(*groups[4:]))
+            elif line.split(' ', 1)[0] in SKIPPED_BLOCKS:
+                skipping = True
+            continue
+        text = html.unescape(TAG.sub('', line)).strip()
+        if text:
+            text_lines.append(text)
+    if timing:
+        cues.append(timing[0], timing[1], '\n'.join(text_lines))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程清单测试
+自然排序（第2课在第10课之前）；目录中的媒体或字幕文件增删、修改后清单失效，其他文件不影响；
+整个目录移动后清单仍然有效。
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from course_manifest import (MANIFEST_FILE_NAME, load_manifest, match_subtitle, media_files,  # noqa: E402
+                             natural_sort_key, playlist_items, update_manifest)
+
+
+MEDIA_EXTENSIONS = ('.mp4', '.mp3')
+
+SRT = """1
+00:00:01,000 --> 00:00:02,000
+One.
+
+2
+00:00:03,000 --> 00:00:04,000
+Two.
+"""
+
+
+class NaturalSortTest(unittest.TestCase):
+
+    def test_numbers_compare_by_value(self):
+        names = ['lesson10.mp3', 'Lesson2.mp3', 'lesson1.mp3', 'lesson2b.mp3', 'intro.mp3', 'lesson02.mp3']
+        self.assertEqual(sorted(names, key=natural_sort_key),
+                         ['intro.mp3', 'lesson1.mp3', 'Lesson2.mp3', 'lesson02.mp3', 'lesson2b.mp3', 'lesson10.mp3'])
+
+    def test_multiple_numbers(self):
+        names = ['unit10 part1', 'unit2 part10', 'unit2 part9']
+        self.assertEqual(sorted(names, key=natural_sort_key), ['unit2 part9', 'unit2 part10', 'unit10 part1'])
+
+    def test_match_subtitle(self):
+        self.assertEqual(match_subtitle('lesson1', ['lesson1.vtt', 'lesson1.srt', 'other.srt']), 'lesson1.srt')
+        self.assertEqual(match_subtitle('lesson3', ['a.vtt', 'b.srt']), 'b.srt')
+        self.assertIsNone(match_subtitle('lesson3', []))
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='elp_test_')
+        self.course = os.path.join(self.root, 'course')
+        os.makedirs(self.course)
+        for index in (10, 2, 1):
+            self.write(f"lesson{index}.mp3", b'm' * (1000 + index))
+            self.write(f"lesson{index}.srt", SRT.encode('utf-8'))
+        self.write("lesson1.zh.srt", SRT.encode('utf-8'))
+        self.assertEqual(update_manifest(self.course, MEDIA_EXTENSIONS), 'written')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.course, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def assertStale(self):
+        self.assertIsNone(load_manifest(self.course, MEDIA_EXTENSIONS))
+        self.assertEqual(update_manifest(self.course, MEDIA_EXTENSIONS), 'written')
+        self.assertIsNotNone(load_manifest(self.course, MEDIA_EXTENSIONS))
+
+    def test_lessons_in_natural_order(self):
+        manifest = load_manifest(self.course, MEDIA_EXTENSIONS)
+        self.assertEqual([lesson['media'] for lesson in manifest['lessons']],
+                         ['lesson1.mp3', 'lesson2.mp3', 'lesson10.mp3'])
+        first = manifest['lessons'][0]
+        self.assertEqual((first['subtitle'], first['secondary'], first['cues']), ('lesson1.srt', 'lesson1.zh.srt', 2))
+        self.assertIsNone(manifest['lessons'][1]['secondary'])
+        self.assertEqual(media_files(self.course, MEDIA_EXTENSIONS),
+                         [os.path.join(self.course, name) for name in ('lesson1.mp3', 'lesson2.mp3', 'lesson10.mp3')])
+
+    def test_fresh_manifest_is_not_rewritten(self):
+        self.assertEqual(update_manifest(self.course, MEDIA_EXTENSIONS), 'fresh')
+        self.assertEqual(update_manifest(self.course, MEDIA_EXTENSIONS, force=True), 'written')
+
+    def test_added_media_invalidates(self):
+        self.write("lesson3.mp4", b'v' * 10)
+        self.assertStale()
+
+    def test_removed_subtitle_invalidates(self):
+        os.remove(os.path.join(self.course, "lesson2.srt"))
+        self.assertStale()
+        lesson = load_manifest(self.course, MEDIA_EXTENSIONS)['lessons'][1]
+        # 没有同名字幕时使用目录中的第一个字幕文件
+        self.assertEqual(lesson['subtitle'], 'lesson1.srt')
+
+    def test_edited_file_invalidates(self):
+        self.write("lesson10.srt", (SRT + "\n3\n00:00:05,000 --> 00:00:06,000\nThree.\n").encode('utf-8'))
+        self.assertStale()
+        self.assertEqual(load_manifest(self.course, MEDIA_EXTENSIONS)['lessons'][2]['cues'], 3)
+
+    def test_touched_file_with_same_size_invalidates(self):
+        path = os.path.join(self.course, "lesson2.mp3")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertStale()
+
+    def test_renamed_file_invalidates(self):
+        os.rename(os.path.join(self.course, "lesson10.mp3"), os.path.join(self.course, "lesson11.mp3"))
+        self.assertStale()
+
+    def test_other_files_do_not_invalidate(self):
+        self.write("notes.txt", b'n')
+        self.write("cover.jpg", b'j')
+        self.assertEqual(update_manifest(self.course, MEDIA_EXTENSIONS), 'fresh')
+
+    def test_moved_course_keeps_manifest(self):
+        moved = os.path.join(self.root, 'moved')
+        os.rename(self.course, moved)
+        manifest = load_manifest(moved, MEDIA_EXTENSIONS)
+        self.assertIsNotNone(manifest)
+        items = playlist_items(moved, manifest)
+        self.assertEqual(items[0], {
+            'video_path': os.path.join(moved, 'lesson1.mp3'),
+            'subtitle_path': os.path.join(moved, 'lesson1.srt'),
+            'secondary_subtitle_path': os.path.join(moved, 'lesson1.zh.srt'),
+            'video_name': 'lesson1',
+        })
+
+    def test_other_version_is_ignored(self):
+        manifest_path = os.path.join(self.course, MANIFEST_FILE_NAME)
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['version'] += 1
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        self.assertStale()
+
+    def test_empty_directory(self):
+        empty = os.path.join(self.root, 'empty')
+        os.makedirs(empty)
+        self.assertEqual(update_manifest(empty, MEDIA_EXTENSIONS), 'empty')
+        self.assertFalse(os.path.exists(os.path.join(empty, MANIFEST_FILE_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录监视测试
+在临时目录中增删改文件，检查重新扫描得到的变化；移动和重命名按文件编号识别为同一个文件。
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_watch import FolderIndex  # noqa: E402
+
+
+EXTENSIONS = ('.mp3', '.srt')
+
+
+class FolderIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='elp_test_')
+        self.course = self.make_dir('course')
+        self.other = self.make_dir('other')
+        self.write(self.course, 'lesson1.mp3', b'a' * 100)
+        self.write(self.course, 'lesson1.srt', b'b' * 10)
+        self.write(self.course, 'notes.txt', b'c')
+        self.index = FolderIndex(EXTENSIONS)
+        self.assertEqual(sorted(self.index.watch([self.course, self.other])), sorted([self.course, self.other]))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def make_dir(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+        return path
+
+    def write(self, directory, name, data):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def rescan(self):
+        changes = self.index.rescan([self.course, self.other])
+        return (sorted(changes.added), sorted(changes.removed), sorted(changes.modified), sorted(changes.moved))
+
+    def test_no_changes(self):
+        self.assertFalse(self.index.rescan([self.course, self.other]))
+
+    def test_rename_is_relinked_not_removed_and_added(self):
+        old = os.path.join(self.course, 'lesson1.mp3')
+        new = os.path.join(self.course, 'Lesson 01.mp3')
+        os.rename(old, new)
+        self.assertEqual(self.rescan(), ([], [], [], [(old, new)]))
+
+    def test_move_across_directories_in_one_batch(self):
+        old = os.path.join(self.course, 'lesson1.srt')
+        new = os.path.join(self.other, 'lesson1.srt')
+        os.rename(old, new)
+        self.assertEqual(self.rescan(), ([], [], [], [(old, new)]))
+
+    def test_replaced_file_is_not_a_move(self):
+        # 删除后写入一个大小不同的新文件，即使文件编号被复用也不算移动
+        old = os.path.join(self.course, 'lesson1.mp3')
+        os.remove(old)
+        new = self.write(self.course, 'lesson2.mp3', b'x' * 55)
+        self.assertEqual(self.rescan(), ([new], [old], [], []))
+
+    def test_added_removed_and_modified(self):
+        added = self.write(self.other, 'lesson9.mp3', b'n' * 7)
+        removed = os.path.join(self.course, 'lesson1.srt')
+        os.remove(removed)
+        modified = self.write(self.course, 'lesson1.mp3', b'a' * 120)
+        self.assertEqual(self.rescan(), ([added], [removed], [modified], []))
+        # 快照已经更新，再扫描一次没有变化
+        self.assertEqual(self.rescan(), ([], [], [], []))
+
+    def test_other_extensions_are_ignored(self):
+        self.write(self.course, 'cover.jpg', b'j')
+        os.remove(os.path.join(self.course, 'notes.txt'))
+        self.assertEqual(self.rescan(), ([], [], [], []))
+
+    def test_vanished_directory_keeps_snapshot(self):
+        # 目录整个消失（如U盘拔出）不报告删除，恢复后与原来的快照比较
+        backup = os.path.join(self.root, 'backup')
+        os.rename(self.course, backup)
+        self.assertEqual(self.rescan(), ([], [], [], []))
+        os.rename(backup, self.course)
+        self.assertEqual(self.rescan(), ([], [], [], []))
+
+    def test_watch_drops_unwatched_directories(self):
+        self.assertEqual(self.index.watch([self.course, os.path.join(self.root, 'missing')]), [])
+        self.assertEqual(self.index.directories(), {self.course})
+        self.write(self.other, 'lesson5.mp3', b'z')
+        self.assertFalse(self.index.rescan([self.other]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响度均衡测试
+用生成的正弦波检查BS.1770整体响度（-20 dBFS的1 kHz正弦波为-23 LUFS）和门限，
+整课和每句的增益及其上限、削波限制，WAV分析和缓存文件的读写。
+"""
+
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loudness  # noqa: E402
+from loudness import (ANALYSIS_SAMPLE_RATE, BLOCK_MS, MAX_CUE_ADJUST_DB, MAX_LESSON_GAIN_DB,  # noqa: E402
+                      TARGET_LOUDNESS, BlockAnalyzer, LoudnessProfile, analyze_wav, integrated_loudness)
+
+np = loudness.np
+
+
+def tone(seconds, dbfs, frequency=1000, rate=ANALYSIS_SAMPLE_RATE):
+    """正弦波的16位PCM，dbfs 为峰值相对满刻度的分贝数"""
+    amplitude = 10 ** (dbfs / 20.0)
+    t = np.arange(int(seconds * rate)) / rate
+    return np.round(amplitude * 32767 * np.sin(2 * np.pi * frequency * t)).astype('<i2')
+
+
+def silence(seconds, rate=ANALYSIS_SAMPLE_RATE):
+    return np.zeros(int(seconds * rate), dtype='<i2')
+
+
+def analyze(*parts):
+    analyzer = BlockAnalyzer()
+    analyzer.feed(np.concatenate(parts).tobytes())
+    powers, peaks = analyzer.finish()
+    return LoudnessProfile(integrated_loudness(powers), powers, peaks)
+
+
+@unittest.skipUnless(loudness.is_available(), "需要numpy")
+class IntegratedLoudnessTest(unittest.TestCase):
+
+    def test_reference_tone(self):
+        profile = analyze(tone(5, -20))
+        self.assertAlmostEqual(profile.integrated, -23.0, delta=0.1)
+        self.assertEqual(profile.duration_ms, 5000)
+        self.assertAlmostEqual(profile.peak(), 0.1, places=3)
+
+    def test_level_changes_loudness_one_to_one(self):
+        difference = analyze(tone(3, -6)).integrated - analyze(tone(3, -26)).integrated
+        self.assertAlmostEqual(difference, 20.0, delta=0.05)
+
+    def test_k_weighting_lifts_high_frequencies(self):
+        # K加权在高频有约4 dB的提升，在低频衰减
+        self.assertGreater(analyze(tone(3, -20, 4000)).integrated, -23.0 + 3.0)
+        self.assertLess(analyze(tone(3, -20, 50)).integrated, -23.0 - 0.5)
+
+    def test_silence_is_gated(self):
+        loud = analyze(tone(4, -20)).integrated
+        # 4秒正弦波有37个完整的400ms门限块；跨到静音的3个块分别有3/4、1/2、1/4的功率，也在门限以上
+        self.assertAlmostEqual(analyze(tone(4, -20), silence(20)).integrated, loud + 10 * math.log10(38.5 / 40),
+                               delta=0.01)
+        self.assertIsNone(analyze(silence(3)).integrated)
+        self.assertIsNone(integrated_loudness(np.zeros(0, dtype=np.float32)))
+
+    def test_relative_gate(self):
+        loud = analyze(tone(4, -20)).integrated
+        # 比整体响度低20 dB的部分被相对门限去掉，与后面是静音时相同
+        self.assertAlmostEqual(analyze(tone(4, -20), tone(4, -40)).integrated,
+                               analyze(tone(4, -20), silence(4)).integrated, delta=0.01)
+        # 只低3 dB的部分计入平均
+        mixed = analyze(tone(4, -20), tone(4, -23)).integrated
+        self.assertLess(mixed, loud - 1.0)
+        self.assertGreater(mixed, loud - 3.0)
+
+    def test_chunked_feed_matches_single_feed(self):
+        pcm = np.concatenate([tone(1.234, -20), tone(0.5, -30, 440)]).tobytes()
+        whole = BlockAnalyzer()
+        whole.feed(pcm)
+        chunked = BlockAnalyzer()
+        for offset in range(0, len(pcm), 999):
+            chunked.feed(pcm[offset:offset + 999])
+        for expected, actual in zip(whole.finish(), chunked.finish()):
+            np.testing.assert_allclose(actual, expected, rtol=1e-6)
+        # 最后不满一个子块的部分补零处理
+        self.assertEqual(len(expected), math.ceil(1734 / BLOCK_MS))
+
+
+@unittest.skipUnless(loudness.is_available(), "需要numpy")
+class GainTest(unittest.TestCase):
+
+    def test_lesson_gain_moves_to_target(self):
+        profile = analyze(tone(4, -20))
+        self.assertAlmostEqual(profile.lesson_gain_db(), TARGET_LOUDNESS - profile.integrated, places=6)
+        self.assertAlmostEqual(analyze(tone(4, -1)).lesson_gain_db(), TARGET_LOUDNESS - (-4.0), delta=0.1)
+
+    def test_lesson_gain_is_clamped(self):
+        self.assertEqual(analyze(tone(4, -50)).lesson_gain_db(), MAX_LESSON_GAIN_DB)
+        self.assertEqual(analyze(tone(4, -20)).lesson_gain_db(target=40.0), MAX_LESSON_GAIN_DB)
+
+    def test_gain_never_clips(self):
+        # 整体很轻（需要放大到上限）但有一个较响的峰值：放大后峰值不超过满刻度
+        profile = analyze(tone(10, -36), tone(0.1, -12), tone(10, -36))
+        self.assertGreater(TARGET_LOUDNESS - profile.integrated, MAX_LESSON_GAIN_DB)
+        self.assertAlmostEqual(profile.lesson_gain_db(), -20 * math.log10(profile.peak()), places=6)
+        self.assertAlmostEqual(profile.lesson_gain_db(), 12.0, delta=0.05)
+        # 不包含峰值的一句不受它的限制
+        self.assertGreater(profile.cue_gain_db(0, 5000), MAX_LESSON_GAIN_DB)
+
+    def test_no_sound_has_no_gain(self):
+        profile = analyze(silence(2))
+        self.assertEqual(profile.lesson_gain_db(), 0.0)
+        self.assertEqual(profile.cue_gain_db(0, 1000), 0.0)
+
+    def test_quiet_cue_gets_extra_gain(self):
+        profile = analyze(tone(10, -20), tone(2, -26), tone(2, -40), tone(10, -20))
+        lesson = profile.lesson_gain_db()
+        self.assertAlmostEqual(lesson, TARGET_LOUDNESS - profile.integrated, places=6)
+        self.assertAlmostEqual(profile.cue_loudness(0, 10000), -23.0, delta=0.1)
+        self.assertAlmostEqual(profile.cue_loudness(10000, 12000), -29.0, delta=0.1)
+        # 每句按比整课轻或响的程度修正
+        for start_ms, end_ms in ((0, 10000), (10000, 12000)):
+            self.assertAlmostEqual(profile.cue_gain_db(start_ms, end_ms) - lesson,
+                                   profile.integrated - profile.cue_loudness(start_ms, end_ms), places=6)
+        # 修正有上限
+        self.assertAlmostEqual(profile.cue_gain_db(12000, 14000) - lesson, MAX_CUE_ADJUST_DB, places=6)
+
+    def test_cue_outside_file_uses_last_block(self):
+        profile = analyze(tone(1, -20))
+        self.assertAlmostEqual(profile.cue_loudness(5000, 6000), profile.integrated, delta=0.05)
+
+
+@unittest.skipUnless(loudness.is_available(), "需要numpy")
+class ProfileFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write_wav(self, name, samples, channels=1):
+        path = os.path.join(self.work_dir, name)
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(ANALYSIS_SAMPLE_RATE)
+            wav.writeframes(samples.tobytes())
+        return path
+
+    def test_analyze_wav(self):
+        samples = np.concatenate([tone(3, -20), silence(1)])
+        profile = analyze_wav(self.write_wav('a.wav', samples))
+        self.assertAlmostEqual(profile.integrated, analyze(samples).integrated, places=6)
+        self.assertEqual(profile.duration_ms, 4000)
+        with self.assertRaises(ValueError):
+            analyze_wav(self.write_wav('stereo.wav', tone(1, -20), channels=2))
+
+    def test_save_and_load(self):
+        profile = analyze(tone(2, -20), silence(1))
+        profile.signature = (12345, 1700000000123456789)
+        path = os.path.join(self.work_dir, 'a.loud')
+        profile.save(path)
+        loaded = LoudnessProfile.load(path)
+        self.assertEqual(loaded.signature, profile.signature)
+        self.assertAlmostEqual(loaded.integrated, profile.integrated, places=9)
+        np.testing.assert_array_equal(loaded.powers, profile.powers)
+        np.testing.assert_array_equal(loaded.peaks, profile.peaks)
+        self.assertAlmostEqual(loaded.cue_gain_db(0, 2000), profile.cue_gain_db(0, 2000), places=5)
+
+    def test_silent_profile_round_trip(self):
+        profile = analyze(silence(1))
+        profile.signature = (1, 2)
+        path = os.path.join(self.work_dir, 'silent.loud')
+        profile.save(path)
+        self.assertIsNone(LoudnessProfile.load(path).integrated)
+
+    def test_bad_files_are_ignored(self):
+        path = os.path.join(self.work_dir, 'bad.loud')
+        self.assertIsNone(LoudnessProfile.load(path))
+        with open(path, 'wb') as f:
+            f.write(b'ELPLOUD1' + b'\0' * 10)
+        self.assertIsNone(LoudnessProfile.load(path))
+        profile = analyze(tone(1, -20))
+        profile.signature = (1, 2)
+        profile.save(path)
+        with open(path, 'ab') as f:
+            f.write(b'\0')
+        self.assertIsNone(LoudnessProfile.load(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
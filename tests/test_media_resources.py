@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VLC资源管理测试
+用假的 vlc 模块记录每个媒体、播放器和实例的创建与释放，不需要安装VLC：
+反复切换文件和内存片段后持有的媒体数不增长，close() 之后全部释放，重复 close() 不做任何事。
+完整的内存测试（需要libvlc）见 benchmarks/soak_media_switch.py。
+"""
+
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Ledger:
+    """假libvlc对象的创建和释放记录"""
+
+    def __init__(self):
+        self.live = set()
+        self.created = 0
+        self.double_released = []
+
+    def create(self, obj):
+        self.created += 1
+        self.live.add(obj)
+
+    def release(self, obj):
+        if obj not in self.live:
+            self.double_released.append(obj)
+        self.live.discard(obj)
+
+
+class FakeMedia:
+
+    def __init__(self, ledger, mrl):
+        self.ledger = ledger
+        self.mrl = mrl
+        ledger.create(self)
+
+    def release(self):
+        self.ledger.release(self)
+
+
+class FakePlayer:
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.media = None
+        self.equalizer = None
+        self.stopped = False
+        ledger.create(self)
+
+    def set_media(self, media):
+        self.media = media
+
+    def set_equalizer(self, equalizer):
+        self.equalizer = None if equalizer is None else equalizer.preamp
+        return 0
+
+    def stop(self):
+        self.stopped = True
+
+    def release(self):
+        self.ledger.release(self)
+
+
+class FakeInstance:
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        ledger.create(self)
+
+    def _check(self):
+        if self not in self.ledger.live:
+            raise AssertionError("实例已经释放")
+
+    def media_new(self, mrl):
+        self._check()
+        return FakeMedia(self.ledger, mrl)
+
+    def media_player_new(self):
+        self._check()
+        return FakePlayer(self.ledger)
+
+    def release(self):
+        self.ledger.release(self)
+
+
+class FakeEqualizer:
+
+    def __init__(self):
+        self.preamp = 0.0
+
+    def set_preamp(self, value):
+        self.preamp = value
+        return 0
+
+    def release(self):
+        pass
+
+
+class FakeStream:
+    """内存片段：提供 create_media(instance)"""
+
+    def create_media(self, instance):
+        return instance.media_new('imem://clip')
+
+
+def make_fake_vlc(ledger):
+    module = types.ModuleType('vlc')
+    module.Instance = lambda *args: FakeInstance(ledger)
+    module.AudioEqualizer = FakeEqualizer
+    return module
+
+
+# 没有安装 python-vlc 时也能导入
+with mock.patch.dict(sys.modules, {'vlc': make_fake_vlc(Ledger())}):
+    import media_resources  # noqa: E402
+
+
+SWITCHES = 5000
+
+
+class MediaResourcesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ledger = Ledger()
+        patcher = mock.patch.object(media_resources, 'vlc', make_fake_vlc(self.ledger))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.resources = media_resources.MediaResources()
+        self.main = self.resources.new_player()
+        self.clip = self.resources.new_player()
+
+    def bound(self):
+        return self.resources.media_keep + len(self.resources.players)
+
+    def test_media_count_stays_bounded_while_switching(self):
+        paths = [f"/lessons/{index}.mp3" for index in range(5)]
+        stream = FakeStream()
+        for step in range(SWITCHES):
+            self.resources.load(self.main, paths[step % len(paths)])
+            self.resources.load_stream(self.clip, stream)
+            if step % 7 == 0:
+                # 内存复读的片段也可能在主播放器上
+                self.resources.load_stream(self.main, stream)
+            self.assertLessEqual(self.resources.live_media_count(), self.bound())
+
+        self.assertGreater(self.resources.created_media, 2 * SWITCHES)
+        # 本对象没有持有的媒体都已经释放
+        live_media = [obj for obj in self.ledger.live if isinstance(obj, FakeMedia)]
+        self.assertEqual(len(live_media), self.resources.live_media_count())
+        self.assertEqual(self.resources.created_media - self.resources.released_media, len(live_media))
+        self.assertEqual(self.ledger.double_released, [])
+
+    def test_recent_file_media_is_reused(self):
+        self.resources.load(self.main, "/a.mp3")
+        first = self.main.media
+        self.resources.load(self.main, "/b.mp3")
+        self.resources.load(self.main, "/a.mp3")
+        self.assertIs(self.main.media, first)
+        self.assertEqual(self.resources.created_media, 2)
+        self.resources.load(self.main, "/c.mp3")
+        self.resources.load(self.main, "/b.mp3")
+        self.assertEqual(self.resources.created_media, 4)
+
+    def test_close_releases_everything_once(self):
+        for index in range(50):
+            self.resources.load(self.main, f"/{index}.mp3")
+            self.resources.load_stream(self.clip, FakeStream())
+        instance = self.resources.instance
+        self.resources.close()
+
+        self.assertTrue(self.resources.closed)
+        self.assertEqual(self.resources.created_media, self.resources.released_media)
+        self.assertEqual(self.resources.live_media_count(), 0)
+        self.assertEqual(self.resources.players, [])
+        self.assertTrue(self.main.stopped and self.clip.stopped)
+        self.assertNotIn(instance, self.ledger.live)
+        self.assertEqual(self.ledger.live, set())
+
+        # 第二次 close() 不做任何事
+        self.resources.close()
+        self.assertEqual(self.resources.created_media, self.resources.released_media)
+        self.assertEqual(self.ledger.double_released, [])
+
+    def test_release_player_frees_its_stream(self):
+        self.resources.load_stream(self.clip, FakeStream())
+        self.resources.release_player(self.clip)
+        self.resources.release_player(self.clip)
+        self.assertEqual(self.resources.live_media_count(), 0)
+        self.assertNotIn(self.clip, self.ledger.live)
+        self.assertEqual(self.ledger.double_released, [])
+
+    def test_gain_uses_equalizer_preamp(self):
+        self.resources.set_gain(self.main, 6.0)
+        self.assertEqual(self.main.equalizer, 6.0)
+        self.resources.set_gain(self.main, 40.0)
+        self.assertEqual(self.main.equalizer, media_resources.MAX_PREAMP_DB)
+        self.resources.set_gain(self.main, 0.0)
+        self.assertIsNone(self.main.equalizer)
+
+
+if __name__ == '__main__':
+    unittest.main()
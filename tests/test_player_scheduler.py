@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调度器合并请求测试
+用手动推进的时钟驱动 Scheduler，检查 Debouncer 在默认（只在最后执行）和 leading 两种方式下的执行时刻。
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from player_scheduler import Scheduler, Debouncer, SCOPE_FILE  # noqa: E402
+
+
+DELAY_MS = 150
+
+
+class DebouncerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now_ms = 0
+        self.scheduler = Scheduler(lambda: self.now_ms)
+        self.fired = []
+
+    def advance(self, ms):
+        self.now_ms += ms
+        self.scheduler.run_due()
+
+    def create(self, leading):
+        debouncer = Debouncer(self.scheduler, DELAY_MS, None, scope=SCOPE_FILE, leading=leading)
+        debouncer.callback = lambda: self.fired.append((self.now_ms, debouncer.merged))
+        return debouncer
+
+    def test_trailing_waits_for_the_last_request(self):
+        debouncer = self.create(leading=False)
+        debouncer.request()
+        self.advance(100)
+        debouncer.request()
+        self.advance(100)
+        self.assertEqual(self.fired, [])
+        self.advance(50)
+        self.assertEqual(self.fired, [(250, 2)])
+
+    def test_leading_fires_an_isolated_request_immediately(self):
+        debouncer = self.create(leading=True)
+        debouncer.request()
+        self.assertEqual(self.fired, [(0, 1)])
+        # 没有后续请求时，这一轮结束后不再执行
+        self.advance(DELAY_MS * 2)
+        self.assertEqual(self.fired, [(0, 1)])
+        self.assertFalse(debouncer.active)
+
+        debouncer.request()
+        self.assertEqual(self.fired, [(0, 1), (300, 1)])
+
+    def test_leading_merges_follow_up_requests(self):
+        debouncer = self.create(leading=True)
+        for press in range(4):
+            if press:
+                self.advance(50)
+            debouncer.request()
+        # 第一次立即执行，后三次合并到最后一次请求 DELAY_MS 之后
+        self.advance(DELAY_MS - 1)
+        self.assertEqual(self.fired, [(0, 1)])
+        self.assertTrue(debouncer.pending)
+        self.advance(1)
+        self.assertEqual(self.fired, [(0, 1), (300, 3)])
+        self.assertFalse(debouncer.pending)
+
+    def test_cancel_drops_trailing_request(self):
+        for leading in (False, True):
+            self.fired = []
+            debouncer = self.create(leading=leading)
+            start = self.now_ms
+            debouncer.request()
+            debouncer.request()
+            debouncer.cancel()
+            self.assertFalse(debouncer.pending)
+            self.advance(DELAY_MS * 2)
+            # leading 方式只有第一次请求立即执行过，取消后不再执行合并的请求
+            self.assertEqual(self.fired, [(start, 1)] if leading else [])
+
+    def test_scope_change_drops_pending_request(self):
+        debouncer = self.create(leading=True)
+        debouncer.request()
+        debouncer.request()
+        self.scheduler.new_generation(SCOPE_FILE)
+        self.advance(DELAY_MS * 2)
+        self.assertEqual(self.fired, [(0, 1)])
+        # 作用域失效后的第一次请求重新立即执行
+        debouncer.request()
+        self.assertEqual(self.fired, [(0, 1), (300, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+复读状态机测试
+用 SimulatedBackend 的模拟时钟驱动 RepeatStateMachine，覆盖循环、复读间隔、跳转重试和停止，
+不需要Qt和VLC，结果完全确定。
+
+用法:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from player_scheduler import SCOPE_SENTENCE  # noqa: E402
+from repeat_engine import (RepeatStateMachine, SimulatedBackend, LOOP_POLL_INTERVAL_MS,  # noqa: E402
+                           SEEK_RETRY_POLLS)
+
+
+def create_engine(duration_ms=10000, seek_latency_ms=0, repeat_count=0, repeat_interval=0, auto_next=False):
+    """创建模拟后端和状态机，返回 (后端, 状态机, 事件列表)"""
+    backend = SimulatedBackend(duration_ms, seek_latency_ms=seek_latency_ms)
+    events = []
+    engine = RepeatStateMachine(backend, verbose=False,
+                                on_repeat=lambda done, total: events.append(('repeat', done, total, backend.now_ms)),
+                                on_repeat_completed=lambda: events.append(('completed', backend.now_ms)))
+    engine.set_repeat_settings(repeat_count, repeat_interval, auto_next)
+    return backend, engine, events
+
+
+class LoopTest(unittest.TestCase):
+
+    def test_loops_until_repeat_count_then_completes(self):
+        backend, engine, events = create_engine(repeat_count=3, auto_next=True)
+        engine.set_loop(1000, 2000)
+        engine.play()
+        backend.advance(10000)
+
+        # 每次越过结束点后的第一次检查计数，最后一遍结束后通知自动下一句
+        self.assertEqual([event[:-1] for event in events],
+                         [('repeat', 1, 3), ('repeat', 2, 3), ('repeat', 3, 3), ('completed',)])
+        self.assertEqual([event[-1] for event in events], [1000, 2000, 3000, 3000])
+        self.assertFalse(engine.is_looping)
+        self.assertEqual(engine.current_repeat, 3)
+        # 开始时跳转一次，前两遍结束后各跳回一次
+        self.assertEqual(backend.seek_count, 3)
+
+    def test_unlimited_loop_keeps_position_inside_sentence(self):
+        backend, engine, events = create_engine(repeat_count=0)
+        engine.set_loop(1000, 2000)
+        engine.play()
+        for _ in range(50):
+            backend.advance(LOOP_POLL_INTERVAL_MS)
+            self.assertGreaterEqual(backend.get_position(), 1000)
+            self.assertLessEqual(backend.get_position(), 2000)
+        self.assertTrue(engine.is_looping)
+        self.assertEqual(len(events), 5)
+        self.assertNotIn('completed', [event[0] for event in events])
+
+    def test_repeat_interval_pauses_between_passes(self):
+        backend, engine, events = create_engine(repeat_count=2, repeat_interval=1, auto_next=True)
+        engine.set_loop(1000, 2000)
+        engine.play()
+
+        backend.advance(1000)
+        self.assertEqual(events[-1][:3], ('repeat', 1, 2))
+        self.assertFalse(engine.is_playing)
+        self.assertFalse(backend.playing)
+        paused_at = backend.get_position()
+
+        # 间隔期间位置不变，间隔结束后从开头继续
+        backend.advance(500)
+        self.assertEqual(backend.get_position(), paused_at)
+        backend.advance(500)
+        self.assertTrue(engine.is_playing)
+        self.assertEqual(backend.get_position(), 1000)
+
+        backend.advance(3000)
+        self.assertEqual([event[:-1] for event in events],
+                         [('repeat', 1, 2), ('repeat', 2, 2), ('completed',)])
+        # 最后一遍结束后同样等一个间隔再通知
+        self.assertEqual(events[-1][-1], events[-2][-1] + 1000)
+
+    def test_replay_is_deterministic(self):
+        traces = []
+        for _ in range(2):
+            backend, engine, events = create_engine(seek_latency_ms=30, repeat_count=4, repeat_interval=1,
+                                                    auto_next=True)
+            engine.set_loop(3000, 5500)
+            engine.play()
+            backend.advance(30000)
+            traces.append((events, backend.seek_count, backend.play_count, backend.now_ms))
+        self.assertEqual(traces[0], traces[1])
+
+
+class SeekRetryTest(unittest.TestCase):
+
+    def test_slow_seek_is_not_counted_as_a_repeat(self):
+        # 跳转200ms后才生效，期间播放器仍报告旧位置（已经越过结束点）
+        backend, engine, events = create_engine(seek_latency_ms=200, repeat_count=0)
+        backend.seek(6000)
+        backend.advance(1000)
+        engine.set_loop(1000, 2000)
+        engine.play()
+
+        backend.advance(LOOP_POLL_INTERVAL_MS)
+        self.assertTrue(engine._seek_pending)
+        self.assertEqual(events, [])
+
+        backend.advance(LOOP_POLL_INTERVAL_MS * 2)
+        self.assertFalse(engine._seek_pending)
+        self.assertEqual(events, [])
+        # 生效前没有重新跳转
+        self.assertEqual(backend.seek_count, 2)
+
+    def test_seek_is_retried_after_stale_polls(self):
+        # 跳转一直不生效时，每 SEEK_RETRY_POLLS 次检查重新跳转一次
+        backend, engine, events = create_engine(seek_latency_ms=10 ** 6, repeat_count=0)
+        backend.seek(6000)
+        backend.advance(10 ** 6)
+        seeks_before = backend.seek_count
+        engine.set_loop(1000, 2000)
+        engine.play()
+
+        backend.advance(LOOP_POLL_INTERVAL_MS * (SEEK_RETRY_POLLS - 1))
+        self.assertEqual(backend.seek_count - seeks_before, 1)
+        backend.advance(LOOP_POLL_INTERVAL_MS)
+        self.assertEqual(backend.seek_count - seeks_before, 2)
+        backend.advance(LOOP_POLL_INTERVAL_MS * SEEK_RETRY_POLLS * 3)
+        self.assertEqual(backend.seek_count - seeks_before, 5)
+        self.assertEqual(events, [])
+        self.assertEqual(engine.current_repeat, 0)
+
+
+class StopTest(unittest.TestCase):
+
+    def test_stop_cancels_loop_checks(self):
+        backend, engine, events = create_engine(repeat_count=0)
+        engine.set_loop(1000, 2000)
+        engine.play()
+        backend.advance(1500)
+        self.assertEqual(len(events), 1)
+
+        engine.stop()
+        self.assertFalse(engine.is_looping)
+        self.assertFalse(engine.is_playing)
+        self.assertEqual(backend.get_position(), 0)
+        seeks = backend.seek_count
+        backend.advance(10000)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(backend.seek_count, seeks)
+        self.assertIsNone(backend.scheduler.next_due())
+
+    def test_pause_stops_checks_and_play_resumes_them(self):
+        backend, engine, events = create_engine(repeat_count=0)
+        engine.set_loop(1000, 2000)
+        engine.play()
+        backend.advance(500)
+        engine.pause()
+        self.assertIsNone(backend.scheduler.next_due())
+
+        engine.play()
+        backend.advance(600)
+        self.assertEqual([event[:-1] for event in events], [('repeat', 1, 0)])
+
+    def test_new_sentence_generation_cancels_repeat_interval(self):
+        backend, engine, events = create_engine(repeat_count=2, repeat_interval=1, auto_next=True)
+        engine.set_loop(1000, 2000)
+        engine.play()
+        backend.advance(1000)
+        self.assertFalse(engine.is_playing)
+
+        # 调用方切换句子时使句子作用域失效，间隔结束后的继续播放不再执行
+        backend.scheduler.new_generation(SCOPE_SENTENCE)
+        engine.stop_loop()
+        backend.advance(5000)
+        self.assertFalse(engine.is_playing)
+        self.assertEqual([event[:-1] for event in events], [('repeat', 1, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
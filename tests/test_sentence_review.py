@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子复习测试
+评分后的间隔（SM-2），到期堆按到期时间取句子，重新评分后旧的堆项被跳过，以及按播放列表筛选。
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentence_review import (AGAIN, DAY, EASY, GOOD, HARD, INITIAL_EASE, MAX_INTERVAL, MIN_EASE,  # noqa: E402
+                             RELEARN_SECONDS, REBUILD_SLACK, ReviewScheduler, ReviewState, schedule)
+
+
+NOW = 1700000000
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def test_first_grades(self):
+        self.assertEqual(schedule(ReviewState(), GOOD, NOW).due, NOW + DAY)
+        self.assertEqual(schedule(ReviewState(), EASY, NOW).interval, 4 * DAY)
+        self.assertEqual(schedule(ReviewState(), HARD, NOW).interval, DAY // 2)
+
+    def test_again_relearns_and_lowers_ease(self):
+        state = schedule(schedule(ReviewState(), GOOD, NOW), AGAIN, NOW + DAY)
+        self.assertEqual(state.due, NOW + DAY + RELEARN_SECONDS)
+        self.assertEqual((state.reps, state.failures), (0, 1))
+        self.assertAlmostEqual(state.ease, INITIAL_EASE - 0.2)
+
+    def test_good_stretches_interval_by_ease(self):
+        state = schedule(ReviewState(), GOOD, NOW)
+        second = schedule(state, GOOD, state.due)
+        self.assertEqual(second.interval, int(DAY * INITIAL_EASE))
+        easy = schedule(state, EASY, state.due)
+        self.assertGreater(easy.interval, second.interval)
+        hard = schedule(state, HARD, state.due)
+        self.assertLess(hard.interval, second.interval)
+
+    def test_interval_is_capped(self):
+        state = ReviewState()
+        for _ in range(100):
+            state = schedule(state, EASY, state.due)
+        self.assertEqual(state.interval, MAX_INTERVAL)
+
+    def test_ease_never_drops_below_minimum(self):
+        state = ReviewState()
+        for _ in range(20):
+            state = schedule(state, AGAIN, NOW)
+        self.assertEqual(state.ease, MIN_EASE)
+
+
+class ReviewSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        self.db_path = os.path.join(self.work_dir, 'review.db')
+        self.scheduler = ReviewScheduler(self.db_path)
+
+    def tearDown(self):
+        self.scheduler.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def due_order(self, subtitle_paths=None):
+        """依次取出到期句子（每取一句就评分推到很远的将来），返回 (文件, 序号) 列表"""
+        order = []
+        while True:
+            due = self.scheduler.next_due(subtitle_paths)
+            if due is None or due.due >= NOW + 1000 * DAY:
+                return order
+            order.append((due.subtitle_path, due.cue_index))
+            self.scheduler.grade(due.subtitle_path, due.cue_index, EASY, now=NOW + 1000 * DAY)
+
+    def test_heap_returns_sentences_in_due_order(self):
+        rng = random.Random(3)
+        expected = []
+        for index in range(200):
+            path = f"/lessons/{index % 7}.srt"
+            grade = rng.choice((AGAIN, HARD, GOOD, EASY))
+            state = self.scheduler.grade(path, index, grade, now=NOW + rng.randint(0, DAY))
+            expected.append(state.due)
+        self.assertEqual(self.scheduler.tracked_count(), 200)
+        due_times = []
+        while True:
+            due = self.scheduler.next_due()
+            if due is None or due.due >= NOW + 1000 * DAY:
+                break
+            due_times.append(due.due)
+            self.scheduler.grade(due.subtitle_path, due.cue_index, EASY, now=NOW + 1000 * DAY)
+        self.assertEqual(due_times, sorted(expected))
+
+    def test_regrade_moves_sentence_and_skips_stale_entry(self):
+        self.scheduler.grade("/a.srt", 0, GOOD, now=NOW)          # 一天后
+        self.scheduler.grade("/a.srt", 1, EASY, now=NOW)          # 四天后
+        self.assertEqual(self.scheduler.next_due().cue_index, 0)
+
+        # 堆已经建立；第0句重新评分后推迟，堆中原来的项过期
+        self.scheduler.grade("/a.srt", 0, EASY, now=NOW + DAY)    # 五天后
+        due = self.scheduler.next_due()
+        self.assertEqual((due.cue_index, due.due), (1, NOW + 4 * DAY))
+
+        # 答错的句子十分钟后回来，排到最前面
+        self.scheduler.grade("/a.srt", 1, AGAIN, now=NOW + 4 * DAY)
+        due = self.scheduler.next_due()
+        self.assertEqual((due.cue_index, due.due), (1, NOW + 4 * DAY + RELEARN_SECONDS))
+        self.assertEqual(self.due_order(), [("/a.srt", 1), ("/a.srt", 0)])
+
+    def test_state_is_persisted(self):
+        self.scheduler.grade("/a.srt", 5, GOOD, now=NOW)
+        self.scheduler.close()
+        self.scheduler = ReviewScheduler(self.db_path)
+        self.assertEqual(self.scheduler.state("/a.srt", 5).due, NOW + DAY)
+        self.assertEqual(self.scheduler.tracked_count(), 1)
+        self.assertEqual(self.scheduler.next_due().cue_index, 5)
+        self.assertEqual(self.scheduler.due_count(now=NOW + DAY), 1)
+        self.assertEqual(self.scheduler.due_count(now=NOW + DAY - 1), 0)
+
+    def test_playlist_filter_keeps_other_sentences(self):
+        self.scheduler.grade("/a.srt", 0, HARD, now=NOW)
+        self.scheduler.grade("/b.srt", 0, GOOD, now=NOW)
+        self.assertEqual(self.scheduler.next_due(["/b.srt"]).subtitle_path, "/b.srt")
+        self.assertIsNone(self.scheduler.next_due(["/c.srt"]))
+        # 筛选时跳过的句子放回堆中
+        self.assertEqual(self.scheduler.next_due().subtitle_path, "/a.srt")
+
+    def test_rename_keeps_schedule(self):
+        self.scheduler.grade("/a.srt", 3, GOOD, now=NOW)
+        self.scheduler.next_due()
+        self.scheduler.rename_file("/a.srt", "/moved/a.srt")
+        due = self.scheduler.next_due(["/moved/a.srt"])
+        self.assertEqual((due.subtitle_path, due.cue_index), ("/moved/a.srt", 3))
+        self.assertIsNone(self.scheduler.state("/a.srt", 3))
+
+    def test_heap_is_rebuilt_when_stale_entries_pile_up(self):
+        self.scheduler.grade("/a.srt", 0, GOOD, now=NOW)
+        self.scheduler.next_due()
+        for step in range(REBUILD_SLACK + 10):
+            self.scheduler.grade("/a.srt", 0, GOOD, now=NOW + step)
+        self.assertLessEqual(len(self.scheduler._heap), 2 * self.scheduler.tracked_count() + REBUILD_SLACK)
+        self.assertEqual(self.scheduler.next_due().cue_index, 0)
+
+    def test_cue_index_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.scheduler.grade("/a.srt", 1 << 20, GOOD, now=NOW)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子索引测试
+搜索结果，以及后台同步期间收到的请求合并到下一次、不会丢失。
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentence_search import SentenceIndex  # noqa: E402
+
+
+# 等待后台同步结束的最长时间（秒）
+SYNC_TIMEOUT = 10
+
+
+class SentenceIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        self.texts = {}
+        self.parsed = []
+        self.release = threading.Event()
+        self.release.set()
+        self.index = SentenceIndex(os.path.join(self.work_dir, 'index.db'), self.parse)
+
+    def tearDown(self):
+        self.release.set()
+        self.wait_idle()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def parse(self, path):
+        self.release.wait(SYNC_TIMEOUT)
+        self.parsed.append(os.path.basename(path))
+        return [{'start': index * 1000, 'text': text} for index, text in enumerate(self.texts[path])]
+
+    def add_lesson(self, name, *texts):
+        path = os.path.join(self.work_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(texts))
+        self.texts[path] = texts
+        return path
+
+    def wait_idle(self):
+        deadline = time.monotonic() + SYNC_TIMEOUT
+        while self.index._sync_thread is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(self.index._sync_thread)
+
+    def indexed_files(self):
+        return self.index.stats()[0]
+
+    def test_search_finds_sentences_by_prefix(self):
+        first = self.add_lesson('a.srt', "Where is the station?", "It is over there.")
+        second = self.add_lesson('b.srt', "The train leaves at noon.")
+        self.assertEqual(self.index.sync([first, second]), 2)
+
+        hits = self.index.search("stat")
+        self.assertEqual([(hit.subtitle_path, hit.cue_index, hit.start_ms) for hit in hits], [(first, 0, 0)])
+        self.assertEqual(len(self.index.search("the")), 3)
+        self.assertEqual(self.index.search("!!"), [])
+
+        # 没有变化的文件不重新解析，移出列表的文件从索引中删除
+        self.assertEqual(self.index.sync([first]), 0)
+        self.assertEqual(self.index.search("train"), [])
+
+    def test_requests_during_sync_are_merged_into_next_sync(self):
+        paths = [self.add_lesson(f'{name}.srt', f"lesson {name}") for name in 'abcd']
+        self.release.clear()
+        self.index.sync_in_background(paths[:1])
+        # 第一次同步还在解析时收到的请求只保留最新的一个
+        self.index.sync_in_background(paths[:2])
+        self.index.sync_in_background([paths[0], paths[2]])
+        self.release.set()
+        self.wait_idle()
+        self.assertEqual(self.parsed, ['a.srt', 'c.srt'])
+        self.assertEqual(self.indexed_files(), 2)
+
+        # 后台线程退出后的请求启动新线程
+        self.index.sync_in_background(paths)
+        self.wait_idle()
+        self.assertEqual(sorted(self.parsed[2:]), ['b.srt', 'd.srt'])
+        self.assertEqual(self.indexed_files(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
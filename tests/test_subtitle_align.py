@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕自动对齐测试
+用已知的偏移和漂移生成语音包络，检查 estimate_correction 能否还原；以及校正记录随字幕文件失效。
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subtitle_align  # noqa: E402
+from subtitle_align import (AlignmentStore, Correction, FRAME_MS, apply_correction, cue_mask,  # noqa: E402
+                            estimate_correction, speech_envelope)
+
+if subtitle_align.is_available():
+    import numpy as np
+
+
+# 校正后句子边界允许的误差（毫秒）
+TOLERANCE_MS = 60
+
+
+def make_subtitles(duration_ms, seed=1):
+    """长短不一、间隔不一的句子，避免周期性让互相关出现多个峰"""
+    rng = random.Random(seed)
+    subtitles = []
+    time_ms = 2000
+    while time_ms < duration_ms - 10000:
+        length = rng.randint(1200, 4500)
+        subtitles.append({'start': time_ms, 'end': time_ms + length, 'text': f"cue {len(subtitles)}"})
+        time_ms += length + rng.randint(300, 2500)
+    return subtitles
+
+
+def envelope_for(subtitles, correction, duration_ms):
+    """语音实际出现在校正后的位置"""
+    spoken = apply_correction([dict(sub) for sub in subtitles], correction)
+    return cue_mask(spoken, duration_ms // FRAME_MS)
+
+
+@unittest.skipUnless(subtitle_align.is_available(), "需要numpy")
+class EstimateCorrectionTest(unittest.TestCase):
+
+    def assert_recovers(self, truth, duration_ms):
+        subtitles = make_subtitles(duration_ms)
+        result = estimate_correction(envelope_for(subtitles, truth, duration_ms), subtitles)
+        self.assertTrue(result.reliable)
+        for sub in subtitles[::10] + subtitles[-1:]:
+            for key in ('start', 'end'):
+                self.assertAlmostEqual(result.correction.apply_ms(sub[key]), truth.apply_ms(sub[key]),
+                                       delta=TOLERANCE_MS)
+        return result
+
+    def test_constant_offset(self):
+        result = self.assert_recovers(Correction(2350, 1.0), 20 * 60000)
+        self.assertAlmostEqual(result.correction.offset_ms, 2350, delta=FRAME_MS)
+        self.assertFalse(result.is_identity(20 * 60000))
+
+    def test_frame_rate_scale_and_offset(self):
+        # 25fps 与 23.976fps 的差别，整段超过一分钟
+        self.assert_recovers(Correction(-1500, 25 / 23.976), 30 * 60000)
+
+    def test_linear_drift_is_fitted_from_segments(self):
+        # 不在候选比例中的漂移（2.16秒/小时）由分段偏移拟合
+        result = self.assert_recovers(Correction(800, 1.0006), 40 * 60000)
+        self.assertGreaterEqual(result.segments, 3)
+        self.assertAlmostEqual(result.correction.scale, 1.0006, delta=0.00005)
+
+    def test_aligned_subtitles_need_no_correction(self):
+        duration_ms = 10 * 60000
+        subtitles = make_subtitles(duration_ms)
+        result = estimate_correction(envelope_for(subtitles, Correction(), duration_ms), subtitles)
+        self.assertTrue(result.is_identity(duration_ms))
+
+    def test_speech_envelope_follows_loud_frames(self):
+        sample_rate = subtitle_align.ANALYSIS_SAMPLE_RATE
+        rng = np.random.default_rng(0)
+        samples = rng.normal(0, 30, sample_rate * 4)
+        t = np.arange(sample_rate) / sample_rate
+        samples[sample_rate:sample_rate * 2] += 8000 * np.sin(2 * np.pi * 300 * t)
+        envelope = speech_envelope(samples.astype('<i2').tobytes())
+        self.assertEqual(len(envelope), 4000 // FRAME_MS)
+        self.assertEqual(envelope[110:190].min(), 1.0)
+        self.assertEqual(envelope[:90].max(), 0.0)
+        self.assertEqual(envelope[210:].max(), 0.0)
+
+
+class AlignmentStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        self.subtitle_path = os.path.join(self.work_dir, 'a.srt')
+        with open(self.subtitle_path, 'w', encoding='utf-8') as f:
+            f.write("1\n00:00:01,000 --> 00:00:02,000\nhello\n")
+        self.store_path = os.path.join(self.work_dir, subtitle_align.ALIGNMENT_FILE_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_correction_survives_reload_until_subtitle_changes(self):
+        AlignmentStore(self.store_path).set(self.subtitle_path, Correction(1200, 1.0005))
+        correction = AlignmentStore(self.store_path).get(self.subtitle_path)
+        self.assertEqual((correction.offset_ms, correction.scale), (1200, 1.0005))
+
+        with open(self.subtitle_path, 'a', encoding='utf-8') as f:
+            f.write("\n")
+        self.assertIsNone(AlignmentStore(self.store_path).get(self.subtitle_path))
+
+    def test_second_precision_signature_is_still_accepted(self):
+        store = AlignmentStore(self.store_path)
+        store.set(self.subtitle_path, Correction(500))
+        size, mtime_ns = store.entries[self.subtitle_path]['signature']
+        store.entries[self.subtitle_path]['signature'] = [size, mtime_ns // 1000000000]
+        self.assertEqual(store.get(self.subtitle_path).offset_ms, 500)
+
+    def test_rename_keeps_correction(self):
+        store = AlignmentStore(self.store_path)
+        store.set(self.subtitle_path, Correction(300))
+        new_path = os.path.join(self.work_dir, 'b.srt')
+        os.rename(self.subtitle_path, new_path)
+        store.rename(self.subtitle_path, new_path)
+        self.assertIsNone(store.get(self.subtitle_path))
+        self.assertEqual(store.get(new_path).offset_ms, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
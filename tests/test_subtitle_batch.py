@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕库批量检查测试
+检查重叠、时长为0和LRC按3秒估计的句子，转换为SRT时LRC以下一句的开始时间作为结束时间；
+命令行 batch 子命令不导入PyQt5和VLC，工作进程以spawn方式启动时也不导入。
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from subtitle_batch import check_file, find_subtitle_files, run_batch  # noqa: E402
+from subtitle_formats import parse_file  # noqa: E402
+
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+Hello there.
+
+2
+00:00:03,000 --> 00:00:04,000
+Second line.
+"""
+
+# 第1句与第2句重叠，第3句时长为0
+OVERLAPPING_SRT = """1
+00:00:01,000 --> 00:00:03,500
+One.
+
+2
+00:00:03,000 --> 00:00:04,000
+Two.
+
+3
+00:00:05,000 --> 00:00:05,000
+Empty.
+
+4
+00:00:06,000 --> 00:00:07,000
+Four.
+"""
+
+# 第1句按3秒估计正好到第2句开始；第2句的估计与第3句重叠
+LRC = """[ti:lesson]
+[00:01.00]One.
+[00:04.00]Two.
+[00:05.00]Three.
+"""
+
+
+class CheckFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write(self, name, text, encoding='utf-8'):
+        path = os.path.join(self.work_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding=encoding) as f:
+            f.write(text)
+        return path
+
+    def times(self, path):
+        return [(sub['start'], sub['end']) for sub in parse_file(path)[1]]
+
+    def test_clean_file(self):
+        result = check_file(self.write('a.srt', SRT))
+        self.assertEqual((result['format'], result['cues'], result['errors'], result['warnings']),
+                         ('srt', 2, [], []))
+
+    def test_overlap_and_zero_length(self):
+        result = check_file(self.write('a.srt', OVERLAPPING_SRT))
+        self.assertEqual((result['overlaps'], result['zero_length'], result['lrc_guessed']), (1, 1, 0))
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(len(result['warnings']), 2)
+        self.assertIn("第 [3] 句", result['warnings'][0])
+        self.assertIn("第 [1] 句", result['warnings'][1])
+
+    def test_fix_trims_overlaps_and_drops_zero_length(self):
+        out_path = os.path.join(self.work_dir, 'out', 'a.srt')
+        check_file(self.write('a.srt', OVERLAPPING_SRT), out_path)
+        self.assertEqual(self.times(out_path), [(1000, 3500), (3000, 4000), (5000, 5000), (6000, 7000)])
+        check_file(self.write('a.srt', OVERLAPPING_SRT), out_path, fix=True)
+        self.assertEqual(self.times(out_path), [(1000, 3000), (3000, 4000), (6000, 7000)])
+        self.assertEqual(check_file(out_path)['warnings'], [])
+
+    def test_lrc_end_times_come_from_next_cue(self):
+        out_path = os.path.join(self.work_dir, 'a.srt')
+        result = check_file(self.write('a.lrc', LRC), out_path)
+        self.assertEqual((result['format'], result['cues']), ('lrc', 3))
+        # 第2句的3秒估计不对，最后一句仍按3秒估计
+        self.assertEqual(result['lrc_guessed'], 2)
+        self.assertEqual(result['overlaps'], 0)
+        self.assertEqual(result['warnings'], ["2 句没有结束时间，按3秒估计"])
+        self.assertEqual(self.times(out_path), [(1000, 4000), (4000, 5000), (5000, 8000)])
+        with open(out_path, encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith("1\n00:00:01,000 --> 00:00:04,000\nOne.\n"))
+
+    def test_errors(self):
+        self.assertEqual(check_file(self.write('empty.srt', "nothing here"))['errors'], ["没有句子"])
+        self.assertTrue(check_file(os.path.join(self.work_dir, 'missing.srt'))['errors'])
+        path = self.write('a.srt', SRT)
+        self.assertEqual(check_file(path, path)['errors'], ["输出文件与源文件相同，没有转换"])
+        gbk = check_file(self.write('gbk.srt', SRT.replace("Hello", "你好"), 'gb18030'))
+        self.assertEqual(gbk['errors'], [])
+        self.assertIn("不是UTF-8", gbk['warnings'][0])
+
+    def test_run_batch_keeps_relative_paths(self):
+        self.write('course/unit1/a.srt', OVERLAPPING_SRT)
+        self.write('course/unit2/b.lrc', LRC)
+        self.write('course/notes.txt', "not a subtitle")
+        files = find_subtitle_files([os.path.join(self.work_dir, 'course')])
+        self.assertEqual([relative for _, relative in files],
+                         [os.path.join('unit1', 'a.srt'), os.path.join('unit2', 'b.lrc')])
+        output_dir = os.path.join(self.work_dir, 'converted')
+        report = run_batch(files, output_dir, workers=1)
+        self.assertEqual((report['files'], report['cues'], report['converted']), (2, 7, 2))
+        self.assertEqual((report['overlaps'], report['zero_length'], report['lrc_guessed']), (1, 1, 2))
+        self.assertEqual((report['files_with_errors'], report['files_with_warnings']), (0, 2))
+        self.assertTrue(os.path.isfile(os.path.join(output_dir, 'unit2', 'b.srt')))
+
+
+class HeadlessCommandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_batch_workers_do_not_import_gui(self):
+        # 在最前面的导入路径上放一个导入就失败的 PyQt5 和 vlc，主进程或工作进程导入它们时批量检查会失败
+        blocked = os.path.join(self.work_dir, 'blocked')
+        os.makedirs(os.path.join(blocked, 'PyQt5'))
+        for path in (os.path.join(blocked, 'PyQt5', '__init__.py'), os.path.join(blocked, 'vlc.py')):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("raise ImportError('批量检查不应导入界面和VLC')\n")
+        course = os.path.join(self.work_dir, 'course')
+        os.makedirs(course)
+        for index in range(4):
+            with open(os.path.join(course, f"lesson{index}.srt"), 'w', encoding='utf-8') as f:
+                f.write(SRT)
+        report_path = os.path.join(self.work_dir, 'report.json')
+
+        script = textwrap.dedent(f"""
+            import multiprocessing, runpy, sys
+            multiprocessing.set_start_method('spawn')
+            sys.argv = ['english_listening_player.py', 'batch', {course!r}, '--workers', '2',
+                        '--report', {report_path!r}]
+            runpy.run_path({os.path.join(REPO_DIR, 'english_listening_player.py')!r}, run_name='__main__')
+        """)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([blocked, REPO_DIR]))
+        process = subprocess.run([sys.executable, '-c', script], cwd=self.work_dir, env=env,
+                                 capture_output=True, text=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        with open(report_path, encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual((report['files'], report['cues'], report['workers']), (4, 8, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
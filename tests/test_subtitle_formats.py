@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕格式注册表测试
+按内容识别格式（扩展名不对时也能识别），插件模块在第一次解析该格式时才导入，各格式解析为相同的句子。
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from subtitle_formats import SubtitleParser, detect_format, parse_file, PLUGIN_MODULES  # noqa: E402
+
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+Hello there.
+
+2
+00:00:03,000 --> 00:00:04,000
+Second line
+continues.
+"""
+
+VTT = """WEBVTT
+
+00:01.000 --> 00:02.500 align:start
+Hello there.
+
+00:00:03.000 --> 00:00:04.000
+Second line
+continues.
+"""
+
+ASS = """[Script Info]
+Title: test
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,{\\b1}Hello there.
+Dialogue: 0,0:00:03.00,0:00:04.00,Default,,0,0,0,,Second line\\Ncontinues.
+"""
+
+LRC = """[ti:test]
+[00:01.00]Hello there.
+[00:03.00]Second line
+[00:03.05]continues.
+"""
+
+EXPECTED = [(1000, 2500, "Hello there."), (3000, 4000, "Second line\ncontinues.")]
+
+
+class FormatDetectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write(self, name, text, encoding='utf-8'):
+        path = os.path.join(self.work_dir, name)
+        with open(path, 'w', encoding=encoding) as f:
+            f.write(text)
+        return path
+
+    def cues(self, path):
+        fmt, cues = parse_file(path)
+        return fmt.name, [(sub['start'], sub['end'], sub['text']) for sub in cues]
+
+    def test_every_format_parses_to_the_same_cues(self):
+        for name, text in (('a.srt', SRT), ('a.vtt', VTT), ('a.ass', ASS)):
+            self.assertEqual(self.cues(self.write(name, text))[1], EXPECTED, name)
+        # LRC没有结束时间，同一时间点的两行合并为一句
+        fmt, cues = self.cues(self.write('a.lrc', LRC))
+        self.assertEqual([(start, text) for start, _, text in cues],
+                         [(1000, "Hello there."), (3000, "Second line continues.")])
+
+    def test_content_wins_over_wrong_extension(self):
+        self.assertEqual(self.cues(self.write('lesson.srt', VTT))[0], 'vtt')
+        self.assertEqual(self.cues(self.write('lesson.vtt', SRT))[0], 'srt')
+        self.assertEqual(self.cues(self.write('lesson.txt', ASS))[0], 'ass')
+        self.assertEqual(self.cues(self.write('lesson.ass', LRC))[0], 'lrc')
+
+    def test_extension_is_used_when_content_is_unknown(self):
+        self.assertEqual(detect_format('a.ssa', "nothing recognisable").name, 'ass')
+        self.assertIsNone(detect_format('a.txt', "nothing recognisable"))
+        with self.assertRaises(ValueError):
+            parse_file(self.write('a.txt', "nothing recognisable"))
+
+    def test_gbk_and_utf16_files(self):
+        chinese = SRT.replace("Hello there.", "你好。")
+        self.assertEqual(self.cues(self.write('gbk.srt', chinese, 'gb18030'))[1][0][2], "你好。")
+        self.assertEqual(self.cues(self.write('utf16.srt', chinese, 'utf-16'))[1][0][2], "你好。")
+
+    def test_unsorted_cues_are_sorted(self):
+        swapped = SRT.split("\n\n")
+        path = self.write('b.srt', swapped[1] + "\n\n" + swapped[0] + "\n")
+        self.assertEqual(self.cues(path)[1], EXPECTED)
+
+    def test_parser_navigation(self):
+        parser = SubtitleParser()
+        self.assertTrue(parser.load(self.write('a.srt', SRT)))
+        self.assertEqual(parser.format, 'srt')
+        self.assertIsNone(parser.previous_subtitle())
+        self.assertEqual(parser.next_subtitle()['start'], 3000)
+        self.assertIsNone(parser.next_subtitle())
+        self.assertFalse(parser.load(os.path.join(self.work_dir, 'missing.srt')))
+
+
+class LazyPluginTest(unittest.TestCase):
+
+    def test_plugin_is_imported_on_first_use(self):
+        # 在新进程中检查，本进程中的其他测试已经导入过插件
+        work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        path = os.path.join(work_dir, 'a.vtt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(VTT)
+        script = textwrap.dedent(f"""
+            import sys
+            import subtitle_formats
+            plugins = {PLUGIN_MODULES!r}
+            print(sorted(name for name in plugins if name in sys.modules))
+            subtitle_formats.parse_file({path!r})
+            print(sorted(name for name in plugins if name in sys.modules))
+        """)
+        output = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, capture_output=True, text=True,
+                                check=True).stdout.splitlines()
+        self.assertEqual(output, ["[]", "['subtitle_vtt']"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双语字幕对照测试
+align_tracks 的一次扫描与逐对比较的结果一致（有间隔、有重叠），访问次数与 n+m 成正比；
+以及按文件名查找第二字幕。
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitle_tracks import (NEAREST_TOLERANCE_MS, align_tracks, find_secondary_subtitle,  # noqa: E402
+                             secondary_subtitle_index)
+
+
+class CountingCue(dict):
+    """记录被读取的次数"""
+
+    reads = 0
+
+    def __getitem__(self, key):
+        CountingCue.reads += 1
+        return dict.__getitem__(self, key)
+
+
+def cue(start, end, text=""):
+    return {'start': start, 'end': end, 'text': text}
+
+
+def brute_force(primary, secondary, tolerance_ms=NEAREST_TOLERANCE_MS):
+    """逐对比较：重叠最多的一句，不重叠时取间隔最小且不超过容差的一句"""
+    order = sorted(range(len(primary)), key=lambda i: primary[i]['start'])
+    texts = [[] for _ in primary]
+    for sub in sorted(secondary, key=lambda sub: sub['start']):
+        best, best_overlap = -1, 0
+        for index in order:
+            overlap = min(sub['end'], primary[index]['end']) - max(sub['start'], primary[index]['start'])
+            if overlap > best_overlap:
+                best, best_overlap = index, overlap
+        if best < 0:
+            best_distance = tolerance_ms + 1
+            for index in order:
+                distance = max(primary[index]['start'] - sub['end'], sub['start'] - primary[index]['end'], 0)
+                if distance < best_distance:
+                    best, best_distance = index, distance
+        if best >= 0:
+            texts[best].append(sub['text'])
+    return [' '.join(parts) for parts in texts]
+
+
+def random_tracks(rng, count):
+    """不互相重叠、间隔不一的主字幕，和位置随机的第二字幕（有的跨两句，有的落在间隔里）"""
+    primary = []
+    time_ms = 0
+    for index in range(count):
+        time_ms += rng.randint(0, 3000)
+        length = rng.randint(500, 4000)
+        primary.append(cue(time_ms, time_ms + length, f"p{index}"))
+        time_ms += length
+    secondary = []
+    for index in range(count):
+        start = rng.randint(0, time_ms)
+        secondary.append(cue(start, start + rng.randint(100, 3000), f"s{index}"))
+    return primary, secondary
+
+
+class AlignTracksTest(unittest.TestCase):
+
+    def test_each_secondary_goes_to_largest_overlap(self):
+        primary = [cue(0, 2000), cue(2000, 5000), cue(8000, 9000)]
+        secondary = [cue(1500, 3000, "跨两句"), cue(100, 1800, "第一句"), cue(8100, 8900, "第三句")]
+        self.assertEqual(align_tracks(primary, secondary), ["第一句", "跨两句", "第三句"])
+
+    def test_gap_uses_nearest_cue_within_tolerance(self):
+        primary = [cue(0, 2000), cue(5000, 7000)]
+        secondary = [cue(2300, 2600, "靠近第一句"), cue(4600, 4800, "靠近第二句"), cue(3200, 3400, "太远")]
+        self.assertEqual(align_tracks(primary, secondary), ["靠近第一句", "靠近第二句"])
+
+    def test_overlapping_primary_cues(self):
+        # 主字幕本身有重叠：长句包含一句短句
+        primary = [cue(0, 10000, "长"), cue(1000, 1500, "短"), cue(10000, 12000, "后")]
+        secondary = [cue(900, 1600, "a"), cue(3000, 4000, "b"), cue(9500, 11000, "c")]
+        self.assertEqual(align_tracks(primary, secondary), brute_force(primary, secondary))
+        self.assertEqual(align_tracks(primary, secondary), ["a b", "", "c"])
+
+    def test_unsorted_input_keeps_primary_order(self):
+        primary = [cue(5000, 6000), cue(0, 1000)]
+        secondary = [cue(5100, 5900, "二"), cue(100, 900, "一")]
+        self.assertEqual(align_tracks(primary, secondary), ["二", "一"])
+
+    def test_matches_brute_force_on_random_tracks(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            primary, secondary = random_tracks(rng, rng.randint(1, 60))
+            self.assertEqual(align_tracks(primary, secondary), brute_force(primary, secondary))
+
+    def test_empty_tracks(self):
+        self.assertEqual(align_tracks([cue(0, 1000)], []), [''])
+        self.assertEqual(align_tracks([], [cue(0, 1000)]), [])
+
+    def test_sweep_reads_grow_linearly(self):
+        reads = []
+        for count in (1000, 4000):
+            primary, secondary = random_tracks(random.Random(count), count)
+            primary = [CountingCue(sub) for sub in primary]
+            secondary = [CountingCue(sub) for sub in secondary]
+            CountingCue.reads = 0
+            align_tracks(primary, secondary)
+            reads.append(CountingCue.reads)
+        # 逐对比较时4倍的输入需要16倍的读取
+        self.assertLess(reads[1], reads[0] * 5)
+        self.assertLess(reads[1], 30 * 8000)
+
+
+class FindSecondaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        for name in ('lesson1.mp4', 'lesson1.srt', 'lesson1.zh-cn.srt', 'Lesson2_CHS.vtt', 'lesson3.en.srt'):
+            open(os.path.join(self.work_dir, name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_tagged_subtitles_are_found_by_video_name(self):
+        index = secondary_subtitle_index(self.work_dir)
+        self.assertEqual(set(index), {'lesson1', 'lesson2'})
+        video = os.path.join(self.work_dir, 'lesson1.mp4')
+        self.assertEqual(find_secondary_subtitle(video, os.path.join(self.work_dir, 'lesson1.srt'), index),
+                         os.path.join(self.work_dir, 'lesson1.zh-cn.srt'))
+        self.assertEqual(find_secondary_subtitle(os.path.join(self.work_dir, 'LESSON2.mp4'), None, index),
+                         os.path.join(self.work_dir, 'Lesson2_CHS.vtt'))
+        self.assertIsNone(find_secondary_subtitle(os.path.join(self.work_dir, 'lesson3.mp4'), None, index))
+
+    def test_primary_is_never_its_own_secondary(self):
+        video = os.path.join(self.work_dir, 'lesson1.mp4')
+        primary = os.path.join(self.work_dir, 'lesson1.zh-cn.srt')
+        self.assertIsNone(find_secondary_subtitle(video, primary))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+波形金字塔测试
+各层的最小值/最大值与逐个采样计算的结果一致（WAV分段读取、长度不是桶的整数倍），
+任意范围的每列数值覆盖该列的采样且不超出相邻的一列，以及金字塔文件的读写和复用解码结果时的跳过。
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+import wave
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import waveform_cache  # noqa: E402
+from file_signature import file_signature  # noqa: E402
+from waveform_cache import (BASE_BIN, WaveformCache, WaveformPyramid, base_level_from_wav,  # noqa: E402
+                            bin_samples_for_rate, build_levels, write_pyramid)
+
+np = waveform_cache.np
+
+
+def random_samples(rng, count):
+    """有安静段和响亮段的随机16位采样"""
+    samples = np.array([rng.randint(-300, 300) for _ in range(count)], dtype='<i2')
+    for _ in range(5):
+        start = rng.randrange(count)
+        samples[start:start + rng.randint(1, 200)] = rng.randint(-32768, 32767)
+    return samples
+
+
+def brute_force_base(samples, bin_samples):
+    return np.array([[samples[i:i + bin_samples].min(), samples[i:i + bin_samples].max()]
+                     for i in range(0, len(samples), bin_samples)], dtype='<i2').reshape(-1, 2)
+
+
+def write_wav(path, samples, sample_rate, channels=1):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+@unittest.skipUnless(waveform_cache.is_available(), "需要numpy")
+class LevelsTest(unittest.TestCase):
+
+    def test_levels_match_brute_force(self):
+        rng = random.Random(5)
+        for count in (1, 2, 3, 7, 64, 1000, 1025):
+            base = np.array([[rng.randint(-32768, 0), rng.randint(0, 32767)] for _ in range(count)], dtype='<i2')
+            levels = build_levels(base)
+            self.assertEqual(len(levels), (count - 1).bit_length() + 1, count)
+            for index, level in enumerate(levels):
+                size = 2 ** index
+                self.assertEqual(len(level), -(-count // size))
+                for bucket in range(len(level)):
+                    covered = base[bucket * size:(bucket + 1) * size]
+                    self.assertEqual(tuple(level[bucket]), (covered[:, 0].min(), covered[:, 1].max()))
+            self.assertEqual(tuple(levels[-1][0]), (base[:, 0].min(), base[:, 1].max()))
+
+    def test_bin_samples_keep_bin_duration(self):
+        self.assertEqual(bin_samples_for_rate(8000), BASE_BIN)
+        self.assertEqual(bin_samples_for_rate(16000), 2 * BASE_BIN)
+        self.assertEqual(bin_samples_for_rate(44100), 88)
+        self.assertEqual(bin_samples_for_rate(100), 1)
+
+
+@unittest.skipUnless(waveform_cache.is_available(), "需要numpy")
+class WavTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_base_level_matches_brute_force(self):
+        rng = random.Random(9)
+        # 分段读取的长度不是桶的整数倍，段之间剩下的采样要接到下一段
+        with mock.patch.object(waveform_cache, 'CHUNK_SAMPLES', 1001):
+            for sample_rate, count in ((8000, 5000), (8000, 4999), (16000, 7777), (22050, 3000), (8000, 5)):
+                samples = random_samples(rng, count)
+                path = write_wav(os.path.join(self.work_dir, 'a.wav'), samples, sample_rate)
+                rate, bin_samples, base = base_level_from_wav(path)
+                self.assertEqual((rate, bin_samples), (sample_rate, bin_samples_for_rate(sample_rate)))
+                np.testing.assert_array_equal(base, brute_force_base(samples, bin_samples))
+
+    def test_empty_and_bad_wav(self):
+        path = write_wav(os.path.join(self.work_dir, 'empty.wav'), np.zeros(0, dtype='<i2'), 8000)
+        self.assertEqual(base_level_from_wav(path)[2].shape, (0, 2))
+        stereo = write_wav(os.path.join(self.work_dir, 'stereo.wav'), np.zeros(64, dtype='<i2'), 8000, channels=2)
+        with self.assertRaises(ValueError):
+            base_level_from_wav(stereo)
+
+
+@unittest.skipUnless(waveform_cache.is_available(), "需要numpy")
+class PyramidTest(unittest.TestCase):
+
+    SAMPLE_RATE = 8000
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        self.samples = random_samples(random.Random(11), 8000 * 7 + 123)
+        levels = build_levels(brute_force_base(self.samples, BASE_BIN))
+        self.path = os.path.join(self.work_dir, 'a.wave')
+        write_pyramid(self.path, (1234, 5678), self.SAMPLE_RATE, BASE_BIN, levels)
+        self.levels = levels
+        self.pyramid = WaveformPyramid.open(self.path)
+
+    def tearDown(self):
+        self.pyramid.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_file_round_trip(self):
+        self.assertEqual(self.pyramid.signature, (1234, 5678))
+        self.assertEqual((self.pyramid.sample_rate, self.pyramid.base_bin), (self.SAMPLE_RATE, BASE_BIN))
+        self.assertEqual(len(self.pyramid.levels), len(self.levels))
+        for expected, actual in zip(self.levels, self.pyramid.levels):
+            np.testing.assert_array_equal(actual, expected)
+        self.assertEqual(self.pyramid.duration_ms, len(self.levels[0]) * BASE_BIN * 1000 // self.SAMPLE_RATE)
+
+    def test_bad_files(self):
+        self.assertIsNone(WaveformPyramid.open(os.path.join(self.work_dir, 'missing.wave')))
+        for data in (b'', b'short', b'NOTWAVE1' + bytes(64)):
+            with open(self.path, 'wb') as f:
+                f.write(data)
+            self.assertIsNone(WaveformPyramid.open(self.path))
+
+    def check_columns(self, start_ms, end_ms, width):
+        """每列覆盖该列的所有采样，且不超出前后各一列（放大时一个桶）的范围"""
+        mins, maxs = self.pyramid.columns(start_ms, end_ms, width)
+        per_column = (end_ms - start_ms) * self.SAMPLE_RATE / 1000.0 / width
+        slack = max(per_column, BASE_BIN)
+        for column in range(width):
+            first = start_ms * self.SAMPLE_RATE / 1000.0 + column * per_column
+            last = first + per_column
+            if first >= len(self.levels[0]) * BASE_BIN:
+                self.assertTrue(np.isnan(mins[column]) and np.isnan(maxs[column]))
+                continue
+            inner = self.samples[int(first):max(int(first) + 1, int(last))]
+            outer = self.samples[max(0, int(first - slack)):int(last + slack) + 1]
+            if len(inner):
+                self.assertLessEqual(mins[column] * 32768, inner.min())
+                self.assertGreaterEqual(maxs[column] * 32768, inner.max())
+            self.assertGreaterEqual(mins[column] * 32768, outer.min())
+            self.assertLessEqual(maxs[column] * 32768, outer.max())
+
+    def test_columns_bound_samples_at_every_zoom(self):
+        duration = self.pyramid.duration_ms
+        for start_ms, end_ms, width in ((0, duration, 300), (0, duration, 7), (1234, 2345, 500),
+                                        (1000, 1010, 400), (3333, 6100, 1000), (6000, 9000, 200)):
+            self.check_columns(start_ms, end_ms, width)
+        rng = random.Random(13)
+        for _ in range(30):
+            start_ms = rng.randint(0, duration)
+            self.check_columns(start_ms, start_ms + rng.randint(1, duration), rng.randint(1, 800))
+
+    def test_columns_on_bucket_edges_are_exact(self):
+        # 每列正好一个第0层的桶时，结果就是逐个采样计算的最小值/最大值
+        count = 50
+        mins, maxs = self.pyramid.columns(0, count * BASE_BIN * 1000 // self.SAMPLE_RATE, count)
+        expected = brute_force_base(self.samples, BASE_BIN)[:count] / 32768.0
+        np.testing.assert_allclose(mins, expected[:, 0], rtol=1e-6)
+        np.testing.assert_allclose(maxs, expected[:, 1], rtol=1e-6)
+
+    def test_whole_file_in_one_column(self):
+        mins, maxs = self.pyramid.columns(0, self.pyramid.duration_ms, 1)
+        self.assertAlmostEqual(float(mins[0]), self.samples.min() / 32768.0, places=6)
+        self.assertAlmostEqual(float(maxs[0]), self.samples.max() / 32768.0, places=6)
+
+    def test_empty_ranges(self):
+        self.assertTrue(np.isnan(self.pyramid.columns(1000, 1000, 10)[0]).all())
+        self.assertTrue(np.isnan(self.pyramid.columns(20000, 30000, 10)[0]).all())
+        self.assertEqual(len(self.pyramid.columns(0, 1000, 0)[0]), 0)
+
+
+@unittest.skipUnless(waveform_cache.is_available(), "需要numpy")
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='elp_test_')
+        self.cache = WaveformCache(os.path.join(self.work_dir, 'waveforms'))
+        self.media_path = os.path.join(self.work_dir, 'lesson.mp3')
+        with open(self.media_path, 'wb') as f:
+            f.write(b'media')
+        self.samples = random_samples(random.Random(3), 16000 * 2)
+        self.wav_path = write_wav(os.path.join(self.work_dir, 'decoded.wav'), self.samples, 16000)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_build_from_wav_and_lookup(self):
+        signature = file_signature(self.media_path)
+        self.cache.build_from_wav(self.media_path, signature, self.wav_path)
+        self.assertEqual(self.cache.version, 1)
+        pyramid = self.cache.lookup(self.media_path)
+        self.assertIsNotNone(pyramid)
+        self.assertEqual((pyramid.sample_rate, pyramid.base_bin), (16000, bin_samples_for_rate(16000)))
+        self.assertEqual(tuple(pyramid.levels[-1][0]), (self.samples.min(), self.samples.max()))
+        pyramid.close()
+
+        # 媒体文件变化后不再使用旧的金字塔
+        with open(self.media_path, 'ab') as f:
+            f.write(b'changed')
+        self.assertIsNone(self.cache.lookup(self.media_path))
+
+    def test_current_pyramid_is_not_rebuilt(self):
+        signature = file_signature(self.media_path)
+        self.cache.build_from_wav(self.media_path, signature, self.wav_path)
+        with mock.patch.object(waveform_cache, 'base_level_from_wav') as base_level:
+            self.cache.build_from_wav(self.media_path, signature, self.wav_path)
+            base_level.assert_not_called()
+        self.assertEqual(self.cache.version, 1)
+
+        # 签名不同（媒体已经变化）时重新生成
+        self.cache.build_from_wav(self.media_path, (signature[0] + 1, signature[1]), self.wav_path)
+        self.assertEqual(self.cache.version, 2)
+        pyramid = WaveformPyramid.open(self.cache.pyramid_path(self.media_path))
+        self.assertEqual(pyramid.signature, (signature[0] + 1, signature[1]))
+        pyramid.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
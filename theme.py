@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面主题
+整个主窗口只使用一份样式表，由模板和字体参数生成，控件通过 objectName 匹配样式规则。
+修改字体时只需重新生成并设置一次样式表，不再逐个控件调用 setStyleSheet。
+"""
+
+from string import Template
+
+
+# 控件的 objectName
+TITLE_LABEL = "titleLabel"            # 窗口标题
+PAGE_TITLE = "pageTitle"              # 各界面的标题
+INFO_LABEL = "infoLabel"              # 文件信息、进度等次要文字
+FIELD_LABEL = "fieldLabel"            # 输入框前的说明文字
+INPUT_FIELD = "inputField"            # 下拉框、数字输入框
+VIDEO_FRAME = "videoFrame"            # 视频区域
+CONTROL_BAR = "controlBar"            # 底部控制栏
+SENTENCE_LIST = "sentenceList"        # 句子清单
+FILE_LIST = "fileList"                # 播放列表
+BUTTON = "normalButton"               # 普通按钮
+PRIMARY_BUTTON = "primaryButton"      # 主要按钮
+SETTINGS_CONTENT = "settingsContent"  # 设置内容区域
+SETTINGS_GROUP = "settingsGroup"      # 设置分组
+PREVIEW_LABEL = "previewLabel"        # 字体预览
+SUBTITLE_LABEL = "subtitleLabel"      # 双语字幕
+
+STYLESHEET_TEMPLATE = Template("""
+QLabel#titleLabel {
+    color: white;
+    padding: 10px;
+    font-family: "$family";
+    font-size: ${title_size}pt;
+    font-weight: bold;
+}
+QLabel#pageTitle {
+    color: white;
+    padding: 10px;
+    font-family: "$family";
+    font-size: ${title_size}px;
+}
+QLabel#infoLabel {
+    color: #ccc;
+    font-family: "$family";
+    font-size: ${small_size}px;
+}
+QLabel#fieldLabel, QCheckBox#fieldLabel {
+    color: white;
+    font-family: "$family";
+    font-size: ${field_size}px;
+}
+QComboBox#inputField, QAbstractSpinBox#inputField {
+    color: white;
+    background-color: #333;
+    font-family: "$family";
+    font-size: ${field_size}px;
+    min-height: 30px;
+}
+QLabel#subtitleLabel {
+    color: white;
+    background-color: #2a2a2a;
+    padding: 6px;
+    font-family: "$family";
+    font-size: ${primary_size}px;
+}
+QFrame#videoFrame {
+    background-color: black;
+}
+QFrame#controlBar {
+    background-color: #2a2a2a;
+    padding: 10px;
+}
+QListWidget#sentenceList, QListWidget#fileList {
+    background-color: #2a2a2a;
+    color: white;
+    border: 1px solid #555;
+    border-radius: 5px;
+}
+QListWidget#sentenceList {
+    font-family: "$family";
+    font-size: ${small_size}px;
+}
+QListWidget#sentenceList::item, QListWidget#fileList::item {
+    padding: 8px;
+    border-bottom: 1px solid #444;
+}
+QListWidget#sentenceList::item:selected, QListWidget#fileList::item:selected {
+    background-color: #42a2da;
+}
+QPushButton#normalButton {
+    background-color: #555;
+    color: white;
+    border: none;
+    padding: 12px 24px;
+    border-radius: 20px;
+    font-family: "$family";
+    font-size: ${field_size}px;
+    min-width: 100px;
+    min-height: 45px;
+}
+QPushButton#normalButton:hover {
+    background-color: #666;
+}
+QPushButton#normalButton:pressed {
+    background-color: #444;
+}
+QPushButton#normalButton:disabled {
+    background-color: #333;
+    color: #666;
+}
+QPushButton#primaryButton {
+    background-color: #42a2da;
+    color: white;
+    border: none;
+    padding: 15px 30px;
+    border-radius: 25px;
+    font-family: "$family";
+    font-size: ${primary_size}px;
+    min-width: 120px;
+    min-height: 50px;
+}
+QPushButton#primaryButton:hover {
+    background-color: #3598c5;
+}
+QPushButton#primaryButton:pressed {
+    background-color: #2a7ba2;
+}
+QPushButton#primaryButton:disabled {
+    background-color: #666;
+    color: #999;
+}
+QFrame#settingsContent {
+    background-color: #2a2a2a;
+    border: 1px solid #555;
+    border-radius: 5px;
+    padding: 20px;
+    color: white;
+    font-family: "$family";
+    font-size: ${field_size}px;
+}
+QFrame#settingsGroup, QFrame#settingsGroup QLabel {
+    background-color: #2a2a2a;
+    border: 1px solid #555;
+    border-radius: 5px;
+    padding: 10px;
+    color: white;
+    font-family: "$family";
+    font-size: ${field_size}px;
+}
+QFrame#settingsGroup QLabel#previewLabel {
+    background-color: #333;
+    font-size: ${font_size}px;
+}
+""")
+
+
+class ThemeEngine:
+    """根据字体参数生成并应用样式表
+
+    生成的样式表按 (字体家族, 字号) 缓存，参数没有变化时 apply() 不会触发重新计算样式。
+    """
+
+    def __init__(self, template=STYLESHEET_TEMPLATE):
+        self.template = template
+        self._cache = {}
+        self._applied = {}   # id(widget) -> 已应用的样式表
+
+    def render(self, font_family, font_size):
+        """生成样式表"""
+        key = (font_family, font_size)
+        stylesheet = self._cache.get(key)
+        if stylesheet is None:
+            stylesheet = self.template.substitute(
+                family=font_family.replace('"', ''),
+                font_size=font_size,
+                title_size=max(14, font_size),
+                primary_size=max(14, font_size + 2),
+                field_size=max(12, font_size),
+                small_size=max(10, font_size - 4),
+            )
+            self._cache[key] = stylesheet
+        return stylesheet
+
+    def apply(self, widget, font_family, font_size):
+        """把样式表设置到顶层控件上，样式表变化时返回True"""
+        stylesheet = self.render(font_family, font_size)
+        if self._applied.get(id(widget)) is stylesheet:
+            return False
+        widget.setStyleSheet(stylesheet)
+        self._applied[id(widget)] = stylesheet
+        return True
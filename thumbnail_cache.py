@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子缩略图
+在后台低优先级线程中用独立的VLC实例为视频每句字幕的开始位置截一帧，缩小后保存到缩略图缓存。
+每个视频只有一个打包文件：文件头之后依次追加 (开始时间, 长度, 图片数据) 记录，
+生成到一半时已经写入的缩略图就可以使用，中断后下次从缺少的句子继续。
+
+打包文件按句子开始时间（毫秒）查找缩略图：字幕修改或重新对齐后，时间没变的句子不用重新截图。
+读取时只建立时间到文件偏移的索引，图片数据在列表行滚动到可见范围时才读取，
+所以内存占用与句子数无关。截图的编码（如JPEG）由调用方提供，本模块不依赖Qt。
+"""
+
+import ctypes
+import hashlib
+import os
+import struct
+import threading
+import time
+from array import array
+
+import vlc
+
+from file_signature import file_signature
+
+
+THUMBNAIL_DIR_NAME = "thumbnails"
+PACK_EXTENSION = ".thumbs"
+
+# 可以截图的视频文件，音频文件没有画面
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.avi', '.mkv', '.mov', '.webm')
+
+# 缩略图宽度（像素），高度按视频宽高比计算
+THUMBNAIL_WIDTH = 160
+DEFAULT_ASPECT = 9 / 16
+
+# 文件头：标识、标志、缩略图宽高、视频大小和修改时间
+PACK_MAGIC = b'ELPTHMB1'
+HEADER = struct.Struct('<8sIHHqq')
+# 记录头：句子开始时间（毫秒）、图片数据长度（0表示该位置截图失败）
+RECORD = struct.Struct('<iI')
+
+FLAG_NO_VIDEO = 1      # 文件没有画面，不再尝试截图
+
+# 截图用VLC实例参数：不输出声音和字幕，跳转时优先速度（跳到最近的关键帧）
+GRABBER_INSTANCE_ARGS = ('--no-audio', '--quiet', '--no-video-title-show', '--no-osd', '--no-spu',
+                         '--no-sub-autodetect-file', '--input-fast-seek')
+
+# 等待视频开始显示和每次跳转后出帧的超时时间（秒）
+START_TIMEOUT = 10
+FRAME_TIMEOUT = 3
+# 跳转后播放位置与句子开始时间相差不超过该值时接受这一帧（毫秒），快速跳转落在前一个关键帧上
+SEEK_WINDOW_MS = 10000
+# 每截一帧后让出的时间（秒），避免和正在播放的视频争抢CPU
+THROTTLE_SECONDS = 0.02
+# 后台线程的nice值（仅Linux上对单个线程有效）
+WORKER_NICENESS = 10
+
+
+def is_video_file(path):
+    return bool(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+class ThumbnailPack:
+    """读取一个视频的缩略图打包文件
+
+    打开时只读文件头和记录头，建立开始时间到数据位置的索引；生成线程追加记录后调用 refresh() 读取新增部分。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.flags = 0
+        self.width = 0
+        self.height = 0
+        self.signature = None
+        self._positions = {}        # 开始时间 -> 记录序号
+        self._offsets = array('q')
+        self._lengths = array('I')
+        self._end = HEADER.size     # 已扫描到的位置
+
+    @classmethod
+    def open(cls, path):
+        """打开打包文件，文件不存在或格式不对时返回None"""
+        pack = cls(path)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return None
+                magic, pack.flags, pack.width, pack.height, size, mtime = HEADER.unpack(header)
+                if magic != PACK_MAGIC:
+                    return None
+                pack.signature = (size, mtime)
+                pack._scan(f)
+        except OSError:
+            return None
+        return pack
+
+    @property
+    def has_video(self):
+        return not self.flags & FLAG_NO_VIDEO
+
+    @property
+    def end_offset(self):
+        """最后一条完整记录的结束位置"""
+        return self._end
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, start_ms):
+        return start_ms in self._positions
+
+    def _scan(self, f):
+        """从上次扫描到的位置读取新增的记录头，最后一条不完整的记录（正在写入或写入时中断）留到下次"""
+        file_size = os.fstat(f.fileno()).st_size
+        position = self._end
+        while position + RECORD.size <= file_size:
+            f.seek(position)
+            start_ms, length = RECORD.unpack(f.read(RECORD.size))
+            data_offset = position + RECORD.size
+            if data_offset + length > file_size:
+                break
+            self._positions[start_ms] = len(self._offsets)
+            self._offsets.append(data_offset)
+            self._lengths.append(length)
+            position = data_offset + length
+        self._end = position
+
+    def refresh(self):
+        """重新读取文件头标志和新追加的记录"""
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER.size)
+                if len(header) == HEADER.size:
+                    self.flags = HEADER.unpack(header)[1]
+                self._scan(f)
+        except OSError:
+            pass
+
+    def read(self, start_ms):
+        """读取句子开始时间对应的图片数据，没有截图或截图失败时返回None"""
+        index = self._positions.get(start_ms)
+        if index is None or not self._lengths[index]:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offsets[index])
+                return f.read(self._lengths[index])
+        except OSError:
+            return None
+
+
+class FrameGrabber:
+    """用VLC的内存输出（vmem）按时间截取视频帧
+
+    画面解码为 RV32（每像素4字节，小端序的 0xffRRGGBB），与 QImage.Format_RGB32 相同。
+    """
+
+    def __init__(self, instance, media_path, width):
+        self.instance = instance
+        self.media_path = media_path
+        self.width = width
+        self.height = 0
+        self.player = None
+        self._buffer = None
+        self._buffer_lock = threading.Lock()
+        self._frame_event = threading.Event()
+        self._frames = 0
+        self._callbacks = None
+
+    def _video_height(self, media):
+        """按视频宽高比计算缩略图高度（偶数），读不到时按16:9"""
+        aspect = DEFAULT_ASPECT
+        media.parse_with_options(vlc.MediaParseFlag.local, START_TIMEOUT * 1000)
+        deadline = time.monotonic() + START_TIMEOUT
+        while media.get_parsed_status() == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for track in media.tracks_get() or ():
+            if track.type == vlc.TrackType.video and track.video:
+                video = track.video.contents
+                if video.width and video.height:
+                    sar = video.sar_num / video.sar_den if video.sar_num and video.sar_den else 1.0
+                    aspect = video.height / (video.width * sar)
+                    break
+        return max(2, int(round(self.width * aspect / 2)) * 2)
+
+    def start(self):
+        """开始播放（无声），画面出现返回True，文件没有画面或无法打开时返回False"""
+        media = self.instance.media_new(self.media_path)
+        media.add_option(":no-audio")
+        self.height = self._video_height(media)
+        pitch = self.width * 4
+        self._buffer = ctypes.create_string_buffer(pitch * self.height)
+        buffer_address = ctypes.addressof(self._buffer)
+
+        @vlc.CallbackDecorators.VideoLockCb
+        def lock(opaque, planes):
+            self._buffer_lock.acquire()
+            planes[0] = buffer_address
+            return None
+
+        @vlc.CallbackDecorators.VideoUnlockCb
+        def unlock(opaque, picture, planes):
+            self._buffer_lock.release()
+
+        @vlc.CallbackDecorators.VideoDisplayCb
+        def display(opaque, picture):
+            self._frames += 1
+            self._frame_event.set()
+
+        # 回调对象要一直保留，否则会被回收
+        self._callbacks = (lock, unlock, display)
+        self.player = self.instance.media_player_new()
+        self.player.set_media(media)
+        self.player.video_set_callbacks(lock, unlock, display, None)
+        self.player.video_set_format("RV32", self.width, self.height, pitch)
+        if self.player.play() != 0:
+            return False
+        return self._frame_event.wait(START_TIMEOUT)
+
+    def grab(self, time_ms):
+        """跳转到指定时间并返回这一帧的像素数据，超时返回None"""
+        if self.player.get_state() == vlc.State.Ended:
+            # 上一次跳转后一直播放到了结尾
+            self.player.stop()
+            self.player.play()
+        self._frame_event.clear()
+        frames = self._frames
+        self.player.set_time(max(0, time_ms))
+        deadline = time.monotonic() + FRAME_TIMEOUT
+        while time.monotonic() < deadline:
+            if not self._frame_event.wait(max(0.0, deadline - time.monotonic())):
+                break
+            self._frame_event.clear()
+            # 跳转前已经解码的帧可能还会显示一次，以播放位置为准
+            if self._frames > frames and abs(self.player.get_time() - time_ms) <= SEEK_WINDOW_MS:
+                with self._buffer_lock:
+                    return self._buffer.raw
+        return None
+
+    def close(self):
+        if self.player is not None:
+            self.player.stop()
+            self.player.release()
+            self.player = None
+
+
+class ThumbnailCache:
+    """句子缩略图缓存
+
+    每个视频一个打包文件，文件名为视频路径的SHA1，文件头记录视频的大小/修改时间，视频变化后重新生成。
+    同一时间只处理一个请求（通常是句子清单中正在查看的视频），按请求中的顺序截图；
+    新的请求（另一个视频，或滚动到还没生成的位置后从可见行开始）在下一帧代替正在进行的生成。
+    每截一帧 version 加一，界面定期检查后调用打包文件的 refresh() 并加载可见行。
+
+    Args:
+        cache_dir: 缓存目录
+        encode: encode(宽, 高, RV32像素数据) 返回压缩后的图片数据，在后台线程中调用
+    """
+
+    def __init__(self, cache_dir, encode, width=THUMBNAIL_WIDTH):
+        self.cache_dir = cache_dir
+        self.encode = encode
+        self.width = width
+        self.version = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._request = None        # (视频路径, 句子开始时间列表)
+        self._worker = None
+        self._stopped = False
+        self._instance = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def pack_path(self, media_path):
+        digest = hashlib.sha1(media_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, digest + PACK_EXTENSION)
+
+    def lookup(self, media_path):
+        """打开视频的缩略图打包文件，没有生成过或视频已经变化时返回None"""
+        pack = ThumbnailPack.open(self.pack_path(media_path))
+        if pack is None or pack.width != self.width:
+            return None
+        try:
+            if file_signature(media_path) != pack.signature:
+                return None
+        except OSError:
+            return None
+        return pack
+
+    def generate_in_background(self, media_path, start_times):
+        """在后台按 start_times 的顺序为缺少缩略图的句子截图，代替尚未完成的上一个请求"""
+        if not is_video_file(media_path):
+            return
+        with self._lock:
+            self._request = (media_path, list(dict.fromkeys(start_times)))
+            self._wakeup.set()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name="ThumbnailWorker", daemon=True)
+                self._worker.start()
+
+    def shutdown(self):
+        """停止后台线程"""
+        self._stopped = True
+        self._wakeup.set()
+
+    def _superseded(self):
+        return self._stopped or self._request is not None
+
+    def _run_worker(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        while not self._stopped:
+            self._wakeup.wait()
+            with self._lock:
+                self._wakeup.clear()
+                request, self._request = self._request, None
+            if request is None or self._stopped:
+                continue
+            media_path, start_times = request
+            try:
+                self._generate(media_path, start_times)
+            except Exception as e:
+                print(f"生成句子缩略图失败: {media_path}, 错误: {e}")
+        if self._instance is not None:
+            self._instance.release()
+            self._instance = None
+
+    def _open_for_append(self, media_path, signature):
+        """打开（或新建）打包文件用于追加，返回 (文件, ThumbnailPack)；视频没有画面时返回 (None, pack)"""
+        path = self.pack_path(media_path)
+        pack = self.lookup(media_path)
+        if pack is not None and not pack.has_video:
+            return None, pack
+        if pack is None:
+            temp_path = path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(HEADER.pack(PACK_MAGIC, 0, self.width, 0, *signature))
+            os.replace(temp_path, path)
+            pack = ThumbnailPack.open(path)
+        f = open(path, 'r+b')
+        # 丢掉上次中断时没有写完的记录
+        f.truncate(pack.end_offset)
+        f.seek(pack.end_offset)
+        return f, pack
+
+    def _set_header(self, f, flags, width, height, signature):
+        f.seek(0)
+        f.write(HEADER.pack(PACK_MAGIC, flags, width, height, *signature))
+        f.seek(0, os.SEEK_END)
+
+    def _generate(self, media_path, start_times):
+        if not os.path.exists(media_path):
+            return
+        signature = file_signature(media_path)
+        f, pack = self._open_for_append(media_path, signature)
+        if f is None:
+            return
+        missing = [start_ms for start_ms in start_times if start_ms not in pack]
+        with f:
+            if not missing:
+                return
+            if self._instance is None:
+                self._instance = vlc.Instance(*GRABBER_INSTANCE_ARGS)
+            grabber = FrameGrabber(self._instance, media_path, self.width)
+            try:
+                if not grabber.start():
+                    print(f"视频没有画面，不生成缩略图: {media_path}")
+                    self._set_header(f, FLAG_NO_VIDEO, self.width, 0, signature)
+                    return
+                self._set_header(f, 0, self.width, grabber.height, signature)
+                grabbed = 0
+                for start_ms in missing:
+                    if self._superseded():
+                        break
+                    pixels = grabber.grab(start_ms)
+                    data = self.encode(self.width, grabber.height, pixels) if pixels else b''
+                    f.write(RECORD.pack(start_ms, len(data)) + data)
+                    f.flush()
+                    grabbed += 1
+                    with self._lock:
+                        self.version += 1
+                    time.sleep(THROTTLE_SECONDS)
+                print(f"已生成 {grabbed} 张句子缩略图: {media_path}")
+            finally:
+                grabber.close()
+                with self._lock:
+                    self.version += 1
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子波形数据
+每个媒体文件解码为8kHz单声道后生成一个最小值/最大值金字塔：第0层每个桶是 BASE_BIN 个采样的最小值和最大值，
+往上每一层把相邻两个桶合并为一个，直到只剩一个桶。整个金字塔保存为一个文件，用 mmap 映射，不整个读入内存。
+
+显示任意时间范围时，选择桶长度不超过一个像素的最粗的一层，每个像素只需要合并一到三个桶，
+计算量与像素数成正比，与范围内的采样数无关：一句话和一整课的绘制代价相同。
+界面部分（WaveformView）在主程序中，本模块不依赖Qt。
+
+响度分析（loudness）同样要完整解码一遍文件；两者都需要时由响度分析的解码结果生成金字塔（build_from_wav），
+每个文件只解码一次。第0层每个桶固定为2ms，桶的采样数按WAV的采样率换算，记录在文件头中。
+
+需要numpy，没有安装时 is_available() 返回False。
+"""
+
+import hashlib
+import mmap
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+import wave
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from file_signature import file_signature
+from media_decode import create_decode_instance, decode_to_wav
+
+
+WAVEFORM_DIR_NAME = "waveforms"
+
+# 分析用音频格式：画波形不需要高频细节
+ANALYSIS_SAMPLE_RATE = 8000
+
+# 第0层每个桶的采样数（8kHz下为2ms；其他采样率按比例换算，保持2ms）
+BASE_BIN = 16
+
+# 每次读入的采样数（60秒），大文件不必整个读入内存
+CHUNK_SAMPLES = ANALYSIS_SAMPLE_RATE * 60
+
+# 解码整个文件的超时（秒）
+ANALYSIS_DECODE_TIMEOUT = 600
+
+# 后台线程的nice值（仅Linux上对单个线程有效）
+WORKER_NICENESS = 10
+
+# 文件格式：文件头 + 每层的 (数据偏移, 桶数) + 各层数据，每个桶为 int16 的 (最小值, 最大值)
+PYRAMID_MAGIC = b'ELPWAVE1'
+HEADER = struct.Struct('<8sqqIII')      # 标记、媒体大小、修改时间、采样率、第0层每桶采样数、层数
+LEVEL = struct.Struct('<qq')
+PYRAMID_EXTENSION = ".wave"
+
+
+def is_available():
+    """是否可以生成和显示波形（需要numpy）"""
+    return np is not None
+
+
+def build_levels(base):
+    """由第0层（N×2 的 int16 数组）逐层两两合并，返回所有层的列表"""
+    levels = [base]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = np.concatenate((level, level[-1:]))
+        pairs = level.reshape(-1, 2, 2)
+        levels.append(np.stack((pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)), axis=1))
+    return levels
+
+
+def bin_samples_for_rate(sample_rate):
+    """第0层每个桶的采样数，任何采样率下桶长度都与 ANALYSIS_SAMPLE_RATE 下的 BASE_BIN 相同"""
+    return max(1, BASE_BIN * sample_rate // ANALYSIS_SAMPLE_RATE)
+
+
+def base_level_from_wav(path):
+    """按 CHUNK_SAMPLES 分段读取16位单声道WAV，返回 (采样率, 第0层每桶采样数, 第0层)"""
+    parts = []
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"解码格式不正确: {wav.getsampwidth() * 8}位 {wav.getnchannels()}声道")
+        sample_rate = wav.getframerate()
+        bin_samples = bin_samples_for_rate(sample_rate)
+        chunk = CHUNK_SAMPLES * sample_rate // ANALYSIS_SAMPLE_RATE
+        tail = np.zeros(0, dtype='<i2')
+        while True:
+            pcm = wav.readframes(chunk)
+            if not pcm:
+                break
+            samples = np.concatenate((tail, np.frombuffer(pcm, dtype='<i2')))
+            usable = len(samples) // bin_samples * bin_samples
+            tail = samples[usable:]
+            if usable:
+                bins = samples[:usable].reshape(-1, bin_samples)
+                parts.append(np.stack((bins.min(axis=1), bins.max(axis=1)), axis=1))
+        if len(tail):
+            parts.append(np.array([[tail.min(), tail.max()]], dtype='<i2'))
+    if not parts:
+        return sample_rate, bin_samples, np.zeros((0, 2), dtype='<i2')
+    return sample_rate, bin_samples, np.concatenate(parts).astype('<i2')
+
+
+def write_pyramid(path, signature, sample_rate, base_bin, levels):
+    """把金字塔写入文件（先写临时文件再替换；临时文件名带线程号，两个线程同时写同一个文件也不冲突）"""
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(PYRAMID_MAGIC, signature[0], signature[1], sample_rate, base_bin, len(levels)))
+        offset = HEADER.size + LEVEL.size * len(levels)
+        for level in levels:
+            f.write(LEVEL.pack(offset, len(level)))
+            offset += level.size * 2
+        for level in levels:
+            f.write(np.ascontiguousarray(level, dtype='<i2').tobytes())
+    os.replace(temp_path, path)
+
+
+class WaveformPyramid:
+    """映射到内存的最小值/最大值金字塔"""
+
+    def __init__(self, f, mapped, signature, sample_rate, base_bin, levels):
+        self._file = f
+        self._mmap = mapped
+        self.signature = signature
+        self.sample_rate = sample_rate
+        self.base_bin = base_bin
+        self.levels = levels
+
+    @classmethod
+    def open(cls, path):
+        """打开金字塔文件，不存在或格式不对时返回None"""
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            f.close()
+            return None
+        try:
+            magic, size, mtime, sample_rate, base_bin, level_count = HEADER.unpack_from(mapped)
+            if magic != PYRAMID_MAGIC:
+                raise ValueError("不是波形文件")
+            levels = []
+            for i in range(level_count):
+                offset, count = LEVEL.unpack_from(mapped, HEADER.size + LEVEL.size * i)
+                levels.append(np.frombuffer(mapped, dtype='<i2', count=count * 2, offset=offset).reshape(-1, 2))
+        except (struct.error, ValueError):
+            mapped.close()
+            f.close()
+            return None
+        return cls(f, mapped, (size, mtime), sample_rate, base_bin, levels)
+
+    def close(self):
+        self.levels = []
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 还有数组引用映射的内存，由垃圾回收释放
+                pass
+            self._mmap = None
+            self._file.close()
+
+    @property
+    def duration_ms(self):
+        if not self.levels:
+            return 0
+        return len(self.levels[0]) * self.base_bin * 1000 // self.sample_rate
+
+    def columns(self, start_ms, end_ms, width):
+        """把 [start_ms, end_ms) 分成 width 列，返回每列的 (最小值, 最大值)，范围 -1~1；
+        超出文件的列为 NaN。计算量与 width 成正比"""
+        mins = np.full(width, np.nan, dtype=np.float32)
+        maxs = np.full(width, np.nan, dtype=np.float32)
+        if width <= 0 or end_ms <= start_ms or not self.levels or not len(self.levels[0]):
+            return mins, maxs
+
+        samples_per_column = (end_ms - start_ms) * self.sample_rate / 1000.0 / width
+        # 桶长度不超过一列的最粗的一层，每列合并的桶数在1~3个之间（放大到一个桶宽于一列时每列取一个桶）
+        index = 0
+        while (index + 1 < len(self.levels) and
+               self.base_bin * (2 ** (index + 1)) <= samples_per_column):
+            index += 1
+        level = self.levels[index]
+        bin_samples = self.base_bin * (2 ** index)
+
+        start_sample = start_ms * self.sample_rate / 1000.0
+        edges = (start_sample + np.arange(width + 1) * samples_per_column) / bin_samples
+        # 跨两列的桶两列都计入，每列都包含该列的所有采样，峰值不会被移到相邻的一列或在最后一列丢失
+        first = np.floor(edges[:-1]).astype(np.int64)
+        last = np.maximum(np.ceil(edges[1:]).astype(np.int64), first + 1)
+        # 粗的层最后一个桶可能超出文件的末尾，按第0层判断一列是否超出文件
+        valid = (first >= 0) & (edges[:-1] * bin_samples < len(self.levels[0]) * self.base_bin)
+        if not valid.any():
+            return mins, maxs
+        columns = np.nonzero(valid)[0]
+        first = first[columns]
+        last = np.minimum(last[columns], len(level))
+
+        # 只取出范围内的桶，reduceat 按 (起点, 终点) 交替的下标分段求最小/最大值，偶数位置的结果就是每列的值；
+        # 终点可以等于最后一个桶之后的位置，在末尾补一个桶让这样的下标有效（补的桶只出现在奇数位置的结果中）
+        window = np.concatenate((level[first[0]:last[-1]], level[-1:]))
+        bounds = np.stack((first, last), axis=1).ravel() - first[0]
+        mins[columns] = np.minimum.reduceat(window[:, 0], bounds)[::2] / 32768.0
+        maxs[columns] = np.maximum.reduceat(window[:, 1], bounds)[::2] / 32768.0
+        return mins, maxs
+
+
+class WaveformCache:
+    """波形金字塔缓存
+
+    每个媒体文件一个金字塔文件，文件名为媒体路径的SHA1，文件头记录媒体的大小/修改时间，媒体变化后重新生成。
+    生成在后台线程中逐个进行（使用单独的VLC解码实例）；完成后 version 加一，界面定期检查并重新打开。
+    响度分析解码过的文件可以直接用 build_from_wav() 生成，不再解码第二遍。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.version = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._failed = set()
+        self._worker = None
+        self._stopped = False
+        self._cancel = threading.Event()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def pyramid_path(self, media_path):
+        digest = hashlib.sha1(media_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, digest + PYRAMID_EXTENSION)
+
+    def lookup(self, media_path):
+        """打开媒体文件的波形金字塔，没有生成过或媒体已经变化时返回None；用完后调用 close()"""
+        try:
+            signature = file_signature(media_path)
+        except OSError:
+            return None
+        pyramid = WaveformPyramid.open(self.pyramid_path(media_path))
+        if pyramid is not None and pyramid.signature != signature:
+            pyramid.close()
+            return None
+        return pyramid
+
+    def generate_in_background(self, media_path):
+        """在后台生成波形金字塔，已在队列中或生成失败过的文件会被跳过"""
+        with self._lock:
+            if self._stopped or media_path in self._queued or media_path in self._failed:
+                return
+            self._queued.add(media_path)
+            self._queue.put(media_path)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name="WaveformWorker", daemon=True)
+                self._worker.start()
+
+    def build_from_wav(self, media_path, signature, wav_path):
+        """由其他分析已经解码好的16位单声道WAV生成金字塔（在调用方的后台线程中执行），已有最新的金字塔时跳过"""
+        pyramid = WaveformPyramid.open(self.pyramid_path(media_path))
+        if pyramid is not None:
+            current = pyramid.signature == signature
+            pyramid.close()
+            if current:
+                return
+        try:
+            started = time.perf_counter()
+            sample_rate, base_bin, base = base_level_from_wav(wav_path)
+            levels = build_levels(base)
+            write_pyramid(self.pyramid_path(media_path), signature, sample_rate, base_bin, levels)
+            print(f"已生成波形: {os.path.basename(media_path)}，{len(levels)} 层（复用响度分析的解码），"
+                  f"计算 {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"生成波形失败: {media_path}, 错误: {e}")
+        finally:
+            with self._lock:
+                self.version += 1
+
+    def shutdown(self):
+        """停止后台线程，正在进行的解码随之中止"""
+        self._stopped = True
+        self._cancel.set()
+        self._queue.put(None)
+
+    def _run_worker(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        instance = None
+        try:
+            while not self._stopped:
+                media_path = self._queue.get()
+                if media_path is None:
+                    break
+                try:
+                    if instance is None:
+                        instance = create_decode_instance()
+                    self._generate(instance, media_path)
+                except Exception as e:
+                    print(f"生成波形失败: {media_path}, 错误: {e}")
+                    with self._lock:
+                        self._failed.add(media_path)
+                finally:
+                    with self._lock:
+                        self._queued.discard(media_path)
+                        self.version += 1
+        finally:
+            if instance is not None:
+                instance.release()
+
+    def _generate(self, instance, media_path):
+        signature = file_signature(media_path)
+        fd, temp_path = tempfile.mkstemp(prefix='elp_waveform_', suffix='.wav')
+        os.close(fd)
+        try:
+            started = time.perf_counter()
+            if not decode_to_wav(instance, media_path, temp_path, sample_rate=ANALYSIS_SAMPLE_RATE, channels=1,
+                                 timeout=ANALYSIS_DECODE_TIMEOUT, cancel_event=self._cancel):
+                if not self._stopped:
+                    raise RuntimeError("解码失败")
+                return
+            decoded = time.perf_counter()
+            sample_rate, base_bin, base = base_level_from_wav(temp_path)
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        levels = build_levels(base)
+        write_pyramid(self.pyramid_path(media_path), signature, sample_rate, base_bin, levels)
+        print(f"已生成波形: {os.path.basename(media_path)}，{len(levels)} 层，"
+              f"解码 {decoded - started:.1f}s，计算 {time.perf_counter() - decoded:.2f}s")